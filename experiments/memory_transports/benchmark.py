@@ -0,0 +1,111 @@
+""" Compare the throughput of the redis transports with the in-memory transports
+
+Measures RPC round trips (a worker consumes calls and sends back results), and
+event throughput (events are sent, then consumed by a single consumer group).
+Only the transports are used, so this measures the transports' overhead rather
+than that of the bus.
+"""
+import asyncio
+import sys
+import time
+
+import aioredis
+
+from lightbus import RedisRpcTransport, RedisResultTransport, RedisEventTransport, MemoryRpcTransport, \
+    MemoryResultTransport, MemoryEventTransport, RpcMessage, ResultMessage, EventMessage
+from lightbus.transports.memory import MemoryBroker
+from lightbus.utilities.async import cancel
+
+
+class BenchmarkApi(object):
+    class meta:
+        name = 'benchmark'
+
+
+async def pool():
+    redis = await aioredis.create_redis_pool('redis://127.0.0.1:6379/0', maxsize=100)
+    await redis.flushdb()
+    return redis
+
+
+async def make_redis_transports():
+    return (
+        RedisRpcTransport(redis_pool=await pool()), RedisResultTransport(redis_pool=await pool()),
+        RedisEventTransport(redis_pool=await pool(), consumer_group_prefix='benchmark', consumer_name='benchmark'),
+    )
+
+
+async def make_memory_transports():
+    broker = MemoryBroker()
+    return (
+        MemoryRpcTransport(broker=broker), MemoryResultTransport(broker=broker),
+        MemoryEventTransport(broker=broker, consumer_group_prefix='benchmark', consumer_name='benchmark'),
+    )
+
+
+async def benchmark_rpcs(rpc_transport, result_transport, total, concurrency):
+    async def worker():
+        while True:
+            for rpc_message in await rpc_transport.consume_rpcs(apis=[BenchmarkApi]):
+                await result_transport.send_result(
+                    rpc_message, ResultMessage(rpc_id=rpc_message.rpc_id, result='x'), rpc_message.return_path
+                )
+
+    async def call():
+        rpc_message = RpcMessage(api_name='benchmark', procedure_name='proc', kwargs={})
+        rpc_message.return_path = result_transport.get_return_path(rpc_message)
+        await asyncio.gather(
+            result_transport.receive_result(rpc_message, rpc_message.return_path, {}),
+            rpc_transport.call_rpc(rpc_message, {}),
+        )
+
+    worker_task = asyncio.ensure_future(worker())
+    await asyncio.sleep(0.1)
+    await call()
+
+    start = time.time()
+    for _ in range(total // concurrency):
+        await asyncio.gather(*[call() for _ in range(concurrency)])
+    elapsed = time.time() - start
+
+    await cancel(worker_task)
+    return total // concurrency * concurrency / elapsed
+
+
+async def benchmark_events(event_transport, total):
+    listen_for = [('benchmark', 'event')]
+    consumer = event_transport.consume(listen_for, context={}, loop=None, consumer_group='benchmark', since='0')
+
+    start = time.time()
+    await asyncio.gather(*[
+        event_transport.send_event(EventMessage(api_name='benchmark', event_name='event', kwargs={'n': n}), {})
+        for n in range(total)
+    ])
+    received = 0
+    async for _ in consumer:
+        await consumer.__anext__()
+        received += 1
+        if received == total:
+            break
+    elapsed = time.time() - start
+
+    await consumer.aclose()
+    return total / elapsed
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    loop = asyncio.get_event_loop()
+    for name, make_transports in (('redis', make_redis_transports), ('memory', make_memory_transports)):
+        rpc_transport, result_transport, event_transport = loop.run_until_complete(make_transports())
+        for concurrency in (1, 20):
+            per_second = loop.run_until_complete(benchmark_rpcs(rpc_transport, result_transport, total, concurrency))
+            print('{} RPCs (concurrency {}): {:.0f} calls per second'.format(name, concurrency, per_second))
+        per_second = loop.run_until_complete(benchmark_events(event_transport, total))
+        print('{} events: {:.0f} events per second'.format(name, per_second))
+        for transport in (rpc_transport, result_transport, event_transport):
+            loop.run_until_complete(transport.close())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+""" Compare the round-trip latency of the list-based and pub/sub redis result transports
+
+Each iteration has a caller wait for a result while a worker sends it, much as happens
+for each RPC call. Results are sent over a separate connection pool, as they would be
+by a separate worker process.
+"""
+import asyncio
+import sys
+import time
+
+import aioredis
+
+from lightbus import RedisResultTransport, RedisPubSubResultTransport, RpcMessage, ResultMessage
+
+
+async def benchmark(transport_class, total, concurrency):
+    caller = transport_class(redis_pool=await aioredis.create_redis_pool('redis://127.0.0.1:6379/0', maxsize=100))
+    worker = transport_class(redis_pool=await aioredis.create_redis_pool('redis://127.0.0.1:6379/0', maxsize=100))
+
+    async def round_trip():
+        rpc_message = RpcMessage(api_name='my.api', procedure_name='my_proc', kwargs={})
+        return_path = caller.get_return_path(rpc_message)
+        receive = asyncio.ensure_future(caller.receive_result(rpc_message, return_path, {}))
+        # Ensure the caller is waiting before the result is sent
+        await asyncio.sleep(0)
+        await worker.send_result(rpc_message, ResultMessage(rpc_id=rpc_message.rpc_id, result='x'), return_path)
+        await receive
+
+    # Warm up connections and subscriptions
+    await round_trip()
+
+    start = time.time()
+    for _ in range(total // concurrency):
+        await asyncio.gather(*[round_trip() for _ in range(concurrency)])
+    elapsed = time.time() - start
+
+    await caller.close()
+    await worker.close()
+    return elapsed / (total // concurrency * concurrency)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    loop = asyncio.get_event_loop()
+    for concurrency in (1, 20):
+        for transport_class in (RedisResultTransport, RedisPubSubResultTransport):
+            per_call = loop.run_until_complete(benchmark(transport_class, total, concurrency))
+            print('{} (concurrency {}): {:.3f}ms per result'.format(
+                transport_class.__name__, concurrency, per_call * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
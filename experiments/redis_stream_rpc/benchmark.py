@@ -0,0 +1,72 @@
+""" Compare the throughput of the list-based and stream-based redis RPC transports
+
+A backlog of calls is enqueued, after which a single worker consumes them in batches.
+Enqueuing and consuming are timed separately. The stream-based transport's consumption
+includes acknowledging each batch, which happens when the worker asks for the next one.
+
+Uses redis database 15, which is flushed before each run.
+"""
+import asyncio
+import sys
+import time
+
+import aioredis
+
+from lightbus import Api, RedisRpcTransport, RedisStreamRpcTransport, RpcMessage
+
+
+class BenchmarkApi(Api):
+
+    class Meta:
+        name = 'benchmark'
+
+
+def make_transport(transport_class, redis_pool, batch_size):
+    if transport_class is RedisStreamRpcTransport:
+        return transport_class(redis_pool=redis_pool, consumer_name='benchmark',
+                               batch_size=batch_size, rpc_timeout=600)
+    else:
+        return transport_class(redis_pool=redis_pool, batch_size=batch_size, rpc_timeout=600)
+
+
+async def benchmark(transport_class, total, batch_size):
+    redis_pool = await aioredis.create_redis_pool('redis://127.0.0.1:6379/15', maxsize=100)
+    await redis_pool.flushdb()
+    transport = make_transport(transport_class, redis_pool, batch_size)
+    apis = [BenchmarkApi()]
+
+    # Warm up the connections, and create the stream transport's consumer group
+    rpc_message = RpcMessage(api_name='benchmark', procedure_name='my_proc', kwargs={}, return_path='x')
+    await transport.call_rpc(rpc_message, {})
+    await transport.consume_rpcs(apis)
+
+    start = time.time()
+    for n in range(total):
+        rpc_message = RpcMessage(api_name='benchmark', procedure_name='my_proc', kwargs={'n': n},
+                                 return_path='x')
+        await transport.call_rpc(rpc_message, {})
+    enqueue_elapsed = time.time() - start
+
+    start = time.time()
+    received = 0
+    while received < total:
+        received += len(await transport.consume_rpcs(apis))
+    consume_elapsed = time.time() - start
+
+    await transport.close()
+    return enqueue_elapsed / total, consume_elapsed / total
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    loop = asyncio.get_event_loop()
+    for batch_size in (1, 10, 100):
+        for transport_class in (RedisRpcTransport, RedisStreamRpcTransport):
+            per_enqueue, per_consume = loop.run_until_complete(benchmark(transport_class, total, batch_size))
+            print('{} (batch size {}): {:.3f}ms per call enqueued, {:.3f}ms per call consumed'.format(
+                transport_class.__name__, batch_size, per_enqueue * 1000, per_consume * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
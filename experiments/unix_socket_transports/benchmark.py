@@ -0,0 +1,96 @@
+""" Compare RPC round-trip latency over redis, unix domain sockets, and direct TCP
+
+A worker consumes calls and sends back results, while a caller makes calls one
+at a time (or several at once). Only the transports are used, so this measures
+the transports' overhead rather than that of the bus.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+import aioredis
+
+from lightbus import RedisRpcTransport, RedisResultTransport, UnixRpcTransport, UnixResultTransport, \
+    TcpRpcTransport, TcpResultTransport, RpcMessage, ResultMessage
+from lightbus.utilities.async import cancel
+
+
+class BenchmarkApi(object):
+    class meta:
+        name = 'benchmark'
+
+
+async def pool():
+    return await aioredis.create_redis_pool('redis://127.0.0.1:6379/0', maxsize=100)
+
+
+async def make_redis_transports():
+    return (
+        RedisRpcTransport(redis_pool=await pool()), RedisResultTransport(redis_pool=await pool()),
+        RedisRpcTransport(redis_pool=await pool()), RedisResultTransport(redis_pool=await pool()),
+    )
+
+
+async def make_unix_transports():
+    socket_directory = tempfile.mkdtemp(prefix='lb')
+    return (
+        UnixRpcTransport(socket_directory=socket_directory), UnixResultTransport(socket_directory=socket_directory),
+        UnixRpcTransport(socket_directory=socket_directory), UnixResultTransport(socket_directory=socket_directory),
+    )
+
+
+async def make_tcp_transports():
+    return (
+        TcpRpcTransport(fallback_transport=RedisRpcTransport(redis_pool=await pool())), TcpResultTransport(),
+        TcpRpcTransport(fallback_transport=RedisRpcTransport(redis_pool=await pool())), TcpResultTransport(),
+    )
+
+
+async def benchmark(make_transports, total, concurrency):
+    caller_rpc, caller_result, worker_rpc, worker_result = await make_transports()
+
+    async def worker():
+        while True:
+            for rpc_message in await worker_rpc.consume_rpcs(apis=[BenchmarkApi]):
+                await worker_result.send_result(
+                    rpc_message, ResultMessage(rpc_id=rpc_message.rpc_id, result='x'), rpc_message.return_path
+                )
+
+    async def call():
+        rpc_message = RpcMessage(api_name='benchmark', procedure_name='proc', kwargs={})
+        rpc_message.return_path = caller_result.get_return_path(rpc_message)
+        await asyncio.gather(
+            caller_result.receive_result(rpc_message, rpc_message.return_path, {}),
+            caller_rpc.call_rpc(rpc_message, {}),
+        )
+
+    worker_task = asyncio.ensure_future(worker())
+    # Give the worker a chance to start listening, then warm up connections
+    await asyncio.sleep(0.1)
+    await call()
+
+    start = time.time()
+    for _ in range(total // concurrency):
+        await asyncio.gather(*[call() for _ in range(concurrency)])
+    elapsed = time.time() - start
+
+    await cancel(worker_task)
+    for transport in (caller_rpc, caller_result, worker_rpc, worker_result):
+        await transport.close()
+    return elapsed / (total // concurrency * concurrency)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    loop = asyncio.get_event_loop()
+    for concurrency in (1, 20):
+        for name, make_transports in (('redis', make_redis_transports),
+                                      ('unix', make_unix_transports),
+                                      ('tcp', make_tcp_transports)):
+            per_call = loop.run_until_complete(benchmark(make_transports, total, concurrency))
+            print('{} (concurrency {}): {:.3f}ms per call'.format(name, concurrency, per_call * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
+import inspect
 from typing import Dict
 
 from lightbus.exceptions import UnknownApi, InvalidApiRegistryEntry, EventNotFound, MisconfiguredApiOptions
 
 
-__all__ = ['Api', 'Event']
+__all__ = ['Api', 'Event', 'batched', 'cached']
 
 
 class Registry(object):
@@ -118,3 +119,57 @@ class Event(object):
     def __init__(self, parameters=tuple()):
         # Ensure you update the __copy__() method if adding other instance variables below
         self.parameters = parameters
+
+
+def batched(method=None, *, max_batch_size: int=100, window: float=0.005):
+    """Mark an RPC as batched
+
+    The decorated procedure must accept a single `calls` parameter, which will be a list
+    of kwargs dictionaries (one per call). It must return a list of results in the same order.
+    For example:
+
+        class UserApi(Api):
+
+            @batched
+            def get_user(self, calls: list) -> list:
+                return load_users([call['user_id'] for call in calls])
+
+    Callers continue to call the procedure normally (i.e. `bus.user.get_user(user_id=1)`).
+    Calls made concurrently within `window` seconds of each other are sent
+    as a single RPC, up to a maximum of `max_batch_size` calls.
+    """
+    def decorator(method):
+        parameters = list(inspect.signature(method).parameters)
+        if parameters[1:] != ['calls']:
+            raise MisconfiguredApiOptions(
+                f"Batched RPC {method.__name__}() must accept a single parameter named 'calls', "
+                f"but it accepts: {', '.join(parameters[1:]) or 'no parameters'}"
+            )
+        method._lightbus_batched = dict(max_batch_size=max_batch_size, window=window)
+        return method
+
+    if method is None:
+        return decorator
+    else:
+        return decorator(method)
+
+
+def cached(method=None, *, ttl: float=60, maxsize: int=1000, shared: bool=False):
+    """Cache the results of an RPC on the server
+
+    Only use this for procedures whose results depend entirely upon their parameters.
+    Results are cached for `ttl` seconds, keyed by the procedure's parameters. Errors
+    are not cached.
+
+    By default each process keeps its own cache, containing at most `maxsize` results.
+    Set `shared` to share the cache between all processes serving the API (this
+    requires an RPC transport which supports caching, such as the redis transport).
+    """
+    def decorator(method):
+        method._lightbus_cached = dict(ttl=ttl, maxsize=maxsize, shared=shared)
+        return method
+
+    if method is None:
+        return decorator
+    else:
+        return decorator(method)
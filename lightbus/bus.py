@@ -1,37 +1,44 @@
 import asyncio
 import contextlib
 import inspect
+import json
 import logging
 import os
 import signal
 import time
 from asyncio.futures import CancelledError
 from inspect import isawaitable
-from typing import Optional, List, Tuple, Union, Mapping
+from typing import Optional, List, Tuple, Union, Mapping, Dict, Sequence, AsyncIterator
 
 from lightbus.api import registry, Api
 from lightbus.config import Config
 from lightbus.exceptions import InvalidEventArguments, InvalidBusNodeConfiguration, UnknownApi, EventNotFound, \
     InvalidEventListener, SuddenDeathException, LightbusTimeout, LightbusServerError, NoApisToListenOn, InvalidName, \
-    InvalidParameters, OnlyAvailableOnRootNode
+    InvalidParameters, OnlyAvailableOnRootNode, SchemaNotFound
 from lightbus.internal_apis import LightbusStateApi, LightbusMetricsApi
 from lightbus.log import LBullets, L, Bold
 from lightbus.message import RpcMessage, ResultMessage, EventMessage, Message
 from lightbus.plugins import autoload_plugins, plugin_hook, manually_set_plugins
 from lightbus.schema import Schema
+from lightbus.schema.encoder import json_encode
 from lightbus.schema.schema import _parameter_names
 from lightbus.transports import RpcTransport, ResultTransport, EventTransport
 from lightbus.transports.base import SchemaTransport, TransportRegistry
-from lightbus.utilities.async import handle_aio_exceptions, block, get_event_loop, cancel
+from lightbus.utilities.async import handle_aio_exceptions, block, get_event_loop, cancel, ContextVar
 from lightbus.utilities.config import random_name
 from lightbus.utilities.frozendict import frozendict
+from lightbus.utilities.cache import TtlCache
 from lightbus.utilities.human import human_time
 
-__all__ = ['BusClient', 'BusNode', 'create']
+__all__ = ['BusClient', 'BusNode', 'create', 'rpc_deadline']
 
 
 logger = logging.getLogger(__name__)
 
+# The unix timestamp by which the RPC currently being executed must complete. Calls
+# made by the RPC's handler will not wait beyond this point.
+rpc_deadline = ContextVar('rpc_deadline', default=None)
+
 
 class BusClient(object):
 
@@ -49,6 +56,25 @@ class BusClient(object):
         )
         self.loop = loop or get_event_loop()
         self._listeners = {}
+        # Batches of calls to batched RPCs which are yet to be sent.
+        # Keys are (api name, procedure name, options), values are (kwargs list, full event, future)
+        self._rpc_batches = {}
+        # In-flight calls to single-flight RPCs.
+        # Keys are (api name, procedure name, kwargs, options), values are futures
+        self._rpcs_in_flight = {}
+        # Client-side caches of RPC results. Keys are (api name, procedure name)
+        self._rpc_caches: Dict[Tuple[str, str], TtlCache] = {}
+        # Caches which are being created (see _get_rpc_cache()). Values are futures
+        self._rpc_cache_setups: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Cache keys whose results are being fetched, by (api name, procedure name).
+        # Values are [number of callers fetching the result, number of times the key was invalidated]
+        self._rpc_cache_fills: Dict[Tuple[str, str], Dict[str, List[int]]] = {}
+        # Server-side caches of the results of @cached procedures. Keys are (api name, procedure name)
+        self._local_rpc_caches: Dict[Tuple[str, str], TtlCache] = {}
+        # Keys are fully qualified procedure names, values are dicts of hits & misses
+        self._local_rpc_cache_stats: Dict[str, Dict[str, int]] = {}
+        # @cached(shared=True) procedures whose RPC transport cannot share a cache, as (api name, procedure name)
+        self._unshared_rpc_caches = set()
 
     def setup(self, plugins: dict=None):
         """Setup lightbus and get it ready to consume events and/or RPCs
@@ -106,7 +132,7 @@ class BusClient(object):
         for transport in self.transport_registry.get_all_transports():
             await transport.close()
 
-    def run_forever(self, *, consume_rpcs=True):
+    def run_forever(self, *, consume_rpcs=True, gc_interval: float=None, gc_idle_timeout: float=86400):
         rpc_transport = self.transport_registry.get_rpc_transport('default', default=None)
         result_transport = self.transport_registry.get_result_transport('default', default=None)
         event_transport = self.transport_registry.get_event_transport('default', default=None)
@@ -144,11 +170,11 @@ class BusClient(object):
 
         block(plugin_hook('before_server_start', bus_client=self), self.loop, timeout=5)
 
-        self._run_forever(consume_rpcs)
+        self._run_forever(consume_rpcs, gc_interval, gc_idle_timeout)
 
         self.loop.run_until_complete(plugin_hook('after_server_stopped', bus_client=self))
 
-    def _run_forever(self, consume_rpcs):
+    def _run_forever(self, consume_rpcs, gc_interval=None, gc_idle_timeout=86400):
         # Setup RPC consumption
         consume_rpc_task = None
         if consume_rpcs and registry.all():
@@ -157,6 +183,14 @@ class BusClient(object):
         # Setup schema monitoring
         monitor_task = asyncio.ensure_future(self.schema.monitor(), loop=self.loop)
 
+        # Setup periodic garbage collection
+        gc_task = None
+        if gc_interval:
+            gc_task = asyncio.ensure_future(
+                handle_aio_exceptions(self.collect_garbage_forever(gc_interval, gc_idle_timeout)),
+                loop=self.loop
+            )
+
         self.loop.add_signal_handler(signal.SIGINT, self.loop.stop)
         self.loop.add_signal_handler(signal.SIGTERM, self.loop.stop)
 
@@ -174,7 +208,7 @@ class BusClient(object):
 
         # Cancel the tasks we created above
         block(
-            cancel(consume_rpc_task, monitor_task),
+            cancel(consume_rpc_task, monitor_task, gc_task),
             loop=self.loop, timeout=1
         )
 
@@ -193,6 +227,13 @@ class BusClient(object):
                 'or the API registry is empty.'
             )
 
+        # Warn about any shared caches which cannot be shared now, rather than upon first use
+        for api in apis:
+            for name, method in inspect.getmembers(api):
+                cache_options = getattr(method, '_lightbus_cached', None)
+                if cache_options:
+                    self._is_rpc_cache_shared(api.meta.name, name, cache_options)
+
         while True:
             # Not all APIs will necessarily be served by the same transport, so group them
             # accordingly
@@ -214,29 +255,297 @@ class BusClient(object):
     async def _consume_rpcs_with_transport(self, rpc_transport: RpcTransport, apis: List[Api] = None):
         rpc_messages = await rpc_transport.consume_rpcs(apis)
         for rpc_message in rpc_messages:
-            self._validate(rpc_message, 'incoming')
-
-            await plugin_hook('before_rpc_execution', rpc_message=rpc_message, bus_client=self)
+            if rpc_message.deadline and rpc_message.deadline < time.time():
+                logger.warning(L(
+                    "Skipping RPC {} as its caller has stopped waiting for it ({} ago)",
+                    Bold(rpc_message.canonical_name), human_time(time.time() - rpc_message.deadline)
+                ))
+                continue
+
+            # Make the deadline available to the handler, and to any calls it makes
+            deadline_token = rpc_deadline.set(rpc_message.deadline)
             try:
-                result = await self.call_rpc_local(
-                    api_name=rpc_message.api_name,
-                    name=rpc_message.procedure_name,
-                    kwargs=rpc_message.kwargs
+                await self._execute_rpc(rpc_message)
+            finally:
+                rpc_deadline.reset(deadline_token)
+
+    async def _execute_rpc(self, rpc_message: RpcMessage):
+        self._validate(rpc_message, 'incoming')
+
+        await plugin_hook('before_rpc_execution', rpc_message=rpc_message, bus_client=self)
+        try:
+            result = await self.call_rpc_local(
+                api_name=rpc_message.api_name,
+                name=rpc_message.procedure_name,
+                kwargs=rpc_message.kwargs
+            )
+        except SuddenDeathException:
+            # Used to simulate message failure for testing
+            pass
+        else:
+            if rpc_message.stream:
+                await self._send_result_stream(rpc_message, result)
+                return
+
+            if inspect.isasyncgen(result):
+                # The caller is not streaming the result, so send it all at once
+                result = await self._collect_async_generator(result)
+
+            result_message = ResultMessage(result=result, rpc_id=rpc_message.rpc_id)
+            await plugin_hook('after_rpc_execution', rpc_message=rpc_message, result_message=result_message,
+                              bus_client=self)
+
+            self._validate(result_message, 'outgoing',
+                           api_name=rpc_message.api_name, procedure_name=rpc_message.procedure_name)
+
+            await self.send_result(rpc_message=rpc_message, result_message=result_message)
+
+    async def _send_result_stream(self, rpc_message: RpcMessage, result):
+        """Send the given result as a series of result messages
+
+        `result` may be an async generator, in which case each value will be sent as it
+        is generated. Otherwise the result will be sent as a single value.
+        """
+        async def values():
+            if inspect.isasyncgen(result):
+                async for value in result:
+                    yield value
+            elif not isinstance(result, Exception):
+                yield result
+
+        try:
+            async for value in values():
+                await self.send_result(
+                    rpc_message=rpc_message,
+                    result_message=ResultMessage(result=value, rpc_id=rpc_message.rpc_id, more=True),
                 )
-            except SuddenDeathException:
-                # Used to simulate message failure for testing
-                pass
-            else:
+        except (CancelledError, SuddenDeathException):
+            raise
+        except Exception as e:
+            logger.warning(L("⚡  Error while streaming result of {}", Bold(rpc_message.canonical_name)))
+            result_message = ResultMessage(result=e, rpc_id=rpc_message.rpc_id)
+        else:
+            if isinstance(result, Exception):
                 result_message = ResultMessage(result=result, rpc_id=rpc_message.rpc_id)
-                await plugin_hook('after_rpc_execution', rpc_message=rpc_message, result_message=result_message,
-                                  bus_client=self)
+            else:
+                # Let the caller know the stream is complete
+                result_message = ResultMessage(result=None, rpc_id=rpc_message.rpc_id)
+
+        await plugin_hook('after_rpc_execution', rpc_message=rpc_message, result_message=result_message,
+                          bus_client=self)
+        await self.send_result(rpc_message=rpc_message, result_message=result_message)
+
+    async def _collect_async_generator(self, generator):
+        """Get all values from the given async generator, or the exception it raised"""
+        try:
+            return [value async for value in generator]
+        except (CancelledError, SuddenDeathException):
+            raise
+        except Exception as e:
+            return e
+
+    async def stream_rpc_remote(self, api_name: str, name: str, kwargs: dict=frozendict(),
+                                options: dict=frozendict()):
+        """Call a remote procedure, yielding its result as it is streamed back
+
+        Procedures which are async generators will have each value
+        streamed as it is generated. Otherwise, the result will be yielded as a single value.
+
+        The timeout applies to the wait for each value, rather than to the call as a whole.
+        However, the stream will not outlive the deadline of the RPC currently being executed (if any).
+        Streamed values are not validated, as the schema describes the result as a whole.
+        """
+        rpc_transport = self.transport_registry.get_rpc_transport(api_name)
+        result_transport = self.transport_registry.get_result_transport(api_name)
+
+        rpc_message = RpcMessage(api_name=api_name, procedure_name=name, kwargs=kwargs, stream=True)
+        return_path = result_transport.get_return_path(rpc_message)
+        rpc_message.return_path = return_path
+        options = options or {}
+        deadline = rpc_deadline.get()
+        if self._get_rpc_timeout(api_name, options, deadline) <= 0:
+            raise LightbusTimeout(
+                f"Not calling RPC {rpc_message.canonical_name} as the deadline of the "
+                f"RPC currently being executed has already passed."
+            )
+        # As the timeout applies to each value, the stream as a whole only has a deadline
+        # when we inherit one. The worker will in turn apply it to any calls it makes.
+        rpc_message.deadline = deadline
+
+        self._validate_name(api_name, 'rpc', name)
+        self._validate(rpc_message, 'outgoing')
+
+        logger.info("📞  Calling remote RPC {}.{} (streaming)".format(Bold(api_name), Bold(name)))
+        start_time = time.time()
 
-                self._validate(result_message, 'outgoing',
-                               api_name=rpc_message.api_name, procedure_name=rpc_message.procedure_name)
+        await plugin_hook('before_rpc_call', rpc_message=rpc_message, bus_client=self)
+        await rpc_transport.call_rpc(rpc_message, options=options)
+
+        result_messages = result_transport.receive_result_stream(rpc_message, return_path, options=options)
+        try:
+            while True:
+                timeout = max(self._get_rpc_timeout(api_name, options, deadline), 0)
+                try:
+                    result_message = await asyncio.wait_for(result_messages.__anext__(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    try:
+                        await rpc_transport.cancel_rpc(rpc_message, options=options)
+                    except Exception as e:
+                        logger.warning(L("Failed to cancel timed out RPC {}: {}", Bold(rpc_message.canonical_name), e))
+                    raise LightbusTimeout(
+                        f"Timeout when streaming the result of RPC {rpc_message.canonical_name}. No "
+                        f"result was received for {timeout} seconds."
+                    ) from None
+
+                if result_message.error:
+                    raise LightbusServerError('Error while calling {}: {}\nRemote stack trace:\n{}'.format(
+                        rpc_message.canonical_name,
+                        result_message.result,
+                        result_message.trace,
+                    ))
+
+                if not result_message.more:
+                    break
+                yield result_message.result
+        finally:
+            await result_messages.aclose()
 
-                await self.send_result(rpc_message=rpc_message, result_message=result_message)
+        await plugin_hook('after_rpc_call', rpc_message=rpc_message, result_message=result_message, bus_client=self)
+        logger.info(L("🏁  Remote streaming call of {} completed in {}",
+                      Bold(rpc_message.canonical_name), human_time(time.time() - start_time)))
 
     async def call_rpc_remote(self, api_name: str, name: str, kwargs: dict=frozendict(), options: dict=frozendict()):
+        cache_config = self.config.api(api_name).rpc_cache.get(name)
+        if not cache_config:
+            return await self._call_rpc_remote_single_flight(api_name, name, kwargs, options)
+
+        cache = await self._get_rpc_cache(api_name, name, cache_config)
+        key = json_encode(kwargs, indent=None)
+        try:
+            result = cache.get(key)
+        except KeyError:
+            pass
+        else:
+            logger.debug(L("Using cached result for RPC {}.{}", Bold(api_name), Bold(name)))
+            return result
+
+        # Note any invalidation of the key while we fetch its result, as our result may then be stale
+        fills = self._rpc_cache_fills[(api_name, name)]
+        fill = fills.setdefault(key, [0, 0])
+        fill[0] += 1
+        invalidations = fill[1]
+        try:
+            result = await self._call_rpc_remote_single_flight(api_name, name, kwargs, options)
+        finally:
+            fill[0] -= 1
+            if not fill[0]:
+                del fills[key]
+
+        if fill[1] == invalidations:
+            cache.set(key, result)
+        else:
+            logger.debug(L("Not caching result for RPC {}.{} as it was invalidated during the call",
+                           Bold(api_name), Bold(name)))
+        return result
+
+    async def _get_rpc_cache(self, api_name: str, name: str, cache_config) -> TtlCache:
+        """Get the result cache for the given RPC, creating it if necessary
+
+        Concurrent callers share a single cache creation, and so all wait until the
+        cache is listening for the events which invalidate it.
+        """
+        if (api_name, name) in self._rpc_caches:
+            return self._rpc_caches[(api_name, name)]
+
+        if (api_name, name) not in self._rpc_cache_setups:
+            self._rpc_cache_setups[(api_name, name)] = asyncio.ensure_future(
+                self._create_rpc_cache(api_name, name, cache_config)
+            )
+        # Shielded, so a cancelled caller does not cancel the creation for the others
+        return await asyncio.shield(self._rpc_cache_setups[(api_name, name)])
+
+    async def _create_rpc_cache(self, api_name: str, name: str, cache_config) -> TtlCache:
+        """Create the result cache for the given RPC
+
+        The cache is only used once it is listening for the events which invalidate it.
+        Otherwise, results cached in the meantime could miss their invalidations.
+        """
+        try:
+            cache = TtlCache(ttl=cache_config.ttl, maxsize=cache_config.maxsize)
+            fills = self._rpc_cache_fills.setdefault((api_name, name), {})
+
+            def invalidate(event_api_name, event_name, **event_kwargs):
+                parameters = cache_config.invalidate_on[f'{event_api_name}.{event_name}']
+
+                def matches(key):
+                    rpc_kwargs = json.loads(key)
+                    return all(rpc_kwargs.get(p) == event_kwargs.get(p) for p in parameters)
+
+                for key, _ in cache.items():
+                    if matches(key):
+                        cache.delete(key)
+                for key, fill in fills.items():
+                    if matches(key):
+                        fill[1] += 1
+
+            if cache_config.invalidate_on:
+                await self.listen_for_events(
+                    [tuple(event.rsplit('.', 1)) for event in cache_config.invalidate_on],
+                    invalidate,
+                )
+            self._rpc_caches[(api_name, name)] = cache
+            return cache
+        finally:
+            self._rpc_cache_setups.pop((api_name, name), None)
+
+    async def _call_rpc_remote_single_flight(self, api_name: str, name: str, kwargs: dict=frozendict(),
+                                             options: dict=frozendict()):
+        single_flight = self.config.api(api_name).single_flight
+        if single_flight is not True and name not in (single_flight or []):
+            return await self._call_rpc_remote(api_name, name, kwargs, options)
+
+        # Identical concurrent calls share a single call (and its result)
+        key = (api_name, name, json_encode(kwargs, indent=None), tuple(sorted((options or {}).items())))
+        if key not in self._rpcs_in_flight:
+            # The call runs in its own task, which will not see our deadline (see TaskContextVar)
+            future = asyncio.ensure_future(
+                self._call_rpc_remote(api_name, name, kwargs, options, deadline=rpc_deadline.get())
+            )
+            self._rpcs_in_flight[key] = future
+
+            def remove(f):
+                if self._rpcs_in_flight.get(key) is f:
+                    del self._rpcs_in_flight[key]
+
+            future.add_done_callback(remove)
+        else:
+            logger.debug(L("Joining in-flight call to RPC {}.{}", Bold(api_name), Bold(name)))
+
+        return await self._wait_for_shared_call(self._rpcs_in_flight[key], f'{api_name}.{name}')
+
+    async def _wait_for_shared_call(self, future: asyncio.Future, canonical_name: str):
+        """Wait for a call shared with other callers, giving up at the deadline of the RPC being executed
+
+        The call is shielded, as other callers may still be waiting on it.
+        """
+        deadline = rpc_deadline.get()
+        if not deadline:
+            return await asyncio.shield(future)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=deadline - time.time())
+        except asyncio.TimeoutError:
+            raise LightbusTimeout(
+                f"Stopped waiting for RPC {canonical_name} as the deadline of the "
+                f"RPC currently being executed has passed."
+            ) from None
+
+    async def _call_rpc_remote(self, api_name: str, name: str, kwargs: dict=frozendict(),
+                               options: dict=frozendict(), deadline: float=None):
+        """Call a remote RPC
+
+        The call will not outlive `deadline`, which defaults to that of the RPC currently being executed.
+        """
         rpc_transport = self.transport_registry.get_rpc_transport(api_name)
         result_transport = self.transport_registry.get_result_transport(api_name)
 
@@ -244,7 +553,13 @@ class BusClient(object):
         return_path = result_transport.get_return_path(rpc_message)
         rpc_message.return_path = return_path
         options = options or {}
-        timeout = options.get('timeout', self.config.api(api_name).rpc_timeout)
+        timeout = self._get_rpc_timeout(api_name, options, deadline)
+        if timeout <= 0:
+            raise LightbusTimeout(
+                f"Not calling RPC {rpc_message.canonical_name} as the deadline of the "
+                f"RPC currently being executed has already passed."
+            )
+        rpc_message.deadline = time.time() + timeout
 
         self._validate_name(api_name, 'rpc', name)
 
@@ -273,8 +588,12 @@ class BusClient(object):
             except CancelledError:
                 pass
 
-            # TODO: Remove RPC from queue. Perhaps add a RpcBackend.cancel() method. Optional,
-            #       as not all backends will support it. No point processing calls which have timed out.
+            # No point processing calls which have timed out
+            try:
+                await rpc_transport.cancel_rpc(rpc_message, options=options)
+            except Exception as e:
+                logger.warning(L("Failed to cancel timed out RPC {}: {}", Bold(rpc_message.canonical_name), e))
+
             raise LightbusTimeout(
                 f"Timeout when calling RPC {rpc_message.canonical_name} after {timeout} seconds. "
                 f"It is possible no Lightbus process is serving this API, or perhaps it is taking "
@@ -304,15 +623,232 @@ class BusClient(object):
 
         return result_message.result
 
+    async def call_many(self, calls: Sequence[Tuple[str, str, dict]], options: dict=frozendict()) -> list:
+        """Call several RPCs concurrently, returning their results in order
+
+        Each call is given as an `(api_name, procedure_name, kwargs)` tuple. The calls
+        are sent using a single `call_rpcs()` per RPC transport, and the results are all
+        awaited under a single timeout.
+
+        Failed calls do not raise an exception. Rather, the exception (for example,
+        LightbusServerError or LightbusTimeout) is returned in place of the call's result.
+        """
+        options = options or {}
+        values = {}
+        rpc_messages = {}
+
+        for index, (api_name, name, kwargs) in enumerate(calls):
+            try:
+                self._validate_name(api_name, 'rpc', name)
+                rpc_message = RpcMessage(api_name=api_name, procedure_name=name, kwargs=kwargs)
+                result_transport = self.transport_registry.get_result_transport(api_name)
+                rpc_message.return_path = result_transport.get_return_path(rpc_message)
+                self._validate(rpc_message, 'outgoing')
+            except Exception as e:
+                values[index] = e
+            else:
+                rpc_messages[index] = rpc_message
+
+        if not rpc_messages:
+            return [values[index] for index in range(len(calls))]
+
+        timeout = max(self._get_rpc_timeout(rpc_message.api_name, options) for rpc_message in rpc_messages.values())
+        for rpc_message in rpc_messages.values():
+            rpc_message.deadline = time.time() + timeout
+        logger.info(L("📞  Calling {} remote RPCs", Bold(len(rpc_messages))))
+        start_time = time.time()
+
+        # Group the calls by the transports which will be used to send them & receive their results
+        rpc_transports = {}
+        result_transports = {}
+        for index, rpc_message in rpc_messages.items():
+            rpc_transport = self.transport_registry.get_rpc_transport(rpc_message.api_name)
+            result_transport = self.transport_registry.get_result_transport(rpc_message.api_name)
+            rpc_transports.setdefault(rpc_transport, []).append(index)
+            result_transports.setdefault(result_transport, []).append(index)
+
+        indexes_by_rpc_id = {rpc_message.rpc_id: index for index, rpc_message in rpc_messages.items()}
+        outstanding = set(rpc_messages)
+        all_done = asyncio.Event(loop=self.loop)
+
+        def done(index, value):
+            if index in outstanding:
+                values[index] = value
+                outstanding.discard(index)
+            if not outstanding:
+                all_done.set()
+
+        async def send(rpc_transport, indexes):
+            try:
+                await rpc_transport.call_rpcs([rpc_messages[index] for index in indexes], options=options)
+            except CancelledError:
+                raise
+            except Exception as e:
+                for index in indexes:
+                    done(index, e)
+
+        async def receive(result_transport, indexes):
+            try:
+                async for result_message in result_transport.receive_results(
+                        [rpc_messages[index] for index in indexes],
+                        [rpc_messages[index].return_path for index in indexes],
+                        options=options):
+                    done(indexes_by_rpc_id[result_message.rpc_id], result_message)
+            except CancelledError:
+                raise
+            except Exception as e:
+                for index in indexes:
+                    done(index, e)
+
+        for rpc_message in rpc_messages.values():
+            await plugin_hook('before_rpc_call', rpc_message=rpc_message, bus_client=self)
+
+        # Start waiting for results before sending the calls
+        tasks = [asyncio.ensure_future(receive(t, indexes)) for t, indexes in result_transports.items()]
+        tasks += [asyncio.ensure_future(send(t, indexes)) for t, indexes in rpc_transports.items()]
+        try:
+            await asyncio.wait_for(all_done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await cancel(*tasks)
+
+        for rpc_transport, indexes in rpc_transports.items():
+            for index in indexes:
+                if index not in outstanding:
+                    continue
+                rpc_message = rpc_messages[index]
+                # No point processing calls which have timed out
+                try:
+                    await rpc_transport.cancel_rpc(rpc_message, options=options)
+                except Exception as e:
+                    logger.warning(L("Failed to cancel timed out RPC {}: {}", Bold(rpc_message.canonical_name), e))
+                values[index] = LightbusTimeout(
+                    f"Timeout when calling RPC {rpc_message.canonical_name} after {timeout} seconds "
+                    f"(as part of call_many())."
+                )
+
+        for index, rpc_message in rpc_messages.items():
+            result_message = values[index]
+            if not isinstance(result_message, ResultMessage):
+                continue
+
+            await plugin_hook('after_rpc_call', rpc_message=rpc_message, result_message=result_message,
+                              bus_client=self)
+            if result_message.error:
+                values[index] = LightbusServerError('Error while calling {}: {}\nRemote stack trace:\n{}'.format(
+                    rpc_message.canonical_name,
+                    result_message.result,
+                    result_message.trace,
+                ))
+                continue
+
+            try:
+                self._validate(result_message, 'incoming', rpc_message.api_name,
+                               procedure_name=rpc_message.procedure_name)
+            except Exception as e:
+                values[index] = e
+            else:
+                values[index] = result_message.result
+
+        logger.info(L("🏁  {} remote calls completed in {}",
+                      Bold(len(rpc_messages)), human_time(time.time() - start_time)))
+        return [values[index] for index in range(len(calls))]
+
+    def _get_rpc_timeout(self, api_name: str, options: dict, deadline: float=None) -> float:
+        """Get the timeout for a call, taking into account the deadline of any RPC currently executing"""
+        timeout = options.get('timeout', self.config.api(api_name).rpc_timeout)
+        deadline = deadline or rpc_deadline.get()
+        if deadline:
+            timeout = min(timeout, deadline - time.time())
+        return timeout
+
+    async def call_rpc_batched(self, api_name: str, name: str, kwargs: dict=frozendict(),
+                               options: dict=frozendict(), *, max_batch_size: int=100, window: float=0.005):
+        """Call a batched RPC, coalescing concurrent calls into a single call
+
+        The batch is sent once `window` seconds have passed since its first
+        call, or once it contains `max_batch_size` calls.
+        """
+        key = (api_name, name, tuple(sorted((options or {}).items())))
+        if key not in self._rpc_batches:
+            calls, full = [], asyncio.Event(loop=self.loop)
+            # The batch is sent by its own task, so pass on our deadline (which then applies to the whole batch)
+            future = asyncio.ensure_future(
+                self._send_rpc_batch(key, calls, full, options, window, deadline=rpc_deadline.get())
+            )
+            self._rpc_batches[key] = (calls, full, future)
+
+        calls, full, future = self._rpc_batches[key]
+        index = len(calls)
+        calls.append(dict(kwargs))
+        if len(calls) >= max_batch_size:
+            # Start a new batch for any subsequent calls
+            self._rpc_batches.pop(key, None)
+            full.set()
+
+        results = await self._wait_for_shared_call(future, f'{api_name}.{name}')
+        return results[index]
+
+    async def _send_rpc_batch(self, key, calls: List[dict], full: asyncio.Event, options: dict, window: float,
+                              deadline: float=None):
+        api_name, name, _ = key
+        # Apply the deadline to the calls made by this task
+        rpc_deadline.set(deadline)
+        try:
+            await asyncio.wait_for(full.wait(), timeout=window)
+        except asyncio.TimeoutError:
+            pass
+
+        if key in self._rpc_batches and self._rpc_batches[key][0] is calls:
+            # Subsequent calls should go into a new batch
+            del self._rpc_batches[key]
+
+        logger.debug(L("Sending batch of {} calls to RPC {}.{}", Bold(len(calls)), Bold(api_name), Bold(name)))
+        results = await self.call_rpc_remote(api_name, name, kwargs={'calls': calls}, options=options)
+        if not isinstance(results, list) or len(results) != len(calls):
+            raise LightbusServerError(
+                f"Batched RPC {api_name}.{name} was called with {len(calls)} calls, but did not return a "
+                f"list of {len(calls)} results. Batched RPCs must return a list containing one result per call."
+            )
+        return results
+
+    def get_rpc_batch_options(self, api_name: str, name: str) -> Optional[dict]:
+        """Get the batching options for the given RPC, or None if it is not batched"""
+        if api_name in registry.names():
+            method = getattr(registry.get(api_name), name, None)
+            return getattr(method, '_lightbus_batched', None)
+
+        try:
+            return self.schema.get_rpc_schema(api_name, name).get('batched')
+        except SchemaNotFound:
+            return None
+
     async def call_rpc_local(self, api_name: str, name: str, kwargs: dict=frozendict()):
         api = registry.get(api_name)
         self._validate_name(api_name, 'rpc', name)
+        cache_options = getattr(getattr(api, name, None), '_lightbus_cached', None)
 
         start_time = time.time()
         try:
+            if cache_options:
+                key = json_encode(kwargs, indent=None)
+                stats = self._local_rpc_cache_stats.setdefault(f'{api_name}.{name}', dict(hits=0, misses=0))
+                try:
+                    result = await self._get_cached_local_result(api_name, name, key, cache_options)
+                except KeyError:
+                    stats['misses'] += 1
+                else:
+                    stats['hits'] += 1
+                    logger.info(L("⚡  Used cached result for {}.{}", Bold(api_name), Bold(name)))
+                    return result
+
             result = api.call(name, kwargs)
             if isawaitable(result):
                 result = await result
+
+            if cache_options:
+                await self._set_cached_local_result(api_name, name, key, result, cache_options)
         except (CancelledError, SuddenDeathException):
             raise
         except Exception as e:
@@ -322,6 +858,59 @@ class BusClient(object):
             logger.info(L("⚡  Executed {}.{} in {}", Bold(api_name), Bold(name), human_time(time.time() - start_time)))
             return result
 
+    def rpc_cache_metrics(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        """Get the hits, misses and hit rate of each @cached procedure served by this process"""
+        return {
+            name: dict(**stats, hit_rate=stats['hits'] / ((stats['hits'] + stats['misses']) or 1))
+            for name, stats
+            in self._local_rpc_cache_stats.items()
+        }
+
+    def _is_rpc_cache_shared(self, api_name: str, name: str, cache_options: dict) -> bool:
+        """Should the given @cached procedure use the cache shared via its RPC transport?
+
+        Procedures whose RPC transport provides no shared cache use a local cache instead.
+        """
+        if not cache_options['shared']:
+            return False
+
+        rpc_transport = self.transport_registry.get_rpc_transport(api_name)
+        if rpc_transport.shared_cache:
+            return True
+
+        if (api_name, name) not in self._unshared_rpc_caches:
+            self._unshared_rpc_caches.add((api_name, name))
+            logger.warning(L(
+                "{}.{}() is cached with shared=True, but the {} RPC transport does not provide a shared "
+                "cache. Each process will therefore cache its results separately.",
+                Bold(api_name), Bold(name), rpc_transport.__class__.__name__
+            ))
+        return False
+
+    async def _get_cached_local_result(self, api_name: str, name: str, key: str, cache_options: dict):
+        if self._is_rpc_cache_shared(api_name, name, cache_options):
+            rpc_transport = self.transport_registry.get_rpc_transport(api_name)
+            value = await rpc_transport.get_cached_result(api_name, name, key)
+            if value is None:
+                raise KeyError(key)
+            return json.loads(value)
+        else:
+            cache = self._local_rpc_caches.get((api_name, name))
+            if cache is None:
+                raise KeyError(key)
+            return cache.get(key)
+
+    async def _set_cached_local_result(self, api_name: str, name: str, key: str, result, cache_options: dict):
+        if self._is_rpc_cache_shared(api_name, name, cache_options):
+            rpc_transport = self.transport_registry.get_rpc_transport(api_name)
+            await rpc_transport.set_cached_result(api_name, name, key, json_encode(result, indent=None),
+                                                  ttl=cache_options['ttl'])
+        else:
+            cache = self._local_rpc_caches.setdefault(
+                (api_name, name), TtlCache(ttl=cache_options['ttl'], maxsize=cache_options['maxsize'])
+            )
+            cache.set(key, result)
+
     # Events
 
     async def fire_event(self, api_name, name, kwargs: dict=None, options: dict=None):
@@ -448,6 +1037,64 @@ class BusClient(object):
         listener_task.is_listener = True  # Used by close()
         return listener_task
 
+    async def replay_events(self,
+                            events: List[Tuple[str, str]],
+                            since=None,
+                            until=None,
+                            options: dict=None):
+        """Read historical events from the bus, returning an asynchronous generator
+
+        Events are read directly from the event transport's history, rather than
+        via a consumer group. Events are therefore not acknowledged and will still be
+        received by any listeners. Options are passed on to the event transport's
+        replay() method.
+        """
+        for api_name, name in events:
+            self._validate_name(api_name, 'event', name)
+
+        options = options or {}
+        event_transports = self.transport_registry.get_event_transports(
+            api_names=[api_name for api_name, _ in events]
+        )
+
+        for _event_transport, _api_names in event_transports:
+            _events = [
+                (api_name, event_name)
+                for api_name, event_name in events
+                if api_name in _api_names
+            ]
+            replay = _event_transport.replay(listen_for=_events, since=since, until=until, **options)
+            async for event_message in replay:
+                self._validate(event_message, 'incoming')
+                yield event_message
+
+    # Maintenance
+
+    async def collect_garbage_async(self, idle_timeout: float=86400, **kwargs) -> Dict[str, int]:
+        """Remove consumer state which has been idle for more than idle_timeout seconds
+
+        Each event transport is asked to clean up after listeners which are
+        no longer running (see EventTransport.collect_garbage()), and is passed
+        any further keyword arguments. Returns the totals of the statistics
+        returned by each transport.
+        """
+        totals = {}
+        for event_transport in self.transport_registry.get_all_event_transports():
+            stats = await event_transport.collect_garbage(idle_timeout=idle_timeout, **kwargs)
+            for k, v in (stats or {}).items():
+                totals[k] = totals.get(k, 0) + v
+
+        logger.info(LBullets('Garbage collection complete', items=totals))
+        return totals
+
+    def collect_garbage(self, idle_timeout: float=86400, **kwargs) -> Dict[str, int]:
+        return block(self.collect_garbage_async(idle_timeout, **kwargs), self.loop, timeout=None)
+
+    async def collect_garbage_forever(self, interval: float, idle_timeout: float=86400):
+        while True:
+            await asyncio.sleep(interval)
+            await self.collect_garbage_async(idle_timeout)
+
     # Results
 
     async def send_result(self, rpc_message: RpcMessage, result_message: ResultMessage):
@@ -600,10 +1247,63 @@ class BusNode(object):
                 f"arguments. Lightbus requires you use keyword arguments. For example, "
                 f"instead of func(1), use func(foo=1)."
             )
+
+        batch_options = self.bus_client.get_rpc_batch_options(self.api_name, self.name)
+        if batch_options:
+            return await self.bus_client.call_rpc_batched(
+                api_name=self.api_name, name=self.name, kwargs=kwargs, options=bus_options, **batch_options
+            )
+
         return await self.bus_client.call_rpc_remote(
             api_name=self.api_name, name=self.name, kwargs=kwargs, options=bus_options
         )
 
+    def call_many(self, calls: List[Tuple['BusNode', dict]], *, bus_options: dict=None) -> list:
+        if not calls:
+            return []
+        rpc_timeout = max(self.bus_client.config.api(node.api_name).rpc_timeout for node, _ in calls) * 1.5
+        return block(self.call_many_async(calls, bus_options=bus_options),
+                     loop=self.bus_client.loop,
+                     timeout=rpc_timeout)
+
+    async def call_many_async(self, calls: List[Tuple['BusNode', dict]], *, bus_options: dict=None) -> list:
+        """Call several RPCs concurrently, returning their results (or errors) in order
+
+        For example:
+
+            user, order = await bus.call_many_async([
+                (bus.auth.get_user, {'user_id': 1}),
+                (bus.store.get_order, {'order_id': 2}),
+            ])
+        """
+        if self.parent:
+            raise OnlyAvailableOnRootNode(
+                'Both call_many() and call_many_async() are only available on the '
+                'bus root. For example, call bus.call_many(), not bus.my_api.my_proc.call_many()'
+            )
+
+        return await self.bus_client.call_many(
+            [(node.api_name, node.name, kwargs) for node, kwargs in calls], options=bus_options
+        )
+
+    def stream_async(self, *args, bus_options: dict=None, **kwargs) -> AsyncIterator:
+        """Call the RPC, returning an async iterator of its streamed result
+
+        For example:
+
+            async for row in bus.reports.export.stream_async(year=2018):
+                print(row)
+        """
+        if args:
+            raise InvalidParameters(
+                f"You have attempted to call the RPC {self.fully_qualified_name} using positional "
+                f"arguments. Lightbus requires you use keyword arguments. For example, "
+                f"instead of func(1), use func(foo=1)."
+            )
+        return self.bus_client.stream_rpc_remote(
+            api_name=self.api_name, name=self.name, kwargs=kwargs, options=bus_options
+        )
+
     # Events
 
     async def listen_async(self, listener, *, bus_options: dict=None):
@@ -633,6 +1333,26 @@ class BusNode(object):
             self.listen_multiple_async(events, listener, bus_options=bus_options), self.bus_client.loop, timeout=5
         )
 
+    def history(self, *, since=None, until=None, bus_options: dict=None):
+        """Get an asynchronous generator of this event's historical events"""
+        return self.bus_client.replay_events(
+            events=[(self.api_name, self.name)], since=since, until=until, options=bus_options
+        )
+
+    async def replay_async(self, listener, *, since=None, until=None, bus_options: dict=None) -> int:
+        """Pass this event's historical events to the given listener
+
+        Returns the number of events replayed
+        """
+        self.bus_client._sanity_check_listener(listener)
+        total = 0
+        async for event_message in self.history(since=since, until=until, bus_options=bus_options):
+            co = listener(event_message.api_name, event_message.event_name, **event_message.kwargs)
+            if inspect.isawaitable(co):
+                await co
+            total += 1
+        return total
+
     async def fire_async(self, *args, bus_options: dict=None, **kwargs):
         if args:
             raise InvalidParameters(
@@ -658,8 +1378,8 @@ class BusNode(object):
                 yield parent
             parent = parent.parent
 
-    def run_forever(self, consume_rpcs=True):
-        self.bus_client.run_forever(consume_rpcs=consume_rpcs)
+    def run_forever(self, consume_rpcs=True, **kwargs):
+        self.bus_client.run_forever(consume_rpcs=consume_rpcs, **kwargs)
 
     @property
     def api_name(self):
@@ -11,6 +11,7 @@ import lightbus.commands.run
 import lightbus.commands.shell
 import lightbus.commands.dump_schema
 import lightbus.commands.dump_config_schema
+import lightbus.commands.collect_garbage
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,7 @@ def parse_args(args=None):
     lightbus.commands.dump_schema.Command().setup(parser, subparsers)
     lightbus.commands.dump_schema.Command().setup(parser, subparsers)
     lightbus.commands.dump_config_schema.Command().setup(parser, subparsers)
+    lightbus.commands.collect_garbage.Command().setup(parser, subparsers)
 
     autoload_plugins(config=Config.load_dict({}))
 
@@ -64,6 +66,7 @@ def load_config(args) -> Config:
 
     if args.service_name:
         config._config.service_name = args.service_name
+        config._config.service_name_generated = False
 
     if args.process_name:
         config._config.process_name = args.process_name
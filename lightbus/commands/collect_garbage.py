@@ -0,0 +1,64 @@
+import argparse
+import logging
+
+import sys
+
+import lightbus
+from lightbus.commands.utilities import BusImportMixin, LogLevelMixin
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LogLevelMixin, BusImportMixin, object):
+
+    def setup(self, parser, subparsers):
+        parser_gc = subparsers.add_parser('gc',
+                                          help='Delete abandoned consumer groups and consumers. Only the '
+                                               'consumer groups belonging to this service are considered, '
+                                               'unless --prefix or --all is specified.',
+                                          formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        parser_gc.add_argument('--idle-timeout',
+                               help='Consumers and consumer groups which have been idle for '
+                                    'longer than this will be deleted',
+                               metavar='SECONDS',
+                               type=float,
+                               default=86400,
+                               )
+        parser_gc_scope_group = parser_gc.add_mutually_exclusive_group()
+        parser_gc_scope_group.add_argument('--prefix',
+                                           help='Consider the consumer groups of the service with this name '
+                                                '(rather than this service). Groups whose names start with '
+                                                'PREFIX- are considered even if their creation was never '
+                                                'recorded. May be specified multiple times.',
+                                           metavar='PREFIX',
+                                           action='append',
+                                           dest='prefixes',
+                                           )
+        parser_gc_scope_group.add_argument('--all',
+                                           help='Consider every consumer group, regardless of which service '
+                                                'created it',
+                                           action='store_true',
+                                           dest='all_groups',
+                                           )
+        self.setup_import_parameter(parser_gc)
+        parser_gc.set_defaults(func=self.handle)
+
+    def handle(self, args, config):
+        self.setup_logging(args.log_level or 'warning', config)
+
+        if config.service_name_generated and not (args.prefixes or args.all_groups):
+            sys.stderr.write(
+                'No service name is configured, so this service\'s consumer groups cannot be found. '
+                'Set the service name (using --service-name or the config file), or use --prefix or --all.\n'
+            )
+            exit(1)
+            return  # noqa
+
+        self.import_bus(args)
+        bus = lightbus.create(config)
+        stats = bus.client.collect_garbage(
+            idle_timeout=args.idle_timeout, prefixes=args.prefixes, all_groups=args.all_groups
+        )
+
+        for k, v in sorted(stats.items()):
+            sys.stderr.write('{}: {}\n'.format(k.replace('_', ' ').capitalize(), v))
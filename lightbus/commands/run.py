@@ -1,5 +1,6 @@
 import argparse
 import logging
+import sys
 
 from lightbus import create
 from lightbus.commands.utilities import BusImportMixin, LogLevelMixin
@@ -24,11 +25,33 @@ class Command(LogLevelMixin, BusImportMixin, object):
                  'but manual loading may be useful during development or testing.',
             metavar='FILE_OR_DIRECTORY',
         )
+        parser_run.add_argument('--gc-interval',
+                                help='Periodically delete abandoned consumer groups and consumers '
+                                     'belonging to this service. Requires the service name to be set. '
+                                     'Disabled if omitted.',
+                                metavar='SECONDS',
+                                type=float,
+                                )
+        parser_run.add_argument('--gc-idle-timeout',
+                                help='Consumers and consumer groups which have been idle for '
+                                     'longer than this will be deleted by --gc-interval',
+                                metavar='SECONDS',
+                                type=float,
+                                default=86400,
+                                )
         parser_run.set_defaults(func=self.handle)
 
     def handle(self, args, config, dry_run=False):
         self.setup_logging(args.log_level, config)
 
+        if args.gc_interval and config.service_name_generated:
+            sys.stderr.write(
+                'No service name is configured, so this service\'s consumer groups cannot be found. '
+                'Set the service name (using --service-name or the config file) to use --gc-interval.\n'
+            )
+            exit(1)
+            return  # noqa
+
         bus_module = self.import_bus(args)
 
         bus = create(config=config)
@@ -49,7 +72,8 @@ class Command(LogLevelMixin, BusImportMixin, object):
         if dry_run:
             return
 
-        if args.events_only:
-            bus.run_forever(consume_rpcs=False)
-        else:
-            bus.run_forever()
+        bus.run_forever(
+            consume_rpcs=not args.events_only,
+            gc_interval=args.gc_interval,
+            gc_idle_timeout=args.gc_idle_timeout,
+        )
@@ -163,7 +163,11 @@ def mapping_to_named_tuple(mapping: Mapping, named_tuple: Type[T]) -> T:
         elif is_class and issubclass(hint, Mapping) and subs_tree and len(subs_tree) == 3:
             parameters[key] = dict()
             for k, v in value.items():
-                parameters[key][k] = mapping_to_named_tuple(v, hint._subs_tree()[2])
+                if hasattr(subs_tree[2], '__annotations__'):
+                    parameters[key][k] = mapping_to_named_tuple(v, subs_tree[2])
+                else:
+                    # A mapping of simple values (e.g. Mapping[str, int])
+                    parameters[key][k] = v
         else:
             parameters[key] = value
 
@@ -21,7 +21,7 @@ import logging
 import os
 import socket
 from enum import Enum
-from typing import NamedTuple, Optional, Union, Dict
+from typing import NamedTuple, Optional, Union, Dict, List
 
 from lightbus.plugins import find_plugins
 from lightbus.transports.base import get_available_transports
@@ -83,6 +83,15 @@ class ApiValidationConfig(NamedTuple):
     incoming: bool = True
 
 
+class RpcCacheConfig(NamedTuple):
+    ttl: float = 60
+    maxsize: int = 1000
+    # Keys are fully qualified event names, values are the parameters which the event
+    # shares with the procedure. Cached results are cleared when the event fires with the
+    # same values for these parameters. An empty list clears all of the procedure's results.
+    invalidate_on: Dict[str, List[str]] = {}
+
+
 class ApiConfig(object):
     rpc_timeout: int = 5
     event_listener_setup_timeout: int = 1
@@ -92,6 +101,8 @@ class ApiConfig(object):
     rpc_transport: RpcTransportSelector = None
     result_transport: ResultTransportSelector = None
     strict_validation: bool = False
+    single_flight: Union[bool, List[str]] = False
+    rpc_cache: Dict[str, RpcCacheConfig] = {}
 
     def __init__(self, **kw):
         for k, v in kw.items():
@@ -131,6 +142,9 @@ class RootConfig(object):
         for k, v in kw.items():
             setattr(self, k, v)
 
+        # A generated name differs for every process, so cannot be used to find
+        # the state left behind by the service's previous processes
+        self.service_name_generated = self.service_name == RootConfig.service_name
         self.service_name = self._format_name(self.service_name)
         self.process_name = self._format_name(self.process_name)
 
@@ -56,6 +56,10 @@ class NothingToListenFor(LightbusException):
     pass
 
 
+class InvalidEventFilter(LightbusException):
+    pass
+
+
 class CannotBlockHere(LightbusException):
     pass
 
@@ -64,6 +68,20 @@ class LightbusTimeout(LightbusException):
     pass
 
 
+class InvalidRpcPriority(LightbusException):
+    pass
+
+
+class RpcQueueFull(LightbusException):
+    """The RPC could not be called as the API's queue is full"""
+    pass
+
+
+class NoConsumersFound(LightbusException):
+    """The message could not be sent as no processes are available to receive it"""
+    pass
+
+
 class SuddenDeathException(LightbusException):
     """Used to kill an invocation for testing purposes"""
     pass
@@ -37,13 +37,17 @@ class RpcMessage(Message):
     required_metadata = ['rpc_id', 'api_name', 'procedure_name', 'return_path']
 
     def __init__(self, *, api_name: str, procedure_name: str, kwargs: Optional[dict]=None,
-                 return_path: Any=None, rpc_id: str=''):
+                 return_path: Any=None, rpc_id: str='', stream: bool=False, deadline: Optional[float]=None):
 
         self.rpc_id = rpc_id or b64encode(uuid1().bytes).decode('utf8')
         self.api_name = api_name
         self.procedure_name = procedure_name
         self.kwargs = kwargs
         self.return_path = return_path
+        # Should the result be streamed back to the caller as a series of result messages?
+        self.stream = bool(stream)
+        # The unix timestamp after which the caller will no longer be waiting for the result
+        self.deadline = float(deadline) if deadline else None
 
     def __repr__(self):
         return '<{}: {}>'.format(self.__class__.__name__, self)
@@ -59,12 +63,18 @@ class RpcMessage(Message):
         return "{}.{}".format(self.api_name, self.procedure_name)
 
     def get_metadata(self) -> dict:
-        return {
+        metadata = {
             'rpc_id': self.rpc_id,
             'api_name': self.api_name,
             'procedure_name': self.procedure_name,
             'return_path': self.return_path or '',
         }
+        if self.stream:
+            # Only set when needed, and not as a bool, as some serializers only support strings & numbers
+            metadata['stream'] = 1
+        if self.deadline:
+            metadata['deadline'] = self.deadline
+        return metadata
 
     def get_kwargs(self):
         return self.kwargs
@@ -77,8 +87,10 @@ class RpcMessage(Message):
 class ResultMessage(Message):
     required_metadata = ['rpc_id']
 
-    def __init__(self, *, result, rpc_id, error: bool=False, trace: str=None):
+    def __init__(self, *, result, rpc_id, error: bool=False, trace: str=None, more: bool=False):
         self.rpc_id = rpc_id
+        # When streaming results, indicates that further result messages will follow
+        self.more = bool(more)
 
         if isinstance(result, BaseException):
             self.result = str(result)
@@ -109,6 +121,8 @@ class ResultMessage(Message):
         }
         if self.error:
             metadata['trace'] = self.trace
+        if self.more:
+            metadata['more'] = 1
         return metadata
 
     def get_kwargs(self):
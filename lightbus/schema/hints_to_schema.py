@@ -3,7 +3,7 @@ import itertools
 import json
 import logging
 from _pydecimal import Decimal
-from typing import Union, Any, Tuple, Sequence, Mapping, Callable
+from typing import Union, Any, Tuple, Sequence, Mapping, Callable, AsyncIterator, AsyncIterable, AsyncGenerator
 
 import datetime
 from enum import Enum
@@ -105,6 +105,10 @@ def return_type_to_schema(type_):
     if type_ is empty:
         return {}
 
+    if getattr(type_, '__origin__', None) in (AsyncIterator, AsyncIterable, AsyncGenerator):
+        # Streamed results. Non-streaming callers will receive a list of the streamed values
+        return {'type': 'array', 'items': return_type_to_schema(type_.__args__[0])}
+
     type_schemas = python_type_to_json_schemas(type_)
     if not type_schemas:
         return {}
@@ -146,7 +150,8 @@ def python_type_to_json_schemas(type_):
         subs_tree = None
 
     if type(type_) == type(Union):
-        sub_types = subs_tree[1:]
+        # Use __args__ rather than the subs tree, as the latter flattens nested types into tuples
+        sub_types = type_.__args__
         return list(itertools.chain(*map(python_type_to_json_schemas, sub_types)))
     if type_ == empty:
         return [{}]
@@ -162,7 +167,7 @@ def python_type_to_json_schemas(type_):
         # Mapping with strings as keys
         return [{
             'type': 'object',
-            'patternProperties': {'.*': wrap_with_one_of(python_type_to_json_schemas(subs_tree[2]))}
+            'patternProperties': {'.*': wrap_with_one_of(python_type_to_json_schemas(type_.__args__[1]))}
         }]
     elif is_class and issubclass(type_, (dict, Mapping)):
         return [{'type': 'object'}]
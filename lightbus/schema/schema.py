@@ -291,6 +291,9 @@ def api_to_schema(api: 'lightbus.Api') -> dict:
                 'parameters': make_rpc_parameter_schema(api.meta.name, member_name, method=member),
                 'response': make_response_schema(api.meta.name, member_name, method=member),
             }
+            if getattr(member, '_lightbus_batched', None):
+                # Let callers know they can coalesce calls to this RPC
+                schema['rpcs'][member_name]['batched'] = member._lightbus_batched
         elif isinstance(member, lightbus.Event):
             schema['events'][member_name] = {
                 'parameters': make_event_parameter_schema(api.meta.name, member_name, event=member),
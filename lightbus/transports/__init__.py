@@ -1,4 +1,9 @@
 from .base import RpcTransport, ResultTransport, EventTransport, SchemaTransport, Transport
 from .debug import DebugRpcTransport, DebugResultTransport, DebugEventTransport, DebugSchemaTransport
 from .direct import DirectRpcTransport, DirectResultTransport, DirectEventTransport
-from .redis import RedisRpcTransport, RedisResultTransport, RedisEventTransport, RedisSchemaTransport
+from .redis import RedisRpcTransport, RedisStreamRpcTransport, RedisResultTransport, RedisPubSubResultTransport, \
+    RedisEventTransport, RedisPubSubEventTransport, RedisSchemaTransport
+from .unix import UnixRpcTransport, UnixResultTransport, UnixEventTransport
+from .tcp import TcpRpcTransport, TcpResultTransport
+from .memory import MemoryRpcTransport, MemoryResultTransport, MemoryEventTransport, MemorySchemaTransport
+from .file import FileEventTransport
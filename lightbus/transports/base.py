@@ -1,7 +1,8 @@
+import asyncio
 import logging
 from asyncio import AbstractEventLoop
 from itertools import chain
-from typing import Sequence, Tuple, List, Generator, Dict, NamedTuple, TypeVar, Type, Set
+from typing import Sequence, Tuple, List, Generator, Dict, NamedTuple, TypeVar, Type, Set, Optional, AsyncGenerator
 
 from lightbus.api import Api
 from lightbus.exceptions import NothingToListenFor, TransportNotFound
@@ -41,16 +42,51 @@ class Transport(object, metaclass=TransportMetaclass):
 
 class RpcTransport(Transport):
     """Implement the sending and receiving of RPC calls"""
+    # Set to true by transports which implement get_cached_result() & set_cached_result()
+    shared_cache = False
 
     async def call_rpc(self, rpc_message: RpcMessage, options: dict):
         """Publish a call to a remote procedure"""
         RpcTransport.from_config()
         raise NotImplementedError()
 
+    async def call_rpcs(self, rpc_messages: Sequence[RpcMessage], options: dict):
+        """Publish several calls at once
+
+        Transports may override this in order to publish the calls more efficiently.
+        """
+        await asyncio.gather(*[self.call_rpc(rpc_message, options) for rpc_message in rpc_messages])
+
     async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
         """Consume RPC calls for the given API"""
         raise NotImplementedError()
 
+    async def get_cached_result(self, api_name: str, procedure_name: str, key: str) -> Optional[str]:
+        """Get a result from the cache shared between RPC workers, or None if not present
+
+        Only required in order to support @cached(shared=True) procedures, in which
+        case `shared_cache` should also be set.
+        """
+        raise NotImplementedError(
+            f"The {self.__class__.__name__} RPC transport does not provide a shared cache, "
+            f"so {api_name}.{procedure_name}() cannot be cached with shared=True"
+        )
+
+    async def set_cached_result(self, api_name: str, procedure_name: str, key: str, value: str, ttl: float):
+        """Store a result in the cache shared between RPC workers"""
+        raise NotImplementedError(
+            f"The {self.__class__.__name__} RPC transport does not provide a shared cache, "
+            f"so {api_name}.{procedure_name}() cannot be cached with shared=True"
+        )
+
+    async def cancel_rpc(self, rpc_message: RpcMessage, options: dict):
+        """Cancel a call which the caller has stopped waiting for
+
+        Called when a call times out. Transports should, where possible, prevent
+        the call from being processed. Implementing this is optional.
+        """
+        pass
+
 
 class ResultTransport(Transport):
     """Implement the send & receiving of results
@@ -82,6 +118,35 @@ class ResultTransport(Transport):
         """
         raise NotImplementedError()
 
+    async def receive_result_stream(self, rpc_message: RpcMessage, return_path: str,
+                                    options: dict) -> AsyncGenerator[ResultMessage, None]:
+        """Receive a streamed result, yielding each result message in turn
+
+        The last message yielded will have `more` set to False.
+        """
+        while True:
+            result_message = await self.receive_result(rpc_message, return_path, options)
+            yield result_message
+            if not result_message.more:
+                return
+
+    async def receive_results(self, rpc_messages: Sequence[RpcMessage], return_paths: Sequence[str],
+                              options: dict) -> AsyncGenerator[ResultMessage, None]:
+        """Receive the results for the given messages, yielding each one as it arrives
+
+        Transports may override this in order to receive the results more efficiently.
+        """
+        futures = [
+            asyncio.ensure_future(self.receive_result(rpc_message, return_path, options))
+            for rpc_message, return_path in zip(rpc_messages, return_paths)
+        ]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+
 
 class EventTransport(Transport):
     """ Implement the sending/consumption of events over a given transport.
@@ -134,6 +199,28 @@ class EventTransport(Transport):
         """
         raise NotImplementedError()
 
+    async def replay(self,
+                     listen_for: List[Tuple[str, str]],
+                     since=None,
+                     until=None,
+                     **kwargs
+                     ) -> Generator[EventMessage, None, None]:
+        """Read the historical events for the given events
+
+        Unlike fetch(), events are not consumed as part of any consumer group
+        and will not be acknowledged. Replay will finish once the end of
+        history is reached.
+        """
+        raise NotImplementedError()
+
+    async def collect_garbage(self, idle_timeout: float, **kwargs) -> Optional[Dict[str, int]]:
+        """Remove any state left behind by listeners which have been idle for idle_timeout seconds
+
+        Implementing this is optional. Should return a mapping of statistics describing
+        what was removed, or None if there was nothing to do.
+        """
+        return None
+
 
 class SchemaTransport(Transport):
     """ Implement sharing of lightbus API schemas
@@ -314,6 +401,10 @@ class TransportRegistry(object):
         """
         return self._get_transports(api_names, 'event')
 
+    def get_all_event_transports(self) -> Set[EventTransport]:
+        """Get a set of all event transports"""
+        return set([entry.event for entry in self._registry.values() if entry.event is not None])
+
     def get_all_transports(self) -> Set[Transport]:
         """Get a set of all transports irrespective of type"""
         all_transports = chain(*[entry._asdict().values() for entry in self._registry.values()])
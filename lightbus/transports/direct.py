@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from typing import Sequence
+from typing import Sequence, List, Tuple, Generator, Set
 
 from lightbus.transports.base import ResultTransport, RpcTransport, EventTransport
 from lightbus.api import registry, Api
@@ -29,7 +29,7 @@ class DirectRpcTransport(RpcTransport):
         logger.debug("Sending result for message {}".format(rpc_message))
         await self.result_transport.send_result(
             rpc_message=rpc_message,
-            result_message=ResultMessage(result=result),
+            result_message=ResultMessage(result=result, rpc_id=rpc_message.rpc_id),
             return_path=rpc_message.return_path,
         )
         logger.info("⚡️  Directly executed RPC call & sent result for message {}.".format(rpc_message))
@@ -61,18 +61,43 @@ class DirectResultTransport(ResultTransport):
 
 
 class DirectEventTransport(EventTransport):
+    """ Event transport passing events to listeners within the current process
+
+    Each event is received by every listener listening for it, regardless of
+    consumer group. Events sent while nothing is listening for them are discarded.
+    Use the MemoryEventTransport for consumer groups.
+    """
 
     def __init__(self):
-        self.queue = asyncio.Queue()
+        # One queue for each running fetch(), along with the events it is listening for
+        self._queues: List[Tuple[Set[Tuple[str, str]], asyncio.Queue]] = []
 
     async def send_event(self, event_message: EventMessage, options: dict):
         """Publish an event"""
         logger.info(L("⚡  Directly sending event: {}", Bold(event_message)))
-        await self.queue.put(event_message)
-
-    async def fetch_events(self) -> Sequence[EventMessage]:
-        """Consume RPC events for the given API"""
-        logger.info(L("⌛  Awaiting all events"))
-        event = await self.queue.get()
-        logger.info(L("⬅  Received event {}", Bold(event)))
-        yield [event]
+        for expected_events, queue in self._queues:
+            if (event_message.api_name, event_message.event_name) in expected_events:
+                queue.put_nowait(event_message)
+
+    async def fetch(self,
+                    listen_for: List[Tuple[str, str]],
+                    context: dict,
+                    loop: asyncio.AbstractEventLoop,
+                    consumer_group: str=None,
+                    **kwargs
+                    ) -> Generator[EventMessage, None, None]:
+        """Consume events for the given APIs"""
+        entry = (set(listen_for), asyncio.Queue())
+        self._queues.append(entry)
+        logger.info(L("⌛  Awaiting events"))
+        try:
+            while True:
+                event = await entry[1].get()
+                logger.info(L("⬅  Received event {}", Bold(event)))
+                yield event
+                # Nothing to acknowledge
+                yield True
+        except GeneratorExit:
+            return
+        finally:
+            self._queues.remove(entry)
@@ -0,0 +1,345 @@
+import asyncio
+import fcntl
+import heapq
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Sequence, Dict, List, Tuple, Mapping, Union, Generator, Optional
+from urllib.parse import quote
+
+from lightbus.log import L, Bold, LBullets
+from lightbus.message import EventMessage
+from lightbus.serializers.by_field import ByFieldMessageSerializer, ByFieldMessageDeserializer
+from lightbus.transports.base import EventTransport
+from lightbus.transports.redis import normalise_since_value, normalise_filters, message_matches_filters, Since
+from lightbus.utilities.importing import import_from_string
+from lightbus.utilities.segments import SegmentLog, parse_message_id
+
+if False:
+    from lightbus.config import Config
+
+logger = logging.getLogger(__name__)
+
+# (stream, message ID, fields)
+StreamMessage = Tuple[str, str, Mapping[str, str]]
+
+
+class FileConsumerGroup(object):
+    """ The state of a consumer group reading a stream, stored in a JSON file
+
+    The state records the ID of the last message delivered to the group, and the
+    messages which have been delivered to a consumer but not yet acknowledged
+    (the pending entries). Pending entries are stored as
+    ``{message_id: [consumer_name, delivered_at, delivery_count]}``.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    @contextmanager
+    def lock(self):
+        """Obtain an exclusive lock on the group's state, saving any changes made to it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f'{self.path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        state = json.load(f)
+                except FileNotFoundError:
+                    state = {'last_delivered_id': None, 'pending': {}}
+
+                original = json.dumps(state)
+                yield state
+
+                if json.dumps(state) != original:
+                    # Replace the file atomically, so readers never see a partial write
+                    with open(f'{self.path}.tmp', 'w') as f:
+                        json.dump(state, f)
+                    os.replace(f'{self.path}.tmp', self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class FileEventTransport(EventTransport):
+    """ Event transport storing events on disk, for use without redis on a single host
+
+    Each event has its own stream, stored as append-only segment files (see SegmentLog).
+    Events sent concurrently are written together as a single block.
+
+    Consumer groups behave as they do for the RedisEventTransport. Each group's offset and
+    pending entries are stored in a file alongside the stream. Messages are pending until
+    the listener has processed them. Pending messages are delivered again should the consumer
+    restart, or are reclaimed by another consumer once `acknowledgement_timeout`
+    seconds have passed. Listeners check for new events every `poll_interval` seconds.
+    """
+
+    def __init__(self, *,
+                 directory: str,
+                 consumer_group_prefix: str,
+                 consumer_name: str,
+                 serializer=ByFieldMessageSerializer(),
+                 deserializer=ByFieldMessageDeserializer(EventMessage),
+                 batch_size=10,
+                 acknowledgement_timeout: float=60,
+                 reclaim_interval: float=5,
+                 poll_interval: float=0.1,
+                 max_segment_size: int=64 * 1024 * 1024,
+                 ):
+        self.directory = Path(directory)
+        self.consumer_group_prefix = consumer_group_prefix
+        self.consumer_name = consumer_name
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.batch_size = batch_size
+        self.acknowledgement_timeout = acknowledgement_timeout
+        self.reclaim_interval = reclaim_interval
+        self.poll_interval = poll_interval
+        self.max_segment_size = max_segment_size
+
+        # Keys are stream names, values are lists of (fields, future) waiting to be written
+        self._pending_writes: Dict[str, list] = {}
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    directory: str='lightbus_events',
+                    consumer_group_prefix: str=None,
+                    consumer_name: str=None,
+                    serializer: str='lightbus.serializers.ByFieldMessageSerializer',
+                    deserializer: str='lightbus.serializers.ByFieldMessageDeserializer',
+                    batch_size: int=10,
+                    acknowledgement_timeout: float=60,
+                    reclaim_interval: float=5,
+                    poll_interval: float=0.1,
+                    max_segment_size: int=64 * 1024 * 1024,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(EventMessage)
+
+        return cls(
+            directory=directory,
+            consumer_group_prefix=consumer_group_prefix or config.service_name,
+            consumer_name=consumer_name or config.process_name,
+            serializer=serializer,
+            deserializer=deserializer,
+            batch_size=batch_size,
+            acknowledgement_timeout=acknowledgement_timeout,
+            reclaim_interval=reclaim_interval,
+            poll_interval=poll_interval,
+            max_segment_size=max_segment_size,
+        )
+
+    async def send_event(self, event_message: EventMessage, options: dict):
+        """Publish an event"""
+        stream = self._get_stream_name(event_message.api_name, event_message.event_name)
+        future = asyncio.Future()
+        if stream not in self._pending_writes:
+            self._pending_writes[stream] = []
+            asyncio.ensure_future(self._write(stream))
+        self._pending_writes[stream].append((self.serializer(event_message), future))
+
+        start_time = time.time()
+        message_id = await future
+
+        logger.debug(L(
+            "Stored event message {} as {} in stream {} in {}",
+            Bold(event_message), Bold(message_id), Bold(stream), round(time.time() - start_time, 4)
+        ))
+
+    async def fetch(self,
+                    listen_for,
+                    context: dict,
+                    loop: asyncio.AbstractEventLoop,
+                    consumer_group: str=None,
+                    since: Union[Since, Sequence[Since]]='$',
+                    forever=True,
+                    filters: Mapping=None,
+                    **kwargs
+                    ) -> Generator[EventMessage, None, None]:
+        if self.consumer_group_prefix:
+            consumer_group = f'{self.consumer_group_prefix}-{consumer_group}'
+
+        if not isinstance(since, (list, tuple)):
+            since = [since] * len(listen_for)
+        streams = OrderedDict()
+        for (api_name, event_name), since_value in zip(listen_for, since):
+            streams.setdefault(self._get_stream_name(api_name, event_name), normalise_since_value(since_value))
+        expected_events = {event_name for _, event_name in listen_for}
+        filters = normalise_filters(filters)
+
+        logger.debug(LBullets(
+            L('Consuming events as consumer {} in group {} from files in {}',
+              Bold(self.consumer_name), Bold(consumer_group), Bold(self.directory)),
+            items=list(streams)
+        ))
+
+        loop = loop or asyncio.get_event_loop()
+
+        def run(fn, *args):
+            # File access blocks, so do it in another thread
+            return loop.run_in_executor(None, fn, *args)
+
+        await run(self._create_groups, streams, consumer_group)
+        # Messages delivered to us before we restarted
+        stream_messages = await run(self._claim_pending, list(streams), consumer_group, True)
+        last_reclaim = time.time()
+
+        while True:
+            if not stream_messages and time.time() - last_reclaim > self.reclaim_interval:
+                stream_messages = await run(self._claim_pending, list(streams), consumer_group, False)
+                last_reclaim = time.time()
+
+            if not stream_messages:
+                stream_messages = await run(self._read_new_messages, list(streams), consumer_group)
+
+            if not stream_messages:
+                if not forever:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            for stream, message_id, fields in stream_messages:
+                event_message = self.deserializer(fields)
+                wanted = event_message.event_name in expected_events and (
+                    not filters or message_matches_filters(event_message, filters)
+                )
+                if wanted:
+                    yield event_message
+                # Only acknowledge once the listener has processed the message
+                await run(self._acknowledge, stream, consumer_group, message_id)
+                if wanted:
+                    yield True
+            stream_messages = []
+
+    async def replay(self,
+                     listen_for,
+                     since: Since=None,
+                     until: Since=None,
+                     **kwargs
+                     ) -> Generator[EventMessage, None, None]:
+        """Read the historical events for the given events, in the order in which they were sent"""
+        start_id = '0-0' if since is None else normalise_since_value(since)
+        end_id = None if until is None else normalise_since_value(until)
+        streams = list(OrderedDict.fromkeys(self._get_stream_name(*event) for event in listen_for))
+
+        def read(stream):
+            for message_id, fields in self._get_log(stream).read(start_id=start_id, end_id=end_id):
+                yield parse_message_id(message_id), fields
+
+        for _, fields in heapq.merge(*[read(stream) for stream in streams], key=lambda m: m[0]):
+            yield self.deserializer(fields)
+
+    async def _write(self, stream: str):
+        # Give any other events sent at the same time a chance to arrive
+        await asyncio.sleep(0)
+        writes = self._pending_writes.pop(stream)
+        try:
+            message_ids = await asyncio.get_event_loop().run_in_executor(
+                None, self._append, stream, [fields for fields, _ in writes]
+            )
+        except Exception as e:
+            for _, future in writes:
+                future.set_exception(e)
+        else:
+            for (_, future), message_id in zip(writes, message_ids):
+                future.set_result(message_id)
+
+    def _append(self, stream: str, messages: List[Mapping[str, str]]) -> List[str]:
+        """Append messages to the stream, returning their new message IDs"""
+        log = self._get_log(stream)
+        with log.lock():
+            last_id = log.last_id()
+            milliseconds, n = parse_message_id(last_id) if last_id else (0, -1)
+            now = int(time.time() * 1000)
+            if now > milliseconds:
+                milliseconds, n = now, -1
+
+            message_ids = ['{}-{}'.format(milliseconds, n + 1 + i) for i in range(len(messages))]
+            log.append(list(zip(message_ids, messages)))
+        return message_ids
+
+    def _create_groups(self, streams: Mapping[str, str], consumer_group: str):
+        """Create the consumer group for each stream, unless it already exists
+
+        New groups receive messages sent after the given ID, where '$' means
+        messages sent from now on.
+        """
+        for stream, since in streams.items():
+            with self._get_group(stream, consumer_group).lock() as state:
+                if state['last_delivered_id'] is None:
+                    if since == '$':
+                        since = self._get_log(stream).last_id() or '0-0'
+                    state['last_delivered_id'] = since
+
+    def _read_new_messages(self, streams: List[str], consumer_group: str) -> List[StreamMessage]:
+        """Deliver up to batch_size messages to us which have not yet been delivered to the group"""
+        stream_messages = []
+        for stream in streams:
+            with self._get_group(stream, consumer_group).lock() as state:
+                milliseconds, n = parse_message_id(state['last_delivered_id'])
+                messages = self._get_log(stream).read(start_id='{}-{}'.format(milliseconds, n + 1))
+                for message_id, fields in messages:
+                    if len(stream_messages) >= self.batch_size:
+                        break
+                    state['pending'][message_id] = [self.consumer_name, time.time(), 1]
+                    state['last_delivered_id'] = message_id
+                    stream_messages.append((stream, message_id, fields))
+        return stream_messages
+
+    def _claim_pending(self, streams: List[str], consumer_group: str, own: bool) -> List[StreamMessage]:
+        """Claim up to batch_size pending messages
+
+        If `own` is true then claim messages previously delivered to us (i.e. prior to
+        restarting), otherwise claim messages which have not been acknowledged
+        within acknowledgement_timeout.
+        """
+        stream_messages = []
+        for stream in streams:
+            with self._get_group(stream, consumer_group).lock() as state:
+                claimed = []
+                for message_id, (consumer_name, delivered_at, deliveries) in state['pending'].items():
+                    if len(stream_messages) + len(claimed) >= self.batch_size:
+                        break
+                    if own != (consumer_name == self.consumer_name):
+                        continue
+                    if not own and time.time() - delivered_at < self.acknowledgement_timeout:
+                        continue
+                    state['pending'][message_id] = [self.consumer_name, time.time(), deliveries + 1]
+                    claimed.append(message_id)
+
+                if claimed:
+                    if not own:
+                        logger.info(L('Reclaiming {} timed out messages on stream {}',
+                                      Bold(len(claimed)), Bold(stream)))
+                    stream_messages.extend(self._read_messages(stream, claimed))
+        return stream_messages
+
+    def _acknowledge(self, stream: str, consumer_group: str, message_id: str):
+        with self._get_group(stream, consumer_group).lock() as state:
+            state['pending'].pop(message_id, None)
+
+    def _read_messages(self, stream: str, message_ids: List[str]) -> List[StreamMessage]:
+        message_ids = sorted(message_ids, key=parse_message_id)
+        wanted = set(message_ids)
+        return [
+            (stream, message_id, fields)
+            for message_id, fields
+            in self._get_log(stream).read(start_id=message_ids[0], end_id=message_ids[-1])
+            if message_id in wanted
+        ]
+
+    def _get_log(self, stream: str) -> SegmentLog:
+        return SegmentLog(self.directory / 'streams' / quote(stream, safe='.'), max_segment_size=self.max_segment_size)
+
+    def _get_group(self, stream: str, consumer_group: str) -> FileConsumerGroup:
+        return FileConsumerGroup(
+            self.directory / 'groups' / quote(stream, safe='.') / '{}.json'.format(quote(consumer_group, safe='.'))
+        )
+
+    def _get_stream_name(self, api_name: str, event_name: str) -> str:
+        return f'{api_name}.{event_name}:stream'
@@ -0,0 +1,480 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Sequence, Dict, List, Tuple, Mapping, Union, Generator, Optional, AsyncGenerator
+
+from lightbus.api import Api
+from lightbus.log import L, Bold, LBullets
+from lightbus.message import RpcMessage, ResultMessage, EventMessage
+from lightbus.transports.base import RpcTransport, ResultTransport, EventTransport, SchemaTransport
+from lightbus.transports.redis import normalise_since_value, normalise_filters, message_matches_filters, Since
+from lightbus.utilities.segments import parse_message_id
+
+if False:
+    from lightbus.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Keys are broker names
+_brokers: Dict[str, 'MemoryBroker'] = {}
+
+
+def get_broker(name: str='default') -> 'MemoryBroker':
+    """Get the named broker, creating it if it does not exist"""
+    if name not in _brokers:
+        _brokers[name] = MemoryBroker()
+    return _brokers[name]
+
+
+class MemoryStream(object):
+    """ An in-memory stream of events, along with its consumer groups
+
+    Message IDs are (milliseconds, sequence) tuples, as per redis stream IDs.
+    Once the stream exceeds `max_length` it is trimmed (approximately, in chunks).
+    """
+
+    def __init__(self, max_length: Optional[int]=None):
+        self.max_length = max_length
+        self.ids: List[Tuple[int, int]] = []
+        self.messages: List[EventMessage] = []
+        # Keys are group names, values are MemoryConsumerGroups
+        self.groups: Dict[str, MemoryConsumerGroup] = {}
+
+    def append(self, event_message: EventMessage) -> Tuple[int, int]:
+        milliseconds = int(time.time() * 1000)
+        last_milliseconds, n = self.ids[-1] if self.ids else (0, -1)
+        message_id = (milliseconds, 0) if milliseconds > last_milliseconds else (last_milliseconds, n + 1)
+        self.ids.append(message_id)
+        self.messages.append(event_message)
+
+        if self.max_length is not None:
+            overflow = len(self.ids) - self.max_length
+            if overflow >= max(1, self.max_length // 10):
+                del self.ids[:overflow]
+                del self.messages[:overflow]
+        return message_id
+
+    def read(self, after_id: Tuple[int, int], limit: int=None, until_id: Tuple[int, int]=None):
+        """Get the (id, message) pairs after after_id (and up to & including until_id)"""
+        start = bisect.bisect_right(self.ids, after_id)
+        end = len(self.ids) if until_id is None else bisect.bisect_right(self.ids, until_id)
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(zip(self.ids[start:end], self.messages[start:end]))
+
+    def last_id(self) -> Tuple[int, int]:
+        return self.ids[-1] if self.ids else (0, 0)
+
+
+class MemoryConsumerGroup(object):
+    """ The state of a consumer group reading a MemoryStream
+
+    Pending entries are stored as ``{message_id: [consumer_name, delivered_at, event_message]}``,
+    where a consumer name of None means that any consumer may claim the message right away.
+    """
+
+    def __init__(self, last_delivered_id: Tuple[int, int]):
+        self.last_delivered_id = last_delivered_id
+        self.pending: Dict[Tuple[int, int], list] = OrderedDict()
+
+
+class MemoryBroker(object):
+    """ Holds the state shared by the memory transports within a process
+
+    This is the in-memory equivalent of a redis server. Messages are
+    passed by reference rather than being serialized.
+    """
+
+    def __init__(self):
+        # Keys are API names, values are queues of (rpc_message, expires_at)
+        self.rpc_queues: Dict[str, deque] = {}
+        # Keys are RPC IDs, values are queues of result messages awaiting collection by the caller
+        self.results: Dict[str, deque] = {}
+        # Keys are stream names
+        self.streams: Dict[str, MemoryStream] = {}
+        # Keys are API names, values are (schema, expires_at)
+        self.schemas: Dict[str, Tuple[dict, Optional[float]]] = {}
+        # Keys are arbitrary, values are futures to be resolved upon notify()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    async def wait(self, keys: Sequence[str], timeout: float=None):
+        """Wait until notify() is called for any of the given keys, or until the timeout passes"""
+        future = asyncio.get_event_loop().create_future()
+        for key in keys:
+            self._waiters.setdefault(key, []).append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for key in keys:
+                waiters = self._waiters.get(key)
+                if waiters and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[key]
+
+    def notify(self, key: str):
+        for future in self._waiters.pop(key, ()):
+            if not future.done():
+                future.set_result(None)
+
+    def get_stream(self, stream_name: str, max_length: Optional[int]=None) -> MemoryStream:
+        if stream_name not in self.streams:
+            self.streams[stream_name] = MemoryStream(max_length)
+        return self.streams[stream_name]
+
+
+class MemoryRpcTransport(RpcTransport):
+    """ RPC transport passing calls to workers within the same process
+
+    Calls are queued per API and passed to workers by reference, with no serialization.
+    As with the RedisRpcTransport, calls are discarded (rather than processed) once
+    `rpc_timeout` seconds have passed, or once they have been cancelled.
+    """
+
+    def __init__(self, *,
+                 broker: MemoryBroker=None,
+                 batch_size=10,
+                 rpc_timeout=5,
+                 ):
+        self.broker = broker or get_broker()
+        self.batch_size = batch_size
+        self.rpc_timeout = rpc_timeout
+        self._rotation = 0
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    broker: str='default',
+                    batch_size: int=10,
+                    rpc_timeout=5,
+                    ):
+        return cls(broker=get_broker(broker), batch_size=batch_size, rpc_timeout=rpc_timeout)
+
+    async def call_rpc(self, rpc_message: RpcMessage, options: dict):
+        queue = self.broker.rpc_queues.setdefault(rpc_message.api_name, deque())
+        queue.append((rpc_message, time.time() + self.rpc_timeout))
+        self.broker.notify(self._get_queue_key(rpc_message.api_name))
+        logger.debug(L("Enqueued message {} in memory", Bold(rpc_message)))
+
+    async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
+        api_names = [api.meta.name for api in apis]
+        # Rotate the order in which APIs are served, so a busy API cannot starve the others
+        first = self._rotation % len(api_names)
+        api_names = api_names[first:] + api_names[:first]
+        self._rotation += 1
+
+        while True:
+            rpc_messages = []
+            for api_name in api_names:
+                queue = self.broker.rpc_queues.get(api_name)
+                while queue and len(rpc_messages) < self.batch_size:
+                    rpc_message, expires_at = queue.popleft()
+                    if expires_at > time.time():
+                        rpc_messages.append(rpc_message)
+                    else:
+                        logger.debug(L("Discarding timed out RPC message {}", Bold(rpc_message)))
+
+            if rpc_messages:
+                for rpc_message in rpc_messages:
+                    logger.debug(LBullets(
+                        L("⬅ Received RPC message {}", Bold(rpc_message)),
+                        items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+                    ))
+                return rpc_messages
+
+            await self.broker.wait([self._get_queue_key(api_name) for api_name in api_names])
+
+    async def cancel_rpc(self, rpc_message: RpcMessage, options: dict):
+        queue = self.broker.rpc_queues.get(rpc_message.api_name, ())
+        for entry in queue:
+            if entry[0] is rpc_message:
+                queue.remove(entry)
+                break
+
+    def _get_queue_key(self, api_name: str) -> str:
+        return f'{api_name}:rpc_queue'
+
+
+class MemoryResultTransport(ResultTransport):
+    """ Result transport passing results back to callers within the same process
+
+    Results are only kept while the caller is waiting for them. The values
+    of a streamed result are not bounded, so a caller which is slower than the
+    worker will accumulate values in memory.
+    """
+
+    def __init__(self, *, broker: MemoryBroker=None):
+        self.broker = broker or get_broker()
+
+    @classmethod
+    def from_config(cls, config: 'Config', broker: str='default'):
+        return cls(broker=get_broker(broker))
+
+    def get_return_path(self, rpc_message: RpcMessage) -> str:
+        # Results sent before the caller starts waiting are held until it does
+        self.broker.results.setdefault(rpc_message.rpc_id, deque())
+        return f'memory://{rpc_message.rpc_id}'
+
+    async def send_result(self, rpc_message: RpcMessage, result_message: ResultMessage, return_path: str):
+        queue = self.broker.results.get(result_message.rpc_id)
+        if queue is None:
+            logger.debug(L("Discarding result for RPC {} as no caller is waiting for it",
+                           Bold(result_message.rpc_id)))
+            return
+        queue.append(result_message)
+        self.broker.notify(return_path)
+        logger.debug(L("➡ Sent result {} to {}", Bold(result_message), Bold(return_path)))
+
+    async def receive_result(self, rpc_message: RpcMessage, return_path: str, options: dict) -> ResultMessage:
+        logger.debug(L("Awaiting result on {} for RPC message: {}", Bold(return_path), Bold(rpc_message)))
+        try:
+            result_message = await self._next_result(rpc_message, return_path)
+        finally:
+            self.broker.results.pop(rpc_message.rpc_id, None)
+        logger.debug(L("⬅ Received result for RPC message {}: {}", rpc_message, Bold(result_message.result)))
+        return result_message
+
+    async def receive_result_stream(self, rpc_message: RpcMessage, return_path: str,
+                                    options: dict) -> AsyncGenerator[ResultMessage, None]:
+        try:
+            while True:
+                result_message = await self._next_result(rpc_message, return_path)
+                yield result_message
+                if not result_message.more:
+                    return
+        finally:
+            self.broker.results.pop(rpc_message.rpc_id, None)
+
+    async def _next_result(self, rpc_message: RpcMessage, return_path: str) -> ResultMessage:
+        queue = self.broker.results.setdefault(rpc_message.rpc_id, deque())
+        while not queue:
+            await self.broker.wait([return_path])
+        return queue.popleft()
+
+
+class MemoryEventTransport(EventTransport):
+    """ Event transport passing events to listeners within the same process
+
+    Each event has its own stream, trimmed to approximately `max_stream_length` events.
+    Events are passed to listeners by reference, with no serialization.
+
+    Consumer groups behave as they do for the RedisEventTransport. Messages are pending
+    until the listener has processed them. A listener's pending messages are
+    delivered again should it restart, and may be claimed by any other consumer in the
+    group once it stops. Messages are also reclaimed by another consumer if they are not
+    acknowledged within `acknowledgement_timeout` seconds (checked every `reclaim_interval`
+    seconds).
+    """
+
+    def __init__(self, *,
+                 broker: MemoryBroker=None,
+                 consumer_group_prefix: str=None,
+                 consumer_name: str='memory',
+                 batch_size=10,
+                 acknowledgement_timeout: float=60,
+                 reclaim_interval: float=5,
+                 max_stream_length: Optional[int]=100000,
+                 ):
+        self.broker = broker or get_broker()
+        self.consumer_group_prefix = consumer_group_prefix
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size
+        self.acknowledgement_timeout = acknowledgement_timeout
+        self.reclaim_interval = reclaim_interval
+        self.max_stream_length = max_stream_length
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    broker: str='default',
+                    consumer_group_prefix: str=None,
+                    consumer_name: str=None,
+                    batch_size: int=10,
+                    acknowledgement_timeout: float=60,
+                    reclaim_interval: float=5,
+                    max_stream_length: Optional[int]=100000,
+                    ):
+        return cls(
+            broker=get_broker(broker),
+            consumer_group_prefix=consumer_group_prefix or config.service_name,
+            consumer_name=consumer_name or config.process_name,
+            batch_size=batch_size,
+            acknowledgement_timeout=acknowledgement_timeout,
+            reclaim_interval=reclaim_interval,
+            max_stream_length=max_stream_length,
+        )
+
+    async def send_event(self, event_message: EventMessage, options: dict):
+        """Publish an event"""
+        stream_name = self._get_stream_name(event_message.api_name, event_message.event_name)
+        self.broker.get_stream(stream_name, self.max_stream_length).append(event_message)
+        self.broker.notify(stream_name)
+        logger.debug(L("Added event message {} to stream {} in memory", Bold(event_message), Bold(stream_name)))
+
+    async def fetch(self,
+                    listen_for,
+                    context: dict,
+                    loop: asyncio.AbstractEventLoop,
+                    consumer_group: str=None,
+                    since: Union[Since, Sequence[Since]]='$',
+                    forever=True,
+                    filters: Mapping=None,
+                    **kwargs
+                    ) -> Generator[EventMessage, None, None]:
+        if self.consumer_group_prefix:
+            consumer_group = f'{self.consumer_group_prefix}-{consumer_group}'
+
+        if not isinstance(since, (list, tuple)):
+            since = [since] * len(listen_for)
+        streams = OrderedDict()
+        for (api_name, event_name), since_value in zip(listen_for, since):
+            stream_name = self._get_stream_name(api_name, event_name)
+            stream = self.broker.get_stream(stream_name, self.max_stream_length)
+            if consumer_group not in stream.groups:
+                since_value = normalise_since_value(since_value)
+                stream.groups[consumer_group] = MemoryConsumerGroup(
+                    stream.last_id() if since_value == '$' else parse_message_id(since_value)
+                )
+            streams[stream_name] = stream.groups[consumer_group]
+        expected_events = {event_name for _, event_name in listen_for}
+        filters = normalise_filters(filters)
+
+        logger.debug(LBullets(
+            L('Consuming events as consumer {} in group {} from memory',
+              Bold(self.consumer_name), Bold(consumer_group)),
+            items=list(streams)
+        ))
+
+        # Messages delivered to us before we restarted
+        messages = self._claim_pending(streams, own=True)
+        last_reclaim = time.time()
+
+        try:
+            while True:
+                if not messages:
+                    timed_out = time.time() - last_reclaim > self.reclaim_interval
+                    if timed_out:
+                        last_reclaim = time.time()
+                    messages = self._claim_pending(streams, own=False, timed_out=timed_out)
+                if not messages:
+                    messages = self._read_new_messages(streams)
+
+                if not messages:
+                    if not forever:
+                        return
+                    await self.broker.wait(list(streams), timeout=self.reclaim_interval)
+                    continue
+
+                for group, message_id, event_message in messages:
+                    wanted = event_message.event_name in expected_events and (
+                        not filters or message_matches_filters(event_message, filters)
+                    )
+                    if wanted:
+                        yield event_message
+                    # Only acknowledge once the listener has processed the message
+                    group.pending.pop(message_id, None)
+                    if wanted:
+                        yield True
+                messages = []
+        finally:
+            # Let the other consumers take over our pending messages right away
+            for stream_name, group in streams.items():
+                released = False
+                for entry in group.pending.values():
+                    if entry[0] == self.consumer_name:
+                        entry[0] = None
+                        released = True
+                if released:
+                    self.broker.notify(stream_name)
+
+    async def replay(self,
+                     listen_for,
+                     since: Since=None,
+                     until: Since=None,
+                     **kwargs
+                     ) -> Generator[EventMessage, None, None]:
+        """Read the historical events for the given events, in the order in which they were sent"""
+        if since is None:
+            after_id = (0, -1)
+        else:
+            # Include messages sent at exactly `since`
+            milliseconds, n = parse_message_id(normalise_since_value(since))
+            after_id = (milliseconds, n - 1)
+        until_id = None if until is None else parse_message_id(normalise_since_value(until))
+        stream_names = OrderedDict.fromkeys(self._get_stream_name(*event) for event in listen_for)
+
+        stream_messages = [
+            self.broker.streams[stream_name].read(after_id, until_id=until_id)
+            for stream_name in stream_names if stream_name in self.broker.streams
+        ]
+        for _, event_message in heapq.merge(*stream_messages, key=lambda m: m[0]):
+            yield event_message
+
+    def _read_new_messages(self, streams: Mapping[str, MemoryConsumerGroup]):
+        """Deliver up to batch_size messages to us which have not yet been delivered to the group"""
+        messages = []
+        for stream_name, group in streams.items():
+            for message_id, event_message in self.broker.streams[stream_name].read(
+                    group.last_delivered_id, limit=self.batch_size - len(messages)):
+                group.pending[message_id] = [self.consumer_name, time.time(), event_message]
+                group.last_delivered_id = message_id
+                messages.append((group, message_id, event_message))
+        return messages
+
+    def _claim_pending(self, streams: Mapping[str, MemoryConsumerGroup], own: bool, timed_out: bool=False):
+        """Claim up to batch_size pending messages
+
+        If `own` is true then claim messages previously delivered to us (i.e. prior to
+        restarting). Otherwise claim messages released by consumers which have stopped,
+        along with (if `timed_out` is true) messages which have not been
+        acknowledged within acknowledgement_timeout.
+        """
+        messages = []
+        now = time.time()
+        for group in streams.values():
+            for message_id, entry in group.pending.items():
+                if len(messages) >= self.batch_size:
+                    break
+                consumer_name, delivered_at, event_message = entry
+                if own:
+                    claim = consumer_name == self.consumer_name
+                else:
+                    claim = consumer_name is None or (
+                        timed_out and consumer_name != self.consumer_name
+                        and now - delivered_at > self.acknowledgement_timeout
+                    )
+                if claim:
+                    entry[:2] = [self.consumer_name, now]
+                    messages.append((group, message_id, event_message))
+        return messages
+
+    def _get_stream_name(self, api_name: str, event_name: str) -> str:
+        return f'{api_name}.{event_name}:stream'
+
+
+class MemorySchemaTransport(SchemaTransport):
+    """ Schema transport sharing schemas between buses within the same process """
+
+    def __init__(self, *, broker: MemoryBroker=None):
+        self.broker = broker or get_broker()
+
+    @classmethod
+    def from_config(cls, config: 'Config', broker: str='default'):
+        return cls(broker=get_broker(broker))
+
+    async def store(self, api_name: str, schema: Dict, ttl_seconds: Optional[int]):
+        expires_at = None if ttl_seconds is None else time.time() + ttl_seconds
+        self.broker.schemas[api_name] = (schema, expires_at)
+
+    async def load(self) -> Dict[str, Dict]:
+        now = time.time()
+        return {
+            api_name: schema
+            for api_name, (schema, expires_at) in self.broker.schemas.items()
+            if expires_at is None or expires_at > now
+        }
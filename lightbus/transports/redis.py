@@ -1,11 +1,15 @@
 import asyncio
+import hashlib
 import json
 import logging
 import time
 from collections import OrderedDict
+from itertools import islice
 from datetime import datetime
-from typing import Sequence, Optional, Union, Generator, Dict, Mapping, List
+from typing import Sequence, Optional, Union, Generator, Dict, Mapping, List, Tuple, AsyncGenerator
 from enum import Enum
+from pathlib import Path
+from urllib.parse import quote
 
 import aioredis
 from aioredis import Redis, ReplyError
@@ -13,17 +17,22 @@ from aioredis.pool import ConnectionsPool
 from aioredis.util import decode
 
 from lightbus.api import Api
-from lightbus.exceptions import LightbusException, LightbusShutdownInProgress
+from lightbus.exceptions import LightbusException, LightbusShutdownInProgress, InvalidEventFilter, \
+    InvalidRpcPriority, RpcQueueFull, InvalidParameters, LightbusTimeout
 from lightbus.log import L, Bold, LBullets
 from lightbus.message import RpcMessage, ResultMessage, EventMessage
 from lightbus.schema.encoder import json_encode
 from lightbus.serializers.blob import BlobMessageSerializer, BlobMessageDeserializer
 from lightbus.serializers.by_field import ByFieldMessageSerializer, ByFieldMessageDeserializer
 from lightbus.transports.base import ResultTransport, RpcTransport, EventTransport, SchemaTransport
-from lightbus.utilities.async import cancel
+from lightbus.utilities.async import cancel, chain_async, merge_async, handle_aio_exceptions
+from lightbus.utilities.config import random_name
 from lightbus.utilities.frozendict import frozendict
 from lightbus.utilities.human import human_time
 from lightbus.utilities.importing import import_from_string
+from lightbus.utilities.redis_client import RedisClient, ClientClosedError, create_redis_client, \
+    ReplyError as ClientReplyError, RedisError as ClientRedisError
+from lightbus.utilities.segments import SegmentLog
 
 if False:
     from lightbus.config import Config
@@ -32,12 +41,139 @@ logger = logging.getLogger(__name__)
 
 Since = Union[str, datetime, None]
 
+# The largest possible sequence number within a stream message ID
+MAX_STREAM_SEQUENCE = 2 ** 64 - 1
+
+
+# Skips past any new messages which do not match the given filters. Scripts cannot call
+# XREADGROUP, so instead we XRANGE over messages not yet delivered to the group and move the
+# group's last delivered ID past those we do not want. The skipped messages are never
+# delivered to any consumer, and are therefore never sent over the wire.
+#
+#   KEYS: The streams to scan
+#   ARGV: group name, maximum messages to scan per stream, JSON filters, JSON event names
+#
+# The filters map field names to lists of acceptable (encoded) values. If the event
+# names list is non-empty then messages for other events will also be skipped.
+#
+# Returns a list of three items:
+#
+#   1. The number of matching messages now at the head of each stream, ready to be read with XREADGROUP
+#   2. Each stream's last delivered ID (after skipping)
+#   3. The total number of messages scanned
+FILTER_STREAMS_SCRIPT = """
+local group, scan_size = ARGV[1], ARGV[2]
+local filters = cjson.decode(ARGV[3])
+local event_names = {}
+for _, event_name in ipairs(cjson.decode(ARGV[4])) do
+    event_names[event_name] = true
+end
+local check_event_name = next(event_names) ~= nil
+
+local function matches(flat_fields)
+    local fields = {}
+    for i = 1, #flat_fields, 2 do
+        fields[flat_fields[i]] = flat_fields[i + 1]
+    end
+    if fields[''] ~= nil then
+        -- A noop message
+        return false
+    end
+    if check_event_name and event_names[fields['event_name']] == nil then
+        return false
+    end
+    for field, allowed_values in pairs(filters) do
+        local value_matches = false
+        for _, allowed_value in ipairs(allowed_values) do
+            if fields[field] == allowed_value then
+                value_matches = true
+                break
+            end
+        end
+        if not value_matches then
+            return false
+        end
+    end
+    return true
+end
+
+local ready_counts, latest_ids = {}, {}
+local total_scanned = 0
+
+for i, stream in ipairs(KEYS) do
+    local latest_id = '0-0'
+    for _, group_info in ipairs(redis.call('XINFO', 'GROUPS', stream)) do
+        for j = 1, #group_info, 2 do
+            if group_info[j] == 'name' and group_info[j + 1] ~= group then
+                break
+            elseif group_info[j] == 'last-delivered-id' then
+                latest_id = group_info[j + 1]
+            end
+        end
+    end
+
+    -- XRANGE is inclusive, so start from the ID immediately after the last delivered ID
+    local separator = string.find(latest_id, '-', 1, true)
+    local start_id = string.sub(latest_id, 1, separator) .. tostring(tonumber(string.sub(latest_id, separator + 1)) + 1)
+    local entries = redis.call('XRANGE', stream, start_id, '+', 'COUNT', scan_size)
+    total_scanned = total_scanned + #entries
+
+    local ready = 0
+    for _, entry in ipairs(entries) do
+        if matches(entry[2]) then
+            ready = ready + 1
+        elseif ready > 0 then
+            -- Stop at the end of the first run of matching messages
+            break
+        else
+            latest_id = entry[1]
+        end
+    end
+
+    if ready == 0 and #entries > 0 then
+        latest_id = entries[#entries][1]
+    end
+    redis.call('XGROUP', 'SETID', stream, group, latest_id)
+
+    ready_counts[i] = ready
+    latest_ids[i] = latest_id
+end
+
+return {ready_counts, latest_ids, total_scanned}
+"""
+
+
+# Trim all messages up to and including the given ID. Unlike XTRIM MAXLEN, this
+# cannot remove messages which were added after we decided what to trim.
+#
+#   KEYS: The stream to trim
+#   ARGV: The ID of the last message to trim
+#
+# Returns the number of messages trimmed
+TRIM_TO_ID_SCRIPT = """
+local total = #redis.call('XRANGE', KEYS[1], '-', ARGV[1])
+if total > 0 then
+    redis.call('XTRIM', KEYS[1], 'MAXLEN', redis.call('XLEN', KEYS[1]) - total)
+end
+return total
+"""
+
 
 class StreamUse(Enum):
     PER_API = 'per_api'
     PER_EVENT = 'per_event'
 
 
+class StreamFairness(Enum):
+    # Read all streams with a single command & handle messages stream by stream
+    NONE = 'none'
+    # Interleave messages from each stream, weighted by stream_weights
+    ROUND_ROBIN = 'round_robin'
+    # As with ROUND_ROBIN, but also limit the number of messages read from each
+    # stream to its share of the batch size (again, weighted by stream_weights)
+    BUDGET = 'budget'
+
+
 class RedisTransportMixin(object):
     connection_parameters: dict = {
         'address': 'redis://localhost:6379',
@@ -46,7 +182,9 @@ class RedisTransportMixin(object):
     _redis_pool: Optional[Redis] = None
 
     def set_redis_pool(self, redis_pool: Optional[Redis], url: str=None, connection_parameters: Mapping=frozendict()):
-        if not redis_pool:
+        if isinstance(redis_pool, RedisClient):
+            self._redis_pool = redis_pool
+        elif not redis_pool:
             self.connection_parameters = self.connection_parameters.copy()
             self.connection_parameters.update(connection_parameters)
             if url:
@@ -71,8 +209,14 @@ class RedisTransportMixin(object):
             self._redis_pool = redis_pool
 
     async def connection_manager(self) -> Redis:
-        if self._redis_pool is None:
-            self._redis_pool = await aioredis.create_redis_pool(**self.connection_parameters)
+        await self._get_redis_pool()
+
+        if isinstance(self._redis_pool, RedisClient):
+            # The client shares its connections between callers, so is used directly
+            try:
+                return await self._redis_pool
+            except ClientClosedError:
+                raise LightbusShutdownInProgress('Redis client has been closed. Assuming shutdown in progress.')
 
         try:
             internal_pool = self._redis_pool._pool_or_conn
@@ -96,8 +240,163 @@ class RedisTransportMixin(object):
             await self._redis_pool.wait_closed()
             self._redis_pool = None
 
+    async def _get_redis_pool(self) -> Redis:
+        if self._redis_pool is None:
+            connection_parameters = dict(self.connection_parameters)
+            client = connection_parameters.pop('client', 'aioredis')
+            if client == 'lightbus':
+                self._redis_pool = await create_redis_client(**connection_parameters)
+            elif client == 'aioredis':
+                self._redis_pool = await aioredis.create_redis_pool(**connection_parameters)
+            else:
+                raise InvalidRedisPool(
+                    f"Unknown redis client '{client}'. The client connection parameter must be "
+                    f"either 'aioredis' (the default) or 'lightbus'"
+                )
+        return self._redis_pool
+
+
+class RedisStreamConsumerMixin(object):
+    """ Functionality common to transports which consume redis streams via consumer groups
+
+    Requires the `consumer_name`, `batch_size`, `heartbeat_interval` and `missed_heartbeats`
+    attributes to be set.
+
+    Each consumer which sends heartbeats is recorded in a set per consumer group.
+    Pending messages are only claimed early from consumers in this set, as consumers which
+    have never sent a heartbeat (such as those running an older version of lightbus
+    during a rolling upgrade) may well still be alive. Their messages are left
+    to be reclaimed once unacknowledged for `acknowledgement_timeout` seconds.
+    """
+
+    async def _create_consumer_groups(self, streams, redis, consumer_group) -> List[str]:
+        """Create the consumer group on each stream, returning the streams on which it was created"""
+        created = []
+        for stream, since in streams.items():
+            if not await redis.exists(stream):
+                # Add a noop to ensure the stream exists
+                await redis.xadd(stream, fields={'': ''})
+
+            try:
+                # Create the group (it may already exist)
+                await redis.xgroup_create(stream, consumer_group, latest_id=since)
+            except (ReplyError, ClientReplyError) as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+            else:
+                created.append(stream)
+        return created
+
+    def _get_heartbeat_key(self, consumer_group: str, consumer_name: str) -> str:
+        return '{}:{}:consumer_heartbeat'.format(consumer_group, consumer_name)
+
+    def _get_heartbeating_consumers_key(self, consumer_group: str) -> str:
+        return '{}:heartbeating_consumers'.format(consumer_group)
+
+    async def _send_heartbeat(self, stream_names: List[str], consumer_group: str):
+        """Let the other consumers in the group know that this consumer is alive
+
+        The heartbeat key expires should we miss `missed_heartbeats` heartbeats,
+        at which point the other consumers will claim our pending messages.
+        """
+        with await self.connection_manager() as redis:
+            await redis.set(
+                self._get_heartbeat_key(consumer_group, self.consumer_name),
+                b'1',
+                pexpire=int(self.heartbeat_interval * self.missed_heartbeats * 1000),
+            )
+        await self._record_heartbeating_consumer(consumer_group)
+        try:
+            await self._touch_consumer(stream_names, consumer_group)
+        except (ReplyError, ClientReplyError) as e:
+            # The consumer group will not exist until fetching has started
+            if 'NOGROUP' not in str(e):
+                raise
+
+    async def _record_heartbeating_consumer(self, consumer_group: str):
+        """Record that this consumer sends heartbeats, and may therefore be claimed from once they stop
+
+        This is done before consuming any messages, so that our messages
+        can be claimed should we die before our first heartbeat is sent.
+        """
+        with await self.connection_manager() as redis:
+            await redis.sadd(self._get_heartbeating_consumers_key(consumer_group), self.consumer_name)
+
+    async def _stop_heartbeat(self, consumer_group: str):
+        with await self.connection_manager() as redis:
+            await redis.delete(self._get_heartbeat_key(consumer_group, self.consumer_name))
+
+    async def _touch_consumer(self, stream_names: List[str], consumer_group: str):
+        """Reset this consumer's idle time on the given streams
+
+        Blocking reads do not update a consumer's idle time, so this is done as part
+        of each heartbeat. This prevents collect_garbage() deleting consumers on quiet
+        streams. Claiming a message ID which cannot exist is a no-op, except that
+        redis will consider this consumer to have been seen.
+        """
+        with await self.connection_manager() as redis:
+            await asyncio.gather(*[
+                redis.xclaim(stream, consumer_group, self.consumer_name, 2 ** 63 - 1, '0-0')
+                for stream in stream_names
+            ])
+
+    async def _claim_dead_consumer_messages(self, redis, stream: str,
+                                            consumer_group: str) -> List[Tuple[str, str, dict]]:
+        """Claim the pending messages of consumers which are no longer sending heartbeats
 
-class RedisRpcTransport(RedisTransportMixin, RpcTransport):
+        Only consumers which have previously sent heartbeats are considered.
+        Returns a list of (previous owner, message ID, fields) tuples.
+        """
+        _, _, _, owners = await redis.xpending(stream, consumer_group)
+        heartbeating_consumers_key = self._get_heartbeating_consumers_key(consumer_group)
+        heartbeating = {decode(name, 'utf8') for name in await redis.smembers(heartbeating_consumers_key)}
+        owners = [decode(name, 'utf8') for name, _ in owners or []]
+        owners = [name for name in owners if name != self.consumer_name and name in heartbeating]
+        if not owners:
+            return []
+
+        alive = await asyncio.gather(*[
+            redis.exists(self._get_heartbeat_key(consumer_group, owner)) for owner in owners
+        ])
+        claimed = []
+        for owner, is_alive in zip(owners, alive):
+            if is_alive:
+                continue
+
+            pending = await redis.xpending(stream, consumer_group, '-', '+', self.batch_size, owner)
+            if not pending:
+                continue
+
+            logger.info(L('Consumer {} in group {} has stopped sending heartbeats. '
+                          'Claiming its pending messages on stream {}...',
+                          Bold(owner), Bold(consumer_group), Bold(stream)))
+            result = await redis.xclaim(
+                stream, consumer_group, self.consumer_name, int(self.heartbeat_interval * 1000),
+                *[message_id for message_id, *_ in pending]
+            )
+            claimed.extend((owner, decode(message_id, 'utf8'), fields) for message_id, fields in result)
+        return claimed
+
+
+class RedisRpcCacheMixin(object):
+    """ Provides the cache shared between RPC workers, for @cached(shared=True) procedures """
+    shared_cache = True
+
+    async def get_cached_result(self, api_name: str, procedure_name: str, key: str) -> Optional[str]:
+        with await self.connection_manager() as redis:
+            value = await redis.get(self._get_cache_key(api_name, procedure_name, key))
+        return None if value is None else decode(value, 'utf8')
+
+    async def set_cached_result(self, api_name: str, procedure_name: str, key: str, value: str, ttl: float):
+        with await self.connection_manager() as redis:
+            await redis.set(self._get_cache_key(api_name, procedure_name, key), value, pexpire=int(ttl * 1000))
+
+    def _get_cache_key(self, api_name: str, procedure_name: str, key: str) -> str:
+        # Hash the key, as the parameters may be large
+        return f'{api_name}.{procedure_name}:rpc_cache:{hashlib.sha1(key.encode("utf8")).hexdigest()}'
+
+
+class RedisRpcTransport(RedisTransportMixin, RedisRpcCacheMixin, RpcTransport):
     """ Redis RPC transport providing at-most-once delivery
 
     This transport uses a redis list and a blocking pop operation
@@ -107,6 +406,16 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
     key expires it should be assumed that the RPC call has timed
     out and that therefore is should be discarded rather than
     be processed.
+
+    Calls may be given a priority using the `priority` option (i.e. via `bus_options`).
+    Each priority has its own list, and consumers will always serve higher
+    priority lists first. Within each priority, the order in which the APIs'
+    lists are served is rotated, thereby preventing a busy API from starving the others.
+    Set `api_weights` to serve some APIs more often than others.
+
+    Set `max_queue_length` to reject calls (by raising RpcQueueFull) while an API's queue
+    is too long, rather than letting the queue grow and the calls time out. Queue lengths
+    are cached for `queue_length_ttl` seconds, so the limit is approximate.
     """
 
     def __init__(self, *,
@@ -117,6 +426,11 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
                  connection_parameters: Mapping=frozendict(maxsize=100),
                  batch_size=10,
                  rpc_timeout=5,
+                 priorities: Sequence[str]=('high', 'normal', 'low'),
+                 default_priority: str='normal',
+                 api_weights: Mapping[str, int]=frozendict(),
+                 max_queue_length: Optional[int]=None,
+                 queue_length_ttl: float=1,
                  ):
         self.set_redis_pool(redis_pool, url, connection_parameters)
         self._latest_ids = {}
@@ -124,6 +438,23 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
         self.deserializer = deserializer
         self.batch_size = batch_size
         self.rpc_timeout = rpc_timeout
+        # Highest priority first
+        self.priorities = list(priorities)
+        self.default_priority = default_priority
+        self.api_weights = api_weights
+        self._rotation = 0
+        self._pending_cancellations = []
+        self._cancellation_task = None
+        self.max_queue_length = max_queue_length
+        self.queue_length_ttl = queue_length_ttl
+        # Keys are queue keys, values are (length, time read)
+        self._queue_lengths = {}
+
+        if default_priority not in self.priorities:
+            raise InvalidRpcPriority(
+                f"The default RPC priority '{default_priority}' is not one of the available "
+                f"priorities: {', '.join(self.priorities)}"
+            )
 
     @classmethod
     def from_config(cls,
@@ -134,6 +465,11 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
                     serializer: str='lightbus.serializers.BlobMessageSerializer',
                     deserializer: str='lightbus.serializers.BlobMessageDeserializer',
                     rpc_timeout=5,
+                    priorities: List[str]=('high', 'normal', 'low'),
+                    default_priority: str='normal',
+                    api_weights: Mapping[str, int]=frozendict(),
+                    max_queue_length: Optional[int]=None,
+                    queue_length_ttl: float=1,
                     ):
         serializer = import_from_string(serializer)()
         deserializer = import_from_string(deserializer)(RpcMessage)
@@ -145,35 +481,70 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
             connection_parameters=connection_parameters,
             batch_size=batch_size,
             rpc_timeout=rpc_timeout,
+            priorities=priorities,
+            default_priority=default_priority,
+            api_weights=api_weights,
+            max_queue_length=max_queue_length,
+            queue_length_ttl=queue_length_ttl,
         )
 
     async def call_rpc(self, rpc_message: RpcMessage, options: dict):
-        queue_key = f'{rpc_message.api_name}:rpc_queue'
-        expiry_key = f'rpc_expiry_key:{rpc_message.rpc_id}'
-        logger.debug(
-            LBullets(
-                L("Enqueuing message {} in Redis stream {}", Bold(rpc_message), Bold(queue_key)),
-                items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+        await self.call_rpcs([rpc_message], options)
+
+    async def call_rpcs(self, rpc_messages: Sequence[RpcMessage], options: dict):
+        """Enqueue several calls using a single pipeline"""
+        priority = options.get('priority', self.default_priority)
+        queue_keys = []
+        for rpc_message in rpc_messages:
+            if priority not in self.priorities:
+                raise InvalidRpcPriority(
+                    f"Invalid priority '{priority}' when calling RPC {rpc_message.canonical_name}. "
+                    f"Priority must be one of: {', '.join(self.priorities)}"
+                )
+            queue_keys.append(self._get_queue_key(rpc_message.api_name, priority))
+
+        if self.max_queue_length is not None:
+            for rpc_message, queue_key in zip(rpc_messages, queue_keys):
+                queue_length = await self._get_queue_length(queue_key)
+                if queue_length >= self.max_queue_length:
+                    raise RpcQueueFull(
+                        f"Cannot call RPC {rpc_message.canonical_name} as its queue ({queue_key}) contains "
+                        f"{queue_length} calls, which is at or above the max_queue_length of "
+                        f"{self.max_queue_length}. The workers serving this API are probably overloaded."
+                    )
+
+        for rpc_message, queue_key in zip(rpc_messages, queue_keys):
+            logger.debug(
+                LBullets(
+                    L("Enqueuing message {} in Redis stream {}", Bold(rpc_message), Bold(queue_key)),
+                    items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+                )
             )
-        )
 
         with await self.connection_manager() as redis:
             start_time = time.time()
-            print('setting ' + expiry_key)
             p = redis.pipeline()
-            p.rpush(key=queue_key, value=self.serializer(rpc_message))
-            p.set(expiry_key, 1)
-            p.expire(expiry_key, timeout=self.rpc_timeout)
-            await p.execute()
+            for rpc_message, queue_key in zip(rpc_messages, queue_keys):
+                expiry_key = f'rpc_expiry_key:{rpc_message.rpc_id}'
+                p.rpush(key=queue_key, value=self.serializer(rpc_message))
+                p.set(expiry_key, 1)
+                p.expire(expiry_key, timeout=self.rpc_timeout)
+            results = await p.execute()
+
+        for queue_key, queue_length in zip(queue_keys, results[::3]):
+            if queue_key in self._queue_lengths:
+                # We get the queue length for free, so keep our cached value up to date
+                self._queue_lengths[queue_key] = (queue_length, self._queue_lengths[queue_key][1])
 
         logger.debug(L(
-            "Enqueued message {} in Redis in {} stream {}",
-            Bold(rpc_message), human_time(time.time() - start_time), Bold(queue_key)
+            "Enqueued {} messages in Redis in {} on streams {}",
+            Bold(len(rpc_messages)), human_time(time.time() - start_time), Bold(', '.join(set(queue_keys)))
         ))
 
     async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
-        # Get the name of each stream
-        queue_keys = ['{}:rpc_queue'.format(api.meta.name) for api in apis]
+        # Get the name of each list, in the order in which they should be served
+        queue_keys = self._get_queue_keys([api.meta.name for api in apis], self._rotation)
+        self._rotation += 1
 
         logger.debug(LBullets(
             'Consuming RPCs from', items=[
@@ -193,7 +564,6 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
             stream = decode(stream, 'utf8')
             rpc_message = self.deserializer(data)
             expiry_key = f'rpc_expiry_key:{rpc_message.rpc_id}'
-            print('deleting ' + expiry_key)
             key_deleted = await redis.delete(expiry_key)
 
             if not key_deleted:
@@ -206,8 +576,324 @@ class RedisRpcTransport(RedisTransportMixin, RpcTransport):
 
         return [rpc_message]
 
+    async def cancel_rpc(self, rpc_message: RpcMessage, options: dict):
+        """Prevent a call from being processed, and remove it from its queue if possible
+
+        Cancellations made at the same time (as is common during overload) are
+        sent to redis together in a single pipeline.
+        """
+        self._pending_cancellations.append((rpc_message, options))
+        if not self._cancellation_task:
+            self._cancellation_task = asyncio.ensure_future(self._send_cancellations())
+        await asyncio.shield(self._cancellation_task)
+
+    async def _send_cancellations(self):
+        # Give any other cancellations a chance to arrive
+        await asyncio.sleep(0)
+        cancellations, self._pending_cancellations = self._pending_cancellations, []
+        self._cancellation_task = None
+
+        with await self.connection_manager() as redis:
+            p = redis.pipeline()
+            for rpc_message, options in cancellations:
+                # Deleting the expiry key ensures consumers will discard the
+                # call, even if it has already been popped from the queue
+                p.delete(f'rpc_expiry_key:{rpc_message.rpc_id}')
+                # Calls are popped from the head of the list, so the oldest (i.e.
+                # timed out) calls will be found quickly when scanning from the head
+                p.lrem(
+                    self._get_queue_key(rpc_message.api_name, options.get('priority', self.default_priority)),
+                    count=1,
+                    value=self.serializer(rpc_message),
+                )
+            results = await p.execute()
+
+        removed = sum(results[1::2])
+        logger.debug(L(
+            "Cancelled {} RPC calls, of which {} were removed from their queues",
+            Bold(len(cancellations)), Bold(removed)
+        ))
+
+    async def _get_queue_length(self, queue_key: str) -> int:
+        """Get the length of the given queue, which may be up to queue_length_ttl seconds old"""
+        length, read_at = self._queue_lengths.get(queue_key, (None, 0))
+        if time.time() - read_at > self.queue_length_ttl:
+            with await self.connection_manager() as redis:
+                length = await redis.llen(queue_key)
+            self._queue_lengths[queue_key] = (length, time.time())
+        return length
+
+    def _get_queue_key(self, api_name: str, priority: str) -> str:
+        if priority == self.default_priority:
+            return f'{api_name}:rpc_queue'
+        else:
+            return f'{api_name}:rpc_queue:{priority}'
+
+    def _get_queue_keys(self, api_names: List[str], rotation: int) -> List[str]:
+        """Get the queue keys for the given APIs, in the order they should be served
+
+        BLPOP serves the first non-empty list. We therefore list higher priority
+        lists first, and rotate which API is first within each priority.
+        """
+        # Each API appears in the schedule once per unit of weight, spread evenly
+        schedule = sorted(
+            ((n + 0.5) / weight, i)
+            for i, weight in enumerate(max(int(self.api_weights.get(name, 1)), 1) for name in api_names)
+            for n in range(weight)
+        )
+        first = schedule[rotation % len(schedule)][1] if schedule else 0
+        api_names = api_names[first:] + api_names[:first]
+        return [
+            self._get_queue_key(api_name, priority)
+            for priority in self.priorities
+            for api_name in api_names
+        ]
+
+
+class RedisStreamRpcTransport(RedisTransportMixin, RedisStreamConsumerMixin, RedisRpcCacheMixin, RpcTransport):
+    """ Redis RPC transport providing at-least-once delivery
+
+    This transport uses a redis stream per API, which is consumed by a
+    consumer group shared by all RPC workers. Calls are read in batches, and are
+    acknowledged (in bulk) once the bus has processed the batch and returns for more.
+
+    A call being processed by a worker which dies will therefore be delivered
+    to another worker. This happens within a few heartbeats if the worker stops sending
+    heartbeats, otherwise once the call has gone unacknowledged for
+    `acknowledgement_timeout` seconds. Calls older than `rpc_timeout` are
+    discarded, as the caller will have given up waiting for them.
+    """
+
+    def __init__(self, *,
+                 redis_pool=None,
+                 url=None,
+                 serializer=ByFieldMessageSerializer(),
+                 deserializer=ByFieldMessageDeserializer(RpcMessage),
+                 connection_parameters: Mapping=frozendict(maxsize=100),
+                 consumer_name: str,
+                 consumer_group: str='rpc_workers',
+                 batch_size=10,
+                 rpc_timeout=5,
+                 acknowledgement_timeout: float=60,
+                 heartbeat_interval: float=5,
+                 missed_heartbeats: int=3,
+                 max_stream_length: Optional[int]=100000,
+                 ):
+        self.set_redis_pool(redis_pool, url, connection_parameters)
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.consumer_name = consumer_name
+        self.consumer_group = consumer_group
+        self.batch_size = batch_size
+        self.rpc_timeout = rpc_timeout
+        self.acknowledgement_timeout = acknowledgement_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.missed_heartbeats = missed_heartbeats
+        self.max_stream_length = max_stream_length
+
+        # Keys are stream names, values are lists of message IDs awaiting acknowledgement
+        self._unacknowledged = {}
+        self._streams = []
+        self._heartbeat_task = None
+        self._last_reclaim = None
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    url: str='redis://127.0.0.1:6379/0',
+                    connection_parameters: Mapping=frozendict(maxsize=100),
+                    consumer_name: str=None,
+                    consumer_group: str='rpc_workers',
+                    batch_size: int=10,
+                    serializer: str='lightbus.serializers.ByFieldMessageSerializer',
+                    deserializer: str='lightbus.serializers.ByFieldMessageDeserializer',
+                    rpc_timeout=5,
+                    acknowledgement_timeout: float=60,
+                    heartbeat_interval: float=5,
+                    missed_heartbeats: int=3,
+                    max_stream_length: Optional[int]=100000,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(RpcMessage)
+
+        return cls(
+            url=url,
+            serializer=serializer,
+            deserializer=deserializer,
+            connection_parameters=connection_parameters,
+            consumer_name=consumer_name or config.process_name,
+            consumer_group=consumer_group,
+            batch_size=batch_size,
+            rpc_timeout=rpc_timeout,
+            acknowledgement_timeout=acknowledgement_timeout,
+            heartbeat_interval=heartbeat_interval,
+            missed_heartbeats=missed_heartbeats,
+            max_stream_length=max_stream_length,
+        )
+
+    async def call_rpc(self, rpc_message: RpcMessage, options: dict):
+        stream = f'{rpc_message.api_name}:rpc_stream'
+        logger.debug(
+            LBullets(
+                L("Enqueuing message {} in Redis stream {}", Bold(rpc_message), Bold(stream)),
+                items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+            )
+        )
+
+        with await self.connection_manager() as redis:
+            start_time = time.time()
+            await redis.xadd(
+                stream=stream,
+                fields=self.serializer(rpc_message),
+                max_len=self.max_stream_length or None,
+                exact_len=False,
+            )
+
+        logger.debug(L(
+            "Enqueued message {} in Redis in {} stream {}",
+            Bold(rpc_message), human_time(time.time() - start_time), Bold(stream)
+        ))
+
+    async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
+        # The bus only asks for more RPCs once it has finished
+        # processing the previous batch, so we can now acknowledge them
+        await self._acknowledge()
+
+        streams = ['{}:rpc_stream'.format(api.meta.name) for api in apis]
+        if streams != self._streams:
+            await self._start_consuming(streams)
+
+        with await self.connection_manager() as redis:
+            if self._last_reclaim is None:
+                # Messages we received prior to restarting
+                stream_messages = await redis.xread_group(
+                    group_name=self.consumer_group,
+                    consumer_name=self.consumer_name,
+                    streams=streams,
+                    latest_ids=['0'] * len(streams),
+                    count=self.batch_size,
+                    timeout=None,
+                )
+                self._last_reclaim = time.time()
+            elif time.time() - self._last_reclaim > self.heartbeat_interval:
+                stream_messages = await self._reclaim_messages(redis, streams)
+                self._last_reclaim = time.time()
+            else:
+                stream_messages = []
+
+            if not stream_messages:
+                # Wait for new messages, but only for a heartbeat interval,
+                # thereby ensuring we periodically check for lost messages
+                stream_messages = await redis.xread_group(
+                    group_name=self.consumer_group,
+                    consumer_name=self.consumer_name,
+                    streams=streams,
+                    latest_ids=['>'] * len(streams),
+                    count=self.batch_size,
+                    timeout=int(self.heartbeat_interval * 1000),
+                )
+
+            now = await redis.time()
+
+        rpc_messages = []
+        for stream, message_id, fields in stream_messages or []:
+            stream = decode(stream, 'utf8')
+            message_id = decode(message_id, 'utf8')
+            self._unacknowledged.setdefault(stream, []).append(message_id)
+
+            if tuple(fields.items()) == ((b'', b''),):
+                # Noop message
+                continue
+
+            milliseconds, _ = parse_stream_id(message_id)
+            if now * 1000 - milliseconds > self.rpc_timeout * 1000:
+                logger.warning(L(
+                    "Discarding RPC message {} on stream {} as it is older than the rpc_timeout ({} seconds)",
+                    Bold(message_id), Bold(stream), self.rpc_timeout
+                ))
+                continue
+
+            rpc_message = self.deserializer(fields)
+            logger.debug(LBullets(
+                L("⬅ Received RPC message {} on stream {}", Bold(message_id), Bold(stream)),
+                items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+            ))
+            rpc_messages.append(rpc_message)
+
+        return rpc_messages
+
+    async def close(self):
+        await cancel(self._heartbeat_task)
+        if self._heartbeat_task:
+            try:
+                await self._stop_heartbeat(self.consumer_group)
+            except LightbusShutdownInProgress:
+                pass
+        await super().close()
+
+    async def _start_consuming(self, streams: List[str]):
+        with await self.connection_manager() as redis:
+            # Start from the beginning of the stream, as calls may have been
+            # made before any worker started. Old calls will be discarded.
+            await self._create_consumer_groups(OrderedDict((stream, '0') for stream in streams),
+                                               redis, self.consumer_group)
+
+        async def heartbeat_loop():
+            while True:
+                await self._send_heartbeat(streams, self.consumer_group)
+                await asyncio.sleep(self.heartbeat_interval)
+
+        await self._record_heartbeating_consumer(self.consumer_group)
+        await cancel(self._heartbeat_task)
+        self._heartbeat_task = asyncio.ensure_future(handle_aio_exceptions(heartbeat_loop()))
+        self._streams = streams
+        self._last_reclaim = None
+
+    async def _reclaim_messages(self, redis, streams: List[str]):
+        """Claim messages from dead consumers, or messages which have not been acknowledged in time"""
+        stream_messages = []
+        for stream in streams:
+            claimed = await self._claim_dead_consumer_messages(redis, stream, self.consumer_group)
+            stream_messages.extend((stream, message_id, fields) for _, message_id, fields in claimed)
+
+            old_messages = await redis.xpending(stream, self.consumer_group, '-', '+', self.batch_size)
+            timeout = int(self.acknowledgement_timeout * 1000)
+            timed_out_ids = [
+                message_id
+                for message_id, consumer_name, ms_since_last_delivery, _
+                in old_messages
+                if ms_since_last_delivery > timeout
+            ]
+            if timed_out_ids:
+                logger.info(L('Reclaiming {} timed out RPC messages on stream {}',
+                              Bold(len(timed_out_ids)), Bold(stream)))
+                result = await redis.xclaim(stream, self.consumer_group, self.consumer_name, timeout, *timed_out_ids)
+                stream_messages.extend((stream, message_id, fields) for message_id, fields in result)
+        return stream_messages
+
+    async def _acknowledge(self):
+        unacknowledged, self._unacknowledged = self._unacknowledged, {}
+        if not unacknowledged:
+            return
+
+        with await self.connection_manager() as redis:
+            await asyncio.gather(*[
+                redis.xack(stream, self.consumer_group, *message_ids)
+                for stream, message_ids
+                in unacknowledged.items()
+            ])
+
 
 class RedisResultTransport(RedisTransportMixin, ResultTransport):
+    """ Redis result transport, storing each call's results in a list until the caller pops them
+
+    At most `max_buffered_results` values of a streamed result are stored at any
+    one time. Once this many are waiting for the caller, the worker stops generating
+    values until the caller catches up. Should the caller not catch up within `result_ttl`
+    seconds (for example, because it has died), the stream is ended with a LightbusTimeout.
+    """
+    # How often to check whether the caller has caught up with a streamed result
+    buffer_poll_interval = 0.05
 
     def __init__(self, *,
                  redis_pool=None,
@@ -217,6 +903,7 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
                  connection_parameters: Mapping=frozendict(maxsize=100),
                  result_ttl=60,
                  rpc_timeout=5,
+                 max_buffered_results: int=100,
                  ):
         # NOTE: We use the blob serializer here, as the results come back as values in a list
         self.set_redis_pool(redis_pool, url, connection_parameters)
@@ -224,6 +911,7 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
         self.deserializer = deserializer
         self.result_ttl = result_ttl
         self.rpc_timeout = rpc_timeout
+        self.max_buffered_results = max_buffered_results
 
     @classmethod
     def from_config(cls,
@@ -234,6 +922,7 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
                     connection_parameters: Mapping=frozendict(maxsize=100),
                     result_ttl=60,
                     rpc_timeout=5,
+                    max_buffered_results: int=100,
                     ):
         serializer = import_from_string(serializer)()
         deserializer = import_from_string(deserializer)(ResultMessage)
@@ -245,6 +934,7 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
             connection_parameters=connection_parameters,
             result_ttl=result_ttl,
             rpc_timeout=rpc_timeout,
+            max_buffered_results=max_buffered_results,
         )
 
     def get_return_path(self, rpc_message: RpcMessage) -> str:
@@ -264,15 +954,40 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
         with await self.connection_manager() as redis:
             start_time = time.time()
             p = redis.pipeline()
-            p.lpush(redis_key, self.serializer(result_message))
+            # Results are popped from the head of the list, so push onto the
+            # tail in order to preserve the order of streamed results
+            p.rpush(redis_key, self.serializer(result_message))
             p.expire(redis_key, timeout=self.result_ttl)
-            await p.execute()
+            length, _ = await p.execute()
 
         logger.debug(L(
             "➡ Sent result {} into Redis in {} using return path {}",
             Bold(result_message), human_time(time.time() - start_time), Bold(return_path)
         ))
 
+        if result_message.more and length >= self.max_buffered_results:
+            await self._wait_for_caller(redis_key, expires_at=start_time + self.result_ttl)
+
+    async def _wait_for_caller(self, redis_key: str, expires_at: float):
+        """Wait until fewer than max_buffered_results results are waiting for the caller
+
+        Gives up once the results expire, as an expired list is indistinguishable
+        from one which the caller has emptied.
+        """
+        logger.debug(L("Waiting for the caller to receive the results stored in {}", Bold(redis_key)))
+        while True:
+            await asyncio.sleep(self.buffer_poll_interval)
+            with await self.connection_manager() as redis:
+                length = await redis.llen(redis_key)
+            # Check the time after reading the length, as the list may have expired in the meantime
+            if time.time() >= expires_at:
+                raise LightbusTimeout(
+                    f"Streamed result has not been received by its caller for {self.result_ttl} seconds, "
+                    f"so the stream has been abandoned. The caller may have stopped receiving the results."
+                )
+            if length < self.max_buffered_results:
+                return
+
     async def receive_result(self, rpc_message: RpcMessage, return_path: str, options: dict) -> ResultMessage:
         logger.debug(L("Awaiting Redis result for RPC message: {}", Bold(rpc_message)))
         redis_key = self._parse_return_path(return_path)
@@ -294,14 +1009,215 @@ class RedisResultTransport(RedisTransportMixin, ResultTransport):
             human_time(time.time() - start_time), rpc_message, Bold(result_message.result)
         ))
 
-        return result_message
+        return result_message
+
+    async def receive_results(self, rpc_messages: Sequence[RpcMessage], return_paths: Sequence[str],
+                              options: dict) -> AsyncGenerator[ResultMessage, None]:
+        """Receive several results using a single connection, yielding each as it arrives"""
+        redis_keys = {self._parse_return_path(return_path) for return_path in return_paths}
+        logger.debug(L("Awaiting {} Redis results", Bold(len(redis_keys))))
+
+        with await self.connection_manager() as redis:
+            while redis_keys:
+                # BLPOP will return the first available result from any of the keys
+                result = await redis.blpop(*redis_keys, timeout=self.rpc_timeout)
+                if not result:
+                    continue
+                redis_key, serialized = result
+                redis_keys.discard(decode(redis_key, 'utf8'))
+                yield self.deserializer(serialized)
+
+    def _parse_return_path(self, return_path: str) -> str:
+        assert return_path.startswith('redis+key://')
+        return return_path[12:]
+
+
+class RedisPubSubResultTransport(RedisTransportMixin, ResultTransport):
+    """ Redis result transport using pub/sub, for lower latency results
+
+    Each caller process subscribes to its own channel (using a single connection),
+    and results are published to that channel. This requires a single command per result
+    (`PUBLISH`), rather than the three used by `RedisResultTransport`.
+
+    Published messages are not stored by redis, and so will be lost if the caller is not
+    subscribed at the time (for example, if the caller is reconnecting).
+    Therefore, should a result be published to no subscribers, it is instead stored in a
+    list, as with `RedisResultTransport`. Callers check this list once subscribed, and then
+    every `fallback_interval` seconds while waiting. Results published while the caller was
+    subscribed, but which the caller nonetheless fails to receive, will cause the call to
+    time out.
+
+    Unlike `RedisResultTransport`, the values of a streamed result are not bounded.
+    The worker cannot tell how many values the caller has yet to process, so a caller
+    which is slower than the worker will buffer the values in memory.
+    """
+
+    def __init__(self, *,
+                 redis_pool=None,
+                 url=None,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(ResultMessage),
+                 connection_parameters: Mapping=frozendict(maxsize=100),
+                 channel: str=None,
+                 result_ttl=60,
+                 fallback_interval: float=1,
+                 ):
+        self.set_redis_pool(redis_pool, url, connection_parameters)
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.channel = channel or 'lightbus_results:{}'.format(random_name(length=16))
+        self.result_ttl = result_ttl
+        self.fallback_interval = fallback_interval
+
+        # Keys are RPC IDs, values are queues of result messages received for the call
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._listener_task = None
+        # Created upon first use, so as to use the running event loop
+        self._listener_lock = None
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    url: str='redis://127.0.0.1:6379/0',
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    connection_parameters: Mapping=frozendict(maxsize=100),
+                    result_ttl=60,
+                    fallback_interval: float=1,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(ResultMessage)
+
+        return cls(
+            url=url,
+            serializer=serializer,
+            deserializer=deserializer,
+            connection_parameters=connection_parameters,
+            result_ttl=result_ttl,
+            fallback_interval=fallback_interval,
+        )
+
+    def get_return_path(self, rpc_message: RpcMessage) -> str:
+        return 'redis+pubsub://{}'.format(self.channel)
+
+    async def send_result(self, rpc_message: RpcMessage, result_message: ResultMessage, return_path: str):
+        logger.debug(L(
+            "Publishing result {} into Redis using return path {}",
+            Bold(result_message), Bold(return_path)
+        ))
+        channel = self._parse_return_path(return_path)
+        serialized = self.serializer(result_message)
+
+        with await self.connection_manager() as redis:
+            start_time = time.time()
+            receivers = await redis.publish(channel, serialized)
+            if not receivers:
+                # The caller is not subscribed, so store the result where the caller will look for it
+                logger.debug(L("No subscribers on channel {}, storing result instead", Bold(channel)))
+                fallback_key = self._get_fallback_key(channel, result_message.rpc_id)
+                p = redis.pipeline()
+                p.rpush(fallback_key, serialized)
+                p.expire(fallback_key, timeout=self.result_ttl)
+                await p.execute()
+
+        logger.debug(L(
+            "➡ Published result {} into Redis in {} using return path {}",
+            Bold(result_message), human_time(time.time() - start_time), Bold(return_path)
+        ))
+
+    async def receive_result(self, rpc_message: RpcMessage, return_path: str, options: dict) -> ResultMessage:
+        logger.debug(L("Awaiting Redis result for RPC message: {}", Bold(rpc_message)))
+        # Register the call before doing anything else, so we do not miss the result
+        queue = self._queues.setdefault(rpc_message.rpc_id, asyncio.Queue())
+        try:
+            start_time = time.time()
+            result_message = await self._get_result(rpc_message, return_path, queue, check_fallback=True)
+        finally:
+            self._queues.pop(rpc_message.rpc_id, None)
+
+        logger.debug(L(
+            "⬅ Received Redis result in {} for RPC message {}: {}",
+            human_time(time.time() - start_time), rpc_message, Bold(result_message.result)
+        ))
+        return result_message
+
+    async def receive_result_stream(self, rpc_message: RpcMessage, return_path: str,
+                                    options: dict) -> AsyncGenerator[ResultMessage, None]:
+        # Keep the call registered throughout, so results are queued while the caller is busy
+        queue = self._queues.setdefault(rpc_message.rpc_id, asyncio.Queue())
+        check_fallback = True
+        try:
+            while True:
+                result_message = await self._get_result(rpc_message, return_path, queue, check_fallback)
+                check_fallback = False
+                yield result_message
+                if not result_message.more:
+                    return
+        finally:
+            self._queues.pop(rpc_message.rpc_id, None)
+
+    async def close(self):
+        await cancel(self._listener_task)
+        self._listener_task = None
+        await super().close()
+
+    async def _get_result(self, rpc_message: RpcMessage, return_path: str, queue: asyncio.Queue,
+                          check_fallback: bool) -> ResultMessage:
+        await self._start_listening()
+        fallback_key = self._get_fallback_key(self._parse_return_path(return_path), rpc_message.rpc_id)
+        while True:
+            if check_fallback and queue.empty():
+                with await self.connection_manager() as redis:
+                    serialized = await redis.lpop(fallback_key)
+                if serialized:
+                    return self.deserializer(serialized)
+
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=self.fallback_interval)
+            except asyncio.TimeoutError:
+                # The result may have been stored rather than published, so check again
+                check_fallback = True
+
+    async def _start_listening(self):
+        """Subscribe to our channel, if we have not done so already"""
+        if self._listener_lock is None:
+            self._listener_lock = asyncio.Lock()
+
+        # Concurrent callers must not each subscribe & start a listener
+        async with self._listener_lock:
+            if self._listener_task and not self._listener_task.done():
+                return
+
+            redis = await self._get_redis_pool()
+            channel, = await redis.subscribe(self.channel)
+            logger.debug(L("Subscribed to result channel {}", Bold(self.channel)))
+            self._listener_task = asyncio.ensure_future(handle_aio_exceptions(self._listen(channel)))
+
+    async def _listen(self, channel):
+
+        while await channel.wait_message():
+            result_message = self.deserializer(await channel.get())
+            queue = self._queues.get(result_message.rpc_id)
+            if queue:
+                queue.put_nowait(result_message)
+            else:
+                logger.debug(L("Discarding result for RPC {} as no caller is waiting for it",
+                               Bold(result_message.rpc_id)))
+        logger.warning(L("Lost subscription to result channel {}", Bold(self.channel)))
+
+    def _get_fallback_key(self, channel: str, rpc_id: str) -> str:
+        return '{}:{}'.format(channel, rpc_id)
 
     def _parse_return_path(self, return_path: str) -> str:
-        assert return_path.startswith('redis+key://')
-        return return_path[12:]
+        assert return_path.startswith('redis+pubsub://')
+        return return_path[15:]
 
 
-class RedisEventTransport(RedisTransportMixin, EventTransport):
+class RedisEventTransport(RedisTransportMixin, RedisStreamConsumerMixin, EventTransport):
+    # The set recording the consumer groups created by each service (see collect_garbage())
+    consumer_groups_key = 'lightbus:consumer_groups'
+    # How many archived messages to read from disk at a time
+    archive_read_size = 1000
 
     def __init__(self, redis_pool=None, *,
                  consumer_group_prefix: str,
@@ -312,8 +1228,14 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                  connection_parameters: Mapping=frozendict(maxsize=100),
                  batch_size=10,
                  acknowledgement_timeout: float=60,
+                 heartbeat_interval: float=5,
+                 missed_heartbeats: int=3,
                  max_stream_length: Optional[int] = 100000,
                  stream_use: StreamUse=StreamUse.PER_EVENT,
+                 stream_fairness: StreamFairness=StreamFairness.NONE,
+                 stream_weights: Mapping[str, int]=frozendict(),
+                 archive_directory: Optional[str]=None,
+                 archive_interval: float=60,
                  ):
         self.set_redis_pool(redis_pool, url, connection_parameters)
         self.serializer = serializer
@@ -322,8 +1244,17 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
         self.consumer_group_prefix = consumer_group_prefix
         self.consumer_name = consumer_name
         self.acknowledgement_timeout = acknowledgement_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.missed_heartbeats = missed_heartbeats
         self.max_stream_length = max_stream_length
         self.stream_use = stream_use
+        self.stream_fairness = StreamFairness(stream_fairness)
+        # Keys are event names (api_name.event_name), or api_name.* when using per-api streams
+        self.stream_weights = stream_weights
+        self.archive_directory = archive_directory
+        self.archive_interval = archive_interval
+        self._archive_tasks = {}
+        self._archived_at = {}
 
         self._task = None
         self._reload = False
@@ -339,8 +1270,14 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                     serializer: str='lightbus.serializers.ByFieldMessageSerializer',
                     deserializer: str='lightbus.serializers.ByFieldMessageDeserializer',
                     acknowledgement_timeout: float=60,
+                    heartbeat_interval: float=5,
+                    missed_heartbeats: int=3,
                     max_stream_length: Optional[int]=100000,
                     stream_use: StreamUse=StreamUse.PER_EVENT,
+                    stream_fairness: StreamFairness=StreamFairness.NONE,
+                    stream_weights: Mapping[str, int]=frozendict(),
+                    archive_directory: Optional[str]=None,
+                    archive_interval: float=60,
                     ):
         serializer = import_from_string(serializer)()
         deserializer = import_from_string(deserializer)(EventMessage)
@@ -357,8 +1294,14 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
             serializer=serializer,
             deserializer=deserializer,
             acknowledgement_timeout=acknowledgement_timeout,
+            heartbeat_interval=heartbeat_interval,
+            missed_heartbeats=missed_heartbeats,
             max_stream_length=max_stream_length,
             stream_use=stream_use,
+            stream_fairness=stream_fairness,
+            stream_weights=stream_weights,
+            archive_directory=archive_directory,
+            archive_interval=archive_interval,
         )
 
     async def send_event(self, event_message: EventMessage, options: dict):
@@ -379,7 +1322,9 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
             await redis.xadd(
                 stream=stream,
                 fields=self.serializer(event_message),
-                max_len=self.max_stream_length or None,
+                # When archiving, the archiver handles trimming. This ensures
+                # messages are archived before they are removed from redis
+                max_len=None if self.archive_directory else (self.max_stream_length or None),
                 exact_len=False,
             )
 
@@ -388,13 +1333,118 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
             Bold(event_message), human_time(time.time() - start_time), Bold(stream)
         ))
 
+        if self.archive_directory:
+            self._maybe_archive_stream(stream)
+
+    def _maybe_archive_stream(self, stream: str):
+        """Archive the stream in the background, if it has not been archived recently"""
+        if stream in self._archive_tasks:
+            return
+        if time.time() - self._archived_at.get(stream, 0) < self.archive_interval:
+            return
+
+        self._archived_at[stream] = time.time()
+        task = asyncio.ensure_future(handle_aio_exceptions(self.archive_stream(stream)))
+        task.add_done_callback(lambda _: self._archive_tasks.pop(stream, None))
+        self._archive_tasks[stream] = task
+
+    async def archive_stream(self, stream: str) -> int:
+        """Move messages beyond max_stream_length out of redis and into the on-disk archive
+
+        Messages are only trimmed from redis once they are safely on disk. Returns
+        the number of messages archived. Only one process per host will archive a
+        given stream at any one time, so this will do nothing if another process
+        is already archiving the stream.
+
+        Note that each host maintains its own archive, so you will likely want
+        to archive from a single host (or share the archive directory between hosts).
+        """
+        if not self.archive_directory or not self.max_stream_length:
+            return 0
+
+        archive = self._get_archive(stream)
+        to_archive = []
+        try:
+            with archive.lock(blocking=False):
+                with await self.connection_manager() as redis:
+                    excess = await redis.execute(b'XLEN', stream) - self.max_stream_length
+                    if excess <= 0:
+                        return 0
+
+                    messages = await redis.xrange(stream, count=excess)
+                    last_archived = await asyncio.get_event_loop().run_in_executor(None, archive.last_id)
+                    for message_id, fields in messages:
+                        message_id = decode(message_id, 'utf8')
+                        if last_archived and parse_stream_id(message_id) <= parse_stream_id(last_archived):
+                            # Archived previously, but we failed to trim it
+                            continue
+                        if tuple(fields.items()) == ((b'', b''),):
+                            # Noop message
+                            continue
+                        to_archive.append((
+                            message_id,
+                            {decode(k, 'utf8'): decode(v, 'utf8') for k, v in fields.items()},
+                        ))
+
+                    # Writing to disk will block, so do it in another thread
+                    await asyncio.get_event_loop().run_in_executor(None, archive.append, to_archive)
+                    await self._eval_script(
+                        redis, TRIM_TO_ID_SCRIPT, keys=[stream], args=[decode(messages[-1][0], 'utf8')]
+                    )
+        except BlockingIOError:
+            logger.debug(L("Stream {} is already being archived by another process", Bold(stream)))
+            return 0
+
+        logger.debug(L(
+            "Archived {} messages from stream {} to {}",
+            Bold(len(to_archive)), Bold(stream), Bold(archive.directory)
+        ))
+        return len(to_archive)
+
+    def _get_archive(self, stream: str) -> SegmentLog:
+        return SegmentLog(Path(self.archive_directory) / quote(stream, safe='.'))
+
+    async def _read_archive(self, stream: str, start_id: str, end_id: str=None, before_id: str=None):
+        """Read archived messages between the given IDs (inclusive)
+
+        Messages are only returned if their IDs are less than `before_id`. This should
+        be the first ID still present in the stream, thereby ensuring we do not return
+        messages which have been archived but not yet trimmed.
+        """
+        if not self.archive_directory:
+            return
+
+        archive = self._get_archive(stream)
+
+        def read(start_id):
+            # Reading from disk will block, so this is done in another thread. Each read
+            # is self-contained, so an abandoned read leaves no files open in the meantime.
+            messages = archive.read(start_id=start_id, end_id=end_id)
+            try:
+                return list(islice(messages, self.archive_read_size))
+            finally:
+                messages.close()
+
+        while True:
+            messages = await asyncio.get_event_loop().run_in_executor(None, read, start_id)
+            for message_id, fields in messages:
+                if before_id and parse_stream_id(message_id) >= parse_stream_id(before_id):
+                    return
+                yield stream, message_id, fields
+
+            if len(messages) < self.archive_read_size:
+                return
+            milliseconds, n = parse_stream_id(messages[-1][0])
+            start_id = f'{milliseconds}-{n + 1}'
+
     async def fetch(self,
                     listen_for,
                     context: dict,
                     loop: asyncio.AbstractEventLoop,
                     consumer_group: str=None,
                     since: Union[Since, Sequence[Since]] = '$',
-                    forever=True
+                    forever=True,
+                    filters: Mapping=None,
                     ) -> Generator[EventMessage, None, None]:
 
         if self.consumer_group_prefix:
@@ -408,6 +1458,7 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
         # Keys are stream names, values as the latest ID consumed from that stream
         streams = OrderedDict(zip(stream_names, since))
         expected_events = {event_name for _, event_name in listen_for}
+        filters = normalise_filters(filters)
 
         logger.debug(LBullets(
             L('Consuming events as consumer {} in group {} on streams',
@@ -419,16 +1470,31 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
         queue = asyncio.Queue(maxsize=self.batch_size)
 
         async def fetch_loop():
-            async for message in self._fetch_new_messages(streams, consumer_group, expected_events, forever):
+            async for message in self._fetch_new_messages(streams, consumer_group, expected_events, forever, filters):
                 await queue.put(message)
 
         async def reclaim_loop():
             await asyncio.sleep(self.acknowledgement_timeout)
-            async for message in self._reclaim_lost_messages(stream_names, consumer_group, expected_events):
+            async for message in self._reclaim_lost_messages(stream_names, consumer_group, expected_events, filters):
                 await queue.put(message)
 
+        async def heartbeat_loop():
+            while True:
+                await self._send_heartbeat(stream_names, consumer_group)
+                await asyncio.sleep(self.heartbeat_interval)
+
+        async def failover_loop():
+            while True:
+                await asyncio.sleep(self.heartbeat_interval)
+                claimed = self._claim_from_dead_consumers(stream_names, consumer_group, expected_events, filters)
+                async for message in claimed:
+                    await queue.put(message)
+
+        await self._record_heartbeating_consumer(consumer_group)
         fetch_task = asyncio.ensure_future(fetch_loop(), loop=loop)
         reclaim_task = asyncio.ensure_future(reclaim_loop(), loop=loop)
+        heartbeat_task = asyncio.ensure_future(handle_aio_exceptions(heartbeat_loop()), loop=loop)
+        failover_task = asyncio.ensure_future(handle_aio_exceptions(failover_loop()), loop=loop)
 
         try:
             while True:
@@ -437,12 +1503,172 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                 except GeneratorExit:
                     return
         finally:
-            await cancel(fetch_task, reclaim_task)
+            await cancel(fetch_task, reclaim_task, heartbeat_task, failover_task)
+            # Let the other consumers know they can take over our pending messages right away
+            try:
+                await self._stop_heartbeat(consumer_group)
+            except LightbusShutdownInProgress:
+                # Our heartbeat will simply expire
+                pass
+
+    async def replay(self,
+                     listen_for,
+                     since: Since=None,
+                     until: Since=None,
+                     ordered: bool=True,
+                     parallelism: int=4,
+                     page_size: int=1000,
+                     filters: Mapping=None,
+                     ) -> Generator[EventMessage, None, None]:
+        """Read historical events directly from the streams, bypassing consumer groups
+
+        Each stream's ID range is split into `parallelism` sub-ranges which are scanned
+        concurrently using paginated XRANGE calls. Messages are never acknowledged
+        (there is no consumer group), so this is suitable for backfills and for
+        rebuilding state from a stream's history.
+
+        If `ordered` is true, messages will be yielded in ID order (across all streams).
+        Otherwise messages will be yielded as soon as they have been read.
+
+        Messages added after replay starts will not be returned.
+        """
+        if since == '$' or until == '$':
+            raise InvalidParameters(
+                "Cannot replay events since or until '$' (i.e. events yet to be sent). "
+                "To receive new events, listen for them instead."
+            )
+        stream_names = self._get_stream_names(listen_for)
+        expected_events = {event_name for _, event_name in listen_for}
+        filters = normalise_filters(filters)
+        start_id = normalise_since_value(since or '0')
+
+        logger.debug(LBullets(
+            L('Replaying events from {} until {} on streams', Bold(start_id), Bold(until or 'now')),
+            items=stream_names
+        ))
+
+        # Determine the sub-ranges to scan for each stream
+        ranges_by_stream = OrderedDict()
+        archived_by_stream = OrderedDict()
+        with await self.connection_manager() as redis:
+            for stream in stream_names:
+                earliest = await redis.xrange(stream, count=1)
+                if until:
+                    end_id = normalise_since_value(until)
+                elif earliest:
+                    # Pin the end of the range, otherwise we'd chase new messages forever
+                    latest = await redis.xrevrange(stream, count=1)
+                    end_id = decode(latest[0][0], 'utf8')
+                else:
+                    end_id = None
+
+                # Archived messages always precede those still in redis
+                archived_by_stream[stream] = self._read_archive(
+                    stream, start_id, end_id, before_id=decode(earliest[0][0], 'utf8') if earliest else None
+                )
+                if earliest:
+                    # Split only the part of the range which the stream covers, otherwise
+                    # the sub-ranges preceding the stream's first message would be empty
+                    earliest_id = decode(earliest[0][0], 'utf8')
+                    range_start = max(start_id, earliest_id, key=parse_stream_id)
+                    ranges_by_stream[stream] = split_stream_id_range(range_start, end_id, parts=parallelism)
+
+        tasks = []
+
+        def scan_into_queue(stream, range_start, range_end, queue):
+            # Keep the queue small, thereby bounding memory use should we
+            # scan faster than the messages are being consumed
+            async def scan():
+                try:
+                    async for page in self._scan_stream_range(stream, range_start, range_end, page_size):
+                        await queue.put(page)
+                except Exception as e:
+                    await queue.put(e)
+                await queue.put(None)
+
+            tasks.append(asyncio.ensure_future(scan()))
+
+        async def read_queue(queue, total_scans=1):
+            finished = 0
+            while finished < total_scans:
+                page = await queue.get()
+                if page is None:
+                    finished += 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for message in page:
+                        yield message
+
+        try:
+            if ordered:
+                iterators = []
+                for stream, archived in archived_by_stream.items():
+                    ranges = ranges_by_stream.get(stream, [])
+                    queues = [asyncio.Queue(maxsize=2) for _ in ranges]
+                    for (range_start, range_end), queue in zip(ranges, queues):
+                        scan_into_queue(stream, range_start, range_end, queue)
+                    iterators.append(chain_async(archived, *[read_queue(queue) for queue in queues]))
+                messages = merge_async(*iterators, key=lambda m: parse_stream_id(m[1]))
+            else:
+                queue = asyncio.Queue(maxsize=2 * parallelism)
+                for stream, ranges in ranges_by_stream.items():
+                    for range_start, range_end in ranges:
+                        scan_into_queue(stream, range_start, range_end, queue)
+                messages = chain_async(*archived_by_stream.values(), read_queue(queue, total_scans=len(tasks)))
+
+            async for stream, message_id, fields in messages:
+                event_message = self._fields_to_message(fields, expected_events, filters)
+                if event_message:
+                    yield event_message
+        finally:
+            await cancel(*tasks)
+
+    async def _scan_stream_range(self, stream: str, start_id: str, end_id: str, page_size: int):
+        """Read pages of messages within the given stream ID range (inclusive)"""
+        with await self.connection_manager() as redis:
+            while True:
+                messages = await redis.xrange(stream, start=start_id, stop=end_id, count=page_size)
+                if messages:
+                    yield [(stream, decode(message_id, 'utf8'), fields) for message_id, fields in messages]
+                if len(messages) < page_size:
+                    return
+                start_id = redis_stream_id_add_one(decode(messages[-1][0], 'utf8'))
 
-    async def _fetch_new_messages(self, streams, consumer_group, expected_events, forever):
+    async def _fetch_new_messages(self, streams, consumer_group, expected_events, forever, filters=None):
         with await self.connection_manager() as redis:
             # Firstly create the consumer group if we need to
-            await self._create_consumer_groups(streams, redis, consumer_group)
+            created_streams = await self._create_consumer_groups(streams, redis, consumer_group)
+            if self.consumer_group_prefix:
+                # Record which service created the group, for the benefit of collect_garbage()
+                await redis.sadd(
+                    self.consumer_groups_key,
+                    *[self._get_consumer_groups_member(self.consumer_group_prefix, stream, consumer_group)
+                      for stream in streams]
+                )
+
+            # If we have just created the group, and are starting from some point
+            # in the past, then some of the messages we need may have been archived
+            for stream in created_streams:
+                if not self.archive_directory or streams[stream] == '$':
+                    continue
+                earliest = await redis.xrange(stream, count=1)
+                archived = self._read_archive(
+                    stream,
+                    # Consumer groups start after the given ID, so we should too
+                    start_id=redis_stream_id_add_one(streams[stream]),
+                    before_id=decode(earliest[0][0], 'utf8') if earliest else None,
+                )
+                async for _, message_id, fields in archived:
+                    event_message = self._fields_to_message(fields, expected_events, filters)
+                    if not event_message:
+                        continue
+                    logger.debug(LBullets(
+                        L("⬅ Receiving archived event {} on stream {}", Bold(message_id), Bold(stream)),
+                        items=dict(**event_message.get_metadata(), kwargs=event_message.get_kwargs())
+                    ))
+                    yield event_message
+                    yield True
 
             # Get any messages that this consumer has yet to process.
             # This can happen in the case where the processes died before acknowledging.
@@ -455,7 +1681,7 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                 timeout=None,  # Don't block, return immediately
             )
             for stream, message_id, fields in pending_messages:
-                event_message = self._fields_to_message(fields, expected_events)
+                event_message = self._fields_to_message(fields, expected_events, filters)
                 if not event_message:
                     # noop message, or message an event we don't care about
                     continue
@@ -468,24 +1694,43 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
             # We've now cleaned up any old messages that were hanging around.
             # Now we get on to the main loop which blocks and waits for new messages
 
+            rotation = 0
             while True:
-                # Fetch some messages.
-                # This will block until there are some messages available
-                stream_messages = await redis.xread_group(
-                    group_name=consumer_group,
-                    consumer_name=self.consumer_name,
-                    streams=list(streams.keys()),
-                    # Using ID '>' indicates we only want new messages which have not
-                    # been passed to other consumers in this group
-                    latest_ids=['>'] * len(streams),
-                    count=self.batch_size,
-                )
+                if filters and self._can_filter_in_redis():
+                    # Let redis discard the messages we don't care about. This
+                    # will block until there are some messages available
+                    stream_messages = await self._read_filtered_messages(
+                        redis, streams, consumer_group, expected_events, filters
+                    )
+                elif self.stream_fairness != StreamFairness.NONE:
+                    # Read each stream individually.
+                    # This will block until there are some messages available
+                    stream_messages = await self._read_streams_fairly(redis, streams, consumer_group)
+                else:
+                    # Fetch some messages.
+                    # This will block until there are some messages available
+                    stream_messages = await redis.xread_group(
+                        group_name=consumer_group,
+                        consumer_name=self.consumer_name,
+                        streams=list(streams.keys()),
+                        # Using ID '>' indicates we only want new messages which have not
+                        # been passed to other consumers in this group
+                        latest_ids=['>'] * len(streams),
+                        count=self.batch_size,
+                    )
+
+                if self.stream_fairness != StreamFairness.NONE:
+                    # Rotate the starting stream each time so no one stream is always first
+                    stream_messages = self._interleave_stream_messages(stream_messages, list(streams.keys()), rotation)
+                    rotation += 1
 
                 # Handle the messages we have received
                 for stream, message_id, fields in stream_messages:
-                    event_message = self._fields_to_message(fields, expected_events)
+                    event_message = self._fields_to_message(fields, expected_events, filters)
                     if not event_message:
-                        # noop message, or message an event we don't care about
+                        # noop message, or message an event we don't care about.
+                        # Acknowledge it so it doesn't linger in the pending list
+                        await redis.xack(stream, consumer_group, message_id)
                         continue
                     logger.debug(LBullets(
                         L("⬅ Received new event {} on stream {}", Bold(message_id), Bold(stream)),
@@ -498,7 +1743,8 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                 if not forever:
                     return
 
-    async def _reclaim_lost_messages(self, stream_names: List[str], consumer_group: str, expected_events: set):
+    async def _reclaim_lost_messages(self, stream_names: List[str], consumer_group: str, expected_events: set,
+                                     filters: Mapping=None):
         """Reclaim messages that other consumers in the group failed to acknowledge"""
         with await self.connection_manager() as redis:
             for stream in stream_names:
@@ -514,7 +1760,7 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
 
                     result = await redis.xclaim(stream, consumer_group, self.consumer_name, int(timeout), message_id)
                     for claimed_message_id, fields in result:
-                        event_message = self._fields_to_message(fields, expected_events)
+                        event_message = self._fields_to_message(fields, expected_events, filters)
                         if not event_message:
                             # noop message, or message an event we don't care about
                             continue
@@ -525,20 +1771,311 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
                         ))
                         yield event_message
 
-    async def _create_consumer_groups(self, streams, redis, consumer_group):
-        for stream, since in streams.items():
-            if not await redis.exists(stream):
-                # Add a noop to ensure the stream exists
-                await redis.xadd(stream, fields={'': ''})
+    async def _claim_from_dead_consumers(self, stream_names: List[str], consumer_group: str, expected_events: set,
+                                         filters: Mapping=None):
+        """Claim the pending messages of any consumers which are no longer sending heartbeats
 
-            try:
-                # Create the group (it may already exist)
-                await redis.xgroup_create(stream, consumer_group, latest_id=since)
-            except ReplyError as e:
-                if 'BUSYGROUP' not in str(e):
-                    raise
+        This allows us to recover from a consumer crashing within a few heartbeats, rather
+        than waiting for the acknowledgement timeout. Consumers which shut down cleanly
+        remove their heartbeat immediately.
+
+        Messages are only claimed once they have been idle for a heartbeat interval. As claiming
+        resets a message's idle time, this prevents multiple consumers claiming the same message.
+        """
+        with await self.connection_manager() as redis:
+            for stream in stream_names:
+                for owner, message_id, fields in await self._claim_dead_consumer_messages(redis, stream,
+                                                                                          consumer_group):
+                    event_message = self._fields_to_message(fields, expected_events, filters)
+                    if not event_message:
+                        # noop message, or message an event we don't care about
+                        await redis.xack(stream, consumer_group, message_id)
+                        continue
+                    logger.debug(LBullets(
+                        L("⬅ Claimed event {} on stream {} from dead consumer {}",
+                          Bold(message_id), Bold(stream), Bold(owner)),
+                        items=dict(**event_message.get_metadata(), kwargs=event_message.get_kwargs())
+                    ))
+                    yield event_message
+                    await redis.xack(stream, consumer_group, message_id)
+                    yield True
+
+    async def collect_garbage(self, idle_timeout: float, stream_names: Sequence[str]=None,
+                              prefixes: Sequence[str]=None, all_groups: bool=False) -> Dict[str, int]:
+        """Delete consumers and consumer groups which have been idle for longer than idle_timeout
+
+        Listening without specifying a consumer group creates a new group each time
+        the process starts, and these groups (and their consumers) otherwise linger
+        indefinitely. The prefix each group was created with is recorded in the
+        `consumer_groups_key` set (group names alone are ambiguous, as prefixes may
+        themselves contain hyphens). Only groups recorded against this transport's
+        consumer_group_prefix are considered, unless:
+
+          * `prefixes` is given, in which case groups recorded against any of the
+            given prefixes are considered. Groups which were never recorded are also
+            considered if their names start with one of the prefixes (plus a hyphen).
+          * `all_groups` is true, in which case every group is considered.
+
+        All streams are considered unless `stream_names` is specified.
+
+        A group is deleted, along with any messages still pending within it, when
+        all of its consumers are idle. Otherwise, only the idle consumers are deleted.
+        Their pending messages are first handed to the group's most recently active
+        consumer, and will be reclaimed in the usual manner. Deleted consumers are also
+        removed from their group's set of heartbeating consumers.
+
+        Consumers refresh their idle time every `heartbeat_interval` seconds,
+        so `idle_timeout` must be substantially larger than this.
+        """
+        timeout = idle_timeout * 1000
+        stats = dict(groups_deleted=0, consumers_deleted=0, messages_moved=0, messages_dropped=0)
+
+        explicit_prefixes = prefixes is not None
+        prefixes = list(prefixes) if explicit_prefixes else [self.consumer_group_prefix]
+
+        with await self.connection_manager() as redis:
+            # Keys are (stream, group name), values map each recorded set member to its prefix.
+            # Read these before listing the streams, so that every recorded group's stream is listed.
+            recorded: Dict[Tuple[str, str], Dict[str, str]] = {}
+            for member in await redis.smembers(self.consumer_groups_key):
+                member = decode(member, 'utf8')
+                prefix, stream, group_name = json.loads(member)
+                recorded.setdefault((stream, group_name), {})[member] = prefix
+
+            scan_all = stream_names is None
+            if scan_all:
+                stream_names = [decode(key, 'utf8') async for key in redis.iscan(match='*:stream')]
+
+            def should_collect(stream, group_name):
+                if all_groups:
+                    return True
+                if (stream, group_name) in recorded:
+                    return any(prefix in prefixes for prefix in recorded[(stream, group_name)].values())
+                return explicit_prefixes and any(group_name.startswith(f'{p}-') for p in prefixes)
+
+            existing_groups = set()
+            for stream in stream_names:
+                try:
+                    groups = await redis.xinfo_groups(stream)
+                except (ReplyError, ClientReplyError) as e:
+                    if 'no such key' not in str(e):
+                        raise
+                    continue
+
+                for group in groups:
+                    group_name = decode(group[b'name'], 'utf8')
+                    if not should_collect(stream, group_name):
+                        existing_groups.add((stream, group_name))
+                        continue
+
+                    consumers = await redis.xinfo_consumers(stream, group_name)
+                    consumers = sorted(consumers, key=lambda c: c[b'idle'])
+                    if not consumers or consumers[0][b'idle'] > timeout:
+                        logger.info(L('Deleting abandoned consumer group {} on stream {} ({} pending messages)',
+                                      Bold(group_name), Bold(stream), Bold(group[b'pending'])))
+                        await redis.xgroup_destroy(stream, group_name)
+                        if consumers:
+                            await redis.srem(self._get_heartbeating_consumers_key(group_name),
+                                             *[consumer[b'name'] for consumer in consumers])
+                        stats['groups_deleted'] += 1
+                        stats['messages_dropped'] += group[b'pending']
+                        continue
+
+                    existing_groups.add((stream, group_name))
+
+                    active_consumer = consumers[0][b'name']
+                    for consumer in consumers:
+                        if consumer[b'idle'] <= timeout:
+                            continue
+
+                        consumer_name = decode(consumer[b'name'], 'utf8')
+                        if consumer[b'pending']:
+                            moved = await self._move_pending_messages(
+                                redis, stream, group_name, consumer_name, active_consumer, consumer[b'pending']
+                            )
+                            stats['messages_moved'] += moved
+
+                        logger.info(L('Deleting abandoned consumer {} in group {} on stream {}',
+                                      Bold(consumer_name), Bold(group_name), Bold(stream)))
+                        await redis.xgroup_delconsumer(stream, group_name, consumer_name)
+                        await redis.srem(self._get_heartbeating_consumers_key(group_name), consumer_name)
+                        stats['consumers_deleted'] += 1
+
+            # Forget the groups which no longer exist. Redis deletes the set once it is empty.
+            checked_streams = set(stream_names)
+            stale_members = [
+                member
+                for (stream, group_name), members in recorded.items()
+                if (scan_all or stream in checked_streams) and (stream, group_name) not in existing_groups
+                for member in members
+            ]
+            if stale_members:
+                await redis.srem(self.consumer_groups_key, *stale_members)
+
+        return stats
+
+    def _get_consumer_groups_member(self, prefix: str, stream: str, consumer_group: str) -> str:
+        return json.dumps([prefix, stream, consumer_group])
+
+    async def _move_pending_messages(self, redis, stream, group_name, from_consumer, to_consumer, total) -> int:
+        """Move pending messages between consumers, keeping each message's idle time intact
 
-    def _fields_to_message(self, fields, expected_event_names) -> Optional[EventMessage]:
+        Keeping the idle time ensures the messages can still be reclaimed once they
+        exceed the acknowledgement timeout.
+        """
+        pending = await redis.xpending(stream, group_name, '-', '+', total, from_consumer)
+        await asyncio.gather(*[
+            redis.execute(
+                b'XCLAIM', stream, group_name, to_consumer, 0, message_id,
+                b'IDLE', ms_since_last_delivery, b'JUSTID'
+            )
+            for message_id, _, ms_since_last_delivery, _
+            in pending
+        ])
+        return len(pending)
+
+    async def _read_streams_fairly(self, redis, streams, consumer_group):
+        """Read each stream with its own count, so a busy stream cannot crowd out the others
+
+        Each stream is read without blocking (with all reads being pipelined).
+        If nothing is available we then block on all streams at once.
+        """
+        stream_names = list(streams.keys())
+        results = await asyncio.gather(*[
+            redis.xread_group(
+                group_name=consumer_group,
+                consumer_name=self.consumer_name,
+                streams=[stream],
+                latest_ids=['>'],
+                count=self._get_stream_count(stream, stream_names),
+                timeout=None,  # Don't block, return immediately
+            )
+            for stream
+            in stream_names
+        ])
+        stream_messages = [message for messages in results for message in messages]
+        if stream_messages:
+            return stream_messages
+
+        # Nothing available, so block until something arrives on any stream.
+        # Only take a single message per stream, as we will read fairly next time around.
+        return await redis.xread_group(
+            group_name=consumer_group,
+            consumer_name=self.consumer_name,
+            streams=stream_names,
+            latest_ids=['>'] * len(stream_names),
+            count=1,
+        )
+
+    def _get_stream_weight(self, stream_name: str) -> int:
+        # Strip off the ':stream' suffix to get the event name (or api_name.*)
+        weight = self.stream_weights.get(stream_name[:-7], 1)
+        return max(int(weight), 1)
+
+    def _get_stream_count(self, stream_name: str, stream_names: List[str]) -> int:
+        """Get the maximum number of messages to read from the given stream in one go"""
+        if self.stream_fairness != StreamFairness.BUDGET:
+            return self.batch_size
+        total_weight = sum(self._get_stream_weight(s) for s in stream_names)
+        return max(round(self.batch_size * self._get_stream_weight(stream_name) / total_weight), 1)
+
+    def _interleave_stream_messages(self, stream_messages, stream_names: List[str], rotation: int=0):
+        """Reorder messages so streams take turns, each taking as many messages as its weight
+
+        The starting stream is determined by rotation, which should be incremented
+        upon each call.
+        """
+        by_stream = OrderedDict((stream_name, []) for stream_name in stream_names)
+        for message in stream_messages:
+            stream = decode(message[0], 'utf8')
+            by_stream.setdefault(stream, []).append(message)
+
+        stream_names = list(by_stream.keys())
+        offset = rotation % len(stream_names)
+        stream_names = stream_names[offset:] + stream_names[:offset]
+
+        interleaved = []
+        while len(interleaved) < len(stream_messages):
+            for stream_name in stream_names:
+                weight = self._get_stream_weight(stream_name)
+                messages = by_stream[stream_name]
+                interleaved.extend(messages[:weight])
+                by_stream[stream_name] = messages[weight:]
+        return interleaved
+
+    async def _read_filtered_messages(self, redis, streams, consumer_group, expected_events, filters):
+        """Read new messages, having discarded those which do not match the filters within redis
+
+        Non-matching messages are skipped by a Lua script, and are therefore never sent
+        over the wire. Lua scripts cannot block, so if the script finds no new messages
+        we block on XREAD until something arrives and then return an empty list.
+        The caller should then call us again.
+        """
+        encode = self.serializer.encoder
+        encoded_filters = {
+            ':{}'.format(kwarg): [encode(v) for v in values]
+            for kwarg, values
+            in filters.items()
+        }
+        event_names = sorted(expected_events) if self.stream_use == StreamUse.PER_API else []
+        stream_names = list(streams.keys())
+
+        ready_counts, latest_ids, total_scanned = await self._eval_script(
+            redis,
+            FILTER_STREAMS_SCRIPT,
+            keys=stream_names,
+            args=[
+                consumer_group,
+                # Scanning is cheap relative to a round trip, so scan well beyond the batch size
+                self.batch_size * 10,
+                json.dumps(encoded_filters),
+                json.dumps(event_names),
+            ],
+        )
+
+        if not any(ready_counts):
+            if not total_scanned:
+                # Nothing new, so wait for something to arrive. We read exclusive
+                # of the group's last delivered ID, so any message returned here has not
+                # yet been delivered to this group.
+                await redis.xread(
+                    streams=stream_names,
+                    latest_ids=[decode(latest_id, 'utf8') for latest_id in latest_ids],
+                    count=1,
+                )
+            return []
+
+        # Now read the matching messages which are waiting at the head of each stream
+        results = await asyncio.gather(*[
+            redis.xread_group(
+                group_name=consumer_group,
+                consumer_name=self.consumer_name,
+                streams=[stream],
+                latest_ids=['>'],
+                count=min(ready_count, self.batch_size),
+                timeout=None,  # Don't block, return immediately
+            )
+            for stream, ready_count
+            in zip(stream_names, ready_counts)
+            if ready_count
+        ])
+        return [message for stream_messages in results for message in stream_messages]
+
+    async def _eval_script(self, redis, script: str, keys: list, args: list):
+        """Run the given Lua script, only sending the script body if redis does not have it cached"""
+        script_sha = hashlib.sha1(script.encode('utf8')).hexdigest()
+        try:
+            return await redis.evalsha(script_sha, keys=keys, args=args)
+        except (ReplyError, ClientReplyError) as e:
+            if 'NOSCRIPT' not in str(e):
+                raise
+            return await redis.eval(script, keys=keys, args=args)
+
+    def _can_filter_in_redis(self):
+        """Filters can only be applied in redis when each kwarg is stored in its own field"""
+        return isinstance(self.serializer, ByFieldMessageSerializer)
+
+    def _fields_to_message(self, fields, expected_event_names, filters: Mapping=None) -> Optional[EventMessage]:
         if tuple(fields.items()) == ((b'', b''),):
             return None
         message = self.deserializer(fields)
@@ -546,6 +2083,10 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
             # Only care about events we are listening for. If we have one stream
             # per API then we're probably going to receive some events we don't care about.
             return None
+        if filters and not message_matches_filters(message, filters):
+            # Normally filtered out within redis, but pending & reclaimed
+            # messages (and some serializers) require us to check here too
+            return None
         return message
 
     def _get_stream_names(self, listen_for):
@@ -569,6 +2110,201 @@ class RedisEventTransport(RedisTransportMixin, EventTransport):
         return stream_names
 
 
+class RedisPubSubEventTransport(RedisTransportMixin, EventTransport):
+    """ Redis event transport using pub/sub, for ephemeral broadcast events
+
+    Events are published to a channel per event, and every listener receives every
+    event (consumer groups are ignored). Events are not stored, so events fired while
+    nobody is listening are lost, and replay() is not supported. This makes the
+    transport suitable for events such as cache invalidations and live updates,
+    where low latency matters more than reliable delivery.
+
+    Each process subscribes to a single pattern per API, using the pool's
+    shared pub/sub connection. Listeners which fall more than `max_queue_size`
+    events behind will have events dropped, rather than slowing the other listeners.
+    Should the subscription be lost (for example, if the connection to redis fails),
+    it is re-established every `resubscribe_interval` seconds until successful.
+    Events published in the meantime are lost.
+    """
+    resubscribe_interval = 1
+
+    def __init__(self, redis_pool=None, *,
+                 url=None,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(EventMessage),
+                 connection_parameters: Mapping=frozendict(maxsize=100),
+                 max_queue_size: int=1000,
+                 ):
+        self.set_redis_pool(redis_pool, url, connection_parameters)
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.max_queue_size = max_queue_size
+
+        # Keys are channel patterns, values are the queues of the listeners using the pattern
+        self._listener_queues: Dict[str, List[asyncio.Queue]] = {}
+        # Keys are channel patterns, values are futures resolved once subscribed to the pattern
+        self._subscriptions: Dict[str, asyncio.Future] = {}
+        self._dispatch_tasks = {}
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    url: str='redis://127.0.0.1:6379/0',
+                    connection_parameters: Mapping=frozendict(maxsize=100),
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    max_queue_size: int=1000,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(EventMessage)
+
+        return cls(
+            redis_pool=None,
+            url=url,
+            connection_parameters=connection_parameters,
+            serializer=serializer,
+            deserializer=deserializer,
+            max_queue_size=max_queue_size,
+        )
+
+    async def send_event(self, event_message: EventMessage, options: dict):
+        """Publish an event"""
+        channel = self._get_channel_name(event_message.api_name, event_message.event_name)
+
+        with await self.connection_manager() as redis:
+            start_time = time.time()
+            receivers = await redis.publish(channel, self.serializer(event_message))
+
+        logger.debug(L(
+            "Published event message {} in Redis in {} to channel {} ({} subscribers)",
+            Bold(event_message), human_time(time.time() - start_time), Bold(channel), receivers
+        ))
+
+    async def fetch(self,
+                    listen_for,
+                    context: dict,
+                    loop: asyncio.AbstractEventLoop,
+                    consumer_group: str=None,
+                    filters: Mapping=None,
+                    **kwargs
+                    ) -> Generator[EventMessage, None, None]:
+        expected_events = set(listen_for)
+        filters = normalise_filters(filters)
+        patterns = {self._get_channel_name(api_name, '*') for api_name, _ in listen_for}
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+
+        logger.debug(LBullets(L('Consuming events using Redis pub/sub patterns'), items=sorted(patterns)))
+
+        try:
+            for pattern in patterns:
+                await self._add_listener_queue(pattern, queue)
+
+            while True:
+                message = await queue.get()
+                if (message.api_name, message.event_name) not in expected_events:
+                    continue
+                if filters and not message_matches_filters(message, filters):
+                    continue
+                try:
+                    yield message
+                    # Nothing to acknowledge
+                    yield True
+                except GeneratorExit:
+                    return
+        finally:
+            for pattern in patterns:
+                await self._remove_listener_queue(pattern, queue)
+
+    async def close(self):
+        await cancel(*self._subscriptions.values(), *self._dispatch_tasks.values())
+        self._subscriptions = {}
+        self._dispatch_tasks = {}
+        self._listener_queues = {}
+        await super().close()
+
+    async def _add_listener_queue(self, pattern: str, queue: asyncio.Queue):
+        """Add the queue to those receiving the pattern's messages, subscribing if need be
+
+        Concurrent listeners share a single subscription. Should subscribing fail,
+        the error is raised to each of them.
+        """
+        self._listener_queues.setdefault(pattern, []).append(queue)
+        subscription = self._subscriptions.get(pattern)
+        if subscription is None:
+            subscription = self._subscriptions[pattern] = asyncio.ensure_future(self._subscribe(pattern))
+
+        try:
+            await asyncio.shield(subscription)
+        except Exception:
+            if self._subscriptions.get(pattern) is subscription:
+                # Allow the next listener to try again
+                del self._subscriptions[pattern]
+            await self._remove_listener_queue(pattern, queue)
+            raise
+
+    async def _remove_listener_queue(self, pattern: str, queue: asyncio.Queue):
+        queues = self._listener_queues.get(pattern, [])
+        if queue in queues:
+            queues.remove(queue)
+        if queues or pattern not in self._listener_queues:
+            return
+
+        # The last listener for this pattern has stopped
+        del self._listener_queues[pattern]
+        subscription = self._subscriptions.pop(pattern, None)
+        subscribed = subscription and subscription.done() and not subscription.cancelled() \
+            and not subscription.exception()
+        await cancel(subscription, self._dispatch_tasks.pop(pattern, None))
+        if subscribed and self._redis_pool and not self._redis_pool.closed:
+            await self._redis_pool.punsubscribe(pattern)
+
+    async def _subscribe(self, pattern: str):
+        redis = await self._get_redis_pool()
+        channel, = await redis.psubscribe(pattern)
+        self._dispatch_tasks[pattern] = asyncio.ensure_future(handle_aio_exceptions(self._dispatch(pattern, channel)))
+
+    async def _dispatch(self, pattern: str, channel):
+        """Deliver messages received on the given pattern to each listener's queue
+
+        Resubscribes should the subscription be lost, for as long as anyone is listening.
+        """
+        while True:
+            while await channel.wait_message():
+                _, serialized = await channel.get()
+                event_message = self.deserializer(serialized)
+                for queue in self._listener_queues.get(pattern, []):
+                    try:
+                        queue.put_nowait(event_message)
+                    except asyncio.QueueFull:
+                        logger.warning(L(
+                            "Dropping event {} as a listener has fallen more than {} events behind",
+                            Bold(event_message), self.max_queue_size
+                        ))
+
+            logger.warning(L(
+                "Lost the redis subscription to {}. Events will be missed until resubscribed.", Bold(pattern)
+            ))
+            channel = await self._resubscribe(pattern)
+
+    async def _resubscribe(self, pattern: str):
+        while True:
+            await asyncio.sleep(self.resubscribe_interval)
+            try:
+                redis = await self._get_redis_pool()
+                channel, = await redis.psubscribe(pattern)
+            except (OSError, aioredis.RedisError, ClientRedisError) as e:
+                logger.warning(L(
+                    "Failed to resubscribe to {}, retrying in {} seconds: {}",
+                    Bold(pattern), self.resubscribe_interval, e
+                ))
+            else:
+                logger.info(L("Resubscribed to {}", Bold(pattern)))
+                return channel
+
+    def _get_channel_name(self, api_name: str, event_name: str) -> str:
+        return f'{api_name}.{event_name}:events'
+
+
 class RedisSchemaTransport(RedisTransportMixin, SchemaTransport):
 
     def __init__(self, *,
@@ -652,6 +2388,45 @@ def redis_stream_id_subtract_one(message_id):
     return '{:13d}-{}'.format(milliseconds, n)
 
 
+def redis_stream_id_add_one(message_id):
+    """Add one to the message ID
+
+    This is useful when we need to xrange() events exclusive of the given ID,
+    rather than inclusive of the given ID.
+    """
+    milliseconds, n = parse_stream_id(message_id)
+    return '{}-{}'.format(milliseconds, n + 1)
+
+
+def parse_stream_id(message_id) -> Tuple[int, int]:
+    """Parse a message ID into a (milliseconds, sequence number) tuple, useful for sorting"""
+    milliseconds, _, n = decode(message_id, 'utf8').partition('-')
+    return int(milliseconds), int(n or 0)
+
+
+def split_stream_id_range(start_id: str, end_id: str, parts: int) -> List[Tuple[str, str]]:
+    """Split the given (inclusive) stream ID range into roughly equal time-based sub-ranges
+
+    Each sub-range is also inclusive, and together the sub-ranges will cover the entire range.
+    """
+    start_ms, start_n = parse_stream_id(start_id)
+    end_ms, end_n = parse_stream_id(end_id)
+    if (start_ms, start_n) > (end_ms, end_n):
+        return []
+
+    parts = max(min(parts, end_ms - start_ms + 1), 1)
+    step = (end_ms - start_ms + 1) / parts
+    boundaries = [start_ms + round(step * i) for i in range(1, parts)]
+
+    ranges = []
+    range_start = start_id
+    for boundary in boundaries:
+        ranges.append((range_start, '{}-{}'.format(boundary - 1, MAX_STREAM_SEQUENCE)))
+        range_start = '{}-0'.format(boundary)
+    ranges.append((range_start, end_id))
+    return ranges
+
+
 def normalise_since_value(since):
     """Take a 'since' value and normalise it to be a redis message ID"""
     if not since:
@@ -663,5 +2438,43 @@ def normalise_since_value(since):
         return since
 
 
+def normalise_filters(filters: Optional[Mapping]) -> Optional[Dict[str, list]]:
+    """Take event filters and normalise them to be a mapping of kwarg names to lists of acceptable values
+
+    Filters may be specified as either a single value (equality) or as a
+    list, tuple, or set of values (membership). For example::
+
+        {'tenant': 'acme', 'region': ['eu', 'us']}
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, Mapping):
+        raise InvalidEventFilter(
+            f"Event filters must be a mapping of parameter names to values, but {filters!r} "
+            f"was provided. For example: {{'tenant': 'acme', 'region': ['eu', 'us']}}"
+        )
+
+    normalised = {}
+    for kwarg, values in filters.items():
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            values = [values]
+        for value in values:
+            if not isinstance(value, (str, int, float, bool)) and value is not None:
+                raise InvalidEventFilter(
+                    f"Event filter on parameter '{kwarg}' contains the value {value!r}. Only strings, "
+                    f"numbers, booleans and None may be used within event filters."
+                )
+        normalised[kwarg] = list(values)
+    return normalised
+
+
+def message_matches_filters(message: EventMessage, filters: Mapping) -> bool:
+    """Does the given message match the (normalised) filters"""
+    for kwarg, values in filters.items():
+        if kwarg not in message.kwargs or message.kwargs[kwarg] not in values:
+            return False
+    return True
+
+
 class InvalidRedisPool(LightbusException):
     pass
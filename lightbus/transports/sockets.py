@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import socket
+import struct
+import time
+from typing import Sequence, Dict, Callable, AsyncGenerator, List, Optional
+
+from lightbus.log import L, Bold, LBullets
+from lightbus.message import RpcMessage, ResultMessage
+from lightbus.transports.base import RpcTransport, ResultTransport
+from lightbus.utilities.human import human_time
+
+logger = logging.getLogger(__name__)
+
+# Each message is prefixed with its length, as a 4 byte big-endian integer
+FRAME_HEADER = struct.Struct('>I')
+
+
+def write_frame(writer: asyncio.StreamWriter, data: str):
+    data = data.encode('utf8')
+    writer.write(FRAME_HEADER.pack(len(data)) + data)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> str:
+    """Read a single message, raising IncompleteReadError once the connection is closed"""
+    length, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return (await reader.readexactly(length)).decode('utf8')
+
+
+class SocketTransportMixin(object):
+    """ Send and receive messages over stream sockets, without a broker
+
+    Connections are kept open and reused, and are therefore shared by
+    all concurrent calls to the same address. Each frame is written in full
+    before the next, and senders then wait in turn for the connection's buffer
+    to drain (asyncio permits only one waiter at a time). Subclasses implement
+    bind(), get_address() and open_connection() for a given socket family.
+    """
+
+    def init_sockets(self):
+        # Keys are addresses
+        self._servers: Dict[str, asyncio.AbstractServer] = {}
+        self._connections: Dict[str, asyncio.StreamWriter] = {}
+        self._connection_locks: Dict[str, asyncio.Lock] = {}
+        self._drain_locks: Dict[asyncio.StreamWriter, asyncio.Lock] = {}
+
+    def bind(self, address: str) -> socket.socket:
+        """Create a listening socket, after which senders may connect to it"""
+        raise NotImplementedError()
+
+    def get_address(self, sock: socket.socket) -> str:
+        """Get the address at which senders can reach the given listening socket"""
+        raise NotImplementedError()
+
+    async def open_connection(self, address: str):
+        raise NotImplementedError()
+
+    def unbind(self, address: str):
+        """Clean up after we stop listening on address"""
+        pass
+
+    async def listen(self, address: str, on_message: Callable[[str], None], sock: socket.socket=None):
+        """Listen on the given address, calling on_message() with each message received"""
+        sock = sock or self.bind(address)
+
+        async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                while True:
+                    message = await read_frame(reader)
+                    try:
+                        on_message(message)
+                    except Exception:
+                        logger.exception(L("Failed to handle message received on {}", Bold(address)))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # Sender went away
+                pass
+            finally:
+                writer.close()
+
+        self._servers[address] = await asyncio.start_server(handle_connection, sock=sock)
+        logger.debug(L("Listening on {}", Bold(address)))
+
+    async def stop_listening(self, address: str):
+        server = self._servers.pop(address, None)
+        if server:
+            server.close()
+            await server.wait_closed()
+        self.unbind(address)
+
+    async def send(self, address: str, message: str):
+        """Send a message to the given address
+
+        Raises ConnectionError (or OSError) if nothing is listening at the address.
+        """
+        writer = self._connections.get(address)
+        if writer is None or writer.transport.is_closing():
+            lock = self._connection_locks.setdefault(address, asyncio.Lock())
+            async with lock:
+                writer = self._connections.get(address)
+                if writer is None or writer.transport.is_closing():
+                    writer = await self._connect(address)
+
+        try:
+            write_frame(writer, message)
+            async with self._drain_locks.setdefault(writer, asyncio.Lock()):
+                await writer.drain()
+        except ConnectionError:
+            self._connections.pop(address, None)
+            raise
+
+    async def send_to_any(self, addresses: List[str], message: str, rotation: int=0) -> Optional[str]:
+        """Send a message to the first address which is reachable, starting from the rotation'th address
+
+        Returns the address the message was sent to, or None if none were reachable.
+        """
+        if addresses:
+            first = rotation % len(addresses)
+            addresses = addresses[first:] + addresses[:first]
+
+        for address in addresses:
+            try:
+                await self.send(address, message)
+            except OSError as e:
+                # ConnectionError, or the socket no longer exists
+                logger.debug(L("Could not send message to {}: {}", Bold(address), e))
+                continue
+            return address
+        return None
+
+    async def close_sockets(self):
+        for address in list(self._servers):
+            await self.stop_listening(address)
+        for writer in self._connections.values():
+            writer.close()
+        self._connections = {}
+        self._drain_locks = {}
+
+    async def _connect(self, address: str) -> asyncio.StreamWriter:
+        reader, writer = await self.open_connection(address)
+
+        def on_lost(future):
+            # The listener will never write to us, so EOF means it has gone away
+            writer.close()
+            if self._connections.get(address) is writer:
+                del self._connections[address]
+            self._drain_locks.pop(writer, None)
+
+        asyncio.ensure_future(reader.read()).add_done_callback(on_lost)
+        self._connections[address] = writer
+        return writer
+
+
+class SocketRpcTransport(SocketTransportMixin, RpcTransport):
+    """ Base for RPC transports where workers receive calls directly from callers """
+    batch_size = 10
+    _rpc_queue = None
+
+    async def receive_rpcs(self) -> Sequence[RpcMessage]:
+        """Get the next batch of calls received by our listening sockets"""
+        rpc_messages = [await self._get_rpc_queue().get()]
+        while len(rpc_messages) < self.batch_size and not self._rpc_queue.empty():
+            rpc_messages.append(self._rpc_queue.get_nowait())
+
+        for rpc_message in rpc_messages:
+            logger.debug(LBullets(
+                L("⬅ Received RPC message {}", Bold(rpc_message)),
+                items=dict(**rpc_message.get_metadata(), kwargs=rpc_message.get_kwargs())
+            ))
+        return rpc_messages
+
+    def on_rpc_message(self, serialized: str):
+        self._get_rpc_queue().put_nowait(self.deserializer(serialized))
+
+    def _get_rpc_queue(self) -> asyncio.Queue:
+        if self._rpc_queue is None:
+            self._rpc_queue = asyncio.Queue()
+        return self._rpc_queue
+
+
+class SocketResultTransport(SocketTransportMixin, ResultTransport):
+    """ Base for result transports where workers send results directly to callers
+
+    Each caller process listens on a single socket for results. Subclasses
+    set `scheme` and `listen_address`.
+
+    The values of a streamed result are read from the socket as soon as they arrive,
+    so a caller which is slower than the worker will buffer the values in memory (without limit).
+    """
+    scheme: str = None
+    listen_address: str = None
+
+    def init_results(self):
+        self.init_sockets()
+        self.address = None
+        # Keys are RPC IDs, values are queues of result messages received for the call
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._listening = None
+
+    def get_return_path(self, rpc_message: RpcMessage) -> str:
+        # Create our socket right away, so it exists by the time the result is sent
+        self._start_listening()
+        return '{}://{}'.format(self.scheme, self.address)
+
+    async def send_result(self, rpc_message: RpcMessage, result_message: ResultMessage, return_path: str):
+        prefix = '{}://'.format(self.scheme)
+        assert return_path.startswith(prefix)
+        address = return_path[len(prefix):]
+
+        start_time = time.time()
+        await self.send(address, self.serializer(result_message))
+
+        logger.debug(L(
+            "➡ Sent result {} in {} to {}",
+            Bold(result_message), human_time(time.time() - start_time), Bold(return_path)
+        ))
+
+    async def receive_result(self, rpc_message: RpcMessage, return_path: str, options: dict) -> ResultMessage:
+        logger.debug(L("Awaiting result on {} for RPC message: {}", Bold(return_path), Bold(rpc_message)))
+        queue = self._queues.setdefault(rpc_message.rpc_id, asyncio.Queue())
+        try:
+            start_time = time.time()
+            await asyncio.shield(self._start_listening())
+            result_message = await queue.get()
+        finally:
+            self._queues.pop(rpc_message.rpc_id, None)
+
+        logger.debug(L(
+            "⬅ Received result in {} for RPC message {}: {}",
+            human_time(time.time() - start_time), rpc_message, Bold(result_message.result)
+        ))
+        return result_message
+
+    async def receive_result_stream(self, rpc_message: RpcMessage, return_path: str,
+                                    options: dict) -> AsyncGenerator[ResultMessage, None]:
+        queue = self._queues.setdefault(rpc_message.rpc_id, asyncio.Queue())
+        try:
+            await asyncio.shield(self._start_listening())
+            while True:
+                result_message = await queue.get()
+                yield result_message
+                if not result_message.more:
+                    return
+        finally:
+            self._queues.pop(rpc_message.rpc_id, None)
+
+    async def close(self):
+        self._listening = None
+        self.address = None
+        await self.close_sockets()
+
+    def _start_listening(self) -> asyncio.Future:
+        if self._listening is None:
+            sock = self.bind(self.listen_address)
+            self.address = self.get_address(sock)
+            self._listening = asyncio.ensure_future(self.listen(self.address, self._on_message, sock=sock))
+        return self._listening
+
+    def _on_message(self, serialized: str):
+        result_message = self.deserializer(serialized)
+        queue = self._queues.get(result_message.rpc_id)
+        if queue:
+            queue.put_nowait(result_message)
+        else:
+            logger.debug(L("Discarding result for RPC {} as no caller is waiting for it",
+                           Bold(result_message.rpc_id)))
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import socket
+import time
+from typing import Sequence, Dict, List, Tuple, Mapping, Optional
+
+from aioredis.util import decode
+
+from lightbus.api import Api
+from lightbus.log import L, Bold
+from lightbus.message import RpcMessage, ResultMessage
+from lightbus.serializers.blob import BlobMessageSerializer, BlobMessageDeserializer
+from lightbus.transports.redis import RedisRpcTransport
+from lightbus.transports.sockets import SocketTransportMixin, SocketRpcTransport, SocketResultTransport
+from lightbus.utilities.async import cancel, handle_aio_exceptions
+from lightbus.utilities.frozendict import frozendict
+from lightbus.utilities.importing import import_from_string
+
+if False:
+    from lightbus.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TcpSocketTransportMixin(SocketTransportMixin):
+    """ Send and receive messages over TCP
+
+    Addresses are of the form `host:port`. Listening on port 0 will
+    listen on a random free port.
+    """
+    host: str = '127.0.0.1'
+    advertise_host: str = None
+
+    def bind(self, address: str) -> socket.socket:
+        host, port = address.rsplit(':', 1)
+        sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, int(port)))
+        sock.listen(100)
+        sock.setblocking(False)
+        return sock
+
+    def get_address(self, sock: socket.socket) -> str:
+        host, port = sock.getsockname()[:2]
+        return '{}:{}'.format(self.advertise_host or host, port)
+
+    async def open_connection(self, address: str):
+        host, port = address.rsplit(':', 1)
+        return await asyncio.open_connection(host, int(port))
+
+
+class TcpRpcTransport(TcpSocketTransportMixin, SocketRpcTransport):
+    """ RPC transport sending calls directly to workers over TCP
+
+    Workers listen on a TCP port, and advertise their address by periodically
+    adding it to the `{api_name}:rpc_peers` sorted set in redis (scored by the time at
+    which the advertisement expires). Callers read the addresses of the live workers
+    (caching them for `discovery_interval` seconds), keep a single connection open to
+    each worker, and spread calls between the workers in turn.
+
+    Calls are sent via the `fallback_transport` when no workers can be reached,
+    and workers therefore also consume calls from the `fallback_transport`.
+    Calls sent directly to a worker are lost (and will therefore time out) should
+    the worker die before processing them.
+    """
+
+    def __init__(self, *,
+                 fallback_transport: RedisRpcTransport,
+                 host: str='127.0.0.1',
+                 port: int=0,
+                 advertise_host: Optional[str]=None,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(RpcMessage),
+                 batch_size=10,
+                 discovery_interval: float=1,
+                 advertise_interval: float=5,
+                 missed_advertisements: int=3,
+                 ):
+        self.init_sockets()
+        self.fallback_transport = fallback_transport
+        self.host = host
+        self.port = port
+        self.advertise_host = advertise_host
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.batch_size = batch_size
+        self.discovery_interval = discovery_interval
+        self.advertise_interval = advertise_interval
+        self.missed_advertisements = missed_advertisements
+
+        self.address = None
+        self._rotation = 0
+        # Keys are API names, values are (worker addresses, time read)
+        self._peers: Dict[str, Tuple[List[str], float]] = {}
+        self._api_names = []
+        self._advertise_task = None
+        self._fallback_task = None
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    host: str='127.0.0.1',
+                    port: int=0,
+                    advertise_host: Optional[str]=None,
+                    url: str='redis://127.0.0.1:6379/0',
+                    connection_parameters: Mapping=frozendict(maxsize=100),
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    batch_size: int=10,
+                    rpc_timeout=5,
+                    discovery_interval: float=1,
+                    advertise_interval: float=5,
+                    missed_advertisements: int=3,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(RpcMessage)
+        fallback_transport = RedisRpcTransport.from_config(
+            config,
+            url=url,
+            connection_parameters=connection_parameters,
+            batch_size=batch_size,
+            rpc_timeout=rpc_timeout,
+        )
+
+        return cls(
+            fallback_transport=fallback_transport,
+            host=host,
+            port=port,
+            advertise_host=advertise_host,
+            serializer=serializer,
+            deserializer=deserializer,
+            batch_size=batch_size,
+            discovery_interval=discovery_interval,
+            advertise_interval=advertise_interval,
+            missed_advertisements=missed_advertisements,
+        )
+
+    async def call_rpc(self, rpc_message: RpcMessage, options: dict):
+        addresses = await self._get_peers(rpc_message.api_name)
+        self._rotation += 1
+        address = await self.send_to_any(addresses, self.serializer(rpc_message), self._rotation)
+        if address:
+            logger.debug(L("Sent message {} directly to worker at {}", Bold(rpc_message), Bold(address)))
+            if address != addresses[self._rotation % len(addresses)]:
+                # Some workers could not be reached, so look them up again next time
+                self._peers.pop(rpc_message.api_name, None)
+            return
+
+        if addresses:
+            self._peers.pop(rpc_message.api_name, None)
+        logger.debug(L(
+            "No workers for API {} could be reached directly, so sending message {} via the fallback transport",
+            Bold(rpc_message.api_name), Bold(rpc_message)
+        ))
+        await self.fallback_transport.call_rpc(rpc_message, options)
+
+    @property
+    def shared_cache(self):
+        return self.fallback_transport.shared_cache
+
+    async def get_cached_result(self, api_name: str, procedure_name: str, key: str) -> Optional[str]:
+        return await self.fallback_transport.get_cached_result(api_name, procedure_name, key)
+
+    async def set_cached_result(self, api_name: str, procedure_name: str, key: str, value: str, ttl: float):
+        await self.fallback_transport.set_cached_result(api_name, procedure_name, key, value, ttl)
+
+    async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
+        if self.address is None:
+            sock = self.bind('{}:{}'.format(self.host, self.port))
+            self.address = self.get_address(sock)
+            await self.listen(self.address, self.on_rpc_message, sock=sock)
+
+        api_names = [api.meta.name for api in apis]
+        if api_names != self._api_names:
+            await self._start_consuming(apis)
+
+        return await self.receive_rpcs()
+
+    async def close(self):
+        await cancel(self._advertise_task, self._fallback_task)
+        if self._advertise_task:
+            self._advertise_task = None
+            await self._unadvertise()
+        await self.close_sockets()
+        self.address = None
+        await self.fallback_transport.close()
+
+    async def _start_consuming(self, apis: Sequence[Api]):
+        await cancel(self._advertise_task, self._fallback_task)
+        self._api_names = [api.meta.name for api in apis]
+
+        async def advertise_loop():
+            while True:
+                await self._advertise()
+                await asyncio.sleep(self.advertise_interval)
+
+        async def fallback_loop():
+            while True:
+                for rpc_message in await self.fallback_transport.consume_rpcs(apis):
+                    self._get_rpc_queue().put_nowait(rpc_message)
+
+        # Advertise right away, so callers can find us as soon as possible
+        await self._advertise()
+        self._advertise_task = asyncio.ensure_future(handle_aio_exceptions(advertise_loop()))
+        self._fallback_task = asyncio.ensure_future(handle_aio_exceptions(fallback_loop()))
+
+    async def _advertise(self):
+        now = time.time()
+        expires_at = now + self.advertise_interval * self.missed_advertisements
+        with await self.fallback_transport.connection_manager() as redis:
+            p = redis.pipeline()
+            for api_name in self._api_names:
+                p.zadd(self._get_peers_key(api_name), expires_at, self.address)
+                p.zremrangebyscore(self._get_peers_key(api_name), max=now)
+            await p.execute()
+
+    async def _unadvertise(self):
+        with await self.fallback_transport.connection_manager() as redis:
+            p = redis.pipeline()
+            for api_name in self._api_names:
+                p.zrem(self._get_peers_key(api_name), self.address)
+            await p.execute()
+
+    async def _get_peers(self, api_name: str) -> List[str]:
+        """Get the addresses of the workers for the given API, which may be up to discovery_interval seconds old"""
+        addresses, read_at = self._peers.get(api_name, ([], 0))
+        if time.time() - read_at > self.discovery_interval:
+            with await self.fallback_transport.connection_manager() as redis:
+                addresses = await redis.zrangebyscore(self._get_peers_key(api_name), min=time.time())
+            addresses = sorted(decode(address, 'utf8') for address in addresses)
+            self._peers[api_name] = (addresses, time.time())
+        return addresses
+
+    def _get_peers_key(self, api_name: str) -> str:
+        return f'{api_name}:rpc_peers'
+
+
+class TcpResultTransport(TcpSocketTransportMixin, SocketResultTransport):
+    """ Result transport sending results directly back to the caller over TCP
+
+    Each caller process listens on a single TCP port for results.
+    """
+    scheme = 'tcp'
+
+    def __init__(self, *,
+                 host: str='127.0.0.1',
+                 port: int=0,
+                 advertise_host: Optional[str]=None,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(ResultMessage),
+                 ):
+        self.init_results()
+        self.host = host
+        self.port = port
+        self.advertise_host = advertise_host
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.listen_address = '{}:{}'.format(host, port)
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    host: str='127.0.0.1',
+                    port: int=0,
+                    advertise_host: Optional[str]=None,
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(ResultMessage)
+
+        return cls(
+            host=host,
+            port=port,
+            advertise_host=advertise_host,
+            serializer=serializer,
+            deserializer=deserializer,
+        )
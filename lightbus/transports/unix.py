@@ -0,0 +1,264 @@
+import asyncio
+import glob
+import logging
+import os
+import socket
+from typing import Sequence, Dict, Generator, Mapping, List
+
+from lightbus.api import Api
+from lightbus.exceptions import NoConsumersFound
+from lightbus.log import L, Bold
+from lightbus.message import RpcMessage, ResultMessage, EventMessage
+from lightbus.serializers.blob import BlobMessageSerializer, BlobMessageDeserializer
+from lightbus.transports.base import EventTransport
+from lightbus.transports.redis import normalise_filters, message_matches_filters
+from lightbus.transports.sockets import SocketTransportMixin, SocketRpcTransport, SocketResultTransport
+from lightbus.utilities.config import random_name
+from lightbus.utilities.importing import import_from_string
+
+if False:
+    from lightbus.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_DIRECTORY = '/tmp/lightbus'
+
+
+class UnixSocketTransportMixin(SocketTransportMixin):
+    """ Send and receive messages over unix domain sockets
+
+    Processes which receive messages listen on sockets within `socket_directory`.
+    Sockets are named such that senders can find them by name alone, thereby
+    requiring no other means of discovery.
+    """
+    socket_directory: str = DEFAULT_SOCKET_DIRECTORY
+
+    def set_socket_directory(self, socket_directory: str):
+        self.socket_directory = socket_directory
+        self.init_sockets()
+
+    def get_socket_path(self, name: str) -> str:
+        return os.path.join(self.socket_directory, name)
+
+    def find_sockets(self, prefix: str) -> List[str]:
+        """Get the paths of all sockets whose names start with prefix, in a consistent order"""
+        return sorted(glob.glob(self.get_socket_path(glob.escape(prefix) + '*.sock')))
+
+    def bind(self, address: str) -> socket.socket:
+        os.makedirs(self.socket_directory, exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(address)
+        sock.listen(100)
+        sock.setblocking(False)
+        return sock
+
+    def get_address(self, sock: socket.socket) -> str:
+        return sock.getsockname()
+
+    async def open_connection(self, address: str):
+        try:
+            return await asyncio.open_unix_connection(address)
+        except ConnectionRefusedError:
+            # Left behind by a process which did not shut down cleanly
+            logger.debug(L("Removing unix socket {} as nothing is listening on it", Bold(address)))
+            self.unbind(address)
+            raise
+
+    def unbind(self, address: str):
+        try:
+            os.unlink(address)
+        except FileNotFoundError:
+            pass
+
+
+class UnixRpcTransport(UnixSocketTransportMixin, SocketRpcTransport):
+    """ RPC transport sending calls directly to workers on the same host
+
+    Each worker listens on a unix socket per API (named `{api_name}:rpc:{id}.sock`),
+    and calls are spread between the available workers in turn. As there is no
+    broker, calls will be lost (and will therefore time out) should a worker die
+    before processing them, and NoConsumersFound is raised if no workers are running.
+    """
+
+    def __init__(self, *,
+                 socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(RpcMessage),
+                 batch_size=10,
+                 ):
+        self.set_socket_directory(socket_directory)
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.batch_size = batch_size
+        self._rotation = 0
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    batch_size: int=10,
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(RpcMessage)
+
+        return cls(
+            socket_directory=socket_directory,
+            serializer=serializer,
+            deserializer=deserializer,
+            batch_size=batch_size,
+        )
+
+    async def call_rpc(self, rpc_message: RpcMessage, options: dict):
+        self._rotation += 1
+        path = await self.send_to_any(
+            self.find_sockets(f'{rpc_message.api_name}:rpc:'), self.serializer(rpc_message), self._rotation
+        )
+        if not path:
+            raise NoConsumersFound(
+                f"Cannot call RPC {rpc_message.canonical_name} as no workers are listening "
+                f"for it within {self.socket_directory}. Are any workers running for API "
+                f"{rpc_message.api_name} on this host?"
+            )
+        logger.debug(L("Sent message {} to worker via unix socket {}", Bold(rpc_message), Bold(path)))
+
+    async def consume_rpcs(self, apis: Sequence[Api]) -> Sequence[RpcMessage]:
+        for api in apis:
+            prefix = self.get_socket_path(f'{api.meta.name}:rpc:')
+            if not any(path.startswith(prefix) for path in self._servers):
+                await self.listen(prefix + f'{random_name(length=16)}.sock', self.on_rpc_message)
+
+        return await self.receive_rpcs()
+
+    async def close(self):
+        await self.close_sockets()
+
+
+class UnixResultTransport(UnixSocketTransportMixin, SocketResultTransport):
+    """ Result transport sending results directly back to the caller on the same host
+
+    Each caller process listens on a single unix socket for results.
+    """
+    scheme = 'unix'
+
+    def __init__(self, *,
+                 socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(ResultMessage),
+                 ):
+        self.set_socket_directory(socket_directory)
+        self.init_results()
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self.listen_address = self.get_socket_path(f'results:{random_name(length=16)}.sock')
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(ResultMessage)
+
+        return cls(
+            socket_directory=socket_directory,
+            serializer=serializer,
+            deserializer=deserializer,
+        )
+
+
+class UnixEventTransport(UnixSocketTransportMixin, EventTransport):
+    """ Event transport sending events directly to listeners on the same host
+
+    Each listener listens on a unix socket per API (named
+    `{api_name}:events:{consumer_group}:{id}.sock`), and each event is sent to one
+    listener within each consumer group. Events are not stored, so events fired while
+    nobody is listening are lost, and replay() is not supported.
+    """
+
+    def __init__(self, *,
+                 socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                 serializer=BlobMessageSerializer(),
+                 deserializer=BlobMessageDeserializer(EventMessage),
+                 ):
+        self.set_socket_directory(socket_directory)
+        self.serializer = serializer
+        self.deserializer = deserializer
+        self._rotation = 0
+
+    @classmethod
+    def from_config(cls,
+                    config: 'Config',
+                    socket_directory: str=DEFAULT_SOCKET_DIRECTORY,
+                    serializer: str='lightbus.serializers.BlobMessageSerializer',
+                    deserializer: str='lightbus.serializers.BlobMessageDeserializer',
+                    ):
+        serializer = import_from_string(serializer)()
+        deserializer = import_from_string(deserializer)(EventMessage)
+
+        return cls(
+            socket_directory=socket_directory,
+            serializer=serializer,
+            deserializer=deserializer,
+        )
+
+    async def send_event(self, event_message: EventMessage, options: dict):
+        """Publish an event"""
+        prefix = self.get_socket_path(f'{event_message.api_name}:events:')
+        # Keys are consumer groups, values are the sockets of the group's listeners
+        groups: Dict[str, List[str]] = {}
+        for path in self.find_sockets(f'{event_message.api_name}:events:'):
+            consumer_group, _ = path[len(prefix):].rsplit(':', 1)
+            groups.setdefault(consumer_group, []).append(path)
+
+        serialized = self.serializer(event_message)
+        self._rotation += 1
+        for paths in groups.values():
+            await self.send_to_any(paths, serialized, self._rotation)
+
+        logger.debug(L(
+            "Sent event message {} via unix sockets to {} consumer groups",
+            Bold(event_message), len(groups)
+        ))
+
+    async def fetch(self,
+                    listen_for,
+                    context: dict,
+                    loop: asyncio.AbstractEventLoop,
+                    consumer_group: str=None,
+                    filters: Mapping=None,
+                    **kwargs
+                    ) -> Generator[EventMessage, None, None]:
+        expected_events = set(listen_for)
+        filters = normalise_filters(filters)
+        queue = asyncio.Queue()
+        paths = [
+            self.get_socket_path(f'{api_name}:events:{consumer_group}:{random_name(length=16)}.sock')
+            for api_name in sorted({api_name for api_name, _ in listen_for})
+        ]
+
+        try:
+            for path in paths:
+                await self.listen(path, queue.put_nowait)
+
+            while True:
+                event_message = self.deserializer(await queue.get())
+                if (event_message.api_name, event_message.event_name) not in expected_events:
+                    continue
+                if filters and not message_matches_filters(event_message, filters):
+                    continue
+                try:
+                    yield event_message
+                    # Nothing to acknowledge
+                    yield True
+                except GeneratorExit:
+                    return
+        finally:
+            for path in paths:
+                await self.stop_listening(path)
+
+    async def close(self):
+        await self.close_sockets()
@@ -1,7 +1,9 @@
 import asyncio
+import heapq
 import traceback
 import logging
-from typing import Coroutine
+import weakref
+from typing import Coroutine, AsyncIterator, Callable
 
 import aioredis
 
@@ -74,3 +76,77 @@ async def cancel(*tasks):
     # Now raise the first exception we saw, if any
     if ex:
         raise ex
+
+
+async def chain_async(*iterators: AsyncIterator):
+    """Yield all the values from each async iterator in turn"""
+    for iterator in iterators:
+        async for value in iterator:
+            yield value
+
+
+async def merge_async(*iterators: AsyncIterator, key: Callable=lambda v: v):
+    """Merge the given sorted async iterators into a single sorted async iterator
+
+    The asynchronous equivalent of heapq.merge()
+    """
+    heap = []
+
+    async def push_next(index, iterator):
+        try:
+            value = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        heapq.heappush(heap, (key(value), index, value, iterator))
+
+    for index, iterator in enumerate(iterators):
+        await push_next(index, iterator)
+
+    while heap:
+        _, index, value, iterator = heapq.heappop(heap)
+        yield value
+        await push_next(index, iterator)
+
+
+class TaskContextVar(object):
+    """A minimal stand-in for `contextvars.ContextVar`, for Python versions which lack it
+
+    Values are stored per asyncio task. Unlike `ContextVar`, values are therefore not
+    inherited by any tasks the current task creates.
+    """
+
+    def __init__(self, name: str, *, default=None):
+        self.name = name
+        self.default = default
+        self._values = weakref.WeakKeyDictionary()
+        self._value_outside_task = default
+
+    def get(self):
+        task = asyncio.Task.current_task()
+        if task is None:
+            return self._value_outside_task
+        return self._values.get(task, self.default)
+
+    def set(self, value):
+        """Set the value, returning a token which can be passed to `reset()`"""
+        task = asyncio.Task.current_task()
+        token = (task, self.get())
+        if task is None:
+            self._value_outside_task = value
+        else:
+            self._values[task] = value
+        return token
+
+    def reset(self, token):
+        """Restore the value which was present before the corresponding `set()`"""
+        task, value = token
+        if task is None:
+            self._value_outside_task = value
+        else:
+            self._values[task] = value
+
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: no cover (Python 3.6)
+    ContextVar = TaskContextVar
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Tuple
+
+
+class TtlCache(object):
+    """A size-limited in-memory cache whose entries expire after `ttl` seconds
+
+    Once the cache contains `maxsize` entries, the least recently used entry
+    is evicted to make room for a new one.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Keys are cache keys, values are (expiry time, value), least recently used first
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        try:
+            self._get(key)
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def get(self, key: Hashable) -> Any:
+        """Get the value for the given key, raising a KeyError if it is not present"""
+        try:
+            value = self._get(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate over the unexpired entries, without affecting their recency"""
+        for key in list(self._entries):
+            try:
+                yield key, self._get(key)
+            except KeyError:
+                pass
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _get(self, key: Hashable) -> Any:
+        expires_at, value = self._entries[key]
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            raise KeyError(key)
+        return value
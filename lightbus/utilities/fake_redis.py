@@ -0,0 +1,1302 @@
+""" A stand-in redis server, for testing lightbus without redis
+
+Implements (in memory, within an asyncio event loop) the subset of redis used by the
+redis transports: strings, expiry, lists (including BLPOP), sets, sorted sets, pub/sub,
+and streams with consumer groups. Lua scripting is not supported, other than the
+scripts run by the redis transports, which are implemented natively in Python.
+
+Latency and failures can be injected, allowing end-to-end benchmarks and chaos tests
+to be run without redis or a network::
+
+    server = FakeRedisServer(latency=0.001)
+    await server.start(port=6379)
+
+    # Fail the next two BLPOP commands
+    server.inject_error('BLPOP', 'ERR injected failure', times=2)
+    # Sever every client connection
+    server.disconnect_clients()
+
+The server can also be run from the command line::
+
+    python -m lightbus.utilities.fake_redis --port 6379
+
+"""
+import argparse
+import asyncio
+import bisect
+import fnmatch
+import hashlib
+import inspect
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Tuple, Optional, Callable, Awaitable, Set
+
+from lightbus.log import L, Bold
+from lightbus.transports.redis import FILTER_STREAMS_SCRIPT, TRIM_TO_ID_SCRIPT
+from lightbus.utilities.resp import RespParser, RespError, SimpleString, NULL_ARRAY, INCOMPLETE, encode
+
+logger = logging.getLogger(__name__)
+
+OK = SimpleString('OK')
+MAX_ID = (2 ** 64 - 1, 2 ** 64 - 1)
+StreamId = Tuple[int, int]
+Hook = Callable[[str, List[bytes]], Awaitable[None]]
+
+# Commands which may block, prior to which any replies already generated are sent
+BLOCKING_COMMANDS = {'BLPOP', 'BRPOP', 'XREAD', 'XREADGROUP'}
+PUBSUB_COMMANDS = {'SUBSCRIBE', 'PSUBSCRIBE', 'UNSUBSCRIBE', 'PUNSUBSCRIBE', 'PING', 'QUIT'}
+
+
+class WrongType(RespError):
+
+    def __init__(self):
+        super().__init__('WRONGTYPE Operation against a key holding the wrong kind of value')
+
+
+class _MultipleReplies(list):
+    """Several replies to a single command (as with SUBSCRIBE)"""
+    pass
+
+
+class _SortedSet(dict):
+    """Keys are members, values are scores"""
+    pass
+
+
+class _ConsumerGroup(object):
+
+    def __init__(self, last_delivered_id: StreamId):
+        self.last_delivered_id = last_delivered_id
+        # Keys are message IDs, values are [consumer name, delivery time (ms), delivery count]
+        self.pending: Dict[StreamId, list] = OrderedDict()
+        # Keys are consumer names, values are the time (ms) at which the consumer was last seen
+        self.consumers: Dict[bytes, int] = OrderedDict()
+
+    def touch_consumer(self, name: bytes):
+        self.consumers[name] = _now_ms()
+
+
+class _Stream(object):
+
+    def __init__(self):
+        self.ids: List[StreamId] = []
+        self.fields: List[List[bytes]] = []
+        self.last_id: StreamId = (0, 0)
+        # Keys are group names
+        self.groups: Dict[bytes, _ConsumerGroup] = OrderedDict()
+
+    def add(self, message_id: StreamId, fields: List[bytes]):
+        self.ids.append(message_id)
+        self.fields.append(fields)
+        self.last_id = message_id
+
+    def range(self, start: StreamId, end: StreamId, count: int=None) -> List[list]:
+        """Get the entries between the given IDs (inclusive)"""
+        first = bisect.bisect_left(self.ids, start)
+        last = bisect.bisect_right(self.ids, end)
+        if count is not None:
+            last = min(last, first + count)
+        return [[_format_id(i), f] for i, f in zip(self.ids[first:last], self.fields[first:last])]
+
+    def get(self, message_id: StreamId) -> Optional[List[bytes]]:
+        index = bisect.bisect_left(self.ids, message_id)
+        if index < len(self.ids) and self.ids[index] == message_id:
+            return self.fields[index]
+        return None
+
+    def trim(self, max_length: int) -> int:
+        excess = max(len(self.ids) - max_length, 0)
+        del self.ids[:excess]
+        del self.fields[:excess]
+        return excess
+
+
+class _Database(object):
+
+    def __init__(self):
+        self.data: Dict[bytes, object] = {}
+        # Keys are keys, values are expiry times (in seconds since the epoch)
+        self.expires: Dict[bytes, float] = {}
+
+    def get(self, key: bytes, type_=None):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.delete(key)
+        value = self.data.get(key)
+        if value is not None and type_ is not None and not isinstance(value, type_):
+            raise WrongType()
+        return value
+
+    def set(self, key: bytes, value):
+        self.data[key] = value
+        self.expires.pop(key, None)
+
+    def delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def keys(self) -> List[bytes]:
+        now = time.time()
+        for key in [k for k, expires_at in self.expires.items() if expires_at <= now]:
+            self.delete(key)
+        return list(self.data)
+
+
+class _Connection(object):
+    _ids = itertools.count(1)
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.id = next(self._ids)
+        self.db = 0
+        # Set whilst the connection is blocked, and resolved to False by CLIENT UNBLOCK
+        self.waiter: asyncio.Future = None
+        self.channels: Set[bytes] = set()
+        self.patterns: Set[bytes] = set()
+
+    @property
+    def subscribed(self) -> bool:
+        return bool(self.channels or self.patterns)
+
+
+class FakeRedisServer(object):
+    """ An asyncio server speaking the redis protocol, backed by in-memory data
+
+    Each command is executed atomically, as with redis. Set `latency` to delay
+    the handling of each batch of commands received from a client by the given
+    number of seconds, thereby simulating a network round trip.
+    """
+
+    def __init__(self, *, latency: float=0):
+        self.latency = latency
+        self.databases: Dict[int, _Database] = {}
+        self._server: asyncio.AbstractServer = None
+        self._connections: Set[_Connection] = set()
+        self._hooks: List[Hook] = []
+        # Keys are channels/patterns, values are subscribed connections
+        self._channels: Dict[bytes, Set[_Connection]] = {}
+        self._patterns: Dict[bytes, Set[_Connection]] = {}
+        # Keys are (database, key), values are futures to be resolved when the key is written to
+        self._waiters: Dict[Tuple[int, bytes], List[asyncio.Future]] = {}
+        # Keys are command names, values are handler methods
+        self._handlers: Dict[str, Callable] = {}
+        self._signatures: Dict[str, inspect.Signature] = {}
+        for name in dir(self):
+            if name.startswith('cmd_'):
+                handler = getattr(self, name)
+                self._handlers[name[4:].upper()] = handler
+                self._signatures[name[4:].upper()] = inspect.signature(handler)
+        # Keys are script SHA1 digests, values are methods implementing the scripts
+        self._scripts: Dict[bytes, Callable] = {
+            _script_sha(FILTER_STREAMS_SCRIPT): self._script_filter_streams,
+            _script_sha(TRIM_TO_ID_SCRIPT): self._script_trim_to_id,
+        }
+
+    async def start(self, host: str='127.0.0.1', port: int=0, path: str=None):
+        """Start listening on the given TCP host & port, or on the unix socket at `path`"""
+        if path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(L("Fake redis server listening on {}", Bold(self.url)))
+
+    async def stop(self):
+        self.disconnect_clients()
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def address(self):
+        """The (host, port) tuple, or unix socket path, on which the server is listening"""
+        return self._server.sockets[0].getsockname()
+
+    @property
+    def url(self) -> str:
+        address = self.address
+        if isinstance(address, str):
+            return f'unix://{address}'
+        return 'redis://{}:{}/0'.format(*address[:2])
+
+    def add_hook(self, hook: Hook):
+        """ Call the given coroutine function before each command is executed
+
+        The hook is passed the (upper case) command name and its arguments. It may sleep to
+        inject latency, raise RespError to reply with an error, or raise ConnectionResetError
+        to close the client's connection.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook):
+        self._hooks.remove(hook)
+
+    def inject_error(self, command: str, message: str='ERR injected failure', times: int=1):
+        """Reply to the next `times` calls of `command` with the given error"""
+        remaining = times
+
+        async def hook(name, args):
+            nonlocal remaining
+            if name == command.upper() and remaining > 0:
+                remaining -= 1
+                if not remaining:
+                    self.remove_hook(hook)
+                raise RespError(message)
+
+        self.add_hook(hook)
+
+    def disconnect_clients(self):
+        """Close all client connections, as happens when redis restarts or the network fails"""
+        for connection in list(self._connections):
+            connection.writer.close()
+
+    def flush(self):
+        """Delete all data"""
+        self.databases = {}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = _Connection(writer)
+        self._connections.add(connection)
+        parser = RespParser(inline=True)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                parser.feed(data)
+                output = bytearray()
+                while True:
+                    request = parser.get()
+                    if request is INCOMPLETE:
+                        break
+                    if not request:
+                        continue
+                    command = request[0].decode('utf8', 'replace').upper()
+                    if command in BLOCKING_COMMANDS:
+                        if output:
+                            writer.write(output)
+                            output = bytearray()
+                        reply = await self._execute_blocking(connection, reader, parser, command, request[1:])
+                    else:
+                        reply = await self._execute(connection, command, request[1:])
+                    if isinstance(reply, _MultipleReplies):
+                        for item in reply:
+                            encode(item, output)
+                    else:
+                        encode(reply, output)
+                    if command == 'QUIT':
+                        raise ConnectionResetError()
+
+                if output:
+                    writer.write(output)
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            self._unsubscribe_all(connection)
+            writer.close()
+
+    async def _execute(self, connection: _Connection, command: str, args: List[bytes]):
+        handler = self._handlers.get(command)
+        if handler is None:
+            return RespError(f"ERR unknown command '{command}'")
+        if connection.subscribed and command not in PUBSUB_COMMANDS:
+            return RespError('ERR only (P)SUBSCRIBE / (P)UNSUBSCRIBE / PING / QUIT allowed in this context')
+        try:
+            self._signatures[command].bind(connection, *args)
+        except TypeError:
+            return RespError(f"ERR wrong number of arguments for '{command.lower()}' command")
+
+        try:
+            for hook in list(self._hooks):
+                await hook(command, args)
+            reply = handler(connection, *args)
+            if inspect.isawaitable(reply):
+                reply = await reply
+        except RespError as e:
+            return e
+        return reply
+
+    async def _execute_blocking(self, connection, reader, parser, command, args):
+        """Execute a command which may block, whilst watching for the client disconnecting
+
+        Otherwise a disconnected client could continue to wait, and would then take
+        (and lose) data intended for another client.
+        """
+        execution = asyncio.ensure_future(self._execute(connection, command, args))
+        try:
+            while not execution.done():
+                read = asyncio.ensure_future(reader.read(65536))
+                await asyncio.wait([execution, read], return_when=asyncio.FIRST_COMPLETED)
+                if not read.done():
+                    # Wait for the cancellation to complete, otherwise the next read() will fail
+                    read.cancel()
+                    await asyncio.wait([read])
+                if read.cancelled():
+                    continue
+                elif read.result():
+                    # The client sent more commands, to be executed once this one completes
+                    parser.feed(read.result())
+                else:
+                    raise ConnectionResetError()
+            return execution.result()
+        finally:
+            execution.cancel()
+
+    def _db(self, connection: _Connection) -> _Database:
+        if connection.db not in self.databases:
+            self.databases[connection.db] = _Database()
+        return self.databases[connection.db]
+
+    async def _wait(self, connection: _Connection, keys: List[bytes], timeout: Optional[float]) -> bool:
+        """Wait until one of the keys is written to, returning False upon timeout or CLIENT UNBLOCK"""
+        future = connection.waiter = asyncio.get_event_loop().create_future()
+        waiter_keys = [(connection.db, key) for key in keys]
+        for waiter_key in waiter_keys:
+            self._waiters.setdefault(waiter_key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            connection.waiter = None
+            for waiter_key in waiter_keys:
+                waiters = self._waiters.get(waiter_key)
+                if waiters and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[waiter_key]
+
+    def _notify(self, connection: _Connection, key: bytes):
+        for future in self._waiters.pop((connection.db, key), ()):
+            if not future.done():
+                future.set_result(True)
+
+    # Connection & server
+
+    def cmd_ping(self, connection, message=None):
+        return SimpleString('PONG') if message is None else message
+
+    def cmd_echo(self, connection, message):
+        return message
+
+    def cmd_quit(self, connection):
+        return OK
+
+    def cmd_auth(self, connection, password):
+        return OK
+
+    def cmd_select(self, connection, db):
+        connection.db = _int(db)
+        return OK
+
+    def cmd_client(self, connection, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b'ID':
+            return connection.id
+        elif subcommand == b'UNBLOCK':
+            # Blocked commands return as if they had timed out
+            client_id = _int(args[0]) if args else None
+            blocked = [c for c in self._connections if c.id == client_id and c.waiter and not c.waiter.done()]
+            for blocked_connection in blocked:
+                blocked_connection.waiter.set_result(False)
+            return len(blocked)
+        elif subcommand == b'KILL':
+            # Only the filter form is supported, i.e. CLIENT KILL [ID id] [TYPE normal|pubsub]
+            options = _parse_options(args, {b'ID': 1, b'TYPE': 1})
+            if not options:
+                raise RespError('ERR syntax error')
+            client_id = _int(options[b'ID'][0]) if b'ID' in options else None
+            client_type = options[b'TYPE'][0].lower() if b'TYPE' in options else None
+            killed = [
+                c for c in self._connections
+                if (client_id is None or c.id == client_id)
+                and (client_type is None or client_type == (b'pubsub' if c.subscribed else b'normal'))
+            ]
+            for killed_connection in killed:
+                killed_connection.writer.close()
+            return len(killed)
+        return OK
+
+    def cmd_info(self, connection, *args):
+        return (
+            '# Server\r\nredis_version:5.0.0\r\nlightbus_fake_redis:1\r\n'
+            '\r\n# Clients\r\nconnected_clients:{}\r\n'.format(len(self._connections))
+        ).encode()
+
+    def cmd_flushdb(self, connection, *args):
+        self.databases.pop(connection.db, None)
+        return OK
+
+    def cmd_flushall(self, connection, *args):
+        self.flush()
+        return OK
+
+    def cmd_dbsize(self, connection):
+        return len(self._db(connection).keys())
+
+    def cmd_time(self, connection):
+        now = time.time()
+        return [str(int(now)).encode(), str(int(now % 1 * 1000000)).encode()]
+
+    # Keys
+
+    def cmd_del(self, connection, key, *keys):
+        db = self._db(connection)
+        return sum(db.get(k) is not None and db.delete(k) for k in (key,) + keys)
+
+    def cmd_exists(self, connection, key, *keys):
+        db = self._db(connection)
+        return sum(db.get(k) is not None for k in (key,) + keys)
+
+    def cmd_type(self, connection, key):
+        value = self._db(connection).get(key)
+        types = ((bytes, 'string'), (deque, 'list'), (set, 'set'), (_SortedSet, 'zset'), (_Stream, 'stream'))
+        return SimpleString(next((name for type_, name in types if isinstance(value, type_)), 'none'))
+
+    def cmd_expire(self, connection, key, seconds):
+        return self._expire(connection, key, _int(seconds))
+
+    def cmd_pexpire(self, connection, key, milliseconds):
+        return self._expire(connection, key, _int(milliseconds) / 1000)
+
+    def cmd_ttl(self, connection, key):
+        ttl = self._ttl(connection, key)
+        return ttl if ttl < 0 else round(ttl)
+
+    def cmd_pttl(self, connection, key):
+        ttl = self._ttl(connection, key)
+        return ttl if ttl < 0 else round(ttl * 1000)
+
+    def cmd_persist(self, connection, key):
+        db = self._db(connection)
+        return int(db.get(key) is not None and db.expires.pop(key, None) is not None)
+
+    def cmd_keys(self, connection, pattern):
+        return [k for k in self._db(connection).keys() if _matches(pattern, k)]
+
+    def cmd_scan(self, connection, cursor, *args):
+        # Every key is returned in one go
+        options = _parse_options(args, {b'MATCH': 1, b'COUNT': 1})
+        pattern = options.get(b'MATCH', [b'*'])[0]
+        return [b'0', [k for k in self._db(connection).keys() if _matches(pattern, k)]]
+
+    def _expire(self, connection, key, seconds: float) -> int:
+        db = self._db(connection)
+        if db.get(key) is None:
+            return 0
+        if seconds <= 0:
+            db.delete(key)
+        else:
+            db.expires[key] = time.time() + seconds
+        return 1
+
+    def _ttl(self, connection, key) -> float:
+        db = self._db(connection)
+        if db.get(key) is None:
+            return -2
+        if key not in db.expires:
+            return -1
+        return db.expires[key] - time.time()
+
+    # Strings
+
+    def cmd_get(self, connection, key):
+        return self._db(connection).get(key, bytes)
+
+    def cmd_mget(self, connection, key, *keys):
+        db = self._db(connection)
+        values = [db.get(k) for k in (key,) + keys]
+        return [v if isinstance(v, bytes) else None for v in values]
+
+    def cmd_set(self, connection, key, value, *args):
+        db = self._db(connection)
+        options = _parse_options(args, {b'EX': 1, b'PX': 1, b'NX': 0, b'XX': 0})
+        exists = db.get(key) is not None
+        if (b'NX' in options and exists) or (b'XX' in options and not exists):
+            return None
+        db.set(key, value)
+        if b'EX' in options:
+            db.expires[key] = time.time() + _int(options[b'EX'][0])
+        if b'PX' in options:
+            db.expires[key] = time.time() + _int(options[b'PX'][0]) / 1000
+        return OK
+
+    def cmd_setex(self, connection, key, seconds, value):
+        return self.cmd_set(connection, key, value, b'EX', seconds)
+
+    def cmd_incr(self, connection, key):
+        return self.cmd_incrby(connection, key, b'1')
+
+    def cmd_incrby(self, connection, key, increment):
+        db = self._db(connection)
+        value = _int(db.get(key, bytes) or b'0') + _int(increment)
+        expires_at = db.expires.get(key)
+        db.set(key, str(value).encode())
+        if expires_at:
+            db.expires[key] = expires_at
+        return value
+
+    # Lists
+
+    def cmd_rpush(self, connection, key, value, *values):
+        return self._push(connection, key, (value,) + values, left=False)
+
+    def cmd_lpush(self, connection, key, value, *values):
+        return self._push(connection, key, (value,) + values, left=True)
+
+    def cmd_lpop(self, connection, key):
+        return self._pop(connection, key, left=True)
+
+    def cmd_rpop(self, connection, key):
+        return self._pop(connection, key, left=False)
+
+    def cmd_llen(self, connection, key):
+        return len(self._db(connection).get(key, deque) or ())
+
+    def cmd_lrange(self, connection, key, start, stop):
+        items = list(self._db(connection).get(key, deque) or ())
+        start, stop = _int(start), _int(stop)
+        stop = len(items) if stop == -1 else stop + 1
+        return items[start:stop]
+
+    def cmd_lrem(self, connection, key, count, value):
+        db = self._db(connection)
+        items = db.get(key, deque)
+        if not items:
+            return 0
+        count = _int(count)
+        limit = abs(count) or len(items)
+        indexes = [i for i, item in enumerate(items) if item == value]
+        indexes = indexes[-limit:] if count < 0 else indexes[:limit]
+        for index in reversed(indexes):
+            del items[index]
+        if not items:
+            db.delete(key)
+        return len(indexes)
+
+    async def cmd_blpop(self, connection, key, *args):
+        return await self._blocking_pop(connection, (key,) + args[:-1], args[-1], left=True)
+
+    async def cmd_brpop(self, connection, key, *args):
+        return await self._blocking_pop(connection, (key,) + args[:-1], args[-1], left=False)
+
+    def _push(self, connection, key, values, left: bool) -> int:
+        db = self._db(connection)
+        items = db.get(key, deque)
+        if items is None:
+            items = deque()
+            db.set(key, items)
+        for value in values:
+            if left:
+                items.appendleft(value)
+            else:
+                items.append(value)
+        self._notify(connection, key)
+        return len(items)
+
+    def _pop(self, connection, key, left: bool):
+        db = self._db(connection)
+        items = db.get(key, deque)
+        if not items:
+            return None
+        value = items.popleft() if left else items.pop()
+        if not items:
+            db.delete(key)
+        return value
+
+    async def _blocking_pop(self, connection, keys, timeout: bytes, left: bool):
+        if not keys:
+            raise RespError("ERR wrong number of arguments for 'blpop' command")
+        timeout = _float(timeout) or None
+        deadline = timeout and time.time() + timeout
+        while True:
+            for key in keys:
+                value = self._pop(connection, key, left)
+                if value is not None:
+                    return [key, value]
+            # BLOCK 0 (or a BLPOP timeout of 0) blocks indefinitely
+            remaining = deadline - time.time() if deadline else None
+            if remaining is not None and remaining <= 0:
+                return NULL_ARRAY
+            if not await self._wait(connection, keys, remaining):
+                return NULL_ARRAY
+
+    # Sets
+
+    def cmd_sadd(self, connection, key, member, *members):
+        db = self._db(connection)
+        items = db.get(key, set)
+        if items is None:
+            items = set()
+            db.set(key, items)
+        before = len(items)
+        items.update((member,) + members)
+        return len(items) - before
+
+    def cmd_srem(self, connection, key, member, *members):
+        db = self._db(connection)
+        items = db.get(key, set)
+        if not items:
+            return 0
+        before = len(items)
+        items.difference_update((member,) + members)
+        if not items:
+            db.delete(key)
+        return before - len(items)
+
+    def cmd_smembers(self, connection, key):
+        return sorted(self._db(connection).get(key, set) or ())
+
+    def cmd_sismember(self, connection, key, member):
+        return int(member in (self._db(connection).get(key, set) or ()))
+
+    def cmd_scard(self, connection, key):
+        return len(self._db(connection).get(key, set) or ())
+
+    # Sorted sets
+
+    def cmd_zadd(self, connection, key, *args):
+        if not args or len(args) % 2:
+            raise RespError('ERR syntax error')
+        db = self._db(connection)
+        members = db.get(key, _SortedSet)
+        if members is None:
+            members = _SortedSet()
+            db.set(key, members)
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            added += member not in members
+            members[member] = _float(score)
+        return added
+
+    def cmd_zrem(self, connection, key, member, *members):
+        db = self._db(connection)
+        items = db.get(key, _SortedSet)
+        if not items:
+            return 0
+        removed = sum(items.pop(m, None) is not None for m in (member,) + members)
+        if not items:
+            db.delete(key)
+        return removed
+
+    def cmd_zcard(self, connection, key):
+        return len(self._db(connection).get(key, _SortedSet) or ())
+
+    def cmd_zscore(self, connection, key, member):
+        score = (self._db(connection).get(key, _SortedSet) or {}).get(member)
+        return None if score is None else _format_score(score)
+
+    def cmd_zrange(self, connection, key, start, stop, *args):
+        options = _parse_options(args, {b'WITHSCORES': 0})
+        members = self._zrange(connection, key, b'-inf', b'+inf')
+        start, stop = _int(start), _int(stop)
+        start = max(start + len(members), 0) if start < 0 else start
+        stop = stop + len(members) if stop < 0 else stop
+        members = members[start:stop + 1]
+        if b'WITHSCORES' in options:
+            return [v for member, score in members for v in (member, _format_score(score))]
+        return [member for member, _ in members]
+
+    def cmd_zrangebyscore(self, connection, key, min_score, max_score, *args):
+        options = _parse_options(args, {b'WITHSCORES': 0, b'LIMIT': 2})
+        members = self._zrange(connection, key, min_score, max_score)
+        if b'LIMIT' in options:
+            offset, count = map(_int, options[b'LIMIT'])
+            members = members[offset:] if count < 0 else members[offset:offset + count]
+        if b'WITHSCORES' in options:
+            return [v for member, score in members for v in (member, _format_score(score))]
+        return [member for member, _ in members]
+
+    def cmd_zremrangebyscore(self, connection, key, min_score, max_score):
+        db = self._db(connection)
+        members = self._zrange(connection, key, min_score, max_score)
+        items = db.get(key, _SortedSet)
+        for member, _ in members:
+            del items[member]
+        if items is not None and not items:
+            db.delete(key)
+        return len(members)
+
+    def _zrange(self, connection, key, min_score: bytes, max_score: bytes) -> List[Tuple[bytes, float]]:
+        items = self._db(connection).get(key, _SortedSet) or {}
+        (min_score, min_exclusive), (max_score, max_exclusive) = _parse_score(min_score), _parse_score(max_score)
+        return sorted(
+            (
+                (member, score) for member, score in items.items()
+                if (score > min_score if min_exclusive else score >= min_score)
+                and (score < max_score if max_exclusive else score <= max_score)
+            ),
+            key=lambda m: (m[1], m[0])
+        )
+
+    # Pub/sub
+
+    def cmd_publish(self, connection, channel, message):
+        receivers = 0
+        for subscriber in self._channels.get(channel, ()):
+            subscriber.writer.write(encode([b'message', channel, message]))
+            receivers += 1
+        for pattern, subscribers in self._patterns.items():
+            if _matches(pattern, channel):
+                for subscriber in subscribers:
+                    subscriber.writer.write(encode([b'pmessage', pattern, channel, message]))
+                    receivers += 1
+        return receivers
+
+    def cmd_subscribe(self, connection, channel, *channels):
+        return self._subscribe(connection, (channel,) + channels, connection.channels, self._channels, b'subscribe')
+
+    def cmd_psubscribe(self, connection, pattern, *patterns):
+        return self._subscribe(connection, (pattern,) + patterns, connection.patterns, self._patterns, b'psubscribe')
+
+    def cmd_unsubscribe(self, connection, *channels):
+        return self._unsubscribe(connection, channels, connection.channels, self._channels, b'unsubscribe')
+
+    def cmd_punsubscribe(self, connection, *patterns):
+        return self._unsubscribe(connection, patterns, connection.patterns, self._patterns, b'punsubscribe')
+
+    def _subscribe(self, connection, names, subscribed: set, subscribers: dict, kind: bytes):
+        replies = _MultipleReplies()
+        for name in names:
+            subscribed.add(name)
+            subscribers.setdefault(name, set()).add(connection)
+            replies.append([kind, name, len(connection.channels) + len(connection.patterns)])
+        return replies
+
+    def _unsubscribe(self, connection, names, subscribed: set, subscribers: dict, kind: bytes):
+        replies = _MultipleReplies()
+        for name in names or sorted(subscribed):
+            subscribed.discard(name)
+            subscribers.get(name, set()).discard(connection)
+            if not subscribers.get(name, True):
+                del subscribers[name]
+            replies.append([kind, name, len(connection.channels) + len(connection.patterns)])
+        return replies or _MultipleReplies([[kind, None, 0]])
+
+    def _unsubscribe_all(self, connection):
+        self._unsubscribe(connection, (), connection.channels, self._channels, b'unsubscribe')
+        self._unsubscribe(connection, (), connection.patterns, self._patterns, b'punsubscribe')
+
+    # Scripting
+
+    def cmd_evalsha(self, connection, sha, total_keys, *args):
+        script = self._scripts.get(sha.lower())
+        if script is None:
+            raise RespError('NOSCRIPT No matching script. Please use EVAL.')
+        return self._run_script(connection, script, total_keys, args)
+
+    def cmd_eval(self, connection, script, total_keys, *args):
+        script = self._scripts.get(_script_sha(script))
+        if script is None:
+            raise RespError('ERR Lua scripting is not supported by the fake redis server')
+        return self._run_script(connection, script, total_keys, args)
+
+    def _run_script(self, connection, script, total_keys, args):
+        total_keys = _int(total_keys)
+        if not 0 <= total_keys <= len(args):
+            raise RespError("ERR Number of keys can't be greater than number of args")
+        return script(connection, list(args[:total_keys]), list(args[total_keys:]))
+
+    def _script_filter_streams(self, connection, keys, args):
+        """See FILTER_STREAMS_SCRIPT"""
+        group_name, scan_size = args[0], _int(args[1])
+        filters = {
+            field.encode('utf8'): {value.encode('utf8') for value in values}
+            for field, values in json.loads(args[2]).items()
+        }
+        event_names = {event_name.encode('utf8') for event_name in json.loads(args[3])}
+
+        def matches(fields):
+            fields = dict(zip(fields[::2], fields[1::2]))
+            if b'' in fields:
+                # A noop message
+                return False
+            if event_names and fields.get(b'event_name') not in event_names:
+                return False
+            return all(fields.get(field) in values for field, values in filters.items())
+
+        ready_counts, latest_ids = [], []
+        total_scanned = 0
+        for key in keys:
+            group = self._get_group(connection, key, group_name)
+            stream = self._db(connection).get(key, _Stream)
+            last = latest_id = group.last_delivered_id
+            entries = stream.range((last[0], last[1] + 1), MAX_ID, scan_size)
+            total_scanned += len(entries)
+
+            ready = 0
+            for entry_id, fields in entries:
+                if matches(fields):
+                    ready += 1
+                elif ready:
+                    # Stop at the end of the first run of matching messages
+                    break
+                else:
+                    latest_id = _parse_id(entry_id)
+
+            if not ready and entries:
+                latest_id = _parse_id(entries[-1][0])
+            group.last_delivered_id = latest_id
+
+            ready_counts.append(ready)
+            latest_ids.append(_format_id(latest_id))
+
+        return [ready_counts, latest_ids, total_scanned]
+
+    def _script_trim_to_id(self, connection, keys, args):
+        """See TRIM_TO_ID_SCRIPT"""
+        stream = self._db(connection).get(keys[0], _Stream)
+        if not stream:
+            return 0
+        total = len(stream.range((0, 0), _parse_id(args[0])))
+        stream.trim(len(stream.ids) - total)
+        return total
+
+    # Streams
+
+    def cmd_xadd(self, connection, key, *args):
+        db = self._db(connection)
+        options = _parse_options(args, {b'MAXLEN': 1}, stop_at_unknown=True)
+        max_length = options.get(b'MAXLEN')
+        args = args[sum(1 + len(v) for v in options.values()):]
+        if max_length:
+            # Approximate trimming (~) is done exactly
+            max_length = max_length[-1:]
+        if len(args) < 3 or len(args) % 2 == 0:
+            raise RespError("ERR wrong number of arguments for 'xadd' command")
+
+        stream = db.get(key, _Stream)
+        last_id = stream.last_id if stream else (0, 0)
+        if args[0] == b'*':
+            milliseconds = _now_ms()
+            message_id = (milliseconds, 0) if milliseconds > last_id[0] else (last_id[0], last_id[1] + 1)
+        else:
+            message_id = _parse_id(args[0])
+            if message_id <= last_id:
+                raise RespError('ERR The ID specified in XADD is equal or smaller than the target stream top item')
+
+        if stream is None:
+            stream = _Stream()
+            db.set(key, stream)
+        stream.add(message_id, list(args[1:]))
+        if max_length:
+            stream.trim(_int(max_length[0]))
+        self._notify(connection, key)
+        return _format_id(message_id)
+
+    def cmd_xlen(self, connection, key):
+        stream = self._db(connection).get(key, _Stream)
+        return len(stream.ids) if stream else 0
+
+    def cmd_xdel(self, connection, key, message_id, *message_ids):
+        stream = self._db(connection).get(key, _Stream)
+        deleted = 0
+        for message_id in map(_parse_id, (message_id,) + message_ids):
+            index = bisect.bisect_left(stream.ids, message_id) if stream else 0
+            if stream and index < len(stream.ids) and stream.ids[index] == message_id:
+                del stream.ids[index]
+                del stream.fields[index]
+                deleted += 1
+        return deleted
+
+    def cmd_xtrim(self, connection, key, strategy, *args):
+        if strategy.upper() != b'MAXLEN' or not args:
+            raise RespError('ERR syntax error')
+        stream = self._db(connection).get(key, _Stream)
+        return stream.trim(_int(args[-1])) if stream else 0
+
+    def cmd_xrange(self, connection, key, start, end, *args):
+        options = _parse_options(args, {b'COUNT': 1})
+        stream = self._db(connection).get(key, _Stream)
+        if not stream:
+            return []
+        count = _int(options[b'COUNT'][0]) if b'COUNT' in options else None
+        return stream.range(_parse_id(start, start=True), _parse_id(end), count)
+
+    def cmd_xrevrange(self, connection, key, end, start, *args):
+        options = _parse_options(args, {b'COUNT': 1})
+        stream = self._db(connection).get(key, _Stream)
+        if not stream:
+            return []
+        entries = stream.range(_parse_id(start, start=True), _parse_id(end))[::-1]
+        return entries[:_int(options[b'COUNT'][0])] if b'COUNT' in options else entries
+
+    async def cmd_xread(self, connection, *args):
+        options, keys, ids = _parse_xread(args, {b'COUNT': 1, b'BLOCK': 1})
+        count = _int(options[b'COUNT'][0]) if b'COUNT' in options else None
+        db = self._db(connection)
+        streams = [db.get(key, _Stream) for key in keys]
+        # '$' means entries added after the call was made
+        start_ids = [
+            (stream.last_id if stream else (0, 0)) if message_id == b'$' else _parse_id(message_id, start=True)
+            for stream, message_id in zip(streams, ids)
+        ]
+
+        async def read():
+            results = []
+            for key, start_id in zip(keys, start_ids):
+                stream = db.get(key, _Stream)
+                entries = stream.range((start_id[0], start_id[1] + 1), MAX_ID, count) if stream else []
+                if entries:
+                    results.append([key, entries])
+            return results
+
+        return await self._blocking_read(connection, keys, options, read)
+
+    async def cmd_xreadgroup(self, connection, group_keyword, group_name, consumer_name, *args):
+        if group_keyword.upper() != b'GROUP':
+            raise RespError('ERR syntax error')
+        options, keys, ids = _parse_xread(args, {b'COUNT': 1, b'BLOCK': 1, b'NOACK': 0})
+        count = _int(options[b'COUNT'][0]) if b'COUNT' in options else None
+        db = self._db(connection)
+        for key in keys:
+            stream = db.get(key, _Stream)
+            if not stream or group_name not in stream.groups:
+                raise RespError(
+                    f"NOGROUP No such key '{key.decode()}' or consumer group '{group_name.decode()}' "
+                    f"in XREADGROUP with GROUP option"
+                )
+
+        async def read():
+            results = []
+            for key, message_id in zip(keys, ids):
+                stream = db.get(key, _Stream)
+                group = stream.groups.get(group_name) if stream else None
+                if group is None:
+                    raise RespError(f"NOGROUP No such key '{key.decode()}' or consumer group "
+                                    f"'{group_name.decode()}' in XREADGROUP with GROUP option")
+                group.touch_consumer(consumer_name)
+
+                if message_id == b'>':
+                    # New messages, never delivered to this group
+                    last = group.last_delivered_id
+                    entries = stream.range((last[0], last[1] + 1), MAX_ID, count)
+                    for entry in entries:
+                        entry_id = _parse_id(entry[0])
+                        group.last_delivered_id = entry_id
+                        if b'NOACK' not in options:
+                            group.pending[entry_id] = [consumer_name, _now_ms(), 1]
+                    if entries:
+                        results.append([key, entries])
+                else:
+                    # This consumer's pending messages
+                    after_id = _parse_id(message_id)
+                    pending_ids = sorted(
+                        pending_id for pending_id, (owner, _, _) in group.pending.items()
+                        if owner == consumer_name and pending_id > after_id
+                    )[:count]
+                    entries = []
+                    for pending_id in pending_ids:
+                        entry = group.pending[pending_id]
+                        entry[1] = _now_ms()
+                        entry[2] += 1
+                        entries.append([_format_id(pending_id), stream.get(pending_id)])
+                    results.append([key, entries])
+            return results
+
+        if any(message_id != b'>' for message_id in ids):
+            options.pop(b'BLOCK', None)
+        return await self._blocking_read(connection, keys, options, read)
+
+    async def _blocking_read(self, connection, keys, options, read):
+        timeout = _int(options[b'BLOCK'][0]) / 1000 if b'BLOCK' in options else None
+        deadline = timeout and time.time() + timeout
+        while True:
+            results = await read()
+            if results:
+                return results
+            if timeout is None:
+                return NULL_ARRAY
+            # BLOCK 0 (or a BLPOP timeout of 0) blocks indefinitely
+            remaining = deadline - time.time() if deadline else None
+            if remaining is not None and remaining <= 0:
+                return NULL_ARRAY
+            if not await self._wait(connection, keys, remaining):
+                return NULL_ARRAY
+
+    def cmd_xack(self, connection, key, group_name, message_id, *message_ids):
+        group = self._get_group(connection, key, group_name, required=False)
+        if not group:
+            return 0
+        return sum(
+            group.pending.pop(_parse_id(i), None) is not None
+            for i in (message_id,) + message_ids
+        )
+
+    def cmd_xpending(self, connection, key, group_name, *args):
+        group = self._get_group(connection, key, group_name)
+        pending_ids = sorted(group.pending)
+        if not args:
+            if not pending_ids:
+                return [0, None, None, None]
+            counts = OrderedDict()
+            for pending_id in pending_ids:
+                owner = group.pending[pending_id][0]
+                counts[owner] = counts.get(owner, 0) + 1
+            return [
+                len(pending_ids), _format_id(pending_ids[0]), _format_id(pending_ids[-1]),
+                [[owner, str(total).encode()] for owner, total in sorted(counts.items())],
+            ]
+
+        if len(args) not in (3, 4):
+            raise RespError('ERR syntax error')
+        start, end, count = _parse_id(args[0], start=True), _parse_id(args[1]), _int(args[2])
+        consumer_name = args[3] if len(args) == 4 else None
+        if consumer_name is not None and consumer_name in group.consumers:
+            group.touch_consumer(consumer_name)
+
+        now = _now_ms()
+        results = []
+        for pending_id in pending_ids:
+            owner, delivered_at, deliveries = group.pending[pending_id]
+            if not start <= pending_id <= end or (consumer_name is not None and owner != consumer_name):
+                continue
+            results.append([_format_id(pending_id), owner, now - delivered_at, deliveries])
+            if len(results) >= count:
+                break
+        return results
+
+    def cmd_xclaim(self, connection, key, group_name, consumer_name, min_idle_time, *args):
+        group = self._get_group(connection, key, group_name)
+        stream = self._db(connection).get(key, _Stream)
+        min_idle_time = _int(min_idle_time)
+
+        message_ids = []
+        for index, arg in enumerate(args):
+            if arg.upper() in (b'IDLE', b'TIME', b'RETRYCOUNT', b'FORCE', b'JUSTID'):
+                args = args[index:]
+                break
+            message_ids.append(_parse_id(arg))
+        else:
+            args = ()
+        options = _parse_options(args, {b'IDLE': 1, b'TIME': 1, b'RETRYCOUNT': 1, b'FORCE': 0, b'JUSTID': 0})
+
+        now = _now_ms()
+        group.touch_consumer(consumer_name)
+        delivered_at = now
+        if b'IDLE' in options:
+            delivered_at = now - _int(options[b'IDLE'][0])
+        if b'TIME' in options:
+            delivered_at = _int(options[b'TIME'][0])
+
+        results = []
+        for message_id in message_ids:
+            entry = group.pending.get(message_id)
+            if entry is None:
+                if b'FORCE' not in options or stream.get(message_id) is None:
+                    continue
+                entry = group.pending[message_id] = [consumer_name, now, 0]
+            if now - entry[1] < min_idle_time:
+                continue
+
+            entry[0], entry[1] = consumer_name, delivered_at
+            if b'RETRYCOUNT' in options:
+                entry[2] = _int(options[b'RETRYCOUNT'][0])
+            elif b'JUSTID' not in options:
+                entry[2] += 1
+
+            if b'JUSTID' in options:
+                results.append(_format_id(message_id))
+            else:
+                fields = stream.get(message_id)
+                if fields is not None:
+                    results.append([_format_id(message_id), fields])
+        return results
+
+    def cmd_xgroup(self, connection, subcommand, key, group_name, *args):
+        subcommand = subcommand.upper()
+        db = self._db(connection)
+        stream = db.get(key, _Stream)
+
+        if subcommand == b'CREATE':
+            if not args:
+                raise RespError("ERR wrong number of arguments for 'xgroup' command")
+            if stream is None:
+                if b'MKSTREAM' not in [a.upper() for a in args[1:]]:
+                    raise RespError(
+                        'ERR The XGROUP subcommand requires the key to exist. Note that for CREATE '
+                        'you may want to use the MKSTREAM option to create an empty stream automatically.'
+                    )
+                stream = _Stream()
+                db.set(key, stream)
+            if group_name in stream.groups:
+                raise RespError('BUSYGROUP Consumer Group name already exists')
+            stream.groups[group_name] = _ConsumerGroup(
+                stream.last_id if args[0] == b'$' else _parse_id(args[0])
+            )
+            return OK
+        elif subcommand == b'SETID':
+            group = self._get_group(connection, key, group_name)
+            group.last_delivered_id = stream.last_id if args[0] == b'$' else _parse_id(args[0])
+            return OK
+        elif subcommand == b'DESTROY':
+            return int(bool(stream and stream.groups.pop(group_name, None)))
+        elif subcommand == b'DELCONSUMER':
+            group = self._get_group(connection, key, group_name)
+            consumer_name = args[0]
+            owned = [i for i, (owner, _, _) in group.pending.items() if owner == consumer_name]
+            for message_id in owned:
+                del group.pending[message_id]
+            group.consumers.pop(consumer_name, None)
+            return len(owned)
+        else:
+            raise RespError(f"ERR Unknown subcommand '{subcommand.decode()}'")
+
+    def cmd_xinfo(self, connection, subcommand, key, *args):
+        subcommand = subcommand.upper()
+        stream = self._db(connection).get(key, _Stream)
+        if stream is None:
+            raise RespError('ERR no such key')
+
+        if subcommand == b'GROUPS':
+            return [
+                [b'name', name, b'consumers', len(group.consumers), b'pending', len(group.pending),
+                 b'last-delivered-id', _format_id(group.last_delivered_id)]
+                for name, group in stream.groups.items()
+            ]
+        elif subcommand == b'CONSUMERS':
+            group = self._get_group(connection, key, args[0])
+            now = _now_ms()
+            return [
+                [b'name', name, b'pending', sum(1 for owner, _, _ in group.pending.values() if owner == name),
+                 b'idle', now - seen_at]
+                for name, seen_at in group.consumers.items()
+            ]
+        elif subcommand == b'STREAM':
+            first = stream.range((0, 0), MAX_ID, 1)
+            return [
+                b'length', len(stream.ids), b'last-generated-id', _format_id(stream.last_id),
+                b'groups', len(stream.groups),
+                b'first-entry', first[0] if first else None,
+                b'last-entry', [_format_id(stream.ids[-1]), stream.fields[-1]] if stream.ids else None,
+            ]
+        else:
+            raise RespError(f"ERR Unknown subcommand '{subcommand.decode()}'")
+
+    def _get_group(self, connection, key, group_name, required=True) -> Optional[_ConsumerGroup]:
+        stream = self._db(connection).get(key, _Stream)
+        group = stream.groups.get(group_name) if stream else None
+        if group is None and required:
+            raise RespError(f"NOGROUP No such key '{key.decode()}' or consumer group '{group_name.decode()}'")
+        return group
+
+
+def _script_sha(script) -> bytes:
+    if isinstance(script, str):
+        script = script.encode('utf8')
+    return hashlib.sha1(script).hexdigest().encode()
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _int(value: bytes) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise RespError('ERR value is not an integer or out of range')
+
+
+def _float(value: bytes) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        raise RespError('ERR value is not a valid float')
+
+
+def _format_score(score: float) -> bytes:
+    return (str(int(score)) if score == int(score) else repr(score)).encode()
+
+
+def _parse_score(value: bytes) -> Tuple[float, bool]:
+    """Parse a score range boundary, returning (score, is exclusive)"""
+    exclusive = value.startswith(b'(')
+    value = value[1:] if exclusive else value
+    if value in (b'-inf', b'+inf', b'inf'):
+        return float(value), exclusive
+    return _float(value), exclusive
+
+
+def _format_id(message_id: StreamId) -> bytes:
+    return b'%d-%d' % message_id
+
+
+def _parse_id(value: bytes, start: bool=False) -> StreamId:
+    """Parse a stream ID. Partial IDs (i.e. milliseconds only) are completed according to `start`"""
+    if value == b'-':
+        return 0, 0
+    if value == b'+':
+        return MAX_ID
+    milliseconds, _, n = value.partition(b'-')
+    try:
+        return int(milliseconds), int(n) if n else (0 if start else MAX_ID[1])
+    except ValueError:
+        raise RespError('ERR Invalid stream ID specified as stream command argument')
+
+
+def _parse_options(args, spec: Dict[bytes, int], stop_at_unknown=False) -> Dict[bytes, list]:
+    """Parse options, where spec maps each option name to the number of values it takes"""
+    options = {}
+    args = list(args)
+    while args:
+        name = args[0].upper()
+        if name not in spec:
+            if stop_at_unknown:
+                break
+            raise RespError('ERR syntax error')
+        total = spec[name]
+        if name == b'MAXLEN' and len(args) > 1 and args[1] == b'~':
+            total += 1
+        options[name] = args[1:1 + total]
+        if len(options[name]) < total:
+            raise RespError('ERR syntax error')
+        args = args[1 + total:]
+    return options
+
+
+def _parse_xread(args, spec: Dict[bytes, int]) -> Tuple[Dict[bytes, list], List[bytes], List[bytes]]:
+    """Parse the options, keys and IDs passed to XREAD/XREADGROUP"""
+    upper = [a.upper() for a in args]
+    if b'STREAMS' not in upper:
+        raise RespError('ERR syntax error')
+    index = upper.index(b'STREAMS')
+    options = _parse_options(args[:index], spec)
+    streams = args[index + 1:]
+    if not streams or len(streams) % 2:
+        raise RespError(
+            "ERR Unbalanced XREAD list of streams: for each stream key an ID or '$' must be specified."
+        )
+    return options, list(streams[:len(streams) // 2]), list(streams[len(streams) // 2:])
+
+
+def _matches(pattern: bytes, value: bytes) -> bool:
+    return fnmatch.fnmatchcase(value.decode('latin-1'), pattern.decode('latin-1'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a stand-in redis server, for testing lightbus')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds to delay each batch of commands by')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    loop = asyncio.get_event_loop()
+    server = FakeRedisServer(latency=args.latency)
+    loop.run_until_complete(server.start(host=args.host, port=args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+
+
+if __name__ == '__main__':
+    main()
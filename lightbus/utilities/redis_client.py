@@ -0,0 +1,695 @@
+""" A pipelined asyncio redis client, built for the lightbus redis transports
+
+Non-blocking commands share a single connection. Commands issued within the same
+iteration of the event loop are sent in a single write (i.e. they are implicitly
+pipelined), and replies are matched to commands in the order they arrive.
+
+Blocking commands (BLPOP, and XREAD/XREADGROUP with BLOCK) each take a dedicated
+connection, of which there are at most `maxsize`. Blocking commands can be
+cancelled safely: the connection is unblocked using CLIENT UNBLOCK (redis 5+),
+and a value which BLPOP popped just as it was cancelled is pushed back onto its list.
+Messages which XREADGROUP delivered as it was cancelled remain pending for the consumer.
+Where CLIENT UNBLOCK is unavailable the connection is closed instead.
+
+The command methods match those of aioredis, so a client can be used wherever the
+transports would otherwise use an aioredis pool::
+
+    client = await create_redis_client('redis://localhost:6379/0')
+    with await client as redis:
+        await redis.set('key', 'value')
+
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Optional, Set, List, Dict, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from lightbus.exceptions import LightbusException
+from lightbus.log import L, Bold
+from lightbus.utilities.resp import RespParser, RespError, INCOMPLETE, encode_command
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(LightbusException):
+    pass
+
+
+class ReplyError(RedisError):
+    """Redis replied with an error"""
+    pass
+
+
+class ConnectionClosedError(RedisError):
+    pass
+
+
+class ClientClosedError(ConnectionClosedError):
+    pass
+
+
+class RedisProtocol(asyncio.Protocol):
+    """ A single connection to redis
+
+    Commands are buffered and written once per iteration of the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._transport: asyncio.Transport = None
+        self._parser = RespParser()
+        self._waiters = deque()
+        self._output = bytearray()
+        self._flush_scheduled = False
+        self.closed_future = loop.create_future()
+        # Set for blocking connections, allowing them to be unblocked
+        self.client_id: Optional[int] = None
+        # Set for pub/sub connections. Called with each message received
+        self.on_message = None
+
+    @property
+    def closed(self) -> bool:
+        return self._transport is None or self._transport.is_closing()
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data: bytes):
+        parser = self._parser
+        parser.feed(data)
+        while True:
+            reply = parser.get()
+            if reply is INCOMPLETE:
+                return
+
+            if self.on_message and isinstance(reply, list) and reply and reply[0] in (b'message', b'pmessage'):
+                self.on_message(reply)
+                continue
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                # The caller was cancelled, so the reply is discarded
+                continue
+            if isinstance(reply, RespError):
+                waiter.set_exception(ReplyError(str(reply)))
+            else:
+                waiter.set_result(reply)
+
+    def connection_lost(self, exc):
+        self._transport = None
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionClosedError('Connection to redis was lost'))
+        if not self.closed_future.done():
+            self.closed_future.set_result(None)
+
+    def execute(self, *args) -> asyncio.Future:
+        """Send a command, returning a future which will resolve to its reply"""
+        if self.closed:
+            raise ConnectionClosedError('Connection to redis is closed')
+        encode_command(args, self._output)
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush)
+        return waiter
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if self._output and not self.closed:
+            self._transport.write(self._output)
+        self._output = bytearray()
+
+    def close(self):
+        if self._transport:
+            self._transport.close()
+
+
+class Channel(object):
+    """A pub/sub subscription, compatible with aioredis' Channel"""
+
+    def __init__(self, name: bytes, is_pattern: bool, loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.is_pattern = is_pattern
+        self.is_active = True
+        self._loop = loop
+        self._messages = deque()
+        self._waiter: asyncio.Future = None
+
+    def put_nowait(self, message: list):
+        self._messages.append(message)
+        self._wake()
+
+    def close(self):
+        self.is_active = False
+        self._wake()
+
+    def _wake(self):
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def wait_message(self) -> bool:
+        """Wait for a message, returning False once the channel has been closed"""
+        while not self._messages:
+            if not self.is_active:
+                return False
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return True
+
+    async def get(self):
+        """Get the next message. Pattern subscriptions give (channel, message) tuples"""
+        if not await self.wait_message():
+            return None
+        _, *message = self._messages.popleft()
+        return tuple(message[1:]) if self.is_pattern else message[1]
+
+
+class RedisClient(object):
+    """ A redis client with an interface compatible with that of an aioredis pool
+
+    Use create_redis_client() to create a client.
+    """
+    SET_IF_NOT_EXIST = 'SET_IF_NOT_EXIST'
+    SET_IF_EXIST = 'SET_IF_EXIST'
+
+    def __init__(self, address, *, db: int=None, password: str=None, maxsize: int=100,
+                 loop: asyncio.AbstractEventLoop=None):
+        self.address, url_db, url_password = parse_address(address)
+        self.db = url_db if db is None else db
+        self.password = url_password if password is None else password
+        self.maxsize = maxsize
+        self._loop = loop or asyncio.get_event_loop()
+        self._closed = False
+
+        self._connection: RedisProtocol = None
+        self._connecting: asyncio.Future = None
+        self._idle_connections: List[RedisProtocol] = []
+        self._busy_connections: Set[RedisProtocol] = set()
+        self._blocking_semaphore = asyncio.Semaphore(maxsize, loop=self._loop)
+        self._recovery_tasks: Set[asyncio.Future] = set()
+
+        self._pubsub_connection: RedisProtocol = None
+        self._pubsub_lock = asyncio.Lock(loop=self._loop)
+        # Keys are (is pattern, channel name)
+        self._channels: Dict[Tuple[bool, bytes], Channel] = {}
+
+    def __await__(self):
+        # Allows `with await client as redis`, as with an aioredis pool
+        return self._get_context().__await__()
+
+    async def _get_context(self):
+        if self._closed:
+            raise ClientClosedError('Redis client has been closed')
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        for channel in self._channels.values():
+            channel.close()
+        for task in self._recovery_tasks:
+            task.cancel()
+        for connection in self._all_connections():
+            connection.close()
+
+    async def wait_closed(self):
+        futures = [connection.closed_future for connection in self._all_connections()]
+        if futures:
+            await asyncio.wait(futures)
+
+    def _all_connections(self) -> List[RedisProtocol]:
+        connections = [self._connection, self._pubsub_connection]
+        connections += self._idle_connections + list(self._busy_connections)
+        return [c for c in connections if c is not None]
+
+    async def _connect(self, blocking: bool=False) -> RedisProtocol:
+        if isinstance(self.address, str):
+            _, connection = await self._loop.create_unix_connection(lambda: RedisProtocol(self._loop), self.address)
+        else:
+            _, connection = await self._loop.create_connection(lambda: RedisProtocol(self._loop), *self.address)
+
+        setup = []
+        if self.password:
+            setup.append(connection.execute(b'AUTH', self.password))
+        if self.db:
+            setup.append(connection.execute(b'SELECT', self.db))
+        if blocking:
+            setup.append(connection.execute(b'CLIENT', b'ID'))
+        try:
+            results = await asyncio.gather(*setup, return_exceptions=True)
+        except asyncio.CancelledError:
+            connection.close()
+            raise
+        if blocking:
+            client_id = results.pop()
+            # Redis < 5.0 cannot unblock clients, in which case we close the connection instead
+            connection.client_id = client_id if isinstance(client_id, int) else None
+        for result in results:
+            if isinstance(result, Exception):
+                connection.close()
+                raise result
+        return connection
+
+    async def _get_connection(self) -> RedisProtocol:
+        """Get the shared connection used for non-blocking commands"""
+        if self._closed:
+            raise ClientClosedError('Redis client has been closed')
+        if self._connection is None or self._connection.closed:
+            if self._connecting is None:
+                self._connecting = asyncio.ensure_future(self._connect(), loop=self._loop)
+            try:
+                self._connection = await asyncio.shield(self._connecting)
+            finally:
+                if self._connecting.done():
+                    self._connecting = None
+        return self._connection
+
+    async def execute(self, command, *args):
+        """Execute the given command on the shared connection, which will be pipelined with any others"""
+        connection = self._connection
+        if connection is None or connection.closed:
+            connection = await self._get_connection()
+        return await connection.execute(command, *args)
+
+    async def execute_blocking(self, command, *args):
+        """Execute the given command on a dedicated connection, as the command may block"""
+        connection = await self._acquire_blocking_connection()
+        reply_future = connection.execute(command, *args)
+        try:
+            reply = await asyncio.shield(reply_future)
+        except asyncio.CancelledError:
+            task = asyncio.ensure_future(
+                self._recover_blocking_connection(connection, reply_future, command), loop=self._loop
+            )
+            self._recovery_tasks.add(task)
+            task.add_done_callback(self._recovery_tasks.discard)
+            raise
+        except ReplyError:
+            self._release_blocking_connection(connection)
+            raise
+        except Exception:
+            self._release_blocking_connection(connection, discard=True)
+            raise
+        self._release_blocking_connection(connection)
+        return reply
+
+    async def _acquire_blocking_connection(self) -> RedisProtocol:
+        if self._closed:
+            raise ClientClosedError('Redis client has been closed')
+        await self._blocking_semaphore.acquire()
+        try:
+            while self._idle_connections:
+                connection = self._idle_connections.pop()
+                if not connection.closed:
+                    break
+            else:
+                connection = await self._connect(blocking=True)
+        except BaseException:
+            self._blocking_semaphore.release()
+            raise
+        self._busy_connections.add(connection)
+        return connection
+
+    def _release_blocking_connection(self, connection: RedisProtocol, discard: bool=False):
+        self._busy_connections.discard(connection)
+        if discard or self._closed or connection.closed:
+            connection.close()
+        else:
+            self._idle_connections.append(connection)
+        self._blocking_semaphore.release()
+
+    async def _recover_blocking_connection(self, connection: RedisProtocol, reply_future: asyncio.Future, command):
+        """Unblock a connection whose command was cancelled, so that no data is lost"""
+        try:
+            if not reply_future.done():
+                if connection.client_id is None:
+                    # Closing the connection will unblock it
+                    self._release_blocking_connection(connection, discard=True)
+                    return
+                await self.execute(b'CLIENT', b'UNBLOCK', connection.client_id)
+            reply = await reply_future
+            if reply and command == b'BLPOP':
+                # A value was popped just as the caller was cancelled, so put it back
+                await self.execute(b'LPUSH', reply[0], reply[1])
+                logger.debug(L("Restored value popped by cancelled BLPOP to list {}", Bold(reply[0])))
+        except Exception as e:
+            logger.debug(L("Closing redis connection which could not be unblocked: {}", e))
+            self._release_blocking_connection(connection, discard=True)
+        else:
+            self._release_blocking_connection(connection)
+
+    # Pub/sub
+
+    async def subscribe(self, channel, *channels) -> List[Channel]:
+        return await self._subscribe(b'SUBSCRIBE', False, (channel,) + channels)
+
+    async def psubscribe(self, pattern, *patterns) -> List[Channel]:
+        return await self._subscribe(b'PSUBSCRIBE', True, (pattern,) + patterns)
+
+    async def unsubscribe(self, channel, *channels):
+        await self._unsubscribe(b'UNSUBSCRIBE', False, (channel,) + channels)
+
+    async def punsubscribe(self, pattern, *patterns):
+        await self._unsubscribe(b'PUNSUBSCRIBE', True, (pattern,) + patterns)
+
+    async def _subscribe(self, command: bytes, is_pattern: bool, names) -> List[Channel]:
+        connection = await self._get_pubsub_connection()
+        names = [_to_bytes(name) for name in names]
+        # Each name receives its own confirmation, so subscribe to each individually
+        await asyncio.gather(*[connection.execute(command, name) for name in names])
+        channels = []
+        for name in names:
+            if (is_pattern, name) not in self._channels:
+                self._channels[(is_pattern, name)] = Channel(name, is_pattern, self._loop)
+            channels.append(self._channels[(is_pattern, name)])
+        return channels
+
+    async def _unsubscribe(self, command: bytes, is_pattern: bool, names):
+        connection = self._pubsub_connection
+        names = [_to_bytes(name) for name in names]
+        if connection and not connection.closed:
+            await asyncio.gather(*[connection.execute(command, name) for name in names])
+        for name in names:
+            channel = self._channels.pop((is_pattern, name), None)
+            if channel:
+                channel.close()
+
+    async def _get_pubsub_connection(self) -> RedisProtocol:
+        async with self._pubsub_lock:
+            if self._closed:
+                raise ClientClosedError('Redis client has been closed')
+            if self._pubsub_connection is None or self._pubsub_connection.closed:
+                connection = await self._connect()
+                connection.on_message = self._on_message
+                connection.closed_future.add_done_callback(self._on_pubsub_connection_lost)
+                self._pubsub_connection = connection
+        return self._pubsub_connection
+
+    def _on_message(self, message: list):
+        # Messages are [b'message', channel, data] or [b'pmessage', pattern, channel, data]
+        channel = self._channels.get((message[0] == b'pmessage', message[1]))
+        if channel:
+            channel.put_nowait(message)
+
+    def _on_pubsub_connection_lost(self, future):
+        # As with aioredis, subscriptions are not restored
+        for channel in self._channels.values():
+            channel.close()
+        self._channels = {}
+
+    # Commands. These match the signatures and return values of their aioredis equivalents
+
+    def pipeline(self) -> 'Pipeline':
+        return Pipeline(self)
+
+    async def ping(self):
+        return await self.execute(b'PING')
+
+    async def info(self, section='default') -> dict:
+        info = {}
+        section_info = None
+        for line in (await self.execute(b'INFO', section)).decode('utf8').splitlines():
+            if line.startswith('#'):
+                section_info = info.setdefault(line[1:].strip().lower(), {})
+            elif ':' in line and section_info is not None:
+                key, value = line.split(':', 1)
+                section_info[key] = value
+        return info
+
+    async def time(self) -> float:
+        seconds, microseconds = await self.execute(b'TIME')
+        return int(seconds) + int(microseconds) / 1000000
+
+    async def flushdb(self):
+        return await self.execute(b'FLUSHDB') == b'OK'
+
+    async def flushall(self):
+        return await self.execute(b'FLUSHALL') == b'OK'
+
+    async def delete(self, key, *keys) -> int:
+        return await self.execute(b'DEL', key, *keys)
+
+    async def exists(self, key, *keys) -> int:
+        return await self.execute(b'EXISTS', key, *keys)
+
+    async def expire(self, key, timeout) -> bool:
+        if isinstance(timeout, float):
+            return bool(await self.execute(b'PEXPIRE', key, int(timeout * 1000)))
+        return bool(await self.execute(b'EXPIRE', key, timeout))
+
+    async def keys(self, pattern) -> list:
+        return await self.execute(b'KEYS', pattern)
+
+    async def iscan(self, *, match=None, count=None):
+        cursor = b'0'
+        args = ([b'MATCH', match] if match is not None else []) + ([b'COUNT', count] if count is not None else [])
+        while True:
+            cursor, keys = await self.execute(b'SCAN', cursor, *args)
+            for key in keys:
+                yield key
+            if cursor == b'0':
+                return
+
+    async def get(self, key):
+        return await self.execute(b'GET', key)
+
+    async def mget(self, key, *keys) -> list:
+        return await self.execute(b'MGET', key, *keys)
+
+    async def set(self, key, value, *, expire=0, pexpire=0, exist=None) -> bool:
+        args = []
+        if expire:
+            args = [b'EX', expire]
+        if pexpire:
+            args = [b'PX', pexpire]
+        if exist is self.SET_IF_EXIST:
+            args.append(b'XX')
+        elif exist is self.SET_IF_NOT_EXIST:
+            args.append(b'NX')
+        return await self.execute(b'SET', key, value, *args) == b'OK'
+
+    async def rpush(self, key, value, *values) -> int:
+        return await self.execute(b'RPUSH', key, value, *values)
+
+    async def lpop(self, key):
+        return await self.execute(b'LPOP', key)
+
+    async def llen(self, key) -> int:
+        return await self.execute(b'LLEN', key)
+
+    async def lrange(self, key, start, stop) -> list:
+        return await self.execute(b'LRANGE', key, start, stop)
+
+    async def lrem(self, key, count, value) -> int:
+        return await self.execute(b'LREM', key, count, value)
+
+    async def blpop(self, key, *keys, timeout=0) -> Optional[list]:
+        return await self.execute_blocking(b'BLPOP', key, *keys, timeout)
+
+    async def sadd(self, key, member, *members) -> int:
+        return await self.execute(b'SADD', key, member, *members)
+
+    async def srem(self, key, member, *members) -> int:
+        return await self.execute(b'SREM', key, member, *members)
+
+    async def smembers(self, key) -> list:
+        return await self.execute(b'SMEMBERS', key)
+
+    async def zadd(self, key, score, member, *pairs) -> int:
+        return await self.execute(b'ZADD', key, score, member, *pairs)
+
+    async def zrem(self, key, member, *members) -> int:
+        return await self.execute(b'ZREM', key, member, *members)
+
+    async def zrangebyscore(self, key, min=float('-inf'), max=float('inf'), withscores=False,
+                            offset=None, count=None) -> list:
+        args = [b'WITHSCORES'] if withscores else []
+        if offset is not None and count is not None:
+            args += [b'LIMIT', offset, count]
+        reply = await self.execute(b'ZRANGEBYSCORE', key, _score(min), _score(max), *args)
+        if withscores:
+            return [(member, float(score)) for member, score in zip(reply[::2], reply[1::2])]
+        return reply
+
+    async def zremrangebyscore(self, key, min=float('-inf'), max=float('inf')) -> int:
+        return await self.execute(b'ZREMRANGEBYSCORE', key, _score(min), _score(max))
+
+    async def publish(self, channel, message) -> int:
+        return await self.execute(b'PUBLISH', channel, message)
+
+    async def eval(self, script, keys=[], args=[]):
+        return await self.execute(b'EVAL', script, len(keys), *(keys + args))
+
+    async def evalsha(self, digest, keys=[], args=[]):
+        return await self.execute(b'EVALSHA', digest, len(keys), *(keys + args))
+
+    async def xadd(self, stream, fields, message_id=b'*', max_len=None, exact_len=False) -> bytes:
+        args = []
+        if max_len is not None:
+            args = [b'MAXLEN', max_len] if exact_len else [b'MAXLEN', b'~', max_len]
+        args.append(message_id)
+        for field, value in fields.items():
+            args += [field, value]
+        return await self.execute(b'XADD', stream, *args)
+
+    async def xrange(self, stream, start='-', stop='+', count=None) -> list:
+        extra = [b'COUNT', count] if count is not None else []
+        return parse_messages(await self.execute(b'XRANGE', stream, start, stop, *extra))
+
+    async def xrevrange(self, stream, start='+', stop='-', count=None) -> list:
+        extra = [b'COUNT', count] if count is not None else []
+        return parse_messages(await self.execute(b'XREVRANGE', stream, start, stop, *extra))
+
+    async def xread(self, streams, timeout=0, count=None, latest_ids=None) -> list:
+        args = _xread_args(streams, timeout, count, latest_ids)
+        execute = self.execute if timeout is None else self.execute_blocking
+        return parse_messages_by_stream(await execute(b'XREAD', *args))
+
+    async def xread_group(self, group_name, consumer_name, streams, timeout=0, count=None, latest_ids=None) -> list:
+        args = _xread_args(streams, timeout, count, latest_ids)
+        execute = self.execute if timeout is None else self.execute_blocking
+        return parse_messages_by_stream(await execute(b'XREADGROUP', b'GROUP', group_name, consumer_name, *args))
+
+    async def xack(self, stream, group_name, id, *ids) -> int:
+        return await self.execute(b'XACK', stream, group_name, id, *ids)
+
+    async def xpending(self, stream, group_name, start=None, stop=None, count=None, consumer=None) -> list:
+        args = [start, stop, count] if start is not None else []
+        if consumer:
+            args.append(consumer)
+        return await self.execute(b'XPENDING', stream, group_name, *args)
+
+    async def xclaim(self, stream, group_name, consumer_name, min_idle_time, id, *ids) -> list:
+        return parse_messages(
+            await self.execute(b'XCLAIM', stream, group_name, consumer_name, min_idle_time, id, *ids)
+        )
+
+    async def xgroup_create(self, stream, group_name, latest_id='$') -> bool:
+        return await self.execute(b'XGROUP', b'CREATE', stream, group_name, latest_id) == b'OK'
+
+    async def xgroup_destroy(self, stream, group_name) -> int:
+        return await self.execute(b'XGROUP', b'DESTROY', stream, group_name)
+
+    async def xgroup_delconsumer(self, stream, group_name, consumer_name) -> int:
+        return await self.execute(b'XGROUP', b'DELCONSUMER', stream, group_name, consumer_name)
+
+    async def xinfo_groups(self, stream) -> List[dict]:
+        return [_fields_to_dict(group, dict) for group in await self.execute(b'XINFO', b'GROUPS', stream)]
+
+    async def xinfo_consumers(self, stream, group_name) -> List[dict]:
+        consumers = await self.execute(b'XINFO', b'CONSUMERS', stream, group_name)
+        return [_fields_to_dict(consumer, dict) for consumer in consumers]
+
+
+class Pipeline(object):
+    """ Queue up commands to be sent together, as with aioredis' pipeline
+
+    Commands are pipelined implicitly by the client, so this simply gathers them.
+    """
+
+    def __init__(self, client: RedisClient):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+
+        return queue
+
+    async def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        # Tasks first run in the order they are created, so the commands are sent in order.
+        # (gather() creates tasks in an arbitrary order, so we create them ourselves.)
+        tasks = [asyncio.ensure_future(method(*args, **kwargs)) for method, args, kwargs in commands]
+        return await asyncio.gather(*tasks)
+
+
+async def create_redis_client(address='redis://localhost:6379', *, db: int=None, password: str=None,
+                              maxsize: int=100, loop: asyncio.AbstractEventLoop=None) -> RedisClient:
+    """Create a client, connecting to redis to ensure it is available"""
+    client = RedisClient(address, db=db, password=password, maxsize=maxsize, loop=loop)
+    await client.ping()
+    return client
+
+
+def parse_address(address) -> Tuple[object, Optional[int], Optional[str]]:
+    """ Parse a redis address into (address, db, password)
+
+    The address may be a (host, port) tuple, a URL (``redis://:password@host:port/db``),
+    or the path to a unix socket.
+    """
+    if isinstance(address, (tuple, list)):
+        return tuple(address), None, None
+    if address.startswith('unix://'):
+        address = address[7:]
+    if not address.startswith('redis://'):
+        return address, None, None
+
+    url = urlparse(address)
+    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+    db = url.path.strip('/') or query.get('db')
+    return (url.hostname or 'localhost', url.port or 6379), int(db) if db else None, url.password
+
+
+def parse_messages(messages: Optional[list]) -> List[tuple]:
+    """Convert stream entries into (message ID, fields) tuples, skipping entries which have been deleted"""
+    if messages is None:
+        return []
+    return [(message_id, _fields_to_dict(fields)) for message_id, fields in messages if fields is not None]
+
+
+def parse_messages_by_stream(messages_by_stream: Optional[list]) -> List[tuple]:
+    """Convert the reply of XREAD/XREADGROUP into (stream, message ID, fields) tuples"""
+    if messages_by_stream is None:
+        return []
+    return [
+        (stream, message_id, fields)
+        for stream, messages in messages_by_stream
+        for message_id, fields in parse_messages(messages)
+    ]
+
+
+def _fields_to_dict(fields: list, type_=OrderedDict):
+    iterator = iter(fields)
+    return type_(zip(iterator, iterator))
+
+
+def _xread_args(streams, timeout, count, latest_ids) -> list:
+    if latest_ids is None:
+        latest_ids = ['$'] * len(streams)
+    if len(streams) != len(latest_ids):
+        raise ValueError('The streams and latest_ids parameters must be of the same length')
+    args = [b'BLOCK', timeout] if timeout is not None else []
+    if count:
+        args += [b'COUNT', count]
+    return args + [b'STREAMS'] + list(streams) + list(latest_ids)
+
+
+def _score(value: float) -> bytes:
+    if value == float('inf'):
+        return b'+inf'
+    if value == float('-inf'):
+        return b'-inf'
+    return repr(value).encode('utf8') if isinstance(value, float) else b'%d' % value
+
+
+def _to_bytes(value) -> bytes:
+    return value.encode('utf8') if isinstance(value, str) else value
@@ -0,0 +1,191 @@
+""" Encoding & parsing of the redis serialization protocol (RESP)
+
+See https://redis.io/topics/protocol. Values are mapped as follows:
+
+* Simple strings are parsed as bytes. Encode a `SimpleString` to send one
+* Bulk strings are bytes, and a null bulk string is None
+* Integers are ints
+* Arrays are lists, and a null array is None (encode `NULL_ARRAY` to send one)
+* Errors are parsed as `RespError` instances (they are returned, not raised)
+
+"""
+CRLF = b'\r\n'
+
+
+class SimpleString(str):
+    """A string to be encoded as a RESP simple string (e.g. OK), rather than as a bulk string"""
+    pass
+
+
+class RespError(Exception):
+    """An error reply. The message should start with an error code, such as ERR or WRONGTYPE"""
+    pass
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class _NullArray(object):
+
+    def __repr__(self):
+        return 'NULL_ARRAY'
+
+
+NULL_ARRAY = _NullArray()
+
+# Returned by RespParser.get() if there is not yet a complete value to return
+INCOMPLETE = object()
+
+
+class _Incomplete(Exception):
+    pass
+
+
+def encode(value, buffer: bytearray=None) -> bytearray:
+    """Encode the given value, appending it to the buffer (if given)"""
+    if buffer is None:
+        buffer = bytearray()
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        buffer += b'$%d\r\n' % len(value)
+        buffer += value
+        buffer += CRLF
+    elif isinstance(value, SimpleString):
+        buffer += b'+' + value.encode('utf8') + CRLF
+    elif isinstance(value, str):
+        value = value.encode('utf8')
+        buffer += b'$%d\r\n' % len(value)
+        buffer += value
+        buffer += CRLF
+    elif isinstance(value, bool):
+        buffer += b':1\r\n' if value else b':0\r\n'
+    elif isinstance(value, int):
+        buffer += b':%d\r\n' % value
+    elif isinstance(value, float):
+        value = repr(value).encode('utf8')
+        buffer += b'$%d\r\n' % len(value)
+        buffer += value
+        buffer += CRLF
+    elif value is None:
+        buffer += b'$-1\r\n'
+    elif value is NULL_ARRAY:
+        buffer += b'*-1\r\n'
+    elif isinstance(value, (list, tuple)):
+        buffer += b'*%d\r\n' % len(value)
+        for item in value:
+            encode(item, buffer)
+    elif isinstance(value, RespError):
+        buffer += b'-' + str(value).replace('\r\n', ' ').encode('utf8') + CRLF
+    else:
+        raise TypeError(f'Cannot encode {value!r} of type {type(value).__name__} as RESP')
+    return buffer
+
+
+def encode_command(args, buffer: bytearray=None) -> bytearray:
+    """Encode a command (i.e. an array of bulk strings), as sent by a client"""
+    if buffer is None:
+        buffer = bytearray()
+    buffer += b'*%d\r\n' % len(args)
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode('utf8')
+        elif isinstance(arg, int) and not isinstance(arg, bool):
+            arg = b'%d' % arg
+        elif isinstance(arg, float):
+            arg = repr(arg).encode('utf8')
+        elif not isinstance(arg, (bytes, bytearray, memoryview)):
+            raise TypeError(f'Cannot send {arg!r} of type {type(arg).__name__} to redis')
+        buffer += b'$%d\r\n' % len(arg)
+        buffer += arg
+        buffer += CRLF
+    return buffer
+
+
+class RespParser(object):
+    """ Incrementally parse RESP values from a stream of bytes
+
+    Pass data to feed() as it arrives, then call get() until it returns INCOMPLETE.
+    Inline commands (e.g. ``PING\\r\\n``, as typed into telnet) are parsed as a list of
+    bytes if `inline` is true.
+
+    Data is parsed in place, so a value which arrives within a single chunk is never
+    copied (other than when each bulk string is sliced out of it). Chunks are only
+    joined when a value spans them, and a partial value is not parsed again until
+    enough data has arrived to complete the bulk string it was waiting on.
+    """
+
+    def __init__(self, inline: bool=False):
+        self.inline = inline
+        self._buffer = b''
+        self._position = 0
+        # Data received since the buffer was last assembled
+        self._chunks = []
+        self._chunks_length = 0
+        # The number of bytes (from the current position) needed before parsing is worth retrying
+        self._required = 0
+
+    def feed(self, data: bytes):
+        self._chunks.append(data)
+        self._chunks_length += len(data)
+
+    def get(self):
+        """Get the next complete value, or INCOMPLETE"""
+        available = len(self._buffer) - self._position + self._chunks_length
+        if not available or available < self._required:
+            return INCOMPLETE
+
+        if self._chunks:
+            if self._position == len(self._buffer) and len(self._chunks) == 1:
+                self._buffer = self._chunks[0]
+            else:
+                self._buffer = b''.join([self._buffer[self._position:]] + self._chunks)
+            self._position = 0
+            self._chunks = []
+            self._chunks_length = 0
+
+        try:
+            value, self._position = self._parse(self._position)
+        except _Incomplete as e:
+            self._required = e.args[0] - self._position if e.args else 0
+            return INCOMPLETE
+        self._required = 0
+        return value
+
+    def _parse(self, position: int):
+        buffer = self._buffer
+        line_end = buffer.find(CRLF, position)
+        if line_end < 0:
+            raise _Incomplete()
+
+        start = position
+        prefix = buffer[start]
+        position = line_end + 2
+
+        if prefix == 36:  # $
+            length = int(buffer[start + 1:line_end])
+            if length < 0:
+                return None, position
+            end = position + length
+            if len(buffer) < end + 2:
+                raise _Incomplete(end + 2)
+            return buffer[position:end], end + 2
+        elif prefix == 42:  # *
+            length = int(buffer[start + 1:line_end])
+            if length < 0:
+                return None, position
+            items = []
+            for _ in range(length):
+                item, position = self._parse(position)
+                items.append(item)
+            return items, position
+        elif prefix == 58:  # :
+            return int(buffer[start + 1:line_end]), position
+        elif prefix == 43:  # +
+            return buffer[start + 1:line_end], position
+        elif prefix == 45:  # -
+            return RespError(buffer[start + 1:line_end].decode('utf8')), position
+        elif self.inline:
+            return buffer[start:line_end].split(), position
+        else:
+            raise ProtocolError(f'Invalid RESP type prefix {chr(prefix)!r}')
@@ -0,0 +1,207 @@
+""" Append-only, compressed segment files for storing stream messages on disk
+
+Each log is a directory containing a series of segment files. Messages are
+appended in blocks, where each block is a zlib-compressed JSON list of
+``[message_id, fields]`` pairs. Message IDs take the same form as redis
+stream IDs (``<milliseconds>-<sequence>``), and must always increase.
+
+Each segment has an accompanying index file. The index contains one
+fixed-size entry per block, mapping the block's first message ID to
+the block's offset within the segment. Reads memory-map both the index
+and the segment, binary search the index for the relevant block, and then
+decompress blocks sequentially from there.
+
+Layout::
+
+    my_log/
+        00000001515000001000-00000000000000000000.seg
+        00000001515000001000-00000000000000000000.idx
+        00000001515000099000-00000000000000000003.seg
+        00000001515000099000-00000000000000000003.idx
+
+"""
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Sequence, Tuple, Mapping, Iterator, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# The compressed length of the block which follows
+BLOCK_HEADER = struct.Struct('>I')
+# First message ID of the block (milliseconds, sequence), followed by the block's offset
+INDEX_ENTRY = struct.Struct('>QQQ')
+
+Message = Tuple[str, Mapping[str, str]]
+
+
+def parse_message_id(message_id: str) -> Tuple[int, int]:
+    milliseconds, _, n = message_id.partition('-')
+    return int(milliseconds), int(n or 0)
+
+
+class SegmentLog(object):
+
+    def __init__(self, directory, max_segment_size: int=64 * 1024 * 1024, compression_level: int=6):
+        self.directory = Path(directory)
+        self.max_segment_size = max_segment_size
+        self.compression_level = compression_level
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def segment_names(self) -> List[str]:
+        """Get the name of each segment, oldest first"""
+        return sorted(p.stem for p in self.directory.glob('*.seg'))
+
+    def append(self, messages: Sequence[Message]):
+        """Append the given messages to the log as a single block
+
+        Messages must be in ID order, and must all have IDs greater than
+        that of the last message in the log.
+        """
+        if not messages:
+            return
+
+        first_id = parse_message_id(messages[0][0])
+        last_id = self.last_id()
+        if last_id and first_id <= parse_message_id(last_id):
+            raise ValueError(
+                f'Cannot append message {messages[0][0]} to log {self.directory}, as the log '
+                f'already contains message {last_id}. Message IDs must always increase.'
+            )
+
+        block = zlib.compress(
+            json.dumps([[message_id, dict(fields)] for message_id, fields in messages]).encode('utf8'),
+            self.compression_level,
+        )
+
+        segment_names = self.segment_names()
+        segment_name = segment_names[-1] if segment_names else None
+        if not segment_name or (self.directory / f'{segment_name}.seg').stat().st_size >= self.max_segment_size:
+            segment_name = '{:020d}-{:020d}'.format(*first_id)
+
+        with open(self.directory / f'{segment_name}.seg', 'ab') as segment_file, \
+                open(self.directory / f'{segment_name}.idx', 'ab') as index_file:
+            offset = segment_file.tell()
+            segment_file.write(BLOCK_HEADER.pack(len(block)))
+            segment_file.write(block)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+
+            # Only index the block once it is safely on disk
+            index_file.write(INDEX_ENTRY.pack(*first_id, offset))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+        self._last_id = messages[-1][0]
+
+    def last_id(self) -> Optional[str]:
+        """Get the ID of the last message in the log"""
+        if not hasattr(self, '_last_id'):
+            self._last_id = None
+            segment_names = self.segment_names()
+            if segment_names:
+                with self._open_segment(segment_names[-1]) as (segment, index):
+                    if len(index):
+                        _, _, offset = INDEX_ENTRY.unpack_from(index, len(index) - INDEX_ENTRY.size)
+                        self._last_id = self._read_block(segment, offset)[-1][0]
+        return self._last_id
+
+    def first_id(self) -> Optional[str]:
+        """Get the ID of the first message in the log"""
+        segment_names = self.segment_names()
+        if not segment_names:
+            return None
+        milliseconds, n = map(int, segment_names[0].split('-'))
+        return f'{milliseconds}-{n}'
+
+    def read(self, start_id: str='0-0', end_id: str=None) -> Iterator[Message]:
+        """Read messages between the given IDs (inclusive)"""
+        start = parse_message_id(start_id)
+        end = parse_message_id(end_id) if end_id else None
+        segment_names = self.segment_names()
+
+        # Skip any segments which end before our start ID
+        segment_starts = [tuple(map(int, name.split('-'))) for name in segment_names]
+        first_segment = 0
+        for i, segment_start in enumerate(segment_starts):
+            if segment_start <= start:
+                first_segment = i
+
+        for segment_name, segment_start in zip(segment_names[first_segment:], segment_starts[first_segment:]):
+            if end and segment_start > end:
+                return
+
+            with self._open_segment(segment_name) as (segment, index):
+                for offset in self._block_offsets(index, start):
+                    for message_id, fields in self._read_block(segment, offset):
+                        message_position = parse_message_id(message_id)
+                        if message_position < start:
+                            continue
+                        if end and message_position > end:
+                            return
+                        yield message_id, fields
+
+    @contextmanager
+    def lock(self, blocking=True):
+        """Obtain an exclusive lock on this log
+
+        Only one process should append to a log at any one time. If `blocking` is
+        false then BlockingIOError will be raised if the lock is already held.
+        """
+        with open(self.directory / '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                # Another process may have appended since we last looked
+                self.__dict__.pop('_last_id', None)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _open_segment(self, segment_name):
+        with open(self.directory / f'{segment_name}.seg', 'rb') as segment_file, \
+                open(self.directory / f'{segment_name}.idx', 'rb') as index_file:
+            # Only trust blocks which made it into the index
+            index_size = os.fstat(index_file.fileno()).st_size
+            index_size -= index_size % INDEX_ENTRY.size
+            if not index_size or not os.fstat(segment_file.fileno()).st_size:
+                yield b'', b''
+                return
+
+            with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as segment, \
+                    mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                segment_view = memoryview(segment)
+                index_view = memoryview(index)[:index_size]
+                try:
+                    yield segment_view, index_view
+                finally:
+                    segment_view.release()
+                    index_view.release()
+
+    def _block_offsets(self, index, start: Tuple[int, int]) -> Iterator[int]:
+        """Get the offsets of all blocks which may contain messages at or after start"""
+        total = len(index) // INDEX_ENTRY.size
+
+        # Binary search for the last block which starts at or before `start`
+        low, high = 0, total
+        while low < high:
+            middle = (low + high) // 2
+            milliseconds, n, _ = INDEX_ENTRY.unpack_from(index, middle * INDEX_ENTRY.size)
+            if (milliseconds, n) <= start:
+                low = middle + 1
+            else:
+                high = middle
+
+        for i in range(max(low - 1, 0), total):
+            yield INDEX_ENTRY.unpack_from(index, i * INDEX_ENTRY.size)[2]
+
+    def _read_block(self, segment, offset: int) -> List[Message]:
+        length, = BLOCK_HEADER.unpack_from(segment, offset)
+        start = offset + BLOCK_HEADER.size
+        return json.loads(zlib.decompress(segment[start:start + length]).decode('utf8'))
@@ -30,21 +30,34 @@ setup(
         ],
         'lightbus_event_transports': [
             'redis = lightbus:RedisEventTransport',
+            'redis_pubsub = lightbus:RedisPubSubEventTransport',
             'debug = lightbus:DebugEventTransport',
             'direct = lightbus:DirectEventTransport',
+            'unix = lightbus:UnixEventTransport',
+            'file = lightbus:FileEventTransport',
+            'memory = lightbus:MemoryEventTransport',
         ],
         'lightbus_rpc_transports': [
             'redis = lightbus:RedisRpcTransport',
+            'redis_streams = lightbus:RedisStreamRpcTransport',
             'debug = lightbus:DebugRpcTransport',
             'direct = lightbus:DirectRpcTransport',
+            'unix = lightbus:UnixRpcTransport',
+            'tcp = lightbus:TcpRpcTransport',
+            'memory = lightbus:MemoryRpcTransport',
         ],
         'lightbus_result_transports': [
             'redis = lightbus:RedisResultTransport',
+            'redis_pubsub = lightbus:RedisPubSubResultTransport',
             'debug = lightbus:DebugResultTransport',
             'direct = lightbus:DirectResultTransport',
+            'unix = lightbus:UnixResultTransport',
+            'tcp = lightbus:TcpResultTransport',
+            'memory = lightbus:MemoryResultTransport',
         ],
         'lightbus_schema_transports': [
             'redis = lightbus:RedisSchemaTransport',
+            'memory = lightbus:MemorySchemaTransport',
         ]
     }
 )
@@ -105,6 +105,13 @@ def test_mapping_to_named_tuple_apis():
     assert root_config.apis['my_api'].rpc_timeout == 1
 
 
+def test_mapping_to_named_tuple_simple_mapping():
+    root_config = mapping_to_named_tuple({'apis': {'default': {'event_transport': {'redis': {
+        'stream_weights': {'my_api.my_event': 3},
+    }}}}}, RootConfig)
+    assert root_config.apis['default'].event_transport.redis.stream_weights == {'my_api.my_event': 3}
+
+
 def test_mapping_to_named_tuple_unknown_property():
     root_config = mapping_to_named_tuple({'bus': {'foo': 'xyz'}}, RootConfig)
     assert not hasattr(root_config.bus, 'foo')
@@ -18,6 +18,7 @@ import ssl
 import time
 import logging
 import tempfile
+import threading
 import atexit
 
 from collections import namedtuple
@@ -32,6 +33,8 @@ from lightbus.api import registry
 from lightbus.bus import BusNode
 from lightbus.message import EventMessage
 from lightbus.plugins import remove_all_plugins
+from lightbus.utilities import redis_client as lightbus_redis_client
+from lightbus.utilities.fake_redis import FakeRedisServer
 
 TCPAddress = namedtuple('TCPAddress', 'host port')
 
@@ -150,12 +153,23 @@ def new_redis_client(create_redis_client, server, loop):
 
 
 @pytest.fixture
-def new_redis_pool(_closable, create_redis_pool, server, loop):
-    """Useful when you need multiple redis connections."""
+def new_redis_pool(_closable, create_redis_pool, server, loop, request):
+    """Useful when you need multiple redis connections.
+
+    Creates lightbus redis clients rather than aioredis pools if run with --redis-client=lightbus
+    """
     def make_new(**kwargs):
-        redis = loop.run_until_complete(
-            create_redis_pool(server.tcp_address, loop=loop, **kwargs)
-        )
+        if request.config.getoption('--redis-client') == 'lightbus':
+            redis = loop.run_until_complete(
+                lightbus_redis_client.create_redis_client(
+                    server.tcp_address, loop=loop, maxsize=kwargs.get('maxsize', 100)
+                )
+            )
+            _closable(redis)
+        else:
+            redis = loop.run_until_complete(
+                create_redis_pool(server.tcp_address, loop=loop, **kwargs)
+            )
         loop.run_until_complete(redis.flushall())
         return redis
     return make_new
@@ -275,14 +289,25 @@ def pytest_addoption(parser):
 
     parser.addoption('--redis-server', default=default_redis_server,
                      action="append",
-                     help="Path to redis-server executable,"
-                          " defaults to value REDIS_SERVER environment variable, else `%(default)s`")
+                     help="Path to redis-server executable, or 'fake' to use lightbus' stand-in redis server"
+                          " (no redis required), defaults to value REDIS_SERVER environment variable,"
+                          " else `%(default)s`")
+    parser.addoption('--redis-client', default='aioredis', choices=['aioredis', 'lightbus'],
+                     help="The redis client to be used by the redis transports under test")
     parser.addoption('--test-timeout', default=30,
                      type=int,
                      help="The timeout for each individual test")
 
 
+# Use lightbus' stand-in server (FakeRedisServer) rather than a redis-server executable
+FAKE_REDIS_SERVER = 'fake'
+# The redis version whose features the stand-in server provides
+FAKE_REDIS_VERSION = (5, 0, 0)
+
+
 def _read_server_version(redis_bin):
+    if redis_bin == FAKE_REDIS_SERVER:
+        return FAKE_REDIS_VERSION
     args = [redis_bin, '--version']
     with subprocess.Popen(args, stdout=subprocess.PIPE) as proc:
         version = proc.stdout.readline().decode('utf-8')
@@ -309,6 +334,8 @@ TEST_TIMEOUT = 30
 
 
 def format_version(srv):
+    if srv == FAKE_REDIS_SERVER:
+        return 'redis_fake'
     return 'redis_v{}'.format('.'.join(map(str, REDIS_VERSIONS[srv])))
 
 
@@ -346,6 +373,12 @@ def start_redis_server(_proc, request, unused_port, redis_server_bin):
         if name in servers:
             return servers[name]
 
+        if redis_server_bin == FAKE_REDIS_SERVER:
+            assert not config_lines and slaveof is None, "Not supported by the fake redis server"
+            info = RedisServer(name, _start_fake_redis_server(unused_port()), None, version)
+            servers.setdefault(name, info)
+            return info
+
         port = unused_port()
         tcp_address = TCPAddress('localhost', port)
         if sys.platform == 'win32':
@@ -423,6 +456,14 @@ def start_redis_server(_proc, request, unused_port, redis_server_bin):
     return maker
 
 
+def _start_fake_redis_server(port) -> TCPAddress:
+    """Run a FakeRedisServer in its own thread, as it must outlive each test's event loop"""
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(FakeRedisServer().start(host='127.0.0.1', port=port))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return TCPAddress('127.0.0.1', port)
+
+
 @pytest.fixture(scope='session')
 def start_sentinel(_proc, request, unused_port, redis_server_bin):
     """Starts Redis Sentinel instances."""
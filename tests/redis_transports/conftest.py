@@ -15,12 +15,24 @@ def redis_rpc_transport(new_redis_pool, server, loop):
     return lightbus.RedisRpcTransport(redis_pool=new_redis_pool(maxsize=10000))
 
 
+@pytest.fixture
+def redis_stream_rpc_transport(new_redis_pool, server, loop):
+    """Get a redis transport backed by a running redis server."""
+    return lightbus.RedisStreamRpcTransport(redis_pool=new_redis_pool(maxsize=10000), consumer_name='test_consumer')
+
+
 @pytest.fixture
 def redis_result_transport(new_redis_pool, server, loop):
     """Get a redis transport backed by a running redis server."""
     return lightbus.RedisResultTransport(redis_pool=new_redis_pool(maxsize=10000))
 
 
+@pytest.fixture
+def redis_pubsub_result_transport(new_redis_pool, server, loop):
+    """Get a redis transport backed by a running redis server."""
+    return lightbus.RedisPubSubResultTransport(redis_pool=new_redis_pool(maxsize=10000))
+
+
 @pytest.fixture
 def redis_event_transport(new_redis_pool, server, loop):
     """Get a redis transport backed by a running redis server."""
@@ -28,6 +40,12 @@ def redis_event_transport(new_redis_pool, server, loop):
                                         consumer_group_prefix='test_cg', consumer_name='test_consumer')
 
 
+@pytest.fixture
+def redis_pubsub_event_transport(new_redis_pool, server, loop):
+    """Get a redis transport backed by a running redis server."""
+    return lightbus.RedisPubSubEventTransport(redis_pool=new_redis_pool(maxsize=10000))
+
+
 @pytest.fixture
 def redis_schema_transport(new_redis_pool, server, loop):
     """Get a redis transport backed by a running redis server."""
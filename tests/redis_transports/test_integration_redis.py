@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import time
+from typing import AsyncIterator
 
 import jsonschema
 import pytest
@@ -7,7 +9,8 @@ import lightbus
 from lightbus import BusNode
 from lightbus.api import registry
 from lightbus.config import Config
-from lightbus.exceptions import LightbusTimeout, LightbusServerError
+from lightbus.config.structure import RpcCacheConfig
+from lightbus.exceptions import LightbusTimeout, LightbusServerError, InvalidName
 from lightbus.plugins import manually_set_plugins
 from lightbus.transports.redis import StreamUse
 from lightbus.utilities.async import cancel
@@ -63,6 +66,24 @@ async def test_rpc(bus: lightbus.BusNode, dummy_api):
     assert call_task.result() == 'value: Hello! 😎'
 
 
+@pytest.mark.run_loop
+async def test_rpc_pubsub_results(bus: lightbus.BusNode, dummy_api, redis_pubsub_result_transport):
+    """Full rpc call integration test, with results returned via pub/sub"""
+    bus.bus_client.transport_registry.set_result_transport('default', redis_pubsub_result_transport)
+
+    async def co_call_rpc():
+        await asyncio.sleep(0.1)
+        return await bus.my.dummy.my_proc.call_async(field='Hello! 😎')
+
+    async def co_consume_rpcs():
+        return await bus.bus_client.consume_rpcs(apis=[dummy_api])
+
+    (call_task, ), (consume_task, ) = await asyncio.wait([co_call_rpc(), co_consume_rpcs()], return_when=asyncio.FIRST_COMPLETED)
+    consume_task.cancel()
+    assert call_task.result() == 'value: Hello! 😎'
+    await redis_pubsub_result_transport.close()
+
+
 @pytest.mark.run_loop
 async def test_rpc_timeout(bus: lightbus.BusNode, dummy_api):
     """Full rpc call integration test"""
@@ -81,6 +102,207 @@ async def test_rpc_timeout(bus: lightbus.BusNode, dummy_api):
         call_task.result()
 
 
+@pytest.mark.run_loop
+async def test_rpc_timeout_cancels_call(bus: lightbus.BusNode, dummy_api, redis_client):
+    """Calls which time out should be removed from the queue"""
+    with pytest.raises(LightbusTimeout):
+        await bus.my.dummy.my_proc.call_async(field='x', bus_options={'timeout': 0.1})
+
+    assert await redis_client.llen('my.dummy:rpc_queue') == 0
+    assert not await redis_client.keys('rpc_expiry_key:*')
+
+
+@pytest.mark.run_loop
+async def test_rpc_batched(bus: lightbus.BusNode):
+    """Concurrent calls to a batched RPC should be sent as a single call"""
+    received_calls = []
+
+    class BatchedApi(lightbus.Api):
+        class Meta:
+            name = 'my.batched'
+
+        @lightbus.batched(max_batch_size=3)
+        def double(self, calls: list) -> list:
+            received_calls.append(calls)
+            return [call['n'] * 2 for call in calls]
+
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[registry.get('my.batched')]))
+    results = await asyncio.gather(*[bus.my.batched.double.call_async(n=n) for n in range(5)])
+    await cancel(consume_task)
+
+    assert results == [0, 2, 4, 6, 8]
+    assert [len(calls) for calls in received_calls] == [3, 2]
+    assert sorted(call['n'] for calls in received_calls for call in calls) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.run_loop
+async def test_call_many(bus: lightbus.BusNode, dummy_api):
+    """Results and errors should be returned in order"""
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    results = await bus.call_many_async([
+        (bus.my.dummy.my_proc, {'field': 'a'}),
+        (bus.my.dummy.general_error, {}),
+        (bus.my.dummy.my_proc, {'field': 'b'}),
+        (bus.my.dummy._private, {}),
+    ])
+    await cancel(consume_task)
+
+    assert results[0] == 'value: a'
+    assert isinstance(results[1], LightbusServerError)
+    assert results[2] == 'value: b'
+    assert isinstance(results[3], InvalidName)
+
+
+@pytest.mark.run_loop
+async def test_call_many_timeout(bus: lightbus.BusNode, dummy_api, redis_client):
+    results = await bus.call_many_async([
+        (bus.my.dummy.my_proc, {'field': 'a'}),
+        (bus.my.dummy.my_proc, {'field': 'b'}),
+    ], bus_options={'timeout': 0.1})
+
+    assert [type(result) for result in results] == [LightbusTimeout, LightbusTimeout]
+    # Both calls should have been cancelled
+    assert await redis_client.llen('my.dummy:rpc_queue') == 0
+
+
+@pytest.mark.run_loop
+async def test_rpc_cache(bus: lightbus.BusNode, dummy_api):
+    bus.bus_client.config.api('my.dummy').rpc_cache = {
+        'my_proc': RpcCacheConfig(invalidate_on={'my.dummy.my_event': ['field']}),
+    }
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[dummy_api]))
+
+    assert await bus.my.dummy.my_proc.call_async(field='a') == 'value: a'
+    assert await bus.my.dummy.my_proc.call_async(field='a') == 'value: a'
+    assert await bus.my.dummy.my_proc.call_async(field='b') == 'value: b'
+    cache = bus.bus_client._rpc_caches[('my.dummy', 'my_proc')]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # Only the result with the matching parameters should be cleared
+    await bus.my.dummy.my_event.fire_async(field='a')
+    await asyncio.sleep(0.1)
+    assert len(cache) == 1
+    await bus.my.dummy.my_proc.call_async(field='a')
+    await bus.my.dummy.my_proc.call_async(field='b')
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    await cancel(consume_task)
+
+
+@pytest.mark.run_loop
+async def test_rpc_cache_invalidated_during_call(bus: lightbus.BusNode, dummy_api):
+    """A result is not cached if it was invalidated whilst it was being fetched"""
+    bus.bus_client.config.api('my.dummy').rpc_cache = {
+        'my_proc': RpcCacheConfig(invalidate_on={'my.dummy.my_event': ['field']}),
+    }
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    call_rpc_remote = bus.bus_client._call_rpc_remote_single_flight
+
+    async def call_then_invalidate(*args, **kwargs):
+        result = await call_rpc_remote(*args, **kwargs)
+        # The result changes (and the cache is invalidated) before we receive the result
+        await bus.my.dummy.my_event.fire_async(field='a')
+        await asyncio.sleep(0.1)
+        return result
+
+    bus.bus_client._call_rpc_remote_single_flight = call_then_invalidate
+    assert await bus.my.dummy.my_proc.call_async(field='a') == 'value: a'
+    cache = bus.bus_client._rpc_caches[('my.dummy', 'my_proc')]
+    assert len(cache) == 0
+    assert bus.bus_client._rpc_cache_fills[('my.dummy', 'my_proc')] == {}
+
+    # Results not invalidated are cached as normal
+    bus.bus_client._call_rpc_remote_single_flight = call_rpc_remote
+    await bus.my.dummy.my_proc.call_async(field='a')
+    assert len(cache) == 1
+
+    await cancel(consume_task)
+
+
+@pytest.mark.run_loop
+async def test_rpc_cached_shared(bus: lightbus.BusNode, redis_client):
+    calls = []
+
+    class CachedApi(lightbus.Api):
+        class Meta:
+            name = 'my.cached'
+
+        @lightbus.cached(ttl=60, shared=True)
+        def square(self, n: int) -> int:
+            calls.append(n)
+            return n ** 2
+
+    call = bus.bus_client.call_rpc_local
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+    # Drop any in-process state, as if another worker were serving the call
+    bus.bus_client._local_rpc_caches.clear()
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+
+    assert calls == [2]
+    assert len(await redis_client.keys('my.cached.square:rpc_cache:*')) == 1
+
+
+@pytest.mark.run_loop
+async def test_rpc_stream(bus: lightbus.BusNode):
+    class StreamingApi(lightbus.Api):
+        class Meta:
+            name = 'my.streaming'
+
+        async def count(self, n: int) -> AsyncIterator[int]:
+            for i in range(n):
+                yield i
+                if i == 99:
+                    raise ValueError('Too far')
+
+        def total(self, n: int) -> int:
+            return n
+
+    api = registry.get('my.streaming')
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[api]))
+
+    assert [i async for i in bus.my.streaming.count.stream_async(n=3)] == [0, 1, 2]
+    # Non-streaming callers receive the entire result
+    assert await bus.my.streaming.count.call_async(n=3) == [0, 1, 2]
+    # Procedures which are not generators are streamed as a single value
+    assert [i async for i in bus.my.streaming.total.stream_async(n=3)] == [3]
+
+    received = []
+    with pytest.raises(LightbusServerError):
+        async for i in bus.my.streaming.count.stream_async(n=200):
+            received.append(i)
+    assert received == list(range(100))
+
+    await cancel(consume_task)
+
+
+@pytest.mark.run_loop
+async def test_rpc_deadline(bus: lightbus.BusNode):
+    deadlines = []
+
+    class DeadlineApi(lightbus.Api):
+        class Meta:
+            name = 'my.deadline'
+
+        def my_proc(self):
+            deadlines.append(lightbus.rpc_deadline.get())
+
+    consume_task = asyncio.ensure_future(bus.bus_client.consume_rpcs(apis=[registry.get('my.deadline')]))
+
+    start = time.time()
+    await bus.my.deadline.my_proc.call_async(bus_options={'timeout': 2})
+    assert start + 1.9 < deadlines[0] < time.time() + 2
+
+    # Calls whose deadline has passed are skipped
+    rpc_transport = bus.bus_client.transport_registry.get_rpc_transport('my.deadline')
+    rpc_message = lightbus.RpcMessage(api_name='my.deadline', procedure_name='my_proc', kwargs={},
+                                      return_path='redis+key://abc', deadline=time.time() - 1)
+    await rpc_transport.call_rpc(rpc_message, options={})
+    await asyncio.sleep(0.1)
+    assert len(deadlines) == 1
+
+    await cancel(consume_task)
+
+
 @pytest.mark.run_loop
 async def test_rpc_error(bus: lightbus.BusNode, dummy_api):
     """Test what happens when the remote procedure throws an error"""
@@ -128,6 +350,44 @@ async def test_event(bus: lightbus.BusNode, dummy_api, stream_use):
     assert received_event_name == 'my_event'
 
 
+@pytest.mark.run_loop
+async def test_event_pubsub(bus: lightbus.BusNode, dummy_api, redis_pubsub_event_transport):
+    """Full event integration test, with events broadcast via pub/sub to every listener"""
+    bus.bus_client.transport_registry.set_event_transport('my.dummy', redis_pubsub_event_transport)
+    manually_set_plugins({})
+    received = []
+
+    async def listener(api_name, event_name, **kwargs):
+        received.append((api_name, event_name, kwargs))
+
+    # Listeners in different consumer groups both receive the event
+    await bus.my.dummy.my_event.listen_async(listener)
+    await bus.my.dummy.my_event.listen_async(listener)
+    await asyncio.sleep(0.05)
+    await bus.my.dummy.my_event.fire_async(field='Hello! 😎')
+    await asyncio.sleep(0.05)
+
+    assert received == [('my.dummy', 'my_event', {'field': 'Hello! 😎'})] * 2
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_event_replay(bus: lightbus.BusNode, dummy_api):
+    """Historical events can be replayed to a listener"""
+    manually_set_plugins({})
+    for x in range(0, 5):
+        await bus.my.dummy.my_event.fire_async(field=str(x))
+
+    received = []
+
+    def listener(api_name, event_name, field):
+        received.append(field)
+
+    total = await bus.my.dummy.my_event.replay_async(listener, bus_options={'page_size': 2, 'parallelism': 2})
+    assert total == 5
+    assert received == ['0', '1', '2', '3', '4']
+
+
 @pytest.mark.run_loop
 async def test_rpc_ids(bus: lightbus.BusNode, dummy_api, mocker):
     """Ensure the rpc_id comes back correctly"""
@@ -5,10 +5,12 @@ from datetime import datetime
 import pytest
 
 from lightbus.config import Config
+from lightbus.exceptions import InvalidEventFilter, InvalidParameters
 from lightbus.message import EventMessage
 from lightbus.serializers import ByFieldMessageSerializer, ByFieldMessageDeserializer, BlobMessageSerializer, \
     BlobMessageDeserializer
-from lightbus.transports.redis import RedisEventTransport, StreamUse
+from lightbus.transports.redis import RedisEventTransport, StreamUse, StreamFairness, normalise_filters, \
+    split_stream_id_range
 from lightbus.utilities.async import cancel
 
 pytestmark = pytest.mark.unit
@@ -523,3 +525,528 @@ async def test_consume_events_per_api_stream(loop, redis_event_transport: RedisE
     assert set(event_names) == {'my_event1', 'my_event2', 'my_event3'}
 
     await cancel(task1, task2, task3)
+
+
+@pytest.mark.run_loop
+async def test_consume_events_filtered(loop, redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    """Messages not matching the filters should be discarded within redis"""
+    messages = []
+
+    async def co_consume():
+        consumer = redis_event_transport.consume(
+            [('my.dummy', 'my_event')], {}, loop,
+            consumer_group='filtered',
+            filters={'field': ['a', 'c']},
+        )
+        async for message_ in consumer:
+            messages.append(message_)
+            await consumer.__anext__()
+
+    task = asyncio.ensure_future(co_consume())
+    await asyncio.sleep(0.1)
+
+    for value in (b'"a"', b'"b"', b'"c"'):
+        await redis_client.xadd('my.dummy.my_event:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': b'my_event',
+            b':field': value,
+        })
+    await asyncio.sleep(0.1)
+
+    assert [m.kwargs['field'] for m in messages] == ['a', 'c']
+
+    # Everything has been acknowledged, including the non-matching message
+    pending = await redis_client.xpending('my.dummy.my_event:stream', 'test_cg-filtered')
+    assert pending[0] == 0
+
+    await cancel(task)
+
+
+@pytest.mark.run_loop
+async def test_consume_events_filtered_per_api_stream(loop, redis_event_transport: RedisEventTransport,
+                                                      redis_client, dummy_api):
+    redis_event_transport.stream_use = StreamUse.PER_API
+    messages = []
+
+    async def co_consume():
+        consumer = redis_event_transport.consume(
+            [('my.dummy', 'my_event1')], {}, loop, filters={'field': 'a'}
+        )
+        async for message_ in consumer:
+            messages.append(message_)
+            await consumer.__anext__()
+
+    task = asyncio.ensure_future(co_consume())
+    await asyncio.sleep(0.1)
+
+    for event_name, value in ((b'my_event1', b'"a"'), (b'my_event2', b'"a"'), (b'my_event1', b'"b"')):
+        await redis_client.xadd('my.dummy.*:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': event_name,
+            b':field': value,
+        })
+    await asyncio.sleep(0.1)
+
+    assert len(messages) == 1
+    assert messages[0].event_name == 'my_event1'
+    assert messages[0].kwargs == {'field': 'a'}
+
+    await cancel(task)
+
+
+@pytest.mark.run_loop
+async def test_consume_events_filtered_pending(loop, redis_event_transport: RedisEventTransport,
+                                               redis_client, dummy_api):
+    """Pending messages do not pass through redis' filtering, so should be filtered client side"""
+    for value in (b'"a"', b'"b"'):
+        await redis_client.xadd('my.dummy.my_event:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': b'my_event',
+            b':field': value,
+        })
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'test_cg-filtered', latest_id='0')
+    # Claim both as our consumer, but don't acknowledge them
+    await redis_client.xread_group('test_cg-filtered', 'test_consumer', ['my.dummy.my_event:stream'], latest_ids=['>'])
+
+    messages = []
+
+    async def co_consume():
+        consumer = redis_event_transport.consume(
+            [('my.dummy', 'my_event')], {}, loop, consumer_group='filtered', filters={'field': 'a'}
+        )
+        async for message_ in consumer:
+            messages.append(message_)
+
+    task = asyncio.ensure_future(co_consume())
+    await asyncio.sleep(0.1)
+
+    assert [m.kwargs['field'] for m in messages] == ['a']
+
+    await cancel(task)
+
+
+def test_normalise_filters():
+    assert normalise_filters(None) is None
+    assert normalise_filters({'a': 1, 'b': ('x', 'y')}) == {'a': [1], 'b': ['x', 'y']}
+
+
+def test_normalise_filters_invalid():
+    with pytest.raises(InvalidEventFilter):
+        normalise_filters(['a'])
+    with pytest.raises(InvalidEventFilter):
+        normalise_filters({'a': {'nested': 'dict'}})
+
+
+@pytest.mark.run_loop
+async def test_consume_events_round_robin(loop, redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    """A busy stream should not prevent messages on a quieter stream being handled"""
+    redis_event_transport.stream_fairness = StreamFairness.ROUND_ROBIN
+    redis_event_transport.stream_weights = {'my.dummy.my_event1': 2}
+
+    for _ in range(0, 6):
+        await redis_client.xadd('my.dummy.my_event1:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': b'my_event1',
+            b':field': b'"value"',
+        })
+    await redis_client.xadd('my.dummy.my_event2:stream', fields={
+        b'api_name': b'my.dummy',
+        b'event_name': b'my_event2',
+        b':field': b'"value"',
+    })
+
+    event_names = []
+
+    async def co_consume():
+        consumer = redis_event_transport.consume(
+            [('my.dummy', 'my_event1'), ('my.dummy', 'my_event2')], {}, loop, since='0'
+        )
+        async for message_ in consumer:
+            event_names.append(message_.event_name)
+            await consumer.__anext__()
+
+    task = asyncio.ensure_future(co_consume())
+    await asyncio.sleep(0.1)
+    await cancel(task)
+
+    assert event_names[:3] == ['my_event1', 'my_event1', 'my_event2']
+    assert len(event_names) == 7
+
+
+def test_stream_count_budget(redis_event_transport: RedisEventTransport):
+    redis_event_transport.stream_fairness = StreamFairness.BUDGET
+    redis_event_transport.batch_size = 10
+    redis_event_transport.stream_weights = {'my.api.firehose': 4}
+    stream_names = ['my.api.firehose:stream', 'my.api.alert:stream']
+    assert redis_event_transport._get_stream_count('my.api.firehose:stream', stream_names) == 8
+    assert redis_event_transport._get_stream_count('my.api.alert:stream', stream_names) == 2
+
+
+def test_interleave_stream_messages_rotates(redis_event_transport: RedisEventTransport):
+    redis_event_transport.stream_fairness = StreamFairness.ROUND_ROBIN
+    stream_messages = [
+        (b'a:stream', '1-0', {}),
+        (b'a:stream', '2-0', {}),
+        (b'b:stream', '1-0', {}),
+    ]
+    interleave = redis_event_transport._interleave_stream_messages
+    assert [m[:2] for m in interleave(stream_messages, ['a:stream', 'b:stream'], rotation=0)] == [
+        (b'a:stream', '1-0'), (b'b:stream', '1-0'), (b'a:stream', '2-0'),
+    ]
+    assert [m[:2] for m in interleave(stream_messages, ['a:stream', 'b:stream'], rotation=1)] == [
+        (b'b:stream', '1-0'), (b'a:stream', '1-0'), (b'a:stream', '2-0'),
+    ]
+
+
+async def _add_replay_messages(redis_client, stream, event_name, milliseconds):
+    for ms in milliseconds:
+        await redis_client.xadd(
+            stream,
+            fields={
+                b'api_name': b'my.dummy',
+                b'event_name': event_name,
+                b':field': '"{}"'.format(ms).encode('utf8'),
+            },
+            message_id='{}-0'.format(ms),
+        )
+
+
+@pytest.mark.run_loop
+async def test_replay_ordered(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event1:stream', b'my_event1', range(1000, 1100, 3))
+    await _add_replay_messages(redis_client, 'my.dummy.my_event2:stream', b'my_event2', range(1001, 1100, 5))
+
+    replay = redis_event_transport.replay(
+        [('my.dummy', 'my_event1'), ('my.dummy', 'my_event2')],
+        parallelism=4,
+        page_size=3,
+    )
+    values = [int(m.kwargs['field']) async for m in replay]
+    assert values == sorted(list(range(1000, 1100, 3)) + list(range(1001, 1100, 5)))
+
+
+@pytest.mark.run_loop
+async def test_replay_unordered(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1100))
+
+    replay = redis_event_transport.replay([('my.dummy', 'my_event')], ordered=False, parallelism=3, page_size=7)
+    values = [int(m.kwargs['field']) async for m in replay]
+    assert sorted(values) == list(range(1000, 1100))
+
+
+@pytest.mark.run_loop
+async def test_replay_since_until(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1010))
+
+    replay = redis_event_transport.replay([('my.dummy', 'my_event')], since='1003-0', until='1006-0')
+    values = [int(m.kwargs['field']) async for m in replay]
+    assert values == [1003, 1004, 1005, 1006]
+
+
+@pytest.mark.run_loop
+async def test_replay_empty_stream(redis_event_transport: RedisEventTransport, dummy_api):
+    replay = redis_event_transport.replay([('my.dummy', 'my_event')])
+    assert [m async for m in replay] == []
+
+
+@pytest.mark.run_loop
+async def test_replay_ranges_start_at_stream(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    """The range scanned in parallel starts at the stream's first message, not at the epoch"""
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1100))
+    scanned_ranges = []
+    scan_stream_range = redis_event_transport._scan_stream_range
+
+    def record_range(stream, start_id, end_id, page_size):
+        scanned_ranges.append((start_id, end_id))
+        return scan_stream_range(stream, start_id, end_id, page_size)
+
+    redis_event_transport._scan_stream_range = record_range
+    replay = redis_event_transport.replay([('my.dummy', 'my_event')], parallelism=4)
+    assert [int(m.kwargs['field']) async for m in replay] == list(range(1000, 1100))
+    assert sorted(scanned_ranges) == [
+        ('1000-0', '1024-18446744073709551615'),
+        ('1025-0', '1049-18446744073709551615'),
+        ('1050-0', '1074-18446744073709551615'),
+        ('1075-0', '1099-0'),
+    ]
+
+
+@pytest.mark.run_loop
+async def test_replay_since_dollar(redis_event_transport: RedisEventTransport, dummy_api):
+    with pytest.raises(InvalidParameters):
+        await redis_event_transport.replay([('my.dummy', 'my_event')], since='$').__anext__()
+
+
+def test_split_stream_id_range():
+    assert split_stream_id_range('1000-5', '1009-2', parts=2) == [
+        ('1000-5', '1004-18446744073709551615'),
+        ('1005-0', '1009-2'),
+    ]
+    # Never more parts than milliseconds
+    assert split_stream_id_range('1000-0', '1000-9', parts=4) == [('1000-0', '1000-9')]
+    assert split_stream_id_range('1001-0', '1000-0', parts=4) == []
+
+
+@pytest.mark.run_loop
+async def test_archive_stream(redis_event_transport: RedisEventTransport, redis_client, dummy_api, tmpdir):
+    redis_event_transport.archive_directory = str(tmpdir)
+    redis_event_transport.max_stream_length = 10
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1025))
+
+    assert await redis_event_transport.archive_stream('my.dummy.my_event:stream') == 15
+    assert await redis_client.execute(b'XLEN', 'my.dummy.my_event:stream') == 10
+    archived = list(redis_event_transport._get_archive('my.dummy.my_event:stream').read())
+    assert [message_id for message_id, _ in archived] == ['{}-0'.format(ms) for ms in range(1000, 1015)]
+
+    # Nothing more to do
+    assert await redis_event_transport.archive_stream('my.dummy.my_event:stream') == 0
+
+
+@pytest.mark.run_loop
+async def test_read_archive(redis_event_transport: RedisEventTransport, redis_client, dummy_api, tmpdir):
+    redis_event_transport.archive_directory = str(tmpdir)
+    redis_event_transport.max_stream_length = 5
+    # Read in several chunks
+    redis_event_transport.archive_read_size = 4
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1025))
+    await redis_event_transport.archive_stream('my.dummy.my_event:stream')
+
+    archived = redis_event_transport._read_archive('my.dummy.my_event:stream', '1003-0', before_id='1018-0')
+    assert [message_id async for _, message_id, _ in archived] == [
+        '{}-0'.format(ms) for ms in range(1003, 1018)
+    ]
+
+    archived = redis_event_transport._read_archive('my.dummy.my_event:stream', '0-0', end_id='1010-0')
+    assert len([m async for m in archived]) == 11
+
+
+@pytest.mark.run_loop
+async def test_replay_archived(redis_event_transport: RedisEventTransport, redis_client, dummy_api, tmpdir):
+    redis_event_transport.archive_directory = str(tmpdir)
+    redis_event_transport.max_stream_length = 10
+    await _add_replay_messages(redis_client, 'my.dummy.my_event1:stream', b'my_event1', range(1000, 1050, 2))
+    await _add_replay_messages(redis_client, 'my.dummy.my_event2:stream', b'my_event2', range(1001, 1050, 2))
+    await redis_event_transport.archive_stream('my.dummy.my_event1:stream')
+    await redis_event_transport.archive_stream('my.dummy.my_event2:stream')
+
+    listen_for = [('my.dummy', 'my_event1'), ('my.dummy', 'my_event2')]
+    replay = redis_event_transport.replay(listen_for, since='1005-0', page_size=3)
+    assert [int(m.kwargs['field']) async for m in replay] == list(range(1005, 1050))
+
+    replay = redis_event_transport.replay(listen_for, ordered=False)
+    assert sorted([int(m.kwargs['field']) async for m in replay]) == list(range(1000, 1050))
+
+
+@pytest.mark.run_loop
+async def test_consume_events_since_archived(redis_event_transport: RedisEventTransport, redis_client,
+                                             dummy_api, tmpdir, loop):
+    redis_event_transport.archive_directory = str(tmpdir)
+    redis_event_transport.max_stream_length = 3
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1010))
+    await redis_event_transport.archive_stream('my.dummy.my_event:stream')
+
+    consumer = redis_event_transport.consume([('my.dummy', 'my_event')], {}, since='1004-0',
+                                             forever=False, loop=loop)
+
+    values = []
+
+    async def co():
+        async for m in consumer:
+            if m is not True:
+                values.append(int(m.kwargs['field']))
+    task = asyncio.ensure_future(co())
+    await asyncio.sleep(0.1)
+    await cancel(task)
+
+    assert values == list(range(1005, 1010))
+
+
+async def _add_consumer(redis_client, stream, group, consumer, count=None):
+    await redis_client.xread_group(group, consumer, [stream], latest_ids=['>'], count=count, timeout=None)
+
+
+async def _add_group(transport: RedisEventTransport, redis_client, stream, group, prefix='test_cg'):
+    """Create a consumer group as created by a transport with the given prefix"""
+    await redis_client.xgroup_create(stream, group, latest_id='0')
+    await redis_client.sadd(
+        transport.consumer_groups_key, transport._get_consumer_groups_member(prefix, stream, group)
+    )
+
+
+@pytest.mark.run_loop
+async def test_collect_garbage_abandoned_group(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1003))
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'test_cg-old')
+    # Never recorded
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'other_service-old', latest_id='0')
+    # A service whose name starts with our prefix
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'test_cg-other-old',
+                     prefix='test_cg-other')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-old', 'consumer1')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'other_service-old', 'consumer1')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-other-old', 'consumer1')
+    await asyncio.sleep(0.05)
+
+    stats = await redis_event_transport.collect_garbage(idle_timeout=0.02)
+    assert stats == dict(groups_deleted=1, consumers_deleted=0, messages_moved=0, messages_dropped=3)
+
+    # Only groups created by us are deleted
+    groups = await redis_client.xinfo_groups('my.dummy.my_event:stream')
+    assert sorted(g[b'name'] for g in groups) == [b'other_service-old', b'test_cg-other-old']
+    members = await redis_client.smembers('lightbus:consumer_groups')
+    assert members == [b'["test_cg-other", "my.dummy.my_event:stream", "test_cg-other-old"]']
+
+
+@pytest.mark.run_loop
+async def test_collect_garbage_prefixes(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1003))
+    # Created before groups were recorded
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'other-old', latest_id='0')
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'other-service-old',
+                     prefix='other-service')
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'test_cg-old')
+    await asyncio.sleep(0.05)
+
+    stats = await redis_event_transport.collect_garbage(idle_timeout=0.02, prefixes=['other'])
+    assert stats['groups_deleted'] == 1
+    groups = await redis_client.xinfo_groups('my.dummy.my_event:stream')
+    assert sorted(g[b'name'] for g in groups) == [b'other-service-old', b'test_cg-old']
+
+    stats = await redis_event_transport.collect_garbage(idle_timeout=0.02, all_groups=True)
+    assert stats['groups_deleted'] == 2
+    assert await redis_client.xinfo_groups('my.dummy.my_event:stream') == []
+    # The record is deleted once empty
+    assert not await redis_client.exists('lightbus:consumer_groups')
+
+
+@pytest.mark.run_loop
+async def test_collect_garbage_forgets_missing_groups(redis_event_transport: RedisEventTransport, redis_client):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1003))
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'test_cg-group')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'consumer1')
+    await redis_client.sadd(
+        'lightbus:consumer_groups',
+        redis_event_transport._get_consumer_groups_member('other', 'my.dummy.my_event:stream', 'other-gone'),
+        redis_event_transport._get_consumer_groups_member('test_cg', 'my.dummy.gone:stream', 'test_cg-gone'),
+    )
+
+    await redis_event_transport.collect_garbage(idle_timeout=60)
+    members = await redis_client.smembers('lightbus:consumer_groups')
+    assert members == [b'["test_cg", "my.dummy.my_event:stream", "test_cg-group"]']
+
+
+@pytest.mark.run_loop
+async def test_consume_records_consumer_group(redis_event_transport: RedisEventTransport, redis_client,
+                                              dummy_api, loop):
+    consumer = redis_event_transport.consume([('my.dummy', 'my_event')], {}, consumer_group='group', loop=loop)
+    task = asyncio.ensure_future(consumer.__anext__())
+    await asyncio.sleep(0.05)
+    await cancel(task)
+
+    members = await redis_client.smembers('lightbus:consumer_groups')
+    assert members == [b'["test_cg", "my.dummy.my_event:stream", "test_cg-group"]']
+
+
+@pytest.mark.run_loop
+async def test_collect_garbage_abandoned_consumer(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1003))
+    await _add_group(redis_event_transport, redis_client, 'my.dummy.my_event:stream', 'test_cg-group')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'old_consumer', count=2)
+    await asyncio.sleep(0.05)
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'new_consumer')
+    await redis_client.sadd('test_cg-group:heartbeating_consumers', 'old_consumer', 'new_consumer')
+
+    stats = await redis_event_transport.collect_garbage(idle_timeout=0.02)
+    assert stats == dict(groups_deleted=0, consumers_deleted=1, messages_moved=2, messages_dropped=0)
+
+    consumers = await redis_client.xinfo_consumers('my.dummy.my_event:stream', 'test_cg-group')
+    assert [(c[b'name'], c[b'pending']) for c in consumers] == [(b'new_consumer', 3)]
+    assert await redis_client.smembers('test_cg-group:heartbeating_consumers') == [b'new_consumer']
+
+    # Moved messages retain their idle time, so they can be reclaimed as normal
+    pending = await redis_client.xpending('my.dummy.my_event:stream', 'test_cg-group', '-', '+', 10)
+    assert [p[2] >= 50 for p in pending] == [True, True, False]
+
+
+@pytest.mark.run_loop
+async def test_touch_consumer(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1003))
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'test_cg-group', latest_id='0')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'test_consumer')
+    await asyncio.sleep(0.05)
+
+    await redis_event_transport._touch_consumer(['my.dummy.my_event:stream'], 'test_cg-group')
+    consumers = await redis_client.xinfo_consumers('my.dummy.my_event:stream', 'test_cg-group')
+    assert consumers[0][b'idle'] < 50
+    assert consumers[0][b'pending'] == 3
+
+
+@pytest.mark.run_loop
+async def test_heartbeat(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    redis_event_transport.heartbeat_interval = 2
+    await redis_event_transport._send_heartbeat(['my.dummy.my_event:stream'], 'test_cg-group')
+    ttl = await redis_client.pttl('test_cg-group:test_consumer:consumer_heartbeat')
+    assert 5000 < ttl <= 6000
+    assert await redis_client.smembers('test_cg-group:heartbeating_consumers') == [b'test_consumer']
+
+    await redis_event_transport._stop_heartbeat('test_cg-group')
+    assert not await redis_client.exists('test_cg-group:test_consumer:consumer_heartbeat')
+
+
+@pytest.mark.run_loop
+async def test_claim_from_dead_consumers(redis_event_transport: RedisEventTransport, redis_client, dummy_api):
+    redis_event_transport.heartbeat_interval = 0.02
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1004))
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'test_cg-group', latest_id='0')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'dead_consumer', count=2)
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'live_consumer', count=2)
+    await redis_client.set('test_cg-group:live_consumer:consumer_heartbeat', b'1')
+    await redis_client.sadd('test_cg-group:heartbeating_consumers', 'dead_consumer', 'live_consumer')
+    await asyncio.sleep(0.05)
+
+    claimed = redis_event_transport._claim_from_dead_consumers(
+        ['my.dummy.my_event:stream'], 'test_cg-group', {'my_event'}
+    )
+    messages = [m async for m in claimed]
+    assert [m.kwargs['field'] for m in messages if m is not True] == ['1000', '1001']
+    assert messages.count(True) == 2
+
+    # Claimed messages are acknowledged, the live consumer's messages are untouched
+    pending = await redis_client.xpending('my.dummy.my_event:stream', 'test_cg-group', '-', '+', 10)
+    assert [(p[0], p[1]) for p in pending] == [(b'1002-0', b'live_consumer'), (b'1003-0', b'live_consumer')]
+
+
+@pytest.mark.run_loop
+async def test_claim_from_dead_consumers_never_heartbeating(redis_event_transport: RedisEventTransport,
+                                                            redis_client, dummy_api):
+    redis_event_transport.heartbeat_interval = 0.02
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1002))
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'test_cg-group', latest_id='0')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'old_consumer')
+    await asyncio.sleep(0.05)
+
+    # The consumer has never sent a heartbeat (it may be running an older version),
+    # so its messages are left for the acknowledgement_timeout
+    claimed = redis_event_transport._claim_from_dead_consumers(
+        ['my.dummy.my_event:stream'], 'test_cg-group', {'my_event'}
+    )
+    assert [m async for m in claimed] == []
+    pending = await redis_client.xpending('my.dummy.my_event:stream', 'test_cg-group', '-', '+', 10)
+    assert [p[1] for p in pending] == [b'old_consumer', b'old_consumer']
+
+
+@pytest.mark.run_loop
+async def test_claim_from_dead_consumers_recently_delivered(redis_event_transport: RedisEventTransport,
+                                                            redis_client, dummy_api):
+    redis_event_transport.heartbeat_interval = 10
+    await _add_replay_messages(redis_client, 'my.dummy.my_event:stream', b'my_event', range(1000, 1002))
+    await redis_client.xgroup_create('my.dummy.my_event:stream', 'test_cg-group', latest_id='0')
+    await _add_consumer(redis_client, 'my.dummy.my_event:stream', 'test_cg-group', 'dead_consumer')
+    await redis_client.sadd('test_cg-group:heartbeating_consumers', 'dead_consumer')
+
+    # Messages must be idle for a heartbeat interval, thereby preventing
+    # multiple consumers claiming the same messages
+    claimed = redis_event_transport._claim_from_dead_consumers(
+        ['my.dummy.my_event:stream'], 'test_cg-group', {'my_event'}
+    )
+    assert [m async for m in claimed] == []
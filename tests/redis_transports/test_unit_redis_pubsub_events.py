@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from lightbus.message import EventMessage
+from lightbus.transports.redis import RedisPubSubEventTransport
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+async def consume(transport: RedisPubSubEventTransport, listen_for, received: list, **kwargs):
+    consumer = transport.consume(listen_for, context={}, loop=None, **kwargs)
+    async for message in consumer:
+        received.append(message)
+        await consumer.__anext__()
+
+
+@pytest.mark.run_loop
+async def test_send_event(redis_pubsub_event_transport: RedisPubSubEventTransport, redis_client):
+    channel, = await redis_client.subscribe('my.api.my_event:events')
+    await redis_pubsub_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='my_event', kwargs={'field': 'value'}),
+        options={},
+    )
+    message = await asyncio.wait_for(channel.get(), timeout=1)
+    assert b'"field": "value"' in message
+    # Nothing is stored
+    with await redis_pubsub_event_transport.connection_manager() as redis:
+        assert await redis.keys('*') == []
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_broadcast(redis_pubsub_event_transport: RedisPubSubEventTransport):
+    """Every listener receives every event, regardless of consumer group"""
+    received1, received2 = [], []
+    task1 = asyncio.ensure_future(consume(
+        redis_pubsub_event_transport, [('my.api', 'my_event')], received1, consumer_group='a'
+    ))
+    task2 = asyncio.ensure_future(consume(
+        redis_pubsub_event_transport, [('my.api', 'my_event')], received2, consumer_group='b'
+    ))
+    await asyncio.sleep(0.05)
+
+    await redis_pubsub_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='my_event', kwargs={'field': 'value'}), options={}
+    )
+    await asyncio.sleep(0.05)
+
+    assert [m.kwargs for m in received1] == [{'field': 'value'}]
+    assert [m.kwargs for m in received2] == [{'field': 'value'}]
+    # Both listeners share a single subscription
+    assert list(redis_pubsub_event_transport._listener_queues) == ['my.api.*:events']
+
+    await cancel(task1, task2)
+    assert not redis_pubsub_event_transport._listener_queues
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_only_expected_events(redis_pubsub_event_transport: RedisPubSubEventTransport):
+    received = []
+    task = asyncio.ensure_future(consume(
+        redis_pubsub_event_transport, [('my.api', 'my_event')], received, filters={'tenant': 'acme'}
+    ))
+    await asyncio.sleep(0.05)
+
+    for event_name, tenant in [('other_event', 'acme'), ('my_event', 'other'), ('my_event', 'acme')]:
+        await redis_pubsub_event_transport.send_event(
+            EventMessage(api_name='my.api', event_name=event_name, kwargs={'tenant': tenant}), options={}
+        )
+    await asyncio.sleep(0.05)
+
+    assert [(m.event_name, m.kwargs) for m in received] == [('my_event', {'tenant': 'acme'})]
+    await cancel(task)
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_slow_listener_drops_events(redis_pubsub_event_transport: RedisPubSubEventTransport):
+    redis_pubsub_event_transport.max_queue_size = 2
+    consumer = redis_pubsub_event_transport.consume([('my.api', 'my_event')], context={}, loop=None)
+    first = asyncio.ensure_future(consumer.__anext__())
+    await asyncio.sleep(0.05)
+
+    for n in range(5):
+        await redis_pubsub_event_transport.send_event(
+            EventMessage(api_name='my.api', event_name='my_event', kwargs={'n': n}), options={}
+        )
+    await asyncio.sleep(0.05)
+
+    received = [(await first).kwargs['n']]
+    while True:
+        await consumer.__anext__()
+        try:
+            message = await asyncio.wait_for(consumer.__anext__(), timeout=0.05)
+        except asyncio.TimeoutError:
+            break
+        received.append(message.kwargs['n'])
+
+    # The first event is taken by the waiting listener, two more fit in the queue
+    assert received == [0, 1, 2]
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_subscribe_fails(redis_pubsub_event_transport: RedisPubSubEventTransport):
+    """A failure to subscribe is raised to the listener, and the next listener tries again"""
+    redis = await redis_pubsub_event_transport._get_redis_pool()
+    psubscribe = redis.psubscribe
+
+    async def failing_psubscribe(*args, **kwargs):
+        redis.psubscribe = psubscribe
+        raise ConnectionRefusedError()
+
+    redis.psubscribe = failing_psubscribe
+    with pytest.raises(ConnectionRefusedError):
+        await consume(redis_pubsub_event_transport, [('my.api', 'my_event')], [])
+    assert not redis_pubsub_event_transport._listener_queues
+
+    received = []
+    task = asyncio.ensure_future(consume(redis_pubsub_event_transport, [('my.api', 'my_event')], received))
+    await asyncio.sleep(0.05)
+    await redis_pubsub_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='my_event', kwargs={'field': 'value'}), options={}
+    )
+    await asyncio.sleep(0.05)
+
+    assert [m.kwargs for m in received] == [{'field': 'value'}]
+    await cancel(task)
+    await redis_pubsub_event_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_resubscribes(redis_pubsub_event_transport: RedisPubSubEventTransport, redis_client, caplog):
+    """Listeners continue to receive events once a lost subscription has been re-established"""
+    redis_pubsub_event_transport.resubscribe_interval = 0.05
+    received = []
+    task = asyncio.ensure_future(consume(redis_pubsub_event_transport, [('my.api', 'my_event')], received))
+    await asyncio.sleep(0.05)
+
+    await redis_client.execute(b'CLIENT', b'KILL', b'TYPE', b'pubsub')
+    await asyncio.sleep(0.2)
+    assert 'Lost the redis subscription' in caplog.text
+
+    await redis_pubsub_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='my_event', kwargs={'field': 'value'}), options={}
+    )
+    await asyncio.sleep(0.05)
+
+    assert [m.kwargs for m in received] == [{'field': 'value'}]
+    await cancel(task)
+    await redis_pubsub_event_transport.close()
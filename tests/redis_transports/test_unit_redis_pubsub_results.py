@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from lightbus.message import RpcMessage, ResultMessage
+from lightbus.transports.redis import RedisPubSubResultTransport
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def rpc_message():
+    return RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+
+
+@pytest.mark.run_loop
+async def test_get_return_path(redis_pubsub_result_transport: RedisPubSubResultTransport, rpc_message):
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_message)
+    assert return_path.startswith('redis+pubsub://lightbus_results:')
+    assert return_path == redis_pubsub_result_transport.get_return_path(rpc_message)
+
+
+@pytest.mark.run_loop
+async def test_receive_result_published(redis_pubsub_result_transport: RedisPubSubResultTransport,
+                                        rpc_message, redis_client):
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_message)
+    task = asyncio.ensure_future(redis_pubsub_result_transport.receive_result(rpc_message, return_path, {}))
+    await asyncio.sleep(0.05)
+
+    await redis_pubsub_result_transport.send_result(
+        rpc_message, ResultMessage(rpc_id='123abc', result='All done! 😎'), return_path
+    )
+    result_message = await asyncio.wait_for(task, timeout=1)
+    assert result_message.result == 'All done! 😎'
+    # Published, so nothing stored
+    assert await redis_client.keys('*') == []
+    await redis_pubsub_result_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_receive_result_concurrent(redis_pubsub_result_transport: RedisPubSubResultTransport):
+    """Calls which start waiting at the same time share a single subscription"""
+    redis = await redis_pubsub_result_transport._get_redis_pool()
+    subscribe = redis.subscribe
+    subscriptions = []
+
+    async def spy_subscribe(*channels):
+        subscriptions.append(channels)
+        return await subscribe(*channels)
+
+    redis.subscribe = spy_subscribe
+    rpc_messages = [RpcMessage(api_name='my.api', procedure_name='my_proc', kwargs={}) for _ in range(3)]
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_messages[0])
+    tasks = [
+        asyncio.ensure_future(redis_pubsub_result_transport.receive_result(m, return_path, {}))
+        for m in rpc_messages
+    ]
+    await asyncio.sleep(0.05)
+    assert len(subscriptions) == 1
+
+    for rpc_message in rpc_messages:
+        await redis_pubsub_result_transport.send_result(
+            rpc_message, ResultMessage(rpc_id=rpc_message.rpc_id, result='Done'), return_path
+        )
+    results = await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+    assert [m.result for m in results] == ['Done'] * 3
+    await redis_pubsub_result_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_receive_result_fallback(redis_pubsub_result_transport: RedisPubSubResultTransport,
+                                       rpc_message, redis_client):
+    """Results sent before the caller subscribes are stored, and picked up once it starts waiting"""
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_message)
+    await redis_pubsub_result_transport.send_result(
+        rpc_message, ResultMessage(rpc_id='123abc', result='Stored'), return_path
+    )
+    assert len(await redis_client.keys('*')) == 1
+
+    result_message = await asyncio.wait_for(
+        redis_pubsub_result_transport.receive_result(rpc_message, return_path, {}), timeout=1
+    )
+    assert result_message.result == 'Stored'
+    assert await redis_client.keys('*') == []
+    await redis_pubsub_result_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_receive_result_ignores_other_calls(redis_pubsub_result_transport: RedisPubSubResultTransport,
+                                                  rpc_message):
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_message)
+    task = asyncio.ensure_future(redis_pubsub_result_transport.receive_result(rpc_message, return_path, {}))
+    await asyncio.sleep(0.05)
+
+    await redis_pubsub_result_transport.send_result(
+        rpc_message, ResultMessage(rpc_id='xyz', result='Not for us'), return_path
+    )
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    await cancel(task)
+    assert not redis_pubsub_result_transport._queues
+    await redis_pubsub_result_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_receive_result_stream(redis_pubsub_result_transport: RedisPubSubResultTransport, rpc_message):
+    return_path = redis_pubsub_result_transport.get_return_path(rpc_message)
+
+    async def receive():
+        return [
+            result_message.result
+            async for result_message
+            in redis_pubsub_result_transport.receive_result_stream(rpc_message, return_path, {})
+        ]
+
+    task = asyncio.ensure_future(receive())
+    await asyncio.sleep(0.05)
+    for n in range(3):
+        await redis_pubsub_result_transport.send_result(
+            rpc_message, ResultMessage(rpc_id='123abc', result=n, more=n < 2), return_path
+        )
+
+    assert await asyncio.wait_for(task, timeout=1) == [0, 1, 2]
+    await redis_pubsub_result_transport.close()
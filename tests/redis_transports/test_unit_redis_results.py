@@ -1,9 +1,11 @@
+import asyncio
 import json
 from uuid import UUID
 
 import pytest
 from base64 import b64decode
 
+from lightbus.exceptions import LightbusTimeout
 from lightbus.message import RpcMessage, ResultMessage
 from lightbus.serializers import BlobMessageDeserializer, ByFieldMessageSerializer, ByFieldMessageDeserializer
 from lightbus.transports.redis import RedisResultTransport
@@ -95,6 +97,63 @@ async def test_receive_result(redis_result_transport: RedisResultTransport, redi
     assert result_message.error == False
 
 
+@pytest.mark.run_loop
+async def test_receive_results(redis_result_transport: RedisResultTransport, redis_client):
+    rpc_messages = [
+        RpcMessage(rpc_id=rpc_id, api_name='my.api', procedure_name='my_proc', kwargs={}, return_path='abc')
+        for rpc_id in ('1', '2')
+    ]
+    return_paths = ['redis+key://my.api.my_proc:result:1', 'redis+key://my.api.my_proc:result:2']
+    for rpc_id in ('2', '1'):
+        await redis_client.lpush(
+            key=f'my.api.my_proc:result:{rpc_id}',
+            value=json.dumps({'metadata': {'rpc_id': rpc_id, 'error': False}, 'kwargs': {'result': rpc_id}}),
+        )
+
+    result_messages = []
+    async for result_message in redis_result_transport.receive_results(rpc_messages, return_paths, options={}):
+        result_messages.append(result_message)
+
+    assert sorted(m.result for m in result_messages) == ['1', '2']
+    assert not await redis_client.keys('*')
+
+
+@pytest.mark.run_loop
+async def test_send_result_stream_bounded(redis_result_transport: RedisResultTransport, redis_client):
+    """The worker waits for the caller once max_buffered_results results are waiting"""
+    redis_result_transport.max_buffered_results = 3
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    return_path = redis_result_transport.get_return_path(rpc_message)
+
+    async def send():
+        for n in range(10):
+            result_message = ResultMessage(rpc_id='123abc', result=n, more=n < 9)
+            await redis_result_transport.send_result(rpc_message, result_message, return_path)
+
+    send_task = asyncio.ensure_future(send())
+    await asyncio.sleep(0.1)
+    assert not send_task.done()
+    assert await redis_client.llen(return_path[12:]) == 3
+
+    stream = redis_result_transport.receive_result_stream(rpc_message, return_path, {})
+    assert [m.result async for m in stream] == list(range(10))
+    await asyncio.wait_for(send_task, timeout=1)
+
+
+@pytest.mark.run_loop
+async def test_send_result_stream_caller_gone(redis_result_transport: RedisResultTransport, redis_client):
+    redis_result_transport.max_buffered_results = 2
+    redis_result_transport.result_ttl = 0.1
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    return_path = redis_result_transport.get_return_path(rpc_message)
+
+    await redis_result_transport.send_result(rpc_message, ResultMessage(rpc_id='123abc', result=1, more=True),
+                                             return_path)
+    with pytest.raises(LightbusTimeout):
+        await redis_result_transport.send_result(rpc_message, ResultMessage(rpc_id='123abc', result=2, more=True),
+                                                 return_path)
+
+
 @pytest.mark.run_loop
 async def test_from_config(redis_client):
     await redis_client.select(5)
@@ -4,6 +4,7 @@ import json
 import pytest
 
 from lightbus import RedisRpcTransport
+from lightbus.exceptions import InvalidRpcPriority, RpcQueueFull
 from lightbus.message import RpcMessage
 from lightbus.serializers import BlobMessageSerializer, BlobMessageDeserializer
 from lightbus.utilities.async import cancel
@@ -167,3 +168,107 @@ async def test_consume_rpcs_only_once(redis_client, dummy_api, redis_pool):
     assert message_count == 1
 
     assert not await redis_client.exists('rpc_expiry_key:123abc')
+
+
+def _rpc_message(rpc_id, api_name='my.dummy'):
+    return RpcMessage(rpc_id=rpc_id, api_name=api_name, procedure_name='my_proc', kwargs={}, return_path='abc')
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_priority(redis_rpc_transport, redis_client):
+    await redis_rpc_transport.call_rpc(_rpc_message('1'), options={'priority': 'high'})
+    await redis_rpc_transport.call_rpc(_rpc_message('2'), options={})
+    assert await redis_client.llen('my.dummy:rpc_queue:high') == 1
+    assert await redis_client.llen('my.dummy:rpc_queue') == 1
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_invalid_priority(redis_rpc_transport):
+    with pytest.raises(InvalidRpcPriority):
+        await redis_rpc_transport.call_rpc(_rpc_message('1'), options={'priority': 'urgent'})
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_priority(redis_rpc_transport, dummy_api):
+    await redis_rpc_transport.call_rpc(_rpc_message('low'), options={'priority': 'low'})
+    await redis_rpc_transport.call_rpc(_rpc_message('normal'), options={})
+    await redis_rpc_transport.call_rpc(_rpc_message('high'), options={'priority': 'high'})
+
+    rpc_ids = []
+    for _ in range(3):
+        rpc_ids.extend(m.rpc_id for m in await redis_rpc_transport.consume_rpcs(apis=[dummy_api]))
+    assert rpc_ids == ['high', 'normal', 'low']
+
+
+def test_get_queue_keys_rotation(redis_rpc_transport):
+    redis_rpc_transport.priorities = ['high', 'normal']
+    assert redis_rpc_transport._get_queue_keys(['a', 'b', 'c'], rotation=0) == [
+        'a:rpc_queue:high', 'b:rpc_queue:high', 'c:rpc_queue:high', 'a:rpc_queue', 'b:rpc_queue', 'c:rpc_queue',
+    ]
+    first_keys = [redis_rpc_transport._get_queue_keys(['a', 'b', 'c'], rotation=r)[0] for r in range(4)]
+    assert first_keys == ['a:rpc_queue:high', 'b:rpc_queue:high', 'c:rpc_queue:high', 'a:rpc_queue:high']
+
+
+def test_get_queue_keys_weighted(redis_rpc_transport):
+    redis_rpc_transport.priorities = ['normal']
+    redis_rpc_transport.api_weights = {'a': 3}
+    first_keys = [redis_rpc_transport._get_queue_keys(['a', 'b'], rotation=r)[0] for r in range(8)]
+    assert first_keys.count('a:rpc_queue') == 6
+    assert first_keys.count('b:rpc_queue') == 2
+
+
+@pytest.mark.run_loop
+async def test_cancel_rpc(redis_rpc_transport, redis_client):
+    messages = [_rpc_message(str(n)) for n in range(3)]
+    for message in messages:
+        await redis_rpc_transport.call_rpc(message, options={})
+    await redis_rpc_transport.call_rpc(_rpc_message('high'), options={'priority': 'high'})
+
+    # Cancelled concurrently, and therefore sent to redis together
+    await asyncio.gather(
+        redis_rpc_transport.cancel_rpc(messages[0], options={}),
+        redis_rpc_transport.cancel_rpc(messages[2], options={}),
+        redis_rpc_transport.cancel_rpc(_rpc_message('high'), options={'priority': 'high'}),
+    )
+
+    remaining = await redis_client.lrange('my.dummy:rpc_queue', 0, -1)
+    assert [json.loads(m)['metadata']['rpc_id'] for m in remaining] == ['1']
+    assert await redis_client.llen('my.dummy:rpc_queue:high') == 0
+    assert set(await redis_client.keys('rpc_expiry_key:*')) == {b'rpc_expiry_key:1'}
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_queue_full(redis_rpc_transport, redis_client):
+    redis_rpc_transport.max_queue_length = 2
+    await redis_rpc_transport.call_rpc(_rpc_message('1'), options={})
+    await redis_rpc_transport.call_rpc(_rpc_message('2'), options={})
+    with pytest.raises(RpcQueueFull):
+        await redis_rpc_transport.call_rpc(_rpc_message('3'), options={})
+    assert await redis_client.llen('my.dummy:rpc_queue') == 2
+
+    # Each priority has its own queue, and therefore its own limit
+    await redis_rpc_transport.call_rpc(_rpc_message('4'), options={'priority': 'high'})
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_queue_length_cached(redis_rpc_transport, redis_client):
+    redis_rpc_transport.max_queue_length = 1
+    redis_rpc_transport.queue_length_ttl = 0.05
+    await redis_rpc_transport.call_rpc(_rpc_message('1'), options={})
+
+    # A worker consumes the call, but we have a cached length
+    await redis_client.delete('my.dummy:rpc_queue')
+    with pytest.raises(RpcQueueFull):
+        await redis_rpc_transport.call_rpc(_rpc_message('2'), options={})
+
+    await asyncio.sleep(0.06)
+    await redis_rpc_transport.call_rpc(_rpc_message('2'), options={})
+
+
+@pytest.mark.run_loop
+async def test_call_rpcs(redis_rpc_transport, redis_client):
+    await redis_rpc_transport.call_rpcs([_rpc_message('1'), _rpc_message('2'), _rpc_message('3', 'other')],
+                                        options={})
+    assert await redis_client.llen('my.dummy:rpc_queue') == 2
+    assert await redis_client.llen('other:rpc_queue') == 1
+    assert len(await redis_client.keys('rpc_expiry_key:*')) == 3
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+import lightbus
+from lightbus import RedisStreamRpcTransport
+from lightbus.message import RpcMessage
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+def _rpc_message(n=1):
+    return RpcMessage(
+        rpc_id='rpc{}'.format(n),
+        api_name='my.dummy',
+        procedure_name='my_proc',
+        kwargs={'field': 'value{}'.format(n)},
+        return_path='abc',
+    )
+
+
+async def _make_calls(transport, total):
+    for n in range(total):
+        await transport.call_rpc(_rpc_message(n), options={})
+
+
+@pytest.mark.run_loop
+async def test_call_rpc(redis_stream_rpc_transport: RedisStreamRpcTransport, redis_client):
+    """Does call_rpc() add a message to a stream"""
+    await redis_stream_rpc_transport.call_rpc(_rpc_message(), options={})
+
+    messages = await redis_client.xrange('my.dummy:rpc_stream')
+    assert len(messages) == 1
+    assert messages[0][1] == {
+        b'rpc_id': b'rpc1',
+        b'api_name': b'my.dummy',
+        b'procedure_name': b'my_proc',
+        b'return_path': b'abc',
+        b':field': b'"value1"',
+    }
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_batch(redis_stream_rpc_transport: RedisStreamRpcTransport, redis_client, dummy_api):
+    redis_stream_rpc_transport.batch_size = 3
+    await _make_calls(redis_stream_rpc_transport, 5)
+
+    messages = await redis_stream_rpc_transport.consume_rpcs(apis=[dummy_api])
+    assert [m.rpc_id for m in messages] == ['rpc0', 'rpc1', 'rpc2']
+    # Nothing is acknowledged until we come back for more
+    assert (await redis_client.xpending('my.dummy:rpc_stream', 'rpc_workers'))[0] == 3
+
+    messages = await redis_stream_rpc_transport.consume_rpcs(apis=[dummy_api])
+    assert [m.rpc_id for m in messages] == ['rpc3', 'rpc4']
+    assert (await redis_client.xpending('my.dummy:rpc_stream', 'rpc_workers'))[0] == 2
+
+    await redis_stream_rpc_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_discards_expired(redis_stream_rpc_transport: RedisStreamRpcTransport, redis_client,
+                                             dummy_api):
+    await redis_client.xadd('my.dummy:rpc_stream', redis_stream_rpc_transport.serializer(_rpc_message()),
+                            message_id='1000-0')
+    await _make_calls(redis_stream_rpc_transport, 1)
+
+    messages = await redis_stream_rpc_transport.consume_rpcs(apis=[dummy_api])
+    assert [m.rpc_id for m in messages] == ['rpc0']
+    await redis_stream_rpc_transport.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_redelivered_after_restart(redis_stream_rpc_transport: RedisStreamRpcTransport,
+                                                      dummy_api):
+    await _make_calls(redis_stream_rpc_transport, 2)
+    messages = await redis_stream_rpc_transport.consume_rpcs(apis=[dummy_api])
+    assert len(messages) == 2
+
+    # We die without asking for more, and then restart
+    await cancel(redis_stream_rpc_transport._heartbeat_task)
+    restarted = RedisStreamRpcTransport(redis_pool=redis_stream_rpc_transport._redis_pool,
+                                        consumer_name='test_consumer')
+    messages = await restarted.consume_rpcs(apis=[dummy_api])
+    assert [m.rpc_id for m in messages] == ['rpc0', 'rpc1']
+    await restarted.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_claimed_from_dead_consumer(redis_stream_rpc_transport: RedisStreamRpcTransport,
+                                                       redis_client, dummy_api):
+    redis_stream_rpc_transport.heartbeat_interval = 0.05
+    await _make_calls(redis_stream_rpc_transport, 2)
+    messages = await redis_stream_rpc_transport.consume_rpcs(apis=[dummy_api])
+    assert len(messages) == 2
+
+    assert await redis_client.smembers('rpc_workers:heartbeating_consumers') == [b'test_consumer']
+    # Die without acknowledging, or cleanly removing our heartbeat
+    await cancel(redis_stream_rpc_transport._heartbeat_task)
+    await redis_client.delete('rpc_workers:test_consumer:consumer_heartbeat')
+
+    other = RedisStreamRpcTransport(redis_pool=redis_stream_rpc_transport._redis_pool,
+                                    consumer_name='other_consumer', heartbeat_interval=0.05)
+    assert await other.consume_rpcs(apis=[dummy_api]) == []
+    await asyncio.sleep(0.1)
+    messages = await other.consume_rpcs(apis=[dummy_api])
+    assert [m.rpc_id for m in messages] == ['rpc0', 'rpc1']
+    await other.close()
+
+
+@pytest.fixture
+def stream_bus(loop, redis_stream_rpc_transport, redis_result_transport, redis_event_transport,
+               redis_schema_transport):
+    return lightbus.create(
+        rpc_transport=redis_stream_rpc_transport,
+        result_transport=redis_result_transport,
+        event_transport=redis_event_transport,
+        schema_transport=redis_schema_transport,
+        loop=loop,
+    )
+
+
+@pytest.mark.run_loop
+async def test_rpc_end_to_end(stream_bus: lightbus.BusNode, dummy_api):
+    consume_task = asyncio.ensure_future(stream_bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    result = await stream_bus.my.dummy.my_proc.call_async(field='Hello')
+    await cancel(consume_task)
+    assert result == 'value: Hello'
@@ -1,12 +1,13 @@
 import asyncio
 import json
 from pathlib import Path
+from typing import AsyncIterator
 
 import jsonschema
 import os
 import pytest
 
-from lightbus import Event, Api, Parameter, Schema
+from lightbus import Event, Api, Parameter, Schema, batched
 from lightbus.exceptions import InvalidApiForSchemaCreation, SchemaNotFound
 from lightbus.schema.schema import api_to_schema
 from lightbus.transports.redis import RedisSchemaTransport
@@ -95,6 +96,39 @@ def test_api_to_schema_rpc():
     }
 
 
+def test_api_to_schema_rpc_streamed():
+    class TestApi(Api):
+
+        async def my_proc(self) -> AsyncIterator[str]:
+            yield 'a'
+
+        class Meta:
+            name = 'my.test_api'
+
+    schema = api_to_schema(TestApi())
+    assert schema['rpcs']['my_proc']['response'] == {
+        '$schema': 'http://json-schema.org/draft-04/schema#',
+        'title': 'RPC my.test_api.my_proc() response',
+        'type': 'array',
+        'items': {'type': 'string'},
+    }
+
+
+def test_api_to_schema_rpc_batched():
+    class TestApi(Api):
+
+        @batched(max_batch_size=10)
+        def my_proc(self, calls: list) -> list:
+            pass
+
+        class Meta:
+            name = 'my.test_api'
+
+    schema = api_to_schema(TestApi())
+    assert schema['rpcs']['my_proc']['batched'] == {'max_batch_size': 10, 'window': 0.005}
+    assert list(schema['rpcs']['my_proc']['parameters']['properties']) == ['calls']
+
+
 def test_api_to_schema_rpc_private():
     """Methods starting with an underscore should be ignored"""
     class TestApi(Api):
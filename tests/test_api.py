@@ -1,6 +1,6 @@
 import pytest
 
-from lightbus import Api
+from lightbus import Api, batched
 from lightbus.exceptions import MisconfiguredApiOptions
 
 pytestmark = pytest.mark.unit
@@ -18,3 +18,14 @@ def test_api_named_default_dot_something():
         class BadApi(Api):
             class Meta:
                 name = 'default.foo'
+
+
+def test_batched_bad_parameters():
+    with pytest.raises(MisconfiguredApiOptions):
+        class BadApi(Api):
+            class Meta:
+                name = 'bad'
+
+            @batched
+            def my_proc(self, user_id):
+                pass
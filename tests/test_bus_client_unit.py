@@ -1,12 +1,17 @@
+import asyncio
+import time
+
 import jsonschema
 import pytest
 from jsonschema import ValidationError
 
 import lightbus
 from lightbus import Schema, RpcMessage, ResultMessage, EventMessage, BusClient
+from lightbus.bus import rpc_deadline
 from lightbus.config import Config
+from lightbus.config.structure import RpcCacheConfig
 from lightbus.exceptions import UnknownApi, EventNotFound, InvalidEventArguments, InvalidEventListener, \
-    TransportNotFound, InvalidName
+    TransportNotFound, InvalidName, LightbusTimeout
 
 pytestmark = pytest.mark.unit
 
@@ -116,6 +121,196 @@ async def test_call_rpc_local_empty_name(dummy_bus: lightbus.BusNode, dummy_api)
         await dummy_bus.bus_client.call_rpc_local('my.dummy', '_my_event')
 
 
+@pytest.mark.run_loop
+@pytest.mark.parametrize('single_flight', [True, ['my_proc']])
+async def test_call_rpc_remote_single_flight(dummy_bus: lightbus.BusNode, single_flight):
+    dummy_bus.bus_client.config.api('my.dummy').single_flight = single_flight
+    rpc_transport = dummy_bus.bus_client.transport_registry.get_rpc_transport('my.dummy')
+    rpc_messages = []
+
+    async def call_rpc(rpc_message, options):
+        rpc_messages.append(rpc_message)
+
+    rpc_transport.call_rpc = call_rpc
+    call = dummy_bus.bus_client.call_rpc_remote
+    results = await asyncio.gather(
+        call('my.dummy', 'my_proc', {'field': 'a'}),
+        call('my.dummy', 'my_proc', {'field': 'a'}),
+        call('my.dummy', 'my_proc', {'field': 'b'}),
+    )
+    assert results == ['Fake result'] * 3
+    assert sorted(m.kwargs['field'] for m in rpc_messages) == ['a', 'b']
+
+    # Subsequent calls are not joined onto completed calls
+    await call('my.dummy', 'my_proc', {'field': 'a'})
+    assert len(rpc_messages) == 3
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_local_cached(dummy_bus: lightbus.BusNode):
+    calls = []
+
+    class CachedApi(lightbus.Api):
+        class Meta:
+            name = 'my.cached'
+
+        @lightbus.cached(ttl=60)
+        def square(self, n: int) -> int:
+            calls.append(n)
+            if n < 0:
+                raise ValueError('Negative')
+            return n ** 2
+
+    call = dummy_bus.bus_client.call_rpc_local
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+    assert await call('my.cached', 'square', {'n': 3}) == 9
+    # Errors are not cached
+    assert isinstance(await call('my.cached', 'square', {'n': -1}), ValueError)
+    assert isinstance(await call('my.cached', 'square', {'n': -1}), ValueError)
+
+    assert calls == [2, 3, -1, -1]
+    assert dummy_bus.bus_client.rpc_cache_metrics() == {
+        'my.cached.square': {'hits': 1, 'misses': 4, 'hit_rate': 0.2}
+    }
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_local_shared_cache_unsupported(dummy_bus: lightbus.BusNode, caplog):
+    """Transports without a shared cache fall back to caching locally"""
+    calls = []
+
+    class CachedApi(lightbus.Api):
+        class Meta:
+            name = 'my.cached'
+
+        @lightbus.cached(ttl=60, shared=True)
+        def square(self, n: int) -> int:
+            calls.append(n)
+            return n ** 2
+
+    call = dummy_bus.bus_client.call_rpc_local
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+    assert await call('my.cached', 'square', {'n': 2}) == 4
+    assert calls == [2]
+
+    warnings = [r for r in caplog.records if 'does not provide a shared cache' in r.getMessage()]
+    assert len(warnings) == 1
+
+
+@pytest.mark.run_loop
+async def test_rpc_cache_used_once_listening(dummy_bus: lightbus.BusNode):
+    """Concurrent callers share the cache, which is only used once invalidations are being listened for"""
+    bus_client = dummy_bus.bus_client
+    cache_config = RpcCacheConfig(invalidate_on={'my.dummy.my_event': ['field']})
+    listening = []
+
+    async def listen_for_events(events, listener, options=None):
+        await asyncio.sleep(0.05)
+        listening.append(events)
+
+    bus_client.listen_for_events = listen_for_events
+
+    first = asyncio.ensure_future(bus_client._get_rpc_cache('my.dummy', 'my_proc', cache_config))
+    await asyncio.sleep(0.01)
+    assert ('my.dummy', 'my_proc') not in bus_client._rpc_caches
+    second = await bus_client._get_rpc_cache('my.dummy', 'my_proc', cache_config)
+
+    assert listening == [[('my.dummy', 'my_event')]]
+    assert await first is second
+    assert await bus_client._get_rpc_cache('my.dummy', 'my_proc', cache_config) is second
+
+
+@pytest.mark.run_loop
+async def test_rpc_timeout_clamped_to_deadline(dummy_bus: lightbus.BusNode):
+    bus_client = dummy_bus.bus_client
+    assert bus_client._get_rpc_timeout('my.dummy', {}) == 5
+
+    token = rpc_deadline.set(time.time() + 1)
+    try:
+        assert 0.9 < bus_client._get_rpc_timeout('my.dummy', {}) <= 1
+        assert bus_client._get_rpc_timeout('my.dummy', {'timeout': 0.5}) == 0.5
+    finally:
+        rpc_deadline.reset(token)
+
+    token = rpc_deadline.set(time.time() - 1)
+    try:
+        with pytest.raises(LightbusTimeout):
+            await bus_client.call_rpc_remote('my.dummy', 'my_proc', {'field': 'a'})
+    finally:
+        rpc_deadline.reset(token)
+
+
+@pytest.mark.run_loop
+async def test_rpc_timeout_clamped_to_deadline_shared_calls(dummy_bus: lightbus.BusNode):
+    """Calls made on our behalf by other tasks (single flight & batching) are subject to our deadline"""
+    bus_client = dummy_bus.bus_client
+    bus_client.config.api('my.dummy').single_flight = True
+    rpc_transport = bus_client.transport_registry.get_rpc_transport('my.dummy')
+    result_transport = bus_client.transport_registry.get_result_transport('my.dummy')
+    deadlines = []
+
+    async def call_rpc(rpc_message, options):
+        deadlines.append(rpc_message.deadline)
+
+    async def receive_result(rpc_message, return_path, options):
+        return ResultMessage(rpc_id=rpc_message.rpc_id, result=[None] * len(rpc_message.kwargs.get('calls', [])))
+
+    rpc_transport.call_rpc = call_rpc
+    result_transport.receive_result = receive_result
+
+    deadline = time.time() + 1
+    token = rpc_deadline.set(deadline)
+    try:
+        await bus_client.call_rpc_remote('my.dummy', 'my_proc', {'field': 'a'})
+        await bus_client.call_rpc_batched('my.dummy', 'my_proc', {'field': 'a'})
+    finally:
+        rpc_deadline.reset(token)
+    assert deadlines == [pytest.approx(deadline, abs=0.01)] * 2
+
+
+@pytest.mark.run_loop
+async def test_stream_timeout_clamped_to_deadline(dummy_bus: lightbus.BusNode):
+    bus_client = dummy_bus.bus_client
+    rpc_transport = bus_client.transport_registry.get_rpc_transport('my.dummy')
+    result_transport = bus_client.transport_registry.get_result_transport('my.dummy')
+    deadlines = []
+
+    async def call_rpc(rpc_message, options):
+        deadlines.append(rpc_message.deadline)
+
+    async def receive_result_stream(rpc_message, return_path, options):
+        yield ResultMessage(rpc_id=rpc_message.rpc_id, result=1, more=True)
+        await asyncio.sleep(10)
+
+    rpc_transport.call_rpc = call_rpc
+    rpc_transport.cancel_rpc = lambda *args, **kwargs: asyncio.sleep(0)
+    result_transport.receive_result_stream = receive_result_stream
+
+    deadline = time.time() + 0.1
+    token = rpc_deadline.set(deadline)
+    try:
+        values = []
+        with pytest.raises(LightbusTimeout):
+            async for value in bus_client.stream_rpc_remote('my.dummy', 'my_proc', {'field': 'a'}):
+                values.append(value)
+        # Gave up at the deadline, rather than after the 5 second rpc_timeout
+        assert time.time() < deadline + 0.5
+        assert values == [1]
+        assert deadlines == [deadline]
+    finally:
+        rpc_deadline.reset(token)
+
+    token = rpc_deadline.set(time.time() - 1)
+    try:
+        with pytest.raises(LightbusTimeout):
+            async for _ in bus_client.stream_rpc_remote('my.dummy', 'my_proc', {'field': 'a'}):
+                pass
+        assert len(deadlines) == 1
+    finally:
+        rpc_deadline.reset(token)
+
+
 @pytest.mark.run_loop
 async def test_no_transport(loop):
     # No transports configured for any relevant api
@@ -57,3 +57,12 @@ async def test_positional_only_rpc(dummy_bus: lightbus.BusNode):
 async def test_positional_only_event(dummy_bus: lightbus.BusNode):
     with pytest.raises(InvalidParameters):
         await dummy_bus.my.dummy.event.fire_async(123)
+
+
+def test_call_many_empty(dummy_bus: lightbus.BusNode):
+    assert dummy_bus.call_many([]) == []
+
+
+@pytest.mark.run_loop
+async def test_call_many_async_empty(dummy_bus: lightbus.BusNode):
+    assert await dummy_bus.call_many_async([]) == []
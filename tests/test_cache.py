@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from lightbus.utilities.cache import TtlCache
+
+pytestmark = pytest.mark.unit
+
+
+def test_get_set():
+    cache = TtlCache(ttl=60, maxsize=10)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    with pytest.raises(KeyError):
+        cache.get('b')
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_expiry():
+    cache = TtlCache(ttl=0.01, maxsize=10)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert 'a' not in cache
+    with pytest.raises(KeyError):
+        cache.get('a')
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = TtlCache(ttl=60, maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_items():
+    cache = TtlCache(ttl=60, maxsize=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    for key, _ in cache.items():
+        cache.delete(key)
+    assert len(cache) == 0
@@ -1,7 +1,11 @@
+import argparse
+
 import pytest
 
+import lightbus.commands.collect_garbage
 import lightbus.commands.run
 from lightbus import commands
+from lightbus.config import Config
 
 
 pytestmark = pytest.mark.unit
@@ -13,3 +17,25 @@ def test_commands_run():
     """make sure the arg parser is vaguely happy"""
     args = commands.parse_args(args=['run'])
     lightbus.commands.run.Command().handle(args, dry_run=True)
+
+
+
+def test_commands_gc_args():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='subcommand')
+    lightbus.commands.collect_garbage.Command().setup(parser, subparsers)
+
+    args = parser.parse_args(['gc', '--idle-timeout', '3600'])
+    assert args.idle_timeout == 3600
+    assert args.imprt is None
+    assert args.prefixes is None and not args.all_groups
+
+    args = parser.parse_args(['gc', '--prefix', 'a', '--prefix', 'b'])
+    assert args.prefixes == ['a', 'b']
+    assert parser.parse_args(['gc', '--all']).all_groups
+
+
+def test_commands_gc_requires_service_name():
+    args = argparse.Namespace(log_level=None, idle_timeout=3600, prefixes=None, all_groups=False)
+    with pytest.raises(SystemExit):
+        lightbus.commands.collect_garbage.Command().handle(args, Config.load_dict({}))
@@ -0,0 +1,70 @@
+import fcntl
+
+import pytest
+
+from lightbus.utilities.segments import SegmentLog
+
+
+def _messages(milliseconds):
+    return [('{}-0'.format(ms), {'n': str(ms)}) for ms in milliseconds]
+
+
+def test_append_and_read(tmpdir):
+    log = SegmentLog(str(tmpdir))
+    log.append(_messages(range(1000, 1010)))
+    log.append(_messages(range(1010, 1020)))
+
+    assert [m for m, _ in log.read()] == ['{}-0'.format(ms) for ms in range(1000, 1020)]
+    assert list(log.read())[0] == ('1000-0', {'n': '1000'})
+
+
+def test_read_range(tmpdir):
+    log = SegmentLog(str(tmpdir))
+    for ms in range(1000, 1100, 10):
+        log.append(_messages(range(ms, ms + 10)))
+
+    assert [m for m, _ in log.read('1015-0', '1032-0')] == ['{}-0'.format(ms) for ms in range(1015, 1033)]
+    assert [m for m, _ in log.read('1095')] == ['{}-0'.format(ms) for ms in range(1095, 1100)]
+    assert list(log.read('2000-0')) == []
+
+
+def test_rotation(tmpdir):
+    log = SegmentLog(str(tmpdir), max_segment_size=1)
+    for ms in range(1000, 1050, 10):
+        log.append(_messages(range(ms, ms + 10)))
+
+    assert len(log.segment_names()) == 5
+    assert [m for m, _ in log.read('1025-0', '1034-0')] == ['{}-0'.format(ms) for ms in range(1025, 1035)]
+
+
+def test_first_and_last_id(tmpdir):
+    log = SegmentLog(str(tmpdir))
+    assert log.first_id() is None
+    assert log.last_id() is None
+
+    log.append(_messages(range(1000, 1010)))
+    assert log.first_id() == '1000-0'
+    assert log.last_id() == '1009-0'
+
+    # Reopening will read the last ID from disk
+    assert SegmentLog(str(tmpdir)).last_id() == '1009-0'
+
+
+def test_append_out_of_order(tmpdir):
+    log = SegmentLog(str(tmpdir))
+    log.append(_messages(range(1000, 1010)))
+    with pytest.raises(ValueError):
+        log.append(_messages([1005]))
+
+
+def test_lock_non_blocking(tmpdir):
+    log = SegmentLog(str(tmpdir))
+    with open(str(tmpdir.join('.lock')), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # flock() locks are per open file, so a second open will conflict
+        with pytest.raises(BlockingIOError):
+            with log.lock(blocking=False):
+                pass
+
+    with log.lock(blocking=False):
+        pass
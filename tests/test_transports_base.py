@@ -1,7 +1,7 @@
 import pytest
 
 from lightbus import RedisRpcTransport, RedisResultTransport, RedisEventTransport, RedisSchemaTransport, \
-    DebugRpcTransport, DebugEventTransport
+    DebugRpcTransport, DebugEventTransport, RedisPubSubEventTransport
 from lightbus.config import Config
 from lightbus.exceptions import TransportNotFound
 from lightbus.transports.base import TransportRegistry
@@ -88,6 +88,23 @@ def test_transport_registry_get_specific_api(redis_other_config):
     assert registry.get_schema_transport('other').__class__ == RedisSchemaTransport
 
 
+def test_transport_registry_get_specific_api_pubsub_events():
+    config = Config.load_dict({
+        'apis': {
+            'default': {
+                'event_transport': {'redis': {}},
+            },
+            'other': {
+                'event_transport': {'redis_pubsub': {'max_queue_size': 10}},
+            },
+        }
+    })
+    registry = TransportRegistry().load_config(config)
+    assert registry.get_event_transport('default').__class__ == RedisEventTransport
+    assert registry.get_event_transport('other').__class__ == RedisPubSubEventTransport
+    assert registry.get_event_transport('other').max_queue_size == 10
+
+
 def test_transport_registry_load_config(redis_default_config):
     registry = TransportRegistry().load_config(redis_default_config)
     assert registry.get_rpc_transport('default').__class__ == RedisRpcTransport
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from lightbus.message import RpcMessage, EventMessage
+from lightbus.utilities.async import cancel
+from lightbus.transports.direct import DirectRpcTransport, DirectResultTransport, DirectEventTransport
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.run_loop
+async def test_call_rpc(dummy_api):
+    result_transport = DirectResultTransport()
+    rpc_message = RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={'field': 'x'})
+    rpc_message.return_path = result_transport.get_return_path(rpc_message)
+
+    await DirectRpcTransport(result_transport).call_rpc(rpc_message, options={})
+    result_message = await result_transport.receive_result(rpc_message, rpc_message.return_path, options={})
+    assert result_message.result == 'value: x'
+    assert result_message.rpc_id == rpc_message.rpc_id
+
+
+@pytest.mark.run_loop
+async def test_fetch():
+    transport = DirectEventTransport()
+    consumer = transport.consume([('my.api', 'my_event')], context={}, loop=None)
+    next_event = asyncio.ensure_future(consumer.__anext__())
+    await asyncio.sleep(0.01)
+
+    await transport.send_event(EventMessage(api_name='my.api', event_name='other_event', kwargs={}), options={})
+    await transport.send_event(EventMessage(api_name='my.api', event_name='my_event', kwargs={'n': 1}), options={})
+
+    event_message = await asyncio.wait_for(next_event, timeout=1)
+    assert event_message.kwargs == {'n': 1}
+    assert await consumer.__anext__() is True
+    await consumer.aclose()
+    assert not transport._queues
+
+
+@pytest.mark.run_loop
+async def test_fetch_multiple_listeners():
+    """Each listener receives the events it listens for, rather than competing for all events"""
+    transport = DirectEventTransport()
+    received = {'a': [], 'b': []}
+
+    async def listen(event_name):
+        consumer = transport.consume([('my.api', event_name)], context={}, loop=None)
+        async for event_message in consumer:
+            received[event_name].append(event_message.kwargs['n'])
+            assert await consumer.__anext__() is True
+
+    tasks = [asyncio.ensure_future(listen('a')), asyncio.ensure_future(listen('b'))]
+    await asyncio.sleep(0.01)
+    for n, event_name in enumerate(['a', 'b', 'a', 'b']):
+        await transport.send_event(EventMessage(api_name='my.api', event_name=event_name, kwargs={'n': n}), options={})
+    await asyncio.sleep(0.01)
+
+    assert received == {'a': [0, 2], 'b': [1, 3]}
+    for task in tasks:
+        await cancel(task)
@@ -0,0 +1,195 @@
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+
+import pytest
+
+import lightbus
+from lightbus import BusNode
+from lightbus.message import EventMessage
+from lightbus.transports.file import FileEventTransport
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.yield_fixture
+def directory():
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+@pytest.fixture
+def file_event_transport(directory):
+    return FileEventTransport(
+        directory=directory,
+        consumer_group_prefix='test_cg',
+        consumer_name='test_consumer',
+        poll_interval=0.01,
+    )
+
+
+@pytest.fixture
+def file_bus(loop, directory):
+    return lightbus.create(
+        rpc_transport=lightbus.DebugRpcTransport(),
+        result_transport=lightbus.DebugResultTransport(),
+        event_transport=FileEventTransport(
+            directory=directory,
+            consumer_group_prefix='test_cg',
+            consumer_name='test_consumer',
+            poll_interval=0.01,
+        ),
+        schema_transport=lightbus.DebugSchemaTransport(),
+        loop=loop,
+        plugins={},
+    )
+
+
+async def consume(transport: FileEventTransport, received: list, **kwargs):
+    consumer = transport.consume([('my.api', 'my_event')], context={}, loop=None, **kwargs)
+    async for message in consumer:
+        received.append(message)
+        await consumer.__anext__()
+
+
+def make_event(n):
+    return EventMessage(api_name='my.api', event_name='my_event', kwargs={'n': n})
+
+
+@pytest.mark.run_loop
+async def test_send_event_concurrently(file_event_transport):
+    """Events sent at the same time are written together"""
+    await asyncio.gather(*[file_event_transport.send_event(make_event(n), options={}) for n in range(5)])
+    await file_event_transport.send_event(make_event(5), options={})
+
+    log = file_event_transport._get_log('my.api.my_event:stream')
+    messages = list(log.read())
+    assert sorted(fields[':n'] for _, fields in messages[:5]) == ['0', '1', '2', '3', '4']
+    assert messages[5][1][':n'] == '5'
+    assert len(log.segment_names()) == 1
+
+
+@pytest.mark.run_loop
+async def test_consume_events_consumer_groups(file_event_transport, directory):
+    """Each consumer group receives each event once"""
+    received_a, received_b = [], []
+    consumer2 = FileEventTransport(
+        directory=directory, consumer_group_prefix='test_cg', consumer_name='other_consumer', poll_interval=0.01
+    )
+    tasks = [
+        asyncio.ensure_future(consume(file_event_transport, received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(consumer2, received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(file_event_transport, received_b, consumer_group='b')),
+    ]
+    await asyncio.sleep(0.05)
+
+    for n in range(4):
+        await file_event_transport.send_event(make_event(n), options={})
+    await asyncio.sleep(0.1)
+    await cancel(*tasks)
+
+    assert sorted(m.kwargs['n'] for m in received_a) == [0, 1, 2, 3]
+    assert sorted(m.kwargs['n'] for m in received_b) == [0, 1, 2, 3]
+
+
+@pytest.mark.run_loop
+async def test_consume_events_since(file_event_transport):
+    await file_event_transport.send_event(make_event(0), options={})
+    received = []
+    await consume(file_event_transport, received, consumer_group='a', since='0', forever=False)
+    assert [m.kwargs['n'] for m in received] == [0]
+
+    # Existing groups carry on from where they left off
+    await file_event_transport.send_event(make_event(1), options={})
+    received = []
+    await consume(file_event_transport, received, consumer_group='a', since='0', forever=False)
+    assert [m.kwargs['n'] for m in received] == [1]
+
+
+@pytest.mark.run_loop
+async def test_consume_events_filters(file_event_transport):
+    for n in range(4):
+        await file_event_transport.send_event(make_event(n), options={})
+    received = []
+    await consume(file_event_transport, received, consumer_group='a', since='0', forever=False, filters={'n': [1, 3]})
+    assert [m.kwargs['n'] for m in received] == [1, 3]
+    # Filtered events are acknowledged too
+    assert file_event_transport._claim_pending(['my.api.my_event:stream'], 'test_cg-a', own=True) == []
+
+
+@pytest.mark.run_loop
+async def test_consume_events_redelivered_after_restart(file_event_transport):
+    """Events which were never acknowledged are delivered again"""
+    await file_event_transport.send_event(make_event(0), options={})
+    consumer = file_event_transport.consume([('my.api', 'my_event')], {}, None, consumer_group='a', since='0')
+    assert (await consumer.__anext__()).kwargs == {'n': 0}
+    # Stop without processing the message
+    await consumer.aclose()
+
+    received = []
+    await consume(file_event_transport, received, consumer_group='a', forever=False)
+    assert [m.kwargs['n'] for m in received] == [0]
+
+    received = []
+    await consume(file_event_transport, received, consumer_group='a', forever=False)
+    assert received == []
+
+
+@pytest.mark.run_loop
+async def test_consume_events_reclaim(file_event_transport, directory):
+    """Events not acknowledged within acknowledgement_timeout are reclaimed by another consumer"""
+    await file_event_transport.send_event(make_event(0), options={})
+    consumer = file_event_transport.consume([('my.api', 'my_event')], {}, None, consumer_group='a', since='0')
+    assert (await consumer.__anext__()).kwargs == {'n': 0}
+
+    other = FileEventTransport(
+        directory=directory, consumer_group_prefix='test_cg', consumer_name='other_consumer',
+        acknowledgement_timeout=0.1, reclaim_interval=0.01, poll_interval=0.01,
+    )
+    received = []
+    task = asyncio.ensure_future(consume(other, received, consumer_group='a'))
+    await asyncio.sleep(0.05)
+    assert received == []
+    await asyncio.sleep(0.15)
+    assert [m.kwargs['n'] for m in received] == [0]
+
+    await cancel(task)
+    await consumer.aclose()
+
+
+@pytest.mark.run_loop
+async def test_replay(file_event_transport):
+    await file_event_transport.send_event(make_event(0), options={})
+    await file_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='other_event', kwargs={'n': 1}), options={}
+    )
+    time.sleep(0.002)
+    middle = datetime.now()
+    time.sleep(0.002)
+    await file_event_transport.send_event(make_event(2), options={})
+
+    listen_for = [('my.api', 'my_event'), ('my.api', 'other_event')]
+    replayed = [m.kwargs['n'] async for m in file_event_transport.replay(listen_for)]
+    assert replayed == [0, 1, 2]
+    replayed = [m.kwargs['n'] async for m in file_event_transport.replay(listen_for, since=middle)]
+    assert replayed == [2]
+    replayed = [m.kwargs['n'] async for m in file_event_transport.replay(listen_for, until=middle)]
+    assert replayed == [0, 1]
+
+
+@pytest.mark.run_loop
+async def test_event(file_bus: BusNode, dummy_api):
+    """Full event integration test"""
+    received = []
+
+    def listener(api_name, event_name, **kwargs):
+        received.append(kwargs)
+
+    await file_bus.my.dummy.my_event.listen_async(listener)
+    await asyncio.sleep(0.05)
+    await file_bus.my.dummy.my_event.fire_async(field='Hello! 😎')
+    await asyncio.sleep(0.1)
+
+    assert received == [{'field': 'Hello! 😎'}]
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import lightbus
+from lightbus import BusNode
+from lightbus.message import RpcMessage, ResultMessage, EventMessage
+from lightbus.transports.memory import MemoryBroker, MemoryRpcTransport, MemoryResultTransport, \
+    MemoryEventTransport, MemorySchemaTransport, MemoryStream
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def broker():
+    return MemoryBroker()
+
+
+@pytest.fixture
+def memory_event_transport(broker):
+    return MemoryEventTransport(broker=broker, consumer_group_prefix='test_cg', consumer_name='test_consumer')
+
+
+@pytest.fixture
+def memory_bus(loop, broker):
+    return lightbus.create(
+        rpc_transport=MemoryRpcTransport(broker=broker),
+        result_transport=MemoryResultTransport(broker=broker),
+        event_transport=MemoryEventTransport(broker=broker),
+        schema_transport=MemorySchemaTransport(broker=broker),
+        loop=loop,
+        plugins={},
+    )
+
+
+async def consume(transport: MemoryEventTransport, received: list, **kwargs):
+    consumer = transport.consume([('my.api', 'my_event')], context={}, loop=None, **kwargs)
+    async for message in consumer:
+        received.append(message)
+        await consumer.__anext__()
+
+
+def make_event(n):
+    return EventMessage(api_name='my.api', event_name='my_event', kwargs={'n': n})
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_discards_expired_and_cancelled(broker, dummy_api):
+    transport = MemoryRpcTransport(broker=broker, rpc_timeout=0.01)
+    await transport.call_rpc(RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={'n': 0}), {})
+    await asyncio.sleep(0.02)
+
+    transport.rpc_timeout = 5
+    cancelled = RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={'n': 1})
+    await transport.call_rpc(cancelled, {})
+    await transport.call_rpc(RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={'n': 2}), {})
+    await transport.cancel_rpc(cancelled, {})
+
+    rpc_messages = await asyncio.wait_for(transport.consume_rpcs([dummy_api]), timeout=1)
+    assert [m.kwargs['n'] for m in rpc_messages] == [2]
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_waits(broker, dummy_api):
+    transport = MemoryRpcTransport(broker=broker)
+    task = asyncio.ensure_future(transport.consume_rpcs([dummy_api]))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+
+    rpc_message = RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={})
+    await transport.call_rpc(rpc_message, {})
+    # Passed by reference
+    assert (await asyncio.wait_for(task, timeout=1))[0] is rpc_message
+
+
+@pytest.mark.run_loop
+async def test_receive_result_stream(broker):
+    transport = MemoryResultTransport(broker=broker)
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    return_path = transport.get_return_path(rpc_message)
+    # Sent before the caller starts waiting
+    await transport.send_result(rpc_message, ResultMessage(rpc_id='123abc', result=0, more=True), return_path)
+
+    async def receive():
+        return [m.result async for m in transport.receive_result_stream(rpc_message, return_path, {})]
+
+    task = asyncio.ensure_future(receive())
+    for n in (1, 2):
+        await transport.send_result(rpc_message, ResultMessage(rpc_id='123abc', result=n, more=n < 2), return_path)
+
+    assert await asyncio.wait_for(task, timeout=1) == [0, 1, 2]
+    assert broker.results == {}
+
+
+@pytest.mark.run_loop
+async def test_consume_events_consumer_groups(memory_event_transport, broker):
+    """Each consumer group receives each event once"""
+    received_a, received_b = [], []
+    consumer2 = MemoryEventTransport(broker=broker, consumer_group_prefix='test_cg', consumer_name='other_consumer')
+    tasks = [
+        asyncio.ensure_future(consume(memory_event_transport, received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(consumer2, received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(memory_event_transport, received_b, consumer_group='b')),
+    ]
+    await asyncio.sleep(0.01)
+
+    for n in range(4):
+        await memory_event_transport.send_event(make_event(n), options={})
+    await asyncio.sleep(0.01)
+    await cancel(*tasks)
+
+    assert sorted(m.kwargs['n'] for m in received_a) == [0, 1, 2, 3]
+    assert sorted(m.kwargs['n'] for m in received_b) == [0, 1, 2, 3]
+
+
+@pytest.mark.run_loop
+async def test_consume_events_since_and_filters(memory_event_transport):
+    for n in range(4):
+        await memory_event_transport.send_event(make_event(n), options={})
+    received = []
+    await consume(memory_event_transport, received, consumer_group='a', since='0', forever=False, filters={'n': [1, 3]})
+    assert [m.kwargs['n'] for m in received] == [1, 3]
+
+    # Existing groups carry on from where they left off, and filtered events were acknowledged
+    await memory_event_transport.send_event(make_event(4), options={})
+    received = []
+    await consume(memory_event_transport, received, consumer_group='a', since='0', forever=False)
+    assert [m.kwargs['n'] for m in received] == [4]
+
+
+@pytest.mark.run_loop
+async def test_consume_events_released_on_stop(memory_event_transport, broker):
+    """Events a listener never acknowledged are delivered to the group's other listeners once it stops"""
+    received = []
+    other = MemoryEventTransport(broker=broker, consumer_group_prefix='test_cg', consumer_name='other_consumer')
+    await memory_event_transport.send_event(make_event(0), options={})
+    consumer = memory_event_transport.consume([('my.api', 'my_event')], {}, None, consumer_group='a', since='0')
+    assert (await consumer.__anext__()).kwargs == {'n': 0}
+
+    task = asyncio.ensure_future(consume(other, received, consumer_group='a'))
+    await asyncio.sleep(0.01)
+    assert received == []
+    # Stop without processing the message
+    await consumer.aclose()
+    await asyncio.sleep(0.01)
+    assert [m.kwargs['n'] for m in received] == [0]
+    await cancel(task)
+
+
+@pytest.mark.run_loop
+async def test_consume_events_reclaim(memory_event_transport, broker):
+    """Events not acknowledged within acknowledgement_timeout are reclaimed by another consumer"""
+    await memory_event_transport.send_event(make_event(0), options={})
+    consumer = memory_event_transport.consume([('my.api', 'my_event')], {}, None, consumer_group='a', since='0')
+    assert (await consumer.__anext__()).kwargs == {'n': 0}
+
+    other = MemoryEventTransport(
+        broker=broker, consumer_group_prefix='test_cg', consumer_name='other_consumer',
+        acknowledgement_timeout=0.05, reclaim_interval=0.01,
+    )
+    received = []
+    task = asyncio.ensure_future(consume(other, received, consumer_group='a'))
+    await asyncio.sleep(0.02)
+    assert received == []
+    await asyncio.sleep(0.1)
+    assert [m.kwargs['n'] for m in received] == [0]
+
+    await cancel(task)
+    await consumer.aclose()
+
+
+@pytest.mark.run_loop
+async def test_replay(memory_event_transport):
+    await memory_event_transport.send_event(make_event(0), options={})
+    await memory_event_transport.send_event(
+        EventMessage(api_name='my.api', event_name='other_event', kwargs={'n': 1}), options={}
+    )
+    time.sleep(0.002)
+    middle = datetime.now()
+    time.sleep(0.002)
+    await memory_event_transport.send_event(make_event(2), options={})
+
+    listen_for = [('my.api', 'my_event'), ('my.api', 'other_event')]
+    replayed = [m.kwargs['n'] async for m in memory_event_transport.replay(listen_for)]
+    assert replayed == [0, 1, 2]
+    replayed = [m.kwargs['n'] async for m in memory_event_transport.replay(listen_for, since=middle)]
+    assert replayed == [2]
+    replayed = [m.kwargs['n'] async for m in memory_event_transport.replay(listen_for, until=middle)]
+    assert replayed == [0, 1]
+
+
+def test_stream_trimmed():
+    stream = MemoryStream(max_length=10)
+    for n in range(15):
+        stream.append(make_event(n))
+    assert [m.kwargs['n'] for _, m in stream.read((0, 0))] == list(range(5, 15))
+
+
+@pytest.mark.run_loop
+async def test_rpc(memory_bus: BusNode, dummy_api):
+    """Full rpc call integration test"""
+    consume_task = asyncio.ensure_future(memory_bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.01)
+
+    assert await memory_bus.my.dummy.my_proc.call_async(field='Hello! 😎') == 'value: Hello! 😎'
+    await cancel(consume_task)
+
+
+@pytest.mark.run_loop
+async def test_event(memory_bus: BusNode, dummy_api):
+    """Full event integration test"""
+    received = []
+
+    def listener(api_name, event_name, **kwargs):
+        received.append(kwargs)
+
+    await memory_bus.my.dummy.my_event.listen_async(listener)
+    await asyncio.sleep(0.01)
+    await memory_bus.my.dummy.my_event.fire_async(field='Hello! 😎')
+    await asyncio.sleep(0.01)
+
+    assert received == [{'field': 'Hello! 😎'}]
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+import lightbus
+from lightbus import BusNode
+from lightbus.message import RpcMessage, ResultMessage
+from lightbus.transports.sockets import read_frame
+from lightbus.transports.tcp import TcpRpcTransport, TcpResultTransport
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def tcp_rpc_transports(new_redis_pool, server, loop):
+    """Get several TCP RPC transports, each with a redis fallback transport"""
+    return [
+        TcpRpcTransport(fallback_transport=lightbus.RedisRpcTransport(redis_pool=new_redis_pool(maxsize=10000)))
+        for _ in range(3)
+    ]
+
+
+@pytest.fixture
+def tcp_bus(loop, tcp_rpc_transports):
+    return lightbus.create(
+        rpc_transport=tcp_rpc_transports[0],
+        result_transport=TcpResultTransport(),
+        event_transport=lightbus.DebugEventTransport(),
+        schema_transport=lightbus.DebugSchemaTransport(),
+        loop=loop,
+        plugins={},
+    )
+
+
+def make_rpc_message(**kwargs):
+    return RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs=kwargs, return_path='abc')
+
+
+@pytest.mark.run_loop
+async def test_consume_rpcs_advertises(tcp_rpc_transports, dummy_api, redis_client):
+    worker, *_ = tcp_rpc_transports
+    consume_task = asyncio.ensure_future(worker.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+
+    assert worker.address.startswith('127.0.0.1:')
+    assert await redis_client.zrange('my.dummy:rpc_peers') == [worker.address.encode('utf8')]
+
+    await cancel(consume_task)
+    await worker.close()
+    assert await redis_client.zrange('my.dummy:rpc_peers') == []
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_load_balanced(tcp_rpc_transports, dummy_api, redis_client):
+    caller, worker1, worker2 = tcp_rpc_transports
+    consume1 = asyncio.ensure_future(worker1.consume_rpcs(apis=[dummy_api]))
+    consume2 = asyncio.ensure_future(worker2.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+
+    for n in range(2):
+        await caller.call_rpc(make_rpc_message(n=n), options={})
+
+    rpc_messages = await asyncio.wait_for(consume1, timeout=1) + await asyncio.wait_for(consume2, timeout=1)
+    assert sorted(m.kwargs['n'] for m in rpc_messages) == [0, 1]
+    # Sent directly, so nothing was queued in redis
+    assert await redis_client.keys('*rpc_queue*') == []
+    # A single connection to each worker
+    assert len(caller._connections) == 2
+
+    await caller.close()
+    await worker1.close()
+    await worker2.close()
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_fallback(tcp_rpc_transports, dummy_api, redis_client):
+    """Calls go via redis when no worker can be reached"""
+    caller, worker, _ = tcp_rpc_transports
+    # A worker which has died without removing its advertisement
+    await redis_client.zadd('my.dummy:rpc_peers', 9999999999, '127.0.0.1:1')
+
+    await caller.call_rpc(make_rpc_message(n=1), options={})
+    assert await redis_client.llen('my.dummy:rpc_queue') == 1
+
+    # Workers consume calls sent via the fallback transport
+    rpc_messages = await asyncio.wait_for(worker.consume_rpcs(apis=[dummy_api]), timeout=1)
+    assert [m.kwargs for m in rpc_messages] == [{'n': 1}]
+
+    await caller.close()
+    await worker.close()
+
+
+@pytest.mark.run_loop
+async def test_shared_cache(tcp_rpc_transports, redis_client):
+    """The shared cache is provided by the fallback transport"""
+    transport, *_ = tcp_rpc_transports
+    assert transport.shared_cache
+    await transport.set_cached_result('my.dummy', 'my_proc', '{}', '"value"', ttl=60)
+    assert await transport.get_cached_result('my.dummy', 'my_proc', '{}') == '"value"'
+    assert len(await redis_client.keys('my.dummy.my_proc:rpc_cache:*')) == 1
+
+
+@pytest.mark.run_loop
+async def test_receive_result(loop):
+    caller = TcpResultTransport()
+    worker = TcpResultTransport()
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    return_path = caller.get_return_path(rpc_message)
+    assert return_path.startswith('tcp://127.0.0.1:')
+
+    task = asyncio.ensure_future(caller.receive_result(rpc_message, return_path, {}))
+    await worker.send_result(rpc_message, ResultMessage(rpc_id='123abc', result='All done! 😎'), return_path)
+    assert (await asyncio.wait_for(task, timeout=1)).result == 'All done! 😎'
+
+    await caller.close()
+    await worker.close()
+
+
+@pytest.mark.run_loop
+async def test_send_result_concurrent(loop):
+    """Concurrent sends sharing a connection to a slow reader are all delivered"""
+    received = []
+    done = asyncio.Event()
+
+    async def slow_reader(reader, writer):
+        await asyncio.sleep(0.1)
+        for _ in range(20):
+            received.append(await read_frame(reader))
+        done.set()
+
+    server = await asyncio.start_server(slow_reader, '127.0.0.1', 0)
+    return_path = 'tcp://127.0.0.1:{}'.format(server.sockets[0].getsockname()[1])
+    worker = TcpResultTransport()
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    result_message = ResultMessage(rpc_id='123abc', result='x' * 1000000)
+
+    await asyncio.gather(*[worker.send_result(rpc_message, result_message, return_path) for _ in range(20)])
+    await asyncio.wait_for(done.wait(), timeout=5)
+    assert len(received) == 20
+
+    await worker.close()
+    server.close()
+
+
+@pytest.mark.run_loop
+async def test_rpc(tcp_bus: BusNode, dummy_api):
+    """Full rpc call integration test"""
+    consume_task = asyncio.ensure_future(tcp_bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+
+    results = await asyncio.gather(*[tcp_bus.my.dummy.my_proc.call_async(field=str(n)) for n in range(10)])
+    assert results == ['value: {}'.format(n) for n in range(10)]
+    await cancel(consume_task)
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+import lightbus
+from lightbus import BusNode
+from lightbus.exceptions import NoConsumersFound
+from lightbus.message import RpcMessage, ResultMessage, EventMessage
+from lightbus.transports.sockets import read_frame
+from lightbus.transports.unix import UnixRpcTransport, UnixResultTransport, UnixEventTransport
+from lightbus.utilities.async import cancel
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.yield_fixture
+def socket_directory():
+    # Unix socket paths are limited to ~100 characters, so keep this short
+    with tempfile.TemporaryDirectory(prefix='lb') as directory:
+        yield directory
+
+
+@pytest.fixture
+def unix_bus(loop, socket_directory):
+    return lightbus.create(
+        rpc_transport=UnixRpcTransport(socket_directory=socket_directory),
+        result_transport=UnixResultTransport(socket_directory=socket_directory),
+        event_transport=UnixEventTransport(socket_directory=socket_directory),
+        schema_transport=lightbus.DebugSchemaTransport(),
+        loop=loop,
+        plugins={},
+    )
+
+
+async def consume(transport: UnixEventTransport, listen_for, received: list, **kwargs):
+    consumer = transport.consume(listen_for, context={}, loop=None, **kwargs)
+    async for message in consumer:
+        received.append(message)
+        await consumer.__anext__()
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_no_workers(socket_directory):
+    transport = UnixRpcTransport(socket_directory=socket_directory)
+    with pytest.raises(NoConsumersFound):
+        await transport.call_rpc(RpcMessage(api_name='my.api', procedure_name='my_proc', kwargs={}), options={})
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_round_robin(socket_directory, dummy_api):
+    worker1 = UnixRpcTransport(socket_directory=socket_directory)
+    worker2 = UnixRpcTransport(socket_directory=socket_directory)
+    consume1 = asyncio.ensure_future(worker1.consume_rpcs(apis=[dummy_api]))
+    consume2 = asyncio.ensure_future(worker2.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+    assert len(os.listdir(socket_directory)) == 2
+
+    caller = UnixRpcTransport(socket_directory=socket_directory)
+    for n in range(2):
+        rpc_message = RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={'n': n}, return_path='abc')
+        await caller.call_rpc(rpc_message, options={})
+
+    rpc_messages = await asyncio.wait_for(consume1, timeout=1) + await asyncio.wait_for(consume2, timeout=1)
+    assert sorted(m.kwargs['n'] for m in rpc_messages) == [0, 1]
+
+    await caller.close()
+    await worker1.close()
+    await worker2.close()
+    assert os.listdir(socket_directory) == []
+
+
+@pytest.mark.run_loop
+async def test_call_rpc_stale_socket(socket_directory, dummy_api):
+    """Sockets left behind by dead workers are skipped & removed"""
+    worker = UnixRpcTransport(socket_directory=socket_directory)
+    consume_task = asyncio.ensure_future(worker.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+    # A socket which nothing is listening on
+    stale_path = os.path.join(socket_directory, 'my.dummy:rpc:aaaa.sock')
+    dead = await asyncio.start_unix_server(lambda r, w: None, stale_path)
+    dead.close()
+    await dead.wait_closed()
+    assert os.path.exists(stale_path)
+
+    caller = UnixRpcTransport(socket_directory=socket_directory)
+    for _ in range(2):
+        rpc_message = RpcMessage(api_name='my.dummy', procedure_name='my_proc', kwargs={}, return_path='abc')
+        await caller.call_rpc(rpc_message, options={})
+
+    assert not os.path.exists(stale_path)
+    assert len(await asyncio.wait_for(consume_task, timeout=1)) == 2
+    await caller.close()
+    await worker.close()
+
+
+@pytest.mark.run_loop
+async def test_receive_result_stream(socket_directory):
+    caller = UnixResultTransport(socket_directory=socket_directory)
+    worker = UnixResultTransport(socket_directory=socket_directory)
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    return_path = caller.get_return_path(rpc_message)
+    assert return_path.startswith(f'unix://{socket_directory}/results:')
+
+    async def receive():
+        return [m.result async for m in caller.receive_result_stream(rpc_message, return_path, {})]
+
+    task = asyncio.ensure_future(receive())
+    for n in range(3):
+        await worker.send_result(rpc_message, ResultMessage(rpc_id='123abc', result=n, more=n < 2), return_path)
+
+    assert await asyncio.wait_for(task, timeout=1) == [0, 1, 2]
+    await caller.close()
+    await worker.close()
+
+
+@pytest.mark.run_loop
+async def test_send_result_concurrent(socket_directory):
+    """Concurrent sends sharing a connection to a slow reader are all delivered"""
+    received = []
+    done = asyncio.Event()
+
+    async def slow_reader(reader, writer):
+        await asyncio.sleep(0.1)
+        for _ in range(20):
+            received.append(await read_frame(reader))
+        done.set()
+
+    path = os.path.join(socket_directory, 'results:slow.sock')
+    server = await asyncio.start_unix_server(slow_reader, path)
+    worker = UnixResultTransport(socket_directory=socket_directory)
+    rpc_message = RpcMessage(rpc_id='123abc', api_name='my.api', procedure_name='my_proc', kwargs={})
+    result_message = ResultMessage(rpc_id='123abc', result='x' * 200000)
+
+    await asyncio.gather(*[worker.send_result(rpc_message, result_message, f'unix://{path}') for _ in range(20)])
+    await asyncio.wait_for(done.wait(), timeout=5)
+    assert len(received) == 20
+
+    await worker.close()
+    server.close()
+
+
+@pytest.mark.run_loop
+async def test_consume_events_consumer_groups(socket_directory):
+    """Each consumer group receives each event once"""
+    transport = UnixEventTransport(socket_directory=socket_directory)
+    received_a, received_b = [], []
+    tasks = [
+        asyncio.ensure_future(consume(transport, [('my.api', 'my_event')], received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(transport, [('my.api', 'my_event')], received_a, consumer_group='a')),
+        asyncio.ensure_future(consume(transport, [('my.api', 'my_event')], received_b, consumer_group='b')),
+    ]
+    await asyncio.sleep(0.05)
+
+    sender = UnixEventTransport(socket_directory=socket_directory)
+    for n in range(4):
+        await sender.send_event(EventMessage(api_name='my.api', event_name='my_event', kwargs={'n': n}), options={})
+    await asyncio.sleep(0.05)
+
+    assert sorted(m.kwargs['n'] for m in received_a) == [0, 1, 2, 3]
+    assert sorted(m.kwargs['n'] for m in received_b) == [0, 1, 2, 3]
+
+    await cancel(*tasks)
+    await sender.close()
+    assert os.listdir(socket_directory) == []
+
+
+@pytest.mark.run_loop
+async def test_rpc(unix_bus: BusNode, dummy_api):
+    """Full rpc call integration test"""
+    consume_task = asyncio.ensure_future(unix_bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+
+    assert await unix_bus.my.dummy.my_proc.call_async(field='Hello! 😎') == 'value: Hello! 😎'
+    await cancel(consume_task)
+
+
+@pytest.mark.run_loop
+async def test_event(unix_bus: BusNode, dummy_api):
+    """Full event integration test"""
+    received = []
+
+    def listener(api_name, event_name, **kwargs):
+        received.append(kwargs)
+
+    await unix_bus.my.dummy.my_event.listen_async(listener)
+    await asyncio.sleep(0.05)
+    await unix_bus.my.dummy.my_event.fire_async(field='Hello! 😎')
+    await asyncio.sleep(0.05)
+
+    assert received == [{'field': 'Hello! 😎'}]
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from lightbus.utilities.async import TaskContextVar
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.run_loop
+async def test_task_context_var():
+    var = TaskContextVar('test', default='default')
+
+    async def co(value):
+        assert var.get() == 'default'
+        token = var.set(value)
+        await asyncio.sleep(0.01)
+        assert var.get() == value
+        var.reset(token)
+        assert var.get() == 'default'
+
+    await asyncio.gather(co('a'), co('b'))
+    assert var.get() == 'default'
@@ -0,0 +1,282 @@
+import asyncio
+
+import aioredis
+import pytest
+
+import lightbus
+from lightbus import BusNode, RedisEventTransport
+from lightbus.utilities.async import cancel
+from lightbus.utilities.fake_redis import FakeRedisServer
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def fake_redis(loop):
+    server = FakeRedisServer()
+    loop.run_until_complete(server.start())
+    yield server
+    loop.run_until_complete(server.stop())
+
+
+@pytest.fixture
+def redis_client(fake_redis, loop):
+    redis = loop.run_until_complete(aioredis.create_redis(fake_redis.address, loop=loop))
+    yield redis
+    redis.close()
+    loop.run_until_complete(redis.wait_closed())
+
+
+@pytest.fixture
+def fake_redis_event_transport(fake_redis, loop):
+    transport = RedisEventTransport(
+        url=fake_redis.url, consumer_group_prefix='test_cg', consumer_name='test_consumer'
+    )
+    yield transport
+    loop.run_until_complete(transport.close())
+
+
+@pytest.fixture
+def fake_redis_bus(fake_redis, loop):
+    return lightbus.create(
+        rpc_transport=lightbus.RedisRpcTransport(url=fake_redis.url),
+        result_transport=lightbus.RedisResultTransport(url=fake_redis.url),
+        event_transport=lightbus.RedisEventTransport(
+            url=fake_redis.url, consumer_group_prefix='test_cg', consumer_name='test_consumer'
+        ),
+        schema_transport=lightbus.RedisSchemaTransport(url=fake_redis.url),
+        loop=loop,
+        plugins={},
+    )
+
+
+@pytest.mark.run_loop
+async def test_strings_and_expiry(redis_client):
+    await redis_client.set('a', 'x', pexpire=50)
+    await redis_client.set('b', 'y')
+    assert await redis_client.mget('a', 'b', 'c') == [b'x', b'y', None]
+    assert await redis_client.set('b', 'z', exist=redis_client.SET_IF_NOT_EXIST) is False
+    assert await redis_client.expire('b', 10)
+    assert 0 < await redis_client.ttl('b') <= 10
+
+    await asyncio.sleep(0.06)
+    assert await redis_client.get('a') is None
+    assert await redis_client.exists('a') == 0
+
+
+@pytest.mark.run_loop
+async def test_wrong_type(redis_client):
+    await redis_client.rpush('my_list', 'a')
+    with pytest.raises(aioredis.ReplyError) as e:
+        await redis_client.get('my_list')
+    assert str(e.value).startswith('WRONGTYPE')
+
+
+@pytest.mark.run_loop
+async def test_blpop(redis_client, fake_redis):
+    other_client = await aioredis.create_redis(fake_redis.address)
+    task = asyncio.ensure_future(redis_client.blpop('a', 'b', timeout=1))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+
+    await other_client.rpush('b', 'x', 'y')
+    assert await asyncio.wait_for(task, timeout=1) == [b'b', b'x']
+    assert await redis_client.lrange('b', 0, -1) == [b'y']
+    # Times out (fractional timeouts are accepted, as with redis 6)
+    assert await redis_client.execute(b'BLPOP', 'c', 0.01) is None
+    other_client.close()
+
+
+@pytest.mark.run_loop
+async def test_blpop_client_disconnected(redis_client, fake_redis):
+    """A client which disconnects whilst blocked does not take the next value"""
+    other_client = await aioredis.create_redis(fake_redis.address)
+    task = asyncio.ensure_future(other_client.blpop('a'))
+    await asyncio.sleep(0.01)
+    other_client.close()
+    await asyncio.sleep(0.01)
+
+    await redis_client.rpush('a', 'x')
+    assert await redis_client.lrange('a', 0, -1) == [b'x']
+    await cancel(task)
+
+
+@pytest.mark.run_loop
+async def test_sets_and_sorted_sets(redis_client):
+    assert await redis_client.sadd('s', 'a', 'b', 'a') == 2
+    assert await redis_client.smembers('s') == [b'a', b'b']
+
+    await redis_client.zadd('z', 3, 'c', 1, 'a', 2, 'b')
+    assert await redis_client.zrange('z', 1, -1) == [b'b', b'c']
+    assert await redis_client.zrangebyscore('z', 2, float('inf')) == [b'b', b'c']
+    assert await redis_client.zremrangebyscore('z', max=2) == 2
+    assert await redis_client.zrangebyscore('z', withscores=True) == [(b'c', 3)]
+
+
+@pytest.mark.run_loop
+async def test_pubsub(redis_client, fake_redis):
+    subscriber = await aioredis.create_redis(fake_redis.address)
+    channel, = await subscriber.psubscribe('my.*')
+    assert await redis_client.publish('my.channel', 'hello') == 1
+    assert await asyncio.wait_for(channel.get(), timeout=1) == (b'my.channel', b'hello')
+    subscriber.close()
+
+
+@pytest.mark.run_loop
+async def test_stream_consumer_groups(redis_client):
+    await redis_client.xadd('stream', {'a': 1})
+    await redis_client.xgroup_create('stream', 'group', latest_id='0')
+    with pytest.raises(aioredis.ReplyError) as e:
+        await redis_client.xgroup_create('stream', 'group', latest_id='0')
+    assert str(e.value).startswith('BUSYGROUP')
+
+    message_id = await redis_client.xadd('stream', {'a': 2})
+    messages = await redis_client.xread_group('group', 'consumer1', ['stream'], latest_ids=['>'])
+    assert [fields for _, _, fields in messages] == [{b'a': b'1'}, {b'a': b'2'}]
+    # Nothing new
+    assert await redis_client.xread_group('group', 'consumer1', ['stream'], latest_ids=['>'], timeout=None) == []
+    assert await redis_client.xack('stream', 'group', messages[0][1]) == 1
+
+    pending = await redis_client.xpending('stream', 'group')
+    assert pending == [1, message_id, message_id, [[b'consumer1', b'1']]]
+
+    # Too recently delivered to be claimed
+    assert await redis_client.xclaim('stream', 'group', 'consumer2', 1000, message_id) == []
+    await asyncio.sleep(0.02)
+    claimed = await redis_client.xclaim('stream', 'group', 'consumer2', 10, message_id)
+    assert claimed == [(message_id, {b'a': b'2'})]
+    pending, = await redis_client.xpending('stream', 'group', '-', '+', 10, 'consumer2')
+    assert pending[:2] == [message_id, b'consumer2'] and pending[3] == 2
+
+    consumers = await redis_client.xinfo_consumers('stream', 'group')
+    assert [(c[b'name'], c[b'pending']) for c in consumers] == [(b'consumer1', 0), (b'consumer2', 1)]
+
+
+@pytest.mark.run_loop
+async def test_stream_blocking_read(redis_client, fake_redis):
+    other_client = await aioredis.create_redis(fake_redis.address)
+    await redis_client.execute(b'XGROUP', b'CREATE', 'stream', 'group', '$', b'MKSTREAM')
+    task = asyncio.ensure_future(redis_client.xread_group('group', 'consumer', ['stream'], latest_ids=['>']))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+
+    await other_client.xadd('stream', {'a': 1}, max_len=10)
+    assert [fields for _, _, fields in await asyncio.wait_for(task, timeout=1)] == [{b'a': b'1'}]
+    other_client.close()
+
+
+@pytest.mark.run_loop
+async def test_inject_error(redis_client, fake_redis):
+    fake_redis.inject_error('GET', 'ERR broken', times=1)
+    with pytest.raises(aioredis.ReplyError):
+        await redis_client.get('a')
+    assert await redis_client.get('a') is None
+
+
+@pytest.mark.run_loop
+async def test_client_kill_pubsub(redis_client, fake_redis):
+    subscriber = await aioredis.create_redis(fake_redis.address)
+    channel, = await subscriber.subscribe('my_channel')
+    assert await redis_client.execute(b'CLIENT', b'KILL', b'TYPE', b'pubsub') == 1
+    assert not await asyncio.wait_for(channel.wait_message(), timeout=1)
+    # Other clients are unaffected
+    assert await redis_client.ping() == b'PONG'
+    info = await redis_client.info('clients')
+    assert info['clients']['connected_clients'] == '1'
+
+
+@pytest.mark.run_loop
+async def test_disconnect_clients(redis_client, fake_redis):
+    await redis_client.ping()
+    fake_redis.disconnect_clients()
+    await asyncio.sleep(0.01)
+    assert redis_client.closed
+
+
+@pytest.mark.run_loop
+async def test_rpc(fake_redis_bus: BusNode, dummy_api):
+    """Full rpc call integration test"""
+    consume_task = asyncio.ensure_future(fake_redis_bus.bus_client.consume_rpcs(apis=[dummy_api]))
+    await asyncio.sleep(0.05)
+
+    assert await fake_redis_bus.my.dummy.my_proc.call_async(field='Hello! 😎') == 'value: Hello! 😎'
+    await cancel(consume_task)
+
+
+async def _wait_for_group(redis_client, stream):
+    """Wait for a listener to create its consumer group, after which it will receive new events"""
+    while True:
+        if await redis_client.exists(stream) and await redis_client.xinfo_groups(stream):
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.run_loop
+async def test_event(fake_redis_bus: BusNode, dummy_api, redis_client):
+    """Full event integration test"""
+    received = []
+
+    def listener(api_name, event_name, **kwargs):
+        received.append(kwargs)
+
+    await fake_redis_bus.my.dummy.my_event.listen_async(listener)
+    await asyncio.wait_for(_wait_for_group(redis_client, 'my.dummy.my_event:stream'), timeout=1)
+    await fake_redis_bus.my.dummy.my_event.fire_async(field='Hello! 😎')
+    await asyncio.sleep(0.05)
+
+    assert received == [{'field': 'Hello! 😎'}]
+
+
+@pytest.mark.run_loop
+async def test_event_filtered(fake_redis_event_transport: RedisEventTransport, redis_client, loop):
+    """Filters are applied within the server, as with redis' Lua scripting"""
+    messages = []
+    # Create the group up front, so the listener will see every event regardless of when it starts
+    await redis_client.execute(b'XGROUP', b'CREATE', 'my.dummy.my_event:stream', 'test_cg-filtered', '$', b'MKSTREAM')
+
+    async def co_consume():
+        consumer = fake_redis_event_transport.consume(
+            [('my.dummy', 'my_event')], {}, loop, consumer_group='filtered', filters={'field': ['a', 'c']},
+        )
+        async for message in consumer:
+            messages.append(message)
+            await consumer.__anext__()
+
+    task = asyncio.ensure_future(co_consume())
+    await asyncio.sleep(0.05)
+    for value in (b'"a"', b'"b"', b'"c"'):
+        await redis_client.xadd('my.dummy.my_event:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': b'my_event',
+            b':field': value,
+        })
+    await asyncio.sleep(0.1)
+
+    assert [m.kwargs['field'] for m in messages] == ['a', 'c']
+    assert (await redis_client.xpending('my.dummy.my_event:stream', 'test_cg-filtered'))[0] == 0
+    await cancel(task)
+
+
+@pytest.mark.run_loop
+async def test_archive_stream(fake_redis_event_transport: RedisEventTransport, redis_client, tmpdir):
+    fake_redis_event_transport.archive_directory = str(tmpdir)
+    fake_redis_event_transport.max_stream_length = 10
+    for ms in range(1000, 1025):
+        await redis_client.xadd('my.dummy.my_event:stream', fields={
+            b'api_name': b'my.dummy',
+            b'event_name': b'my_event',
+            b':field': b'"a"',
+        }, message_id='{}-0'.format(ms))
+
+    assert await fake_redis_event_transport.archive_stream('my.dummy.my_event:stream') == 15
+    remaining = await redis_client.xrange('my.dummy.my_event:stream')
+    assert [message_id for message_id, _ in remaining] == ['{}-0'.format(ms).encode() for ms in range(1015, 1025)]
+
+
+@pytest.mark.run_loop
+async def test_unknown_script(redis_client):
+    with pytest.raises(aioredis.ReplyError) as e:
+        await redis_client.evalsha('0' * 40)
+    assert str(e.value).startswith('NOSCRIPT')
+    with pytest.raises(aioredis.ReplyError):
+        await redis_client.eval('return 1')
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from lightbus import RedisRpcTransport
+from lightbus.utilities.async import cancel
+from lightbus.utilities.fake_redis import FakeRedisServer
+from lightbus.utilities.redis_client import create_redis_client, RedisClient, ReplyError
+from lightbus.utilities.resp import RespParser, INCOMPLETE, RespError, encode
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def client(server, loop):
+    client = loop.run_until_complete(create_redis_client(server.tcp_address, loop=loop))
+    loop.run_until_complete(client.flushall())
+    yield client
+    client.close()
+    loop.run_until_complete(client.wait_closed())
+
+
+def test_parse_chunked():
+    parser = RespParser()
+    data = bytes(encode([b'x' * 1000, 123, None, [b'a', RespError('ERR oops')]]))
+    for i in range(0, len(data), 7):
+        assert parser.get() is INCOMPLETE
+        parser.feed(data[i:i + 7])
+
+    value = parser.get()
+    assert value[:3] == [b'x' * 1000, 123, None]
+    assert value[3][0] == b'a' and str(value[3][1]) == 'ERR oops'
+    assert parser.get() is INCOMPLETE
+
+
+@pytest.mark.run_loop
+async def test_commands_pipelined(client: RedisClient):
+    """Concurrent commands are sent together on a single connection"""
+    await client.ping()
+    writes = []
+    transport = client._connection._transport
+    original_write = transport.write
+    transport.write = lambda data: writes.append(data) or original_write(data)
+
+    await asyncio.gather(*[client.set(f'key{n}', n) for n in range(10)])
+    assert len(writes) == 1
+    assert await client.mget('key0', 'key9') == [b'0', b'9']
+
+
+@pytest.mark.run_loop
+async def test_reply_error(client: RedisClient):
+    await client.rpush('my_list', 'a')
+    with pytest.raises(ReplyError) as e:
+        await client.get('my_list')
+    assert str(e.value).startswith('WRONGTYPE')
+    # The connection remains usable
+    assert await client.llen('my_list') == 1
+
+
+@pytest.mark.run_loop
+async def test_pipeline(client: RedisClient):
+    p = client.pipeline()
+    p.rpush('my_list', 'a')
+    p.set('key', 'value')
+    p.expire('key', 60)
+    assert await p.execute() == [1, True, True]
+
+
+@pytest.mark.run_loop
+async def test_blocking_commands_use_own_connection(client: RedisClient):
+    task = asyncio.ensure_future(client.blpop('my_list'))
+    await asyncio.sleep(0.01)
+    # Other commands are not held up by the blocked command
+    assert await asyncio.wait_for(client.rpush('my_list', 'a'), timeout=1) == 1
+    assert await asyncio.wait_for(task, timeout=1) == [b'my_list', b'a']
+
+
+@pytest.mark.run_loop
+async def test_blpop_cancelled(client: RedisClient):
+    """A cancelled BLPOP leaves no connection blocked, and does not lose values"""
+    task = asyncio.ensure_future(client.blpop('my_list'))
+    await asyncio.sleep(0.01)
+    await cancel(task)
+    await asyncio.sleep(0.01)
+
+    await client.rpush('my_list', 'a')
+    assert await client.lrange('my_list', 0, -1) == [b'a']
+    # The unblocked connection is reused
+    assert len(client._idle_connections) == 1
+    assert await client.blpop('my_list') == [b'my_list', b'a']
+
+
+@pytest.mark.run_loop
+async def test_blpop_cancelled_after_pop(client: RedisClient, loop):
+    """A value popped just as BLPOP was cancelled is returned to its list"""
+    other = await create_redis_client(client.address, loop=loop)
+    task = asyncio.ensure_future(client.blpop('my_list'))
+    await asyncio.sleep(0.01)
+    await other.rpush('my_list', 'a', 'b')
+    task.cancel()
+    await asyncio.sleep(0.05)
+
+    assert await client.lrange('my_list', 0, -1) == [b'a', b'b']
+    other.close()
+
+
+@pytest.mark.run_loop
+async def test_xread_group(client: RedisClient):
+    await client.xadd('stream', {'a': 1})
+    assert await client.xgroup_create('stream', 'group', latest_id='0')
+    messages = await client.xread_group('group', 'consumer', ['stream'], latest_ids=['>'], count=10)
+    assert [(stream, fields) for stream, _, fields in messages] == [(b'stream', {b'a': b'1'})]
+
+    task = asyncio.ensure_future(client.xread_group('group', 'consumer', ['stream'], latest_ids=['>']))
+    await asyncio.sleep(0.01)
+    await client.xadd('stream', {'a': 2})
+    messages = await asyncio.wait_for(task, timeout=1)
+    assert [fields for _, _, fields in messages] == [{b'a': b'2'}]
+
+    groups = await client.xinfo_groups('stream')
+    assert groups[0][b'name'] == b'group' and groups[0][b'pending'] == 2
+
+
+@pytest.mark.run_loop
+async def test_pubsub(client: RedisClient):
+    channel, = await client.subscribe('my_channel')
+    pattern_channel, = await client.psubscribe('my_*')
+    assert await client.publish('my_channel', 'hello') == 2
+
+    assert await asyncio.wait_for(channel.get(), timeout=1) == b'hello'
+    assert await asyncio.wait_for(pattern_channel.get(), timeout=1) == (b'my_channel', b'hello')
+
+    await client.punsubscribe('my_*')
+    assert not await pattern_channel.wait_message()
+
+
+@pytest.mark.run_loop
+async def test_fake_redis_server(loop):
+    """The stand-in server supports unblocking cancelled commands"""
+    server = FakeRedisServer()
+    await server.start()
+    client = await create_redis_client(server.address, loop=loop)
+
+    task = asyncio.ensure_future(client.blpop('my_list'))
+    await asyncio.sleep(0.01)
+    await cancel(task)
+    await asyncio.sleep(0.01)
+    await client.rpush('my_list', 'a')
+    assert await client.lrange('my_list', 0, -1) == [b'a']
+
+    client.close()
+    await server.stop()
+
+
+@pytest.mark.run_loop
+async def test_transport_from_config(server, dummy_api):
+    transport = RedisRpcTransport.from_config(
+        config=None,
+        url='redis://{}:{}/0'.format(*server.tcp_address),
+        connection_parameters=dict(client='lightbus', maxsize=5),
+    )
+    with await transport.connection_manager() as redis:
+        assert isinstance(redis, RedisClient)
+        assert redis.maxsize == 5
+    await transport.close()